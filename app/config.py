@@ -49,6 +49,24 @@ class Config:
     REPORTS_BACKUP_ENABLED = os.environ.get('REPORTS_BACKUP_ENABLED', 'True').lower() == 'true'
     REPORTS_BACKUP_RETENTION_DAYS = int(os.environ.get('REPORTS_BACKUP_RETENTION_DAYS', 730))  # 2 años
     REPORTS_MAX_FILE_SIZE = int(os.environ.get('REPORTS_MAX_FILE_SIZE', 10 * 1024 * 1024))  # 10MB
+    REPORTS_BACKUP_CODEC = os.environ.get('REPORTS_BACKUP_CODEC', 'deflated')  # deflated, bzip2 o stored
+    REPORTS_BACKUP_COMPRESSION_LEVEL = int(os.environ.get('REPORTS_BACKUP_COMPRESSION_LEVEL', 6))
+    REPORTS_BACKUP_WORKERS = int(os.environ.get('REPORTS_BACKUP_WORKERS', os.cpu_count() or 2))
+    REPORTS_BACKUP_CHUNK_SIZE = int(os.environ.get('REPORTS_BACKUP_CHUNK_SIZE', 32))  # Archivos por bloque
+    REPORTS_COMPRESS_AT_REST = os.environ.get('REPORTS_COMPRESS_AT_REST', 'False').lower() == 'true'  # Guardar como .html.gz
+    REPORTS_PDF_WORKERS = int(os.environ.get('REPORTS_PDF_WORKERS', 2))  # Procesos de renderizado de PDF
+    REPORTS_STATS_RECOMPUTE_SECONDS = int(os.environ.get('REPORTS_STATS_RECOMPUTE_SECONDS', 600))  # Recálculo exacto
+    REPORTS_STATS_HLL_PRECISION = int(os.environ.get('REPORTS_STATS_HLL_PRECISION', 12))  # 4096 registros, ~1.6% de error
+    REPORTS_BATCH_MAX_SIZE = int(os.environ.get('REPORTS_BATCH_MAX_SIZE', 200))  # Reportes por lote
+    REPORTS_BATCH_WRITE_WORKERS = int(os.environ.get('REPORTS_BATCH_WRITE_WORKERS', 8))  # Escrituras de archivo en paralelo
+    REPORTS_WRITE_BEHIND = os.environ.get('REPORTS_WRITE_BEHIND', 'False').lower() == 'true'  # Escribir archivos durante el commit
+    REPORTS_FILE_WRITE_WORKERS = int(os.environ.get('REPORTS_FILE_WRITE_WORKERS', 2))  # Hilos de E/S en modo write-behind
+    REPORTS_FILE_FSYNC = os.environ.get('REPORTS_FILE_FSYNC', 'True').lower() == 'true'  # fsync de archivo y directorio
+    REPORTS_PAGE_SIZE = int(os.environ.get('REPORTS_PAGE_SIZE', 100))  # Reportes por página (date-range)
+    REPORTS_MAX_PAGE_SIZE = int(os.environ.get('REPORTS_MAX_PAGE_SIZE', 500))
+    REPORTS_EXPORT_BATCH_SIZE = int(os.environ.get('REPORTS_EXPORT_BATCH_SIZE', 500))  # Filas por lote en exportaciones
+    REPORTS_REVISION_KEYFRAME_INTERVAL = int(os.environ.get('REPORTS_REVISION_KEYFRAME_INTERVAL', 20))  # Revisión completa cada N
+    REPORTS_STORAGE_LAYOUT = os.environ.get('REPORTS_STORAGE_LAYOUT', 'monthly')  # monthly (YYYY/MM) o sharded (YYYY/MM/DD/<hash>)
     
     # Configuración de archivos HTML del frontend
     FRONTEND_HTML_FOLDER = os.environ.get('FRONTEND_HTML_FOLDER') or 'frontend_html'
@@ -56,6 +74,30 @@ class Config:
     FRONTEND_HTML_MAX_FILE_SIZE = int(os.environ.get('FRONTEND_HTML_MAX_FILE_SIZE', 5 * 1024 * 1024))  # 5MB
     FRONTEND_HTML_ALLOWED_EXTENSIONS = {'html', 'htm'}
     FRONTEND_HTML_BACKUP_ENABLED = os.environ.get('FRONTEND_HTML_BACKUP_ENABLED', 'True').lower() == 'true'
+    FRONTEND_HTML_BACKUP_KEEP_LAST = int(os.environ.get('FRONTEND_HTML_BACKUP_KEEP_LAST', 10))  # Instantáneas recientes por archivo
+    FRONTEND_HTML_BACKUP_KEEP_DAILY_DAYS = int(os.environ.get('FRONTEND_HTML_BACKUP_KEEP_DAILY_DAYS', 30))  # Una diaria durante N días
+    FRONTEND_HTML_BACKUP_COMPACT_INTERVAL = int(os.environ.get('FRONTEND_HTML_BACKUP_COMPACT_INTERVAL', 3600))  # Segundos (0 = sin compactador)
+    FRONTEND_HTML_COMPRESS_AT_REST = os.environ.get('FRONTEND_HTML_COMPRESS_AT_REST', 'False').lower() == 'true'  # Guardar como .html.gz
+    FRONTEND_HTML_INDEX_PATH = os.environ.get('FRONTEND_HTML_INDEX_PATH')  # Índice SQLite de metadatos (por defecto <base>/index.sqlite3)
+    FRONTEND_HTML_META_CACHE_SIZE = int(os.environ.get('FRONTEND_HTML_META_CACHE_SIZE', 1024))  # Archivos .meta en memoria (0 = sin cache)
+    FRONTEND_HTML_STORAGE_LAYOUT = os.environ.get('FRONTEND_HTML_STORAGE_LAYOUT', 'monthly')  # monthly (YYYY/MM) o sharded (YYYY/MM/DD/<hash>)
+    
+    # Nivel de compresión gzip para HTML almacenado comprimido
+    HTML_GZIP_COMPRESSION_LEVEL = int(os.environ.get('HTML_GZIP_COMPRESSION_LEVEL', 6))
+    
+    # Distribución en directorios: ancho del prefijo de hash y lote de la migración
+    STORAGE_SHARD_WIDTH = int(os.environ.get('STORAGE_SHARD_WIDTH', 2))  # Caracteres hex (2 = hasta 256 directorios por día)
+    STORAGE_MIGRATION_BATCH_SIZE = int(os.environ.get('STORAGE_MIGRATION_BATCH_SIZE', 200))  # Archivos por lote
+    STORAGE_MIGRATION_MAX_BATCHES = int(os.environ.get('STORAGE_MIGRATION_MAX_BATCHES', 5))  # Lotes por petición HTTP
+    
+    # Plantillas de pruebas de laboratorio
+    LAB_TESTS_HTML_PATH = os.environ.get('LAB_TESTS_HTML_PATH') or os.path.join(os.getcwd(), 'bocetos_pruebas', 'html_output')
+    LAB_TESTS_CATEGORIES_PATH = os.environ.get('LAB_TESTS_CATEGORIES_PATH')  # Carpetas <categoría>/ (por defecto el padre de html_output)
+    LAB_TESTS_CATALOG_RELOAD_INTERVAL = int(os.environ.get('LAB_TESTS_CATALOG_RELOAD_INTERVAL', 5))  # Segundos entre revisiones (0 = sin recarga)
+    LAB_TESTS_DOCX_PATH = os.environ.get('LAB_TESTS_DOCX_PATH') or os.path.join(os.getcwd(), 'bocetos_pruebas')  # Documentos Word de origen
+    LAB_TESTS_CONVERT_WORKERS = int(os.environ.get('LAB_TESTS_CONVERT_WORKERS', os.cpu_count() or 2))  # Procesos de conversión
+    LAB_TESTS_BUILD_PATH = os.environ.get('LAB_TESTS_BUILD_PATH') or os.path.join(os.getcwd(), 'bocetos_pruebas', 'html_build')  # Plantillas compiladas (lab_template_build)
+    LAB_TESTS_BUNDLE_MAX_SIZE = int(os.environ.get('LAB_TESTS_BUNDLE_MAX_SIZE', 50))  # Plantillas por /bundle
     
     # Configuración de CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -0,0 +1,145 @@
+"""
+Utilidades para responder archivos HTML almacenados en disco
+
+Las respuestas llevan un ETag basado en el hash del contenido, responden 304 a
+``If-None-Match`` y aceptan ``Range``. La política de cache depende de si el
+contenido puede cambiar: los reportes finalizados y las plantillas pedidas con
+su versión (``?v=<hash>``) se marcan como inmutables.
+"""
+
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from flask import request, send_file, Response, stream_with_context
+
+from app.services.report_storage import is_compressed, iter_html_bytes
+
+# Un año: lo máximo recomendado para recursos inmutables
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Hashes de contenido por archivo, validados por mtime y tamaño
+_ETAG_CACHE_SIZE = 2048
+_etag_cache: 'OrderedDict[str, tuple]' = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def client_accepts_gzip() -> bool:
+    """Verificar si el cliente acepta respuestas comprimidas con gzip"""
+    return request.accept_encodings.quality('gzip') > 0
+
+
+def file_etag(path: str) -> str:
+    """
+    ETag del contenido de un archivo (SHA-256 truncado)
+    
+    El hash se recalcula solo si cambia el mtime o el tamaño del archivo.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    
+    with _etag_lock:
+        cached = _etag_cache.get(key)
+        if cached and cached[0] == signature:
+            _etag_cache.move_to_end(key)
+            return cached[1]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    
+    with _etag_lock:
+        _etag_cache[key] = (signature, etag)
+        _etag_cache.move_to_end(key)
+        while len(_etag_cache) > _ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+def apply_cache_policy(response: Response, immutable: bool = False, private: bool = True) -> Response:
+    """
+    Aplicar la política de cache a una respuesta
+    
+    Args:
+        response: Respuesta a modificar
+        immutable: El contenido de esta URL no cambia nunca
+        private: Solo el navegador puede guardar la respuesta (datos de pacientes)
+    """
+    response.cache_control.private = private or None
+    response.cache_control.public = (not private) or None
+    if immutable:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    else:
+        # Revalidar siempre con el ETag (respuesta 304 si no cambió)
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+    return response
+
+
+def send_compressed(data: bytes, mimetype: str, compresslevel: int = 6, min_size: int = 1024) -> Response:
+    """
+    Responder contenido generado en memoria, comprimido con gzip si el cliente lo acepta
+    
+    Los contenidos menores a ``min_size`` bytes se envían sin comprimir.
+    """
+    response = Response(mimetype=mimetype)
+    if len(data) >= min_size and client_accepts_gzip():
+        response.set_data(gzip.compress(data, compresslevel, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.set_data(data)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def send_cached_file(path: str, mimetype: str, as_attachment: bool = False, download_name: str = None,
+                     etag: Optional[str] = None, immutable: bool = False, private: bool = True) -> Response:
+    """
+    Enviar un archivo con ETag, respuestas condicionales (304) y rangos (206)
+    
+    Args:
+        etag: ETag a usar; por defecto el hash del contenido
+    """
+    response = send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, etag=etag or file_etag(path),
+                         conditional=True, max_age=None)
+    return apply_cache_policy(response, immutable, private)
+
+
+def send_html_file(stored_path: str, as_attachment: bool = False, download_name: str = None,
+                   mimetype: str = 'text/html', immutable: bool = False, private: bool = True) -> Response:
+    """
+    Enviar un archivo HTML almacenado (plano o .gz)
+    
+    Si el archivo está comprimido y el cliente acepta gzip, los bytes se envían
+    tal cual con ``Content-Encoding: gzip``; solo se descomprime (en streaming)
+    para clientes que no aceptan gzip. Cada variante tiene su propio ETag.
+    """
+    etag = file_etag(stored_path)
+    
+    if not is_compressed(stored_path):
+        return send_cached_file(stored_path, mimetype, as_attachment, download_name, etag, immutable, private)
+    
+    if client_accepts_gzip():
+        response = send_cached_file(stored_path, mimetype, as_attachment, download_name,
+                                    f'{etag}-gzip', immutable, private)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        # Sin rangos: el tamaño descomprimido no se conoce sin leer el archivo
+        response = Response(stream_with_context(iter_html_bytes(stored_path)), mimetype=mimetype)
+        if as_attachment:
+            response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        response.set_etag(etag)
+        apply_cache_policy(response, immutable, private)
+        response.make_conditional(request)
+    
+    response.vary.add('Accept-Encoding')
+    return response
@@ -2,11 +2,15 @@
 Controlador para manejo de archivos HTML del frontend
 """
 
-from flask import request, jsonify, send_file
+from flask import request, jsonify, Response, stream_with_context
 from app.services.frontend_html_service import FrontendHTMLService
+from app.services.report_storage import READ_CHUNK_SIZE
+from app.controllers.file_response import send_html_file
 from app.config import Config
 from app.middleware.auth_middleware import token_required
 import os
+import json
+from datetime import datetime
 
 class FrontendHTMLController:
     """Controlador para archivos HTML del frontend"""
@@ -34,45 +38,8 @@ class FrontendHTMLController:
                     'message': 'El contenido HTML es requerido'
                 }), 400
             
-            # Crear estructura de directorios
-            directory_path = self.service.create_directory_structure()
-            
-            # Generar nombre de archivo
-            original_filename = data.get('original_filename', 'reporte.html')
-            prefix = data.get('prefix', 'frontend')
-            filename = self.service.generate_file_name(original_filename, prefix)
-            
-            # Ruta completa del archivo
-            file_path = os.path.join(directory_path, filename)
-            
-            # Preparar metadatos - incluir todos los campos del frontend
-            metadata = {
-                # Campos básicos
-                'patient_name': data.get('patient_name'),
-                'order_number': data.get('order_number'),
-                'doctor_name': data.get('doctor_name'),
-                'notes': data.get('notes', ''),
-                
-                # Campos adicionales del frontend
-                'patient_age': data.get('patient_age'),
-                'patient_gender': data.get('patient_gender'),
-                'reception_date': data.get('reception_date'),
-                'tests': data.get('tests', []),
-                'created_by': data.get('created_by'),
-                'source': data.get('source', 'frontend'),
-                'prefix': data.get('prefix', 'frontend'),
-                'original_filename': data.get('original_filename'),
-                'created_at': data.get('created_at'),
-                
-                # Estado por defecto
-                'status': data.get('status', 'pending'),
-                
-                # Nuevos campos de edición
-                'edit_count': data.get('edit_count', 0),
-                'is_modified': data.get('is_modified', False),
-                'edit_history': data.get('edit_history', []),
-                'last_edit_date': data.get('last_edit_date')
-            }
+            file_path = self._new_file_path(data)
+            metadata = self._upload_metadata(data)
             
             # Guardar archivo
             result = self.service.save_html_file(html_content, file_path, metadata)
@@ -89,6 +56,103 @@ class FrontendHTMLController:
                 'message': f'Error al subir archivo: {str(e)}'
             }), 500
     
+    @token_required
+    def upload_html_stream(self):
+        """
+        Subir archivo HTML en streaming
+        
+        Acepta ``multipart/form-data`` (campo ``file`` y los metadatos como
+        campos del formulario) o el HTML como cuerpo crudo (``text/html``) con
+        los metadatos en la query string. ``tests`` y ``edit_history`` se envían
+        como JSON. El contenido se escribe en disco por bloques.
+        """
+        try:
+            if request.mimetype == 'multipart/form-data':
+                upload = request.files.get('file')
+                if upload is None:
+                    return jsonify({
+                        'success': False,
+                        'message': 'El archivo HTML es requerido (campo file)'
+                    }), 400
+                data = request.form.to_dict()
+                data.setdefault('original_filename', upload.filename or 'reporte.html')
+                stream = upload.stream
+            else:
+                data = request.args.to_dict()
+                stream = request.stream
+            
+            for key in ('tests', 'edit_history'):
+                if isinstance(data.get(key), str):
+                    data[key] = json.loads(data[key])
+            if 'edit_count' in data:
+                data['edit_count'] = int(data['edit_count'])
+            if 'is_modified' in data:
+                data['is_modified'] = str(data['is_modified']).lower() in ('true', '1')
+            
+            file_path = self._new_file_path(data)
+            metadata = self._upload_metadata(data)
+            chunks = iter(lambda: stream.read(READ_CHUNK_SIZE), b'')
+            
+            result = self.service.save_html_stream(chunks, file_path, metadata)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Archivo HTML subido exitosamente',
+                'data': result
+            }), 201
+            
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Datos de subida inválidos: {str(e)}'
+            }), 400
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error al subir archivo: {str(e)}'
+            }), 500
+    
+    def _new_file_path(self, data) -> str:
+        """Ruta (según la distribución configurada) para un archivo recién subido"""
+        # Generar nombre de archivo
+        original_filename = data.get('original_filename', 'reporte.html')
+        prefix = data.get('prefix', 'frontend')
+        filename = self.service.generate_file_name(original_filename, prefix)
+        
+        # Ruta completa del archivo (crea su directorio)
+        return self.service.new_file_path(filename)
+    
+    @staticmethod
+    def _upload_metadata(data) -> dict:
+        """Metadatos de una subida - incluir todos los campos del frontend"""
+        return {
+            # Campos básicos
+            'patient_name': data.get('patient_name'),
+            'order_number': data.get('order_number'),
+            'doctor_name': data.get('doctor_name'),
+            'notes': data.get('notes', ''),
+            
+            # Campos adicionales del frontend
+            'patient_age': data.get('patient_age'),
+            'patient_gender': data.get('patient_gender'),
+            'reception_date': data.get('reception_date'),
+            'tests': data.get('tests', []),
+            'created_by': data.get('created_by'),
+            'source': data.get('source', 'frontend'),
+            'prefix': data.get('prefix', 'frontend'),
+            'original_filename': data.get('original_filename'),
+            'created_at': data.get('created_at'),
+            
+            # Estado por defecto
+            'status': data.get('status', 'pending'),
+            
+            # Nuevos campos de edición
+            'edit_count': data.get('edit_count', 0),
+            'is_modified': data.get('is_modified', False),
+            'edit_history': data.get('edit_history', []),
+            'last_edit_date': data.get('last_edit_date')
+        }
+    
     @token_required
     def list_html_files(self):
         """Listar archivos HTML"""
@@ -115,20 +179,10 @@ class FrontendHTMLController:
     def serve_html_file(self, filename):
         """Servir archivo HTML directamente"""
         try:
-            # Buscar el archivo en la estructura de directorios
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
-                
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        return send_file(file_path, mimetype='text/html')
+            # Buscar el archivo
+            file_path = self.service.find_file(filename)
+            if file_path:
+                return send_html_file(self.service.resolve_file_path(file_path))
             
             return jsonify({
                 'success': False,
@@ -146,29 +200,19 @@ class FrontendHTMLController:
         """Obtener contenido HTML como JSON"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                content = self.service.get_html_content(file_path)
+                metadata = self.service.get_file_metadata(file_path)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        content = self.service.get_html_content(file_path)
-                        metadata = self.service.get_file_metadata(file_path)
-                        
-                        return jsonify({
-                            'success': True,
-                            'data': {
-                                'filename': filename,
-                                'content': content,
-                                'metadata': metadata
-                            }
-                        })
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'filename': filename,
+                        'content': content,
+                        'metadata': metadata
+                    }
+                })
             
             return jsonify({
                 'success': False,
@@ -194,45 +238,22 @@ class FrontendHTMLController:
                 }), 400
             
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                html_content = data.get('html_content')
+                metadata = data.get('metadata', {})
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        html_content = data.get('html_content')
-                        metadata = data.get('metadata', {})
-                        
-                        if html_content:
-                            result = self.service.update_html_file(file_path, html_content, metadata)
-                        else:
-                            # Solo actualizar metadatos
-                            existing_metadata = self.service.get_file_metadata(file_path) or {}
-                            existing_metadata.update(metadata)
-                            existing_metadata['updated_at'] = self.service.get_file_metadata(file_path).get('updated_at')
-                            
-                            meta_file_path = f"{file_path}.meta"
-                            import json
-                            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                                json.dump(existing_metadata, f, indent=2, ensure_ascii=False)
-                            
-                            result = {
-                                'filename': filename,
-                                'file_path': file_path,
-                                'metadata': existing_metadata
-                            }
-                        
-                        return jsonify({
-                            'success': True,
-                            'message': 'Archivo actualizado exitosamente',
-                            'data': result
-                        })
+                if html_content:
+                    result = self.service.update_html_file(file_path, html_content, metadata)
+                else:
+                    # Solo actualizar metadatos
+                    result = self.service.update_file_metadata(file_path, metadata)
+                
+                return jsonify({
+                    'success': True,
+                    'message': 'Archivo actualizado exitosamente',
+                    'data': result
+                })
             
             return jsonify({
                 'success': False,
@@ -250,24 +271,14 @@ class FrontendHTMLController:
         """Eliminar archivo HTML"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                self.service.delete_html_file(file_path)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        self.service.delete_html_file(file_path)
-                        
-                        return jsonify({
-                            'success': True,
-                            'message': 'Archivo eliminado exitosamente'
-                        })
+                return jsonify({
+                    'success': True,
+                    'message': 'Archivo eliminado exitosamente'
+                })
             
             return jsonify({
                 'success': False,
@@ -285,24 +296,14 @@ class FrontendHTMLController:
         """Obtener información detallada de un archivo"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                info = self.service.get_file_info(file_path)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        info = self.service.get_file_info(file_path)
-                        
-                        return jsonify({
-                            'success': True,
-                            'data': info
-                        })
+                return jsonify({
+                    'success': True,
+                    'data': info
+                })
             
             return jsonify({
                 'success': False,
@@ -324,7 +325,10 @@ class FrontendHTMLController:
             order_number = request.args.get('order_number')
             doctor_name = request.args.get('doctor_name')
             status = request.args.get('status')
+            date_from = request.args.get('date_from')
+            date_to = request.args.get('date_to')
             limit = int(request.args.get('limit', 50))
+            offset = int(request.args.get('offset', 0))
             
             files = self.service.search_html_files(
                 query=query,
@@ -332,7 +336,10 @@ class FrontendHTMLController:
                 order_number=order_number,
                 doctor_name=doctor_name,
                 status=status,
-                limit=limit
+                date_from=date_from,
+                date_to=date_to,
+                limit=limit,
+                offset=offset
             )
             
             return jsonify({
@@ -344,7 +351,13 @@ class FrontendHTMLController:
                     'patient_name': patient_name,
                     'order_number': order_number,
                     'doctor_name': doctor_name,
-                    'status': status
+                    'status': status,
+                    'date_from': date_from,
+                    'date_to': date_to
+                },
+                'pagination': {
+                    'limit': limit,
+                    'offset': offset
                 },
                 'message': f'Se encontraron {len(files)} archivos'
             })
@@ -355,6 +368,43 @@ class FrontendHTMLController:
                 'message': f'Error al buscar archivos: {str(e)}'
             }), 500
     
+    @token_required
+    def export_html_files(self):
+        """Exportar archivos HTML filtrados como ZIP (generado en streaming)"""
+        try:
+            data = request.get_json(silent=True) or {}
+            filenames = data.get('filenames') or None
+            filters = {
+                key: data.get(key)
+                for key in ('query', 'patient_name', 'order_number', 'doctor_name', 'status',
+                            'date_from', 'date_to')
+                if data.get(key)
+            }
+            
+            if filenames is not None and not isinstance(filenames, list):
+                return jsonify({
+                    'success': False,
+                    'message': 'filenames debe ser una lista de nombres de archivo'
+                }), 400
+            if not filenames and not filters:
+                return jsonify({
+                    'success': False,
+                    'message': 'Debe indicar filenames o al menos un filtro'
+                }), 400
+            
+            chunks = self.service.export_html_files(filenames, bool(data.get('include_metadata')), **filters)
+            
+            filename = f"frontend_html_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+            response = Response(stream_with_context(chunks), mimetype='application/zip')
+            response.headers.set('Content-Disposition', 'attachment', filename=filename)
+            return response
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error al exportar archivos: {str(e)}'
+            }), 500
+    
     @token_required
     def create_backup(self):
         """Crear backup de archivos HTML"""
@@ -376,6 +426,24 @@ class FrontendHTMLController:
                 'message': f'Error al crear backup: {str(e)}'
             }), 500
     
+    @token_required
+    def compact_backups(self):
+        """Aplicar la política de retención de backups por guardado"""
+        try:
+            result = self.service.compact_backups()
+            
+            return jsonify({
+                'success': True,
+                'message': 'Backups compactados exitosamente',
+                'data': result
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error al compactar backups: {str(e)}'
+            }), 500
+    
     @token_required
     def validate_system(self):
         """Validar sistema de archivos"""
@@ -394,20 +462,88 @@ class FrontendHTMLController:
             }), 500
     
     @token_required
-    def get_stats(self):
-        """Obtener estadísticas generales"""
+    def rebuild_index(self):
+        """Reconstruir el índice de metadatos a partir de los archivos .meta"""
         try:
-            files = self.service.list_html_files(limit=1000)
+            result = self.service.rebuild_index()
             
-            total_size = sum(file_info['size'] for file_info in files)
+            return jsonify({
+                'success': True,
+                'message': f"Índice reconstruido: {result['indexed']} archivos",
+                'data': result
+            })
             
-            stats = {
-                'total_files': len(files),
-                'total_size': total_size,
-                'average_size': total_size / len(files) if files else 0,
-                'oldest_file': min(files, key=lambda x: x['created_at'])['created_at'] if files else None,
-                'newest_file': max(files, key=lambda x: x['created_at'])['created_at'] if files else None
-            }
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error al reconstruir el índice: {str(e)}'
+            }), 500
+    
+    @token_required
+    def rebuild_counters(self):
+        """Recalcular los contadores de estadísticas"""
+        try:
+            counters = self.service.rebuild_counters()
+            
+            return jsonify({
+                'success': True,
+                'message': 'Contadores recalculados',
+                'data': counters
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error al recalcular contadores: {str(e)}'
+            }), 500
+    
+    @token_required
+    def migrate_storage_layout(self):
+        """
+        Mover archivos a la distribución de directorios configurada (por lotes)
+        
+        Cada llamada mueve como máximo STORAGE_MIGRATION_MAX_BATCHES lotes para no
+        exceder el tiempo de una petición; se continúa con ``next_after``.
+        """
+        try:
+            limit = self.config.STORAGE_MIGRATION_MAX_BATCHES
+            try:
+                max_batches = int(request.args.get('max_batches', limit))
+                batch_size = int(request.args['batch_size']) if request.args.get('batch_size') else None
+            except ValueError:
+                raise ValueError("batch_size y max_batches deben ser números enteros")
+            if not 1 <= max_batches <= limit:
+                raise ValueError(f"max_batches debe estar entre 1 y {limit}")
+            
+            result = self.service.migrate_storage_layout(
+                after=request.args.get('after'),
+                batch_size=batch_size,
+                max_batches=max_batches,
+                dry_run=request.args.get('dry_run', 'false').lower() == 'true'
+            )
+            
+            return jsonify({
+                'success': True,
+                'message': f"Migración de distribución: {result['moved']} archivos movidos",
+                'data': result
+            })
+            
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Parámetros de migración inválidos: {str(e)}'
+            }), 400
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error al migrar la distribución de archivos: {str(e)}'
+            }), 500
+    
+    @token_required
+    def get_stats(self):
+        """Obtener estadísticas generales"""
+        try:
+            stats = self.service.get_storage_stats()
             
             return jsonify({
                 'success': True,
@@ -445,19 +581,10 @@ class FrontendHTMLController:
         """Descargar archivo HTML"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
-                
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        return send_file(file_path, as_attachment=True, download_name=filename)
+            file_path = self.service.find_file(filename)
+            if file_path:
+                return send_html_file(self.service.resolve_file_path(file_path), as_attachment=True,
+                                      download_name=filename)
             
             return jsonify({
                 'success': False,
@@ -555,25 +682,15 @@ class FrontendHTMLController:
                 }), 400
             
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                result = self.service.update_file_status(file_path, new_status)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        result = self.service.update_file_status(file_path, new_status)
-                        
-                        return jsonify({
-                            'success': True,
-                            'message': f'Estado del archivo {filename} actualizado a {new_status}',
-                            'data': result
-                        })
+                return jsonify({
+                    'success': True,
+                    'message': f'Estado del archivo {filename} actualizado a {new_status}',
+                    'data': result
+                })
             
             return jsonify({
                 'success': False,
@@ -610,28 +727,18 @@ class FrontendHTMLController:
         """Obtener historial de ediciones de un archivo"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                edit_history = self.service.get_edit_history(file_path)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        edit_history = self.service.get_edit_history(file_path)
-                        
-                        return jsonify({
-                            'success': True,
-                            'data': {
-                                'filename': filename,
-                                'edit_history': edit_history,
-                                'count': len(edit_history)
-                            }
-                        })
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'filename': filename,
+                        'edit_history': edit_history,
+                        'count': len(edit_history)
+                    }
+                })
             
             return jsonify({
                 'success': False,
@@ -649,27 +756,17 @@ class FrontendHTMLController:
         """Obtener estadísticas de edición de un archivo"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                edit_stats = self.service.get_edit_stats(file_path)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        edit_stats = self.service.get_edit_stats(file_path)
-                        
-                        return jsonify({
-                            'success': True,
-                            'data': {
-                                'filename': filename,
-                                'edit_stats': edit_stats
-                            }
-                        })
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'filename': filename,
+                        'edit_stats': edit_stats
+                    }
+                })
             
             return jsonify({
                 'success': False,
@@ -691,25 +788,15 @@ class FrontendHTMLController:
             edit_reason = data.get('edit_reason')
             
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                result = self.service.mark_as_modified(file_path, edited_by, edit_reason)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        result = self.service.mark_as_modified(file_path, edited_by, edit_reason)
-                        
-                        return jsonify({
-                            'success': True,
-                            'message': f'Archivo {filename} marcado como modificado',
-                            'data': result
-                        })
+                return jsonify({
+                    'success': True,
+                    'message': f'Archivo {filename} marcado como modificado',
+                    'data': result
+                })
             
             return jsonify({
                 'success': False,
@@ -727,25 +814,15 @@ class FrontendHTMLController:
         """Resetear el seguimiento de ediciones de un archivo"""
         try:
             # Buscar el archivo
-            for year in os.listdir(self.service.html_base_path):
-                year_path = os.path.join(self.service.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            file_path = self.service.find_file(filename)
+            if file_path:
+                result = self.service.reset_edit_tracking(file_path)
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                    
-                    file_path = os.path.join(month_path, filename)
-                    if os.path.exists(file_path):
-                        result = self.service.reset_edit_tracking(file_path)
-                        
-                        return jsonify({
-                            'success': True,
-                            'message': f'Seguimiento de ediciones reseteado para {filename}',
-                            'data': result
-                        })
+                return jsonify({
+                    'success': True,
+                    'message': f'Seguimiento de ediciones reseteado para {filename}',
+                    'data': result
+                })
             
             return jsonify({
                 'success': False,
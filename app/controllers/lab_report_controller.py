@@ -2,13 +2,16 @@
 Controlador para reportes de laboratorio
 """
 
+import json
 import logging
 from datetime import datetime, date, timedelta
 from typing import Dict, Any, List, Optional
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, stream_with_context
 from sqlalchemy.exc import IntegrityError
 
 from app.services.lab_report_service import LabReportService
+from app.services.report_backup_service import ReportBackupService
+from app.controllers.file_response import file_etag, send_html_file, send_cached_file
 from app.config import Config
 from database import db
 
@@ -21,6 +24,7 @@ class LabReportController:
     
     def __init__(self):
         self.service = LabReportService(Config())
+        self.backup_service = ReportBackupService(Config())
     
     def create_report(self) -> tuple:
         """
@@ -44,8 +48,11 @@ class LabReportController:
                     'message': 'Usuario no autenticado'
                 }), 401
             
-            # Validar campos requeridos
-            required_fields = ['order_number', 'patient_name', 'html_content', 'selected_tests']
+            # Validar campos requeridos (con 'tests' el HTML se compone en el servidor)
+            if data.get('tests') and not data.get('html_content'):
+                required_fields = ['order_number', 'patient_name', 'tests']
+            else:
+                required_fields = ['order_number', 'patient_name', 'html_content', 'selected_tests']
             missing_fields = [field for field in required_fields if field not in data or not data[field]]
             
             if missing_fields:
@@ -107,7 +114,7 @@ class LabReportController:
                 }), 400
             
             # Actualizar reporte
-            lab_report = self.service.update_report(report_id, data)
+            lab_report = self.service.update_report(report_id, data, updated_by=getattr(request, 'user_id', None))
             
             # Respuesta exitosa
             return jsonify({
@@ -130,6 +137,103 @@ class LabReportController:
                 'message': 'Error interno del servidor'
             }), 500
     
+    def _batch_response(self, results: List[Dict[str, Any]], message: str, success_code: int) -> tuple:
+        """Respuesta de una operación por lotes: 2xx si todo salió bien, 207 parcial, 400 si nada"""
+        succeeded = sum(1 for result in results if result['success'])
+        failed = len(results) - succeeded
+        
+        if failed == 0:
+            status_code = success_code
+        elif succeeded == 0:
+            status_code = 400
+        else:
+            status_code = 207
+        
+        return jsonify({
+            'success': failed == 0,
+            'message': message,
+            'data': {
+                'total': len(results),
+                'succeeded': succeeded,
+                'failed': failed,
+                'results': results
+            }
+        }), status_code
+    
+    def create_reports_batch(self) -> tuple:
+        """
+        POST /api/reports/batch
+        Crear varios reportes en una sola transacción
+        """
+        try:
+            data = request.get_json()
+            if not data or not isinstance(data.get('reports'), list):
+                return jsonify({
+                    'error': 'VALIDATION_ERROR',
+                    'message': "Se requiere la lista 'reports'"
+                }), 400
+            
+            created_by = getattr(request, 'user_id', None)
+            if not created_by:
+                return jsonify({
+                    'error': 'AUTHENTICATION_ERROR',
+                    'message': 'Usuario no autenticado'
+                }), 401
+            
+            results = self.service.create_reports_batch(data['reports'], created_by)
+            return self._batch_response(results, 'Lote de reportes procesado', 201)
+            
+        except ValueError as e:
+            logger.warning(f"Error de validación al crear lote de reportes: {str(e)}")
+            return jsonify({
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }), 400
+            
+        except IntegrityError as e:
+            logger.warning(f"Error de integridad al crear lote de reportes: {str(e)}")
+            return jsonify({
+                'error': 'DATABASE_ERROR',
+                'message': 'Algún número de orden del lote ya existe'
+            }), 409
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al crear lote de reportes: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def update_reports_status(self) -> tuple:
+        """
+        PATCH /api/reports/status
+        Cambiar el estado de varios reportes en una sola transacción
+        """
+        try:
+            data = request.get_json()
+            if not data or 'status' not in data or 'report_ids' not in data:
+                return jsonify({
+                    'error': 'VALIDATION_ERROR',
+                    'message': 'Campos report_ids y status son requeridos'
+                }), 400
+            
+            results = self.service.update_reports_status(data['report_ids'], data['status'])
+            return self._batch_response(results, 'Estados actualizados', 200)
+            
+        except ValueError as e:
+            logger.warning(f"Error de validación al cambiar estados: {str(e)}")
+            return jsonify({
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }), 400
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al cambiar estados: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
     def get_report(self, report_id: int) -> tuple:
         """
         GET /api/reports/{id}
@@ -196,53 +300,62 @@ class LabReportController:
                 'message': 'Error interno del servidor'
             }), 500
     
+    def _parse_date_range(self, max_days: Optional[int] = 365) -> tuple:
+        """
+        Leer start_date y end_date de la query string
+        
+        Returns:
+            tuple: (fecha de inicio, fecha de fin)
+        
+        Raises:
+            ValueError: Si faltan las fechas o el rango es inválido
+        """
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        
+        if not start_date_str or not end_date_str:
+            raise ValueError('Parámetros start_date y end_date son requeridos')
+        
+        # Parsear fechas
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
+        
+        # Validar rango de fechas
+        if start_date > end_date:
+            raise ValueError('La fecha de inicio no puede ser mayor a la fecha de fin')
+        
+        # Limitar rango a máximo 1 año
+        if max_days is not None and (end_date - start_date).days > max_days:
+            raise ValueError('El rango de fechas no puede exceder 1 año')
+        
+        return start_date, end_date
+    
     def get_reports_by_date_range(self) -> tuple:
         """
         GET /api/reports/date-range
-        Buscar reportes por rango de fechas
+        Buscar reportes por rango de fechas (paginado por cursor)
         """
         try:
-            # Obtener parámetros
-            start_date_str = request.args.get('start_date')
-            end_date_str = request.args.get('end_date')
             include_html = request.args.get('include_html', 'false').lower() == 'true'
+            cursor = request.args.get('cursor') or None
             
-            if not start_date_str or not end_date_str:
-                return jsonify({
-                    'error': 'VALIDATION_ERROR',
-                    'message': 'Parámetros start_date y end_date son requeridos'
-                }), 400
-            
-            # Parsear fechas
             try:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            except ValueError:
-                return jsonify({
-                    'error': 'VALIDATION_ERROR',
-                    'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
-                }), 400
-            
-            # Validar rango de fechas
-            if start_date > end_date:
-                return jsonify({
-                    'error': 'VALIDATION_ERROR',
-                    'message': 'La fecha de inicio no puede ser mayor a la fecha de fin'
-                }), 400
-            
-            # Limitar rango a máximo 1 año
-            if (end_date - start_date).days > 365:
+                start_date, end_date = self._parse_date_range()
+                limit = request.args.get('limit', type=int)
+                page = self.service.get_reports_page(start_date, end_date, limit=limit,
+                                                     cursor=cursor, include_html=include_html)
+            except ValueError as e:
                 return jsonify({
                     'error': 'VALIDATION_ERROR',
-                    'message': 'El rango de fechas no puede exceder 1 año'
+                    'message': str(e)
                 }), 400
             
-            # Buscar reportes
-            reports = self.service.get_reports_by_date_range(start_date, end_date)
-            
             # Convertir a diccionarios
             reports_data = []
-            for report in reports:
+            for report in page['reports']:
                 if include_html:
                     reports_data.append(report.to_dict())
                 else:
@@ -253,6 +366,8 @@ class LabReportController:
                 'success': True,
                 'data': reports_data,
                 'count': len(reports_data),
+                'next_cursor': page['next_cursor'],
+                'has_more': page['has_more'],
                 'date_range': {
                     'start_date': start_date.isoformat(),
                     'end_date': end_date.isoformat()
@@ -266,14 +381,111 @@ class LabReportController:
                 'message': 'Error interno del servidor'
             }), 500
     
+    def export_reports_by_date_range(self):
+        """
+        GET /api/reports/date-range/export
+        Exportar reportes de un rango de fechas como NDJSON (un reporte por línea)
+        """
+        try:
+            include_html = request.args.get('include_html', 'false').lower() == 'true'
+            start_date, end_date = self._parse_date_range(max_days=None)
+            
+        except ValueError as e:
+            return jsonify({
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }), 400
+        
+        def generate():
+            try:
+                for report_data in self.service.iter_reports_by_date_range(start_date, end_date, include_html):
+                    yield json.dumps(report_data, ensure_ascii=False, default=str) + '\n'
+            except Exception as e:
+                # Los encabezados ya se enviaron: se corta el stream y se registra el error
+                logger.error(f"Error al exportar reportes por rango de fechas: {str(e)}")
+                raise
+        
+        filename = f"reportes_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.ndjson"
+        response = current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+        return response
+    
+    def export_reports(self):
+        """
+        POST /api/reports/export
+        Exportar los archivos HTML de los reportes filtrados como ZIP (streaming)
+        """
+        try:
+            filters = self._parse_export_filters(request.get_json(silent=True) or {})
+            
+        except ValueError as e:
+            return jsonify({
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }), 400
+        
+        chunks = self.service.export_reports_zip(**filters)
+        
+        def generate():
+            try:
+                yield from chunks
+            except Exception as e:
+                # Los encabezados ya se enviaron: se corta el stream y se registra el error
+                logger.error(f"Error al exportar archivos de reportes: {str(e)}")
+                raise
+        
+        filename = f"reportes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        response = current_app.response_class(stream_with_context(generate()), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+        return response
+    
+    @staticmethod
+    def _parse_export_filters(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Leer los filtros de una exportación ZIP
+        
+        Raises:
+            ValueError: Si no hay ningún filtro o alguno es inválido
+        """
+        filters = {}
+        
+        report_ids = data.get('report_ids')
+        if report_ids:
+            if not isinstance(report_ids, list):
+                raise ValueError('report_ids debe ser una lista de IDs')
+            try:
+                filters['report_ids'] = [int(report_id) for report_id in report_ids]
+            except (TypeError, ValueError):
+                raise ValueError('report_ids debe contener solo números')
+        
+        for key in ('order_number', 'status'):
+            value = str(data.get(key) or '').strip()
+            if value:
+                filters[key] = value
+        
+        for key in ('start_date', 'end_date'):
+            if data.get(key):
+                try:
+                    filters[key] = datetime.strptime(data[key], '%Y-%m-%d').date()
+                except (TypeError, ValueError):
+                    raise ValueError(f'Formato de {key} inválido. Use YYYY-MM-DD')
+        
+        if filters.get('start_date') and filters.get('end_date') and filters['start_date'] > filters['end_date']:
+            raise ValueError('La fecha de inicio no puede ser mayor a la fecha de fin')
+        if not filters:
+            raise ValueError('Debe indicar report_ids o al menos un filtro (order_number, status, start_date, end_date)')
+        
+        return filters
+    
     def get_reports_stats(self) -> tuple:
         """
         GET /api/reports/stats
         Obtener estadísticas de reportes
         """
         try:
-            # Obtener estadísticas
-            stats = self.service.get_reports_stats()
+            # Obtener estadísticas (contadores incrementales salvo que se pida exacto)
+            exact = request.args.get('exact', 'false').lower() == 'true'
+            stats = self.service.get_reports_stats(exact=exact)
             
             # Obtener información adicional
             permissions = self.service.validate_file_permissions()
@@ -342,6 +554,11 @@ class LabReportController:
             # Obtener información del archivo
             file_info = self.service.get_file_info(report_id)
             
+            # URL versionada con el hash del contenido (se puede cachear como inmutable)
+            if file_info['file_exists']:
+                file_info['version'] = file_etag(file_info['file_path'])
+                file_info['file_url'] = f"/api/reports/{report_id}/file?v={file_info['version']}"
+            
             # Respuesta exitosa
             return jsonify({
                 'success': True,
@@ -362,10 +579,264 @@ class LabReportController:
                 'message': 'Error interno del servidor'
             }), 500
     
+    def get_report_revisions(self, report_id: int) -> tuple:
+        """
+        GET /api/reports/{id}/revisions
+        Listar el historial de revisiones del reporte
+        """
+        try:
+            revisions = self.service.get_report_revisions(report_id)
+            
+            return jsonify({
+                'success': True,
+                'data': revisions
+            }), 200
+            
+        except ValueError as e:
+            logger.warning(f"Error al obtener revisiones del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al obtener revisiones del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def get_report_revision(self, report_id: int, revision: int):
+        """
+        GET /api/reports/{id}/revisions/{revision}
+        Obtener el contenido de una revisión del reporte
+        """
+        try:
+            revision_data = self.service.get_report_revision(report_id, revision)
+            
+            if request.args.get('format') == 'html':
+                return current_app.response_class(revision_data['html_content'], mimetype='text/html')
+            
+            return jsonify({
+                'success': True,
+                'data': revision_data
+            }), 200
+            
+        except ValueError as e:
+            logger.warning(f"Error al obtener revisión {revision} del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al obtener revisión {revision} del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def get_report_file(self, report_id: int):
+        """
+        GET /api/reports/{id}/file
+        Servir el archivo HTML del reporte (gzip directo si el cliente lo acepta)
+        
+        Un reporte puede volver a borrador y cambiar, así que solo se sirve como
+        inmutable cuando se pide con la versión vigente (``?v=<etag>``, ver
+        file-info); sin ella se revalida con ETag.
+        """
+        try:
+            file_path, file_name, _ = self.service.get_report_file(report_id)
+            download = request.args.get('download', 'false').lower() == 'true'
+            
+            return send_html_file(file_path, as_attachment=download, download_name=file_name,
+                                  immutable=request.args.get('v') == file_etag(file_path))
+            
+        except ValueError as e:
+            logger.warning(f"Error al servir archivo del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al servir archivo del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def get_template_fields(self, template_id: str) -> tuple:
+        """
+        GET /api/reports/templates/{template_id}
+        Obtener los campos de resultado de una plantilla de prueba
+        """
+        try:
+            return jsonify({
+                'success': True,
+                'data': self.service.composer.get_template_fields(template_id)
+            }), 200
+            
+        except ValueError as e:
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al obtener plantilla {template_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def preview_report(self):
+        """
+        POST /api/reports/preview
+        Componer el HTML de un reporte sin guardarlo
+        """
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({
+                    'error': 'VALIDATION_ERROR',
+                    'message': 'Datos JSON requeridos'
+                }), 400
+            
+            composed = self.service.composer.compose(data)
+            return current_app.response_class(composed['html_content'], mimetype='text/html')
+            
+        except ValueError as e:
+            logger.warning(f"Error de validación al componer reporte: {str(e)}")
+            return jsonify({
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }), 400
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al componer reporte: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def request_report_pdf(self, report_id: int) -> tuple:
+        """
+        POST /api/reports/{id}/pdf
+        Encolar la generación del PDF del reporte
+        """
+        try:
+            status = self.service.request_report_pdf(report_id)
+            status['download_url'] = self._pdf_url(report_id, status)
+            
+            if status['status'] == 'completed':
+                return jsonify({
+                    'success': True,
+                    'message': 'PDF disponible',
+                    'data': status
+                }), 200
+            
+            return jsonify({
+                'success': True,
+                'message': 'PDF en proceso',
+                'data': status
+            }), 202
+            
+        except ValueError as e:
+            logger.warning(f"Error al solicitar PDF del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al solicitar PDF del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def get_report_pdf(self, report_id: int):
+        """
+        GET /api/reports/{id}/pdf
+        Descargar el PDF del reporte desde la cache
+        """
+        try:
+            status, pdf_path, download_name = self.service.get_report_pdf(report_id)
+            
+            if pdf_path:
+                download = request.args.get('download', 'true').lower() == 'true'
+                # La clave de cache ya es un hash del contenido; inmutable solo con la versión vigente
+                return send_cached_file(pdf_path, 'application/pdf', as_attachment=download,
+                                        download_name=download_name, etag=status['cache_key'],
+                                        immutable=request.args.get('v') == status['cache_key'])
+            
+            if status['status'] == 'pending':
+                return jsonify({
+                    'success': True,
+                    'message': 'PDF en proceso',
+                    'data': status
+                }), 202
+            
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': f'PDF no generado. Solicítelo con POST /api/reports/{report_id}/pdf',
+                'data': status
+            }), 404
+            
+        except ValueError as e:
+            logger.warning(f"Error al obtener PDF del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al obtener PDF del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    @staticmethod
+    def _pdf_url(report_id: int, status: Dict[str, Any]) -> str:
+        """URL de descarga del PDF, versionada con la clave de cache cuando ya está generado"""
+        if status['status'] == 'completed':
+            return f"/api/reports/{report_id}/pdf?v={status['cache_key']}"
+        return f"/api/reports/{report_id}/pdf"
+    
+    def get_report_pdf_status(self, report_id: int) -> tuple:
+        """
+        GET /api/reports/{id}/pdf/status
+        Consultar el estado del PDF del reporte
+        """
+        try:
+            status, _, _ = self.service.get_report_pdf(report_id)
+            status['download_url'] = self._pdf_url(report_id, status)
+            
+            return jsonify({
+                'success': True,
+                'data': status
+            }), 200
+            
+        except ValueError as e:
+            logger.warning(f"Error al consultar PDF del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'NOT_FOUND',
+                'message': str(e)
+            }), 404
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al consultar PDF del reporte {report_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
     def create_backup(self) -> tuple:
         """
         POST /api/reports/backup
-        Crear backup de reportes
+        Encolar backup de reportes en segundo plano
         """
         try:
             # Obtener fecha del backup (opcional)
@@ -381,19 +852,19 @@ class LabReportController:
                         'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
                     }), 400
             
-            # Crear backup
-            backup_path = self.service.backup_reports(backup_date)
+            # Encolar backup
+            job = self.backup_service.start_backup_job(backup_date)
             
             # Respuesta exitosa
             return jsonify({
                 'success': True,
-                'message': 'Backup creado exitosamente',
+                'message': 'Backup en proceso',
                 'data': {
-                    'backup_path': backup_path,
-                    'backup_date': backup_date.isoformat() if backup_date else date.today().isoformat()
+                    **job,
+                    'status_url': f"/api/reports/backup/{job['job_id']}"
                 }
-            }), 200
-            
+            }), 202
+        
         except ValueError as e:
             logger.warning(f"Error al crear backup: {str(e)}")
             return jsonify({
@@ -408,6 +879,33 @@ class LabReportController:
                 'message': 'Error interno del servidor'
             }), 500
     
+    def get_backup_job(self, job_id: str) -> tuple:
+        """
+        GET /api/reports/backup/{job_id}
+        Obtener progreso de un backup
+        """
+        try:
+            job = self.backup_service.get_backup_job(job_id)
+            
+            if not job:
+                return jsonify({
+                    'error': 'NOT_FOUND',
+                    'message': f'Trabajo de backup {job_id} no encontrado'
+                }), 404
+            
+            # Respuesta exitosa
+            return jsonify({
+                'success': True,
+                'data': job
+            }), 200
+        
+        except Exception as e:
+            logger.error(f"Error inesperado al obtener backup {job_id}: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
     def cleanup_backups(self) -> tuple:
         """
         DELETE /api/reports/backup/cleanup
@@ -433,6 +931,74 @@ class LabReportController:
                 'message': 'Error interno del servidor'
             }), 500
     
+    def reconcile_files(self) -> tuple:
+        """
+        POST /api/reports/system/reconcile
+        Reconciliar archivos en disco con la base de datos
+        """
+        try:
+            dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+            remove_orphans = request.args.get('remove_orphans', 'false').lower() == 'true'
+            
+            summary = self.service.reconcile_files(repair=not dry_run,
+                                                   remove_orphans=remove_orphans and not dry_run)
+            
+            return jsonify({
+                'success': True,
+                'message': f"Reconciliación completada: {summary['repaired']} archivos reparados",
+                'data': summary
+            }), 200
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al reconciliar archivos: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
+    def migrate_storage_layout(self) -> tuple:
+        """
+        POST /api/reports/system/migrate-layout
+        Mover los archivos de reportes a la distribución de directorios configurada
+        
+        Cada llamada mueve como máximo STORAGE_MIGRATION_MAX_BATCHES lotes para no
+        exceder el tiempo de una petición; se continúa con ``next_after_id``.
+        """
+        try:
+            limit = Config.STORAGE_MIGRATION_MAX_BATCHES
+            try:
+                after_id = int(request.args.get('after_id', 0))
+                batch_size = int(request.args['batch_size']) if request.args.get('batch_size') else None
+                max_batches = int(request.args.get('max_batches', limit))
+            except ValueError:
+                raise ValueError("after_id, batch_size y max_batches deben ser números enteros")
+            if not 1 <= max_batches <= limit:
+                raise ValueError(f"max_batches debe estar entre 1 y {limit}")
+            dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+            
+            summary = self.service.migrate_storage_layout(after_id=after_id, batch_size=batch_size,
+                                                          max_batches=max_batches, dry_run=dry_run)
+            
+            return jsonify({
+                'success': True,
+                'message': f"Migración de distribución: {summary['moved']} archivos movidos",
+                'data': summary
+            }), 200
+            
+        except ValueError as e:
+            logger.warning(f"Error de validación al migrar la distribución de archivos: {str(e)}")
+            return jsonify({
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }), 400
+            
+        except Exception as e:
+            logger.error(f"Error inesperado al migrar la distribución de archivos: {str(e)}")
+            return jsonify({
+                'error': 'INTERNAL_ERROR',
+                'message': 'Error interno del servidor'
+            }), 500
+    
     def validate_system(self) -> tuple:
         """
         GET /api/reports/system/validate
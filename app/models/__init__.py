@@ -7,6 +7,7 @@ from .patient import Patient
 from .lab_result import LabResult
 from .payment import Payment
 from .sync import Sync
-from .lab_report import LabReport, ReportTest
+from .lab_report import LabReport, ReportTest, ReportRevision, ReportStatsCounter, ReportStatsRegister
 
-__all__ = ['User', 'Patient', 'LabResult', 'Payment', 'Sync', 'LabReport', 'ReportTest']
+__all__ = ['User', 'Patient', 'LabResult', 'Payment', 'Sync', 'LabReport', 'ReportTest', 'ReportRevision',
+           'ReportStatsCounter', 'ReportStatsRegister']
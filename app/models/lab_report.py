@@ -3,8 +3,11 @@ Modelo para reportes de laboratorio
 """
 
 from datetime import datetime, date
-from typing import List, Optional, Dict, Any
-from sqlalchemy import Column, Integer, String, Date, Text, DateTime, ForeignKey, CheckConstraint
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import (
+    BigInteger, Column, Integer, SmallInteger, String, Date, Text, DateTime, ForeignKey, CheckConstraint, Index,
+    LargeBinary, UniqueConstraint
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, validates
 from database import db
@@ -43,12 +46,16 @@ class LabReport(db.Model):
     # Relaciones
     creator = relationship('User', backref='created_reports')
     tests = relationship('ReportTest', back_populates='report', cascade='all, delete-orphan')
+    revisions = relationship('ReportRevision', back_populates='report', cascade='all, delete-orphan',
+                             order_by='ReportRevision.revision', lazy='dynamic', passive_deletes=True)
     
     # Constraints
     __table_args__ = (
         CheckConstraint("patient_gender IN ('M', 'F')", name='check_patient_gender'),
         CheckConstraint("status IN ('draft', 'final', 'printed')", name='check_status'),
         CheckConstraint("patient_age >= 0 AND patient_age <= 150", name='check_patient_age'),
+        # Paginación por cursor sobre (reception_date, id)
+        Index('idx_lab_reports_reception_date_id', 'reception_date', 'id'),
     )
     
     def __init__(self, **kwargs):
@@ -274,12 +281,47 @@ class LabReport(db.Model):
         ).order_by(cls.created_at.desc()).limit(limit).all()
     
     @classmethod
-    def get_by_date_range(cls, start_date: date, end_date: date) -> List['LabReport']:
-        """Buscar reportes por rango de fechas"""
+    def query_by_date_range(cls, start_date: date, end_date: date):
+        """Consulta de reportes por rango de fechas, ordenada por (reception_date, id) descendente"""
         return cls.query.filter(
             cls.reception_date >= start_date,
             cls.reception_date <= end_date
-        ).order_by(cls.reception_date.desc()).all()
+        ).order_by(cls.reception_date.desc(), cls.id.desc())
+    
+    @classmethod
+    def query_for_export(cls, report_ids: List[int] = None, order_number: str = None, status: str = None,
+                         start_date: date = None, end_date: date = None):
+        """Consulta de reportes con filtros opcionales, ordenada por (reception_date, id) descendente"""
+        query = cls.query
+        if report_ids:
+            query = query.filter(cls.id.in_(report_ids))
+        if order_number:
+            query = query.filter(cls.order_number == order_number)
+        if status:
+            query = query.filter(cls.status == status)
+        if start_date:
+            query = query.filter(cls.reception_date >= start_date)
+        if end_date:
+            query = query.filter(cls.reception_date <= end_date)
+        return query.order_by(cls.reception_date.desc(), cls.id.desc())
+    
+    @classmethod
+    def file_rows_after(cls, after_id: int, limit: int) -> List[Tuple]:
+        """(id, file_path, file_name, created_at) de los reportes con ID mayor a ``after_id``, en orden de ID"""
+        return db.session.query(cls.id, cls.file_path, cls.file_name, cls.created_at).filter(
+            cls.id > after_id
+        ).order_by(cls.id).limit(limit).all()
+    
+    @classmethod
+    def update_file_paths(cls, file_paths: Dict[int, str]) -> None:
+        """Cambiar ``file_path`` de varios reportes (sin confirmar la transacción)"""
+        for report_id, file_path in file_paths.items():
+            cls.query.filter(cls.id == report_id).update({'file_path': file_path}, synchronize_session=False)
+    
+    @classmethod
+    def get_by_date_range(cls, start_date: date, end_date: date) -> List['LabReport']:
+        """Buscar reportes por rango de fechas"""
+        return cls.query_by_date_range(start_date, end_date).all()
     
     @classmethod
     def get_by_status(cls, status: str) -> List['LabReport']:
@@ -359,3 +401,79 @@ class ReportTest(db.Model):
     def __repr__(self):
         return f'<ReportTest {self.test_name} - Report {self.report_id}>'
 
+
+class ReportRevision(db.Model):
+    """
+    Revisión del contenido HTML de un reporte
+    
+    La primera revisión (y cada cierto número de revisiones) se guarda completa
+    ('full'); las demás como diferencia comprimida respecto a la anterior ('delta').
+    """
+    
+    __tablename__ = 'report_revisions'
+    
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, ForeignKey('lab_reports.id', ondelete='CASCADE'), nullable=False, index=True)
+    revision = Column(Integer, nullable=False)
+    kind = Column(String(10), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    content_size = Column(Integer, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    report = relationship('LabReport', back_populates='revisions')
+    
+    __table_args__ = (
+        UniqueConstraint('report_id', 'revision', name='uq_report_revision'),
+        CheckConstraint("kind IN ('full', 'delta')", name='check_revision_kind'),
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convertir a diccionario (sin los datos almacenados)"""
+        return {
+            'revision': self.revision,
+            'kind': self.kind,
+            'content_size': self.content_size,
+            'stored_size': self.stored_size,
+            'content_hash': self.content_hash,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ReportRevision {self.revision} - Report {self.report_id}>'
+
+
+class ReportStatsCounter(db.Model):
+    """
+    Contador de las estadísticas de reportes (ver ReportStatsService)
+    
+    Los contadores por estado se actualizan con ``value = value + delta`` en la
+    misma transacción que crea, modifica o elimina el reporte, así que todos los
+    procesos del servidor leen los mismos valores.
+    """
+    
+    __tablename__ = 'report_stats_counters'
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ReportStatsCounter {self.name}={self.value}>'
+
+
+class ReportStatsRegister(db.Model):
+    """Registro de un HyperLogLog de las estadísticas de reportes (solo crece)"""
+    
+    __tablename__ = 'report_stats_registers'
+    
+    # Nombre del estimador con su precisión (p. ej. 'patients:12')
+    sketch = Column(String(30), primary_key=True)
+    register = Column(Integer, primary_key=True)
+    rank = Column(SmallInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ReportStatsRegister {self.sketch}[{self.register}]={self.rank}>'
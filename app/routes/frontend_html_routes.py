@@ -16,6 +16,10 @@ controller = FrontendHTMLController()
 def upload_html_file():
     return controller.upload_html_file()
 
+@frontend_html_bp.route('/upload/stream', methods=['POST'])
+def upload_html_stream():
+    return controller.upload_html_stream()
+
 @frontend_html_bp.route('/list', methods=['GET'])
 def list_html_files():
     return controller.list_html_files()
@@ -44,14 +48,34 @@ def get_file_info(filename):
 def search_html_files():
     return controller.search_html_files()
 
+@frontend_html_bp.route('/export', methods=['POST'])
+def export_html_files():
+    return controller.export_html_files()
+
 @frontend_html_bp.route('/backup', methods=['POST'])
 def create_backup():
     return controller.create_backup()
 
+@frontend_html_bp.route('/backup/compact', methods=['POST'])
+def compact_backups():
+    return controller.compact_backups()
+
 @frontend_html_bp.route('/system/validate', methods=['GET'])
 def validate_system():
     return controller.validate_system()
 
+@frontend_html_bp.route('/system/reindex', methods=['POST'])
+def rebuild_index():
+    return controller.rebuild_index()
+
+@frontend_html_bp.route('/system/counters/rebuild', methods=['POST'])
+def rebuild_counters():
+    return controller.rebuild_counters()
+
+@frontend_html_bp.route('/system/migrate-layout', methods=['POST'])
+def migrate_storage_layout():
+    return controller.migrate_storage_layout()
+
 @frontend_html_bp.route('/stats', methods=['GET'])
 def get_stats():
     return controller.get_stats()
@@ -38,6 +38,21 @@ def create_report():
         "status": "draft"
     }
     
+    Alternativa (el servidor compone el HTML desde las plantillas):
+    {
+        "order_number": "ORD-001",
+        "patient_name": "Juan Pérez",
+        "tests": [
+            {
+                "template_id": "hematologia_wendy",
+                "results": {
+                    "NEUTROFILOS": {"value": "61%", "flag": "normal"},
+                    "HEMOGLOBINA (HB)": "13.5 g/dl"
+                }
+            }
+        ]
+    }
+    
     Response:
     {
         "success": true,
@@ -48,6 +63,76 @@ def create_report():
     return controller.create_report()
 
 
+@lab_report_bp.route('/batch', methods=['POST'])
+@token_required
+def create_reports_batch():
+    """
+    POST /api/reports/batch
+    Crear varios reportes en una sola llamada
+    
+    Cada elemento usa el mismo formato que POST /api/reports (con html_content
+    o con tests). Los elementos válidos se guardan en una sola transacción; los
+    inválidos se informan sin impedir la creación de los demás.
+    
+    Body:
+    {
+        "reports": [
+            {"order_number": "ORD-001", "patient_name": "Juan Pérez", "tests": [...]},
+            {"order_number": "ORD-002", "patient_name": "María López", "html_content": "...", "selected_tests": [...]}
+        ]
+    }
+    
+    Response (201 si todos se crearon, 207 si algunos fallaron, 400 si ninguno):
+    {
+        "success": false,
+        "message": "Lote de reportes procesado",
+        "data": {
+            "total": 2,
+            "succeeded": 1,
+            "failed": 1,
+            "results": [
+                {"index": 0, "success": true, "data": { ... }},
+                {"index": 1, "success": false, "error": "Ya existe un reporte con el número de orden: ORD-002"}
+            ]
+        }
+    }
+    """
+    return controller.create_reports_batch()
+
+
+@lab_report_bp.route('/status', methods=['PATCH'])
+@token_required
+def update_reports_status():
+    """
+    PATCH /api/reports/status
+    Cambiar el estado de varios reportes (por ejemplo, al imprimir un lote)
+    
+    Transiciones permitidas: draft -> final, draft -> printed, final -> printed.
+    
+    Body:
+    {
+        "report_ids": [12, 13, 14],
+        "status": "printed"
+    }
+    
+    Response (200 si todos se actualizaron, 207 si algunos fallaron, 400 si ninguno):
+    {
+        "success": true,
+        "message": "Estados actualizados",
+        "data": {
+            "total": 3,
+            "succeeded": 3,
+            "failed": 0,
+            "results": [
+                {"index": 0, "id": 12, "success": true, "changed": true, "status": "printed"},
+                ...
+            ]
+        }
+    }
+    """
+    return controller.update_reports_status()
+
+
 @lab_report_bp.route('/<int:report_id>', methods=['PUT'])
 @token_required
 def update_report(report_id):
@@ -62,6 +147,9 @@ def update_report(report_id):
         "status": "final"
     }
     
+    En lugar de html_content se puede enviar "tests" (mismo formato que en
+    POST /api/reports) y el servidor recompone el HTML.
+    
     Response:
     {
         "success": true,
@@ -119,16 +207,23 @@ def get_reports_by_date_range():
     GET /api/reports/date-range
     Buscar reportes por rango de fechas
     
+    Resultados ordenados por fecha de recepción descendente y paginados por
+    cursor: para la siguiente página se envía el next_cursor recibido.
+    
     Query Parameters:
     - start_date: YYYY-MM-DD (required)
     - end_date: YYYY-MM-DD (required)
     - include_html: true/false (default: false)
+    - limit: reportes por página (default: 100, máximo: 500)
+    - cursor: next_cursor de la página anterior (opcional)
     
     Response:
     {
         "success": true,
         "data": [ ... ],
-        "count": 10,
+        "count": 100,
+        "next_cursor": "MjAyNC0wMS0xNXw0Mg",
+        "has_more": true,
         "date_range": {
             "start_date": "2024-01-01",
             "end_date": "2024-01-31"
@@ -138,6 +233,54 @@ def get_reports_by_date_range():
     return controller.get_reports_by_date_range()
 
 
+@lab_report_bp.route('/date-range/export', methods=['GET'])
+@token_required
+def export_reports_by_date_range():
+    """
+    GET /api/reports/date-range/export
+    Exportar reportes de un rango de fechas en formato NDJSON
+    
+    La respuesta se genera por lotes mientras se lee la base de datos, por lo
+    que no tiene límite de rango ni de cantidad de reportes.
+    
+    Query Parameters:
+    - start_date: YYYY-MM-DD (required)
+    - end_date: YYYY-MM-DD (required)
+    - include_html: true/false (default: false)
+    
+    Response (Content-Type: application/x-ndjson, un reporte por línea):
+    {"id": 42, "order_number": "ORD-001", "patient_name": "Juan Pérez", ...}
+    {"id": 41, "order_number": "ORD-000", "patient_name": "María López", ...}
+    """
+    return controller.export_reports_by_date_range()
+
+
+@lab_report_bp.route('/export', methods=['POST'])
+@token_required
+def export_reports():
+    """
+    POST /api/reports/export
+    Descargar los archivos HTML de varios reportes en un ZIP
+    
+    El ZIP se genera en streaming mientras se leen la base de datos y los
+    archivos: el primer byte llega de inmediato y la memoria no depende de la
+    cantidad de reportes. Los archivos guardados con gzip se copian sin
+    recomprimir.
+    
+    Body (al menos un filtro):
+    {
+        "report_ids": [41, 42],
+        "order_number": "ORD-001",
+        "status": "final",
+        "start_date": "2024-01-15",
+        "end_date": "2024-01-15"
+    }
+    
+    Response: application/zip (adjunto reportes_YYYYMMDD_HHMMSS.zip)
+    """
+    return controller.export_reports()
+
+
 @lab_report_bp.route('/stats', methods=['GET'])
 @token_required
 def get_reports_stats():
@@ -145,6 +288,9 @@ def get_reports_stats():
     GET /api/reports/stats
     Obtener estadísticas de reportes
     
+    Query params:
+    - exact: true para forzar recálculo exacto (default: false)
+    
     Response:
     {
         "success": true,
@@ -155,7 +301,9 @@ def get_reports_stats():
                 "unique_doctors": 15,
                 "draft_reports": 25,
                 "final_reports": 100,
-                "printed_reports": 25
+                "printed_reports": 25,
+                "approximate": false,
+                "computed_at": "2024-01-15T14:30:22"
             },
             "system": {
                 "permissions": { ... },
@@ -207,29 +355,223 @@ def get_file_info(report_id):
     return controller.get_file_info(report_id)
 
 
+@lab_report_bp.route('/<int:report_id>/revisions', methods=['GET'])
+@token_required
+def get_report_revisions(report_id):
+    """
+    GET /api/reports/{id}/revisions
+    Listar el historial de revisiones del contenido del reporte
+    
+    La revisión 1 se guarda completa y las siguientes como diferencias
+    comprimidas; stored_size es lo que ocupa cada una en la base de datos.
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "report_id": 1,
+            "revisions": [
+                {"revision": 1, "kind": "full", "content_size": 48213, "stored_size": 6120, ...},
+                {"revision": 2, "kind": "delta", "content_size": 48230, "stored_size": 96, ...}
+            ],
+            "count": 2,
+            "total_content_size": 96443,
+            "total_stored_size": 6216
+        }
+    }
+    """
+    return controller.get_report_revisions(report_id)
+
+
+@lab_report_bp.route('/<int:report_id>/revisions/<int:revision>', methods=['GET'])
+@token_required
+def get_report_revision(report_id, revision):
+    """
+    GET /api/reports/{id}/revisions/{revision}
+    Obtener el contenido HTML de una revisión del reporte
+    
+    Query Parameters:
+    - format: html para recibir el documento directamente (default: JSON)
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "report_id": 1,
+            "revision": 2,
+            "kind": "delta",
+            "content_hash": "5f1c...",
+            "html_content": "<!DOCTYPE html>..."
+        }
+    }
+    """
+    return controller.get_report_revision(report_id, revision)
+
+
+@lab_report_bp.route('/<int:report_id>/file', methods=['GET'])
+@token_required
+def get_report_file(report_id):
+    """
+    GET /api/reports/{id}/file
+    Servir el archivo HTML del reporte
+    
+    Query params:
+    - download: true para descargar como adjunto (default: false)
+    
+    Si el reporte está guardado comprimido (.html.gz) y el cliente envía
+    Accept-Encoding: gzip, los bytes se envían tal cual con
+    Content-Encoding: gzip; en otro caso se descomprime al vuelo.
+    """
+    return controller.get_report_file(report_id)
+
+
+@lab_report_bp.route('/templates/<string:template_id>', methods=['GET'])
+@token_required
+def get_template_fields(template_id):
+    """
+    GET /api/reports/templates/{template_id}
+    Obtener los campos de resultado de una plantilla de prueba
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "template_id": "hematologia_wendy",
+            "filename": "hematologia_wendy.html",
+            "title": "HEMATOLOGIA - PAQUETE PRENATAL DRA. WENDY",
+            "fields": [
+                {
+                    "index": 0,
+                    "key": "RECUENTO DE GLOBULOS BLANCOS",
+                    "label": "RECUENTO DE GLOBULOS BLANCOS",
+                    "reference_range": "5.00 – 10.00",
+                    "sample_value": "8.88"
+                }
+            ]
+        }
+    }
+    """
+    return controller.get_template_fields(template_id)
+
+
+@lab_report_bp.route('/preview', methods=['POST'])
+@token_required
+def preview_report():
+    """
+    POST /api/reports/preview
+    Componer el HTML de un reporte sin guardarlo
+    
+    Body: mismo formato que POST /api/reports con 'tests'
+    Response: HTML del reporte (Content-Type: text/html)
+    """
+    return controller.preview_report()
+
+
+@lab_report_bp.route('/<int:report_id>/pdf', methods=['POST'])
+@token_required
+def request_report_pdf(report_id):
+    """
+    POST /api/reports/{id}/pdf
+    Encolar la generación del PDF del reporte
+    
+    El PDF se renderiza en un pool de procesos y se guarda en una cache
+    indexada por el hash del contenido y la versión del renderizador.
+    
+    Response (202 en proceso, 200 si ya estaba en cache):
+    {
+        "success": true,
+        "message": "PDF en proceso",
+        "data": {
+            "report_id": 1,
+            "cache_key": "9b1c...",
+            "status": "pending",
+            "renderer_version": "1",
+            "download_url": "/api/reports/1/pdf"
+        }
+    }
+    """
+    return controller.request_report_pdf(report_id)
+
+
+@lab_report_bp.route('/<int:report_id>/pdf', methods=['GET'])
+@token_required
+def get_report_pdf(report_id):
+    """
+    GET /api/reports/{id}/pdf
+    Descargar el PDF del reporte
+    
+    Query params:
+    - download: false para mostrarlo en el navegador (default: true)
+    
+    Responde 202 si el PDF aún se está generando y 404 si no se ha solicitado.
+    """
+    return controller.get_report_pdf(report_id)
+
+
+@lab_report_bp.route('/<int:report_id>/pdf/status', methods=['GET'])
+@token_required
+def get_report_pdf_status(report_id):
+    """
+    GET /api/reports/{id}/pdf/status
+    Consultar el estado del PDF del reporte
+    
+    Estados: not_requested, pending, completed, failed
+    """
+    return controller.get_report_pdf_status(report_id)
+
+
 @lab_report_bp.route('/backup', methods=['POST'])
 @token_required
 def create_backup():
     """
     POST /api/reports/backup
-    Crear backup de reportes
+    Encolar backup de reportes (se crea en segundo plano)
     
     Query Parameters:
     - date: YYYY-MM-DD (opcional, default: hoy)
     
-    Response:
+    Response (202):
     {
         "success": true,
-        "message": "Backup creado exitosamente",
+        "message": "Backup en proceso",
         "data": {
-            "backup_path": "/path/to/backup.zip",
-            "backup_date": "2024-01-15"
+            "job_id": "3f2a...",
+            "status": "queued",
+            "backup_date": "2024-01-15",
+            "status_url": "/api/reports/backup/3f2a..."
         }
     }
     """
     return controller.create_backup()
 
 
+@lab_report_bp.route('/backup/<string:job_id>', methods=['GET'])
+@token_required
+def get_backup_job(job_id):
+    """
+    GET /api/reports/backup/{job_id}
+    Consultar progreso de un backup
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "job_id": "3f2a...",
+            "status": "running",
+            "files_total": 1200,
+            "files_done": 480,
+            "progress": 40.0,
+            "bytes_in": 52428800,
+            "bytes_out": 9437184,
+            "codec": "deflated",
+            "compression_level": 6,
+            "backup_path": null
+        }
+    }
+    """
+    return controller.get_backup_job(job_id)
+
+
 @lab_report_bp.route('/backup/cleanup', methods=['DELETE'])
 @token_required
 def cleanup_backups():
@@ -276,6 +618,74 @@ def validate_system():
     return controller.validate_system()
 
 
+@lab_report_bp.route('/system/reconcile', methods=['POST'])
+@token_required
+def reconcile_files():
+    """
+    POST /api/reports/system/reconcile
+    Reconciliar archivos en disco con la base de datos
+    
+    Reescribe desde html_content los archivos faltantes o truncados, elimina
+    temporales abandonados y lista archivos sin reporte asociado.
+    
+    Query Parameters:
+    - dry_run: true para solo informar, sin modificar archivos (opcional, default: false)
+    - remove_orphans: true para eliminar archivos sin reporte (opcional, default: false)
+    
+    Response:
+    {
+        "success": true,
+        "message": "Reconciliación completada: 1 archivos reparados",
+        "data": {
+            "checked": 120,
+            "missing": [15],
+            "mismatched": [],
+            "repaired": 1,
+            "orphans": ["2024/01/ORD-999_Prueba_20240115_101010.html"],
+            "orphans_removed": 0,
+            "temp_files_removed": 0
+        }
+    }
+    """
+    return controller.reconcile_files()
+
+
+@lab_report_bp.route('/system/migrate-layout', methods=['POST'])
+@token_required
+def migrate_storage_layout():
+    """
+    POST /api/reports/system/migrate-layout
+    Mover los archivos de reportes a la distribución configurada (REPORTS_STORAGE_LAYOUT)
+    
+    Mueve los archivos por lotes y actualiza file_path sin detener el servicio.
+    Para continuar una migración parcial, enviar next_after_id como after_id.
+    
+    Query Parameters:
+    - after_id: Continuar después de este ID (opcional, default: 0)
+    - batch_size: Reportes por lote (opcional, default: STORAGE_MIGRATION_BATCH_SIZE)
+    - max_batches: Lotes en esta llamada, entre 1 y STORAGE_MIGRATION_MAX_BATCHES (opcional, default: STORAGE_MIGRATION_MAX_BATCHES)
+    - dry_run: true para solo contar los archivos que se moverían (opcional, default: false)
+    
+    Response:
+    {
+        "success": true,
+        "message": "Migración de distribución: 118 archivos movidos",
+        "data": {
+            "layout": "sharded",
+            "dry_run": false,
+            "checked": 120,
+            "moved": 118,
+            "pending": 0,
+            "missing": [15],
+            "errors": [],
+            "next_after_id": 120,
+            "done": true
+        }
+    }
+    """
+    return controller.migrate_storage_layout()
+
+
 # Rutas adicionales para funcionalidades específicas
 
 @lab_report_bp.route('/<int:report_id>/status', methods=['PATCH'])
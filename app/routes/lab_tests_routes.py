@@ -2,41 +2,85 @@
 Rutas para servir las pruebas de laboratorio HTML
 """
 
-from flask import Blueprint, send_file, jsonify, request
-from pathlib import Path
+from flask import Blueprint, jsonify, request
 import os
+import json
+
+from app.config import Config
+from app.controllers.file_response import file_etag, send_cached_file, send_compressed
+from app.services.lab_test_catalog import LabTestCatalog
 
 # Crear el blueprint para las rutas de pruebas de laboratorio
 lab_tests_bp = Blueprint('lab_tests', __name__, url_prefix='/api/lab-tests')
 
+# Catálogo de plantillas: se recorre una vez al iniciar y se recarga si cambian los directorios
+config = Config()
+catalog = LabTestCatalog(config.LAB_TESTS_HTML_PATH, config.LAB_TESTS_CATEGORIES_PATH,
+                         reload_interval=config.LAB_TESTS_CATALOG_RELOAD_INTERVAL,
+                         build_path=config.LAB_TESTS_BUILD_PATH)
+catalog.start_watcher()
+
 @lab_tests_bp.route('/html/<filename>')
 def serve_lab_test_html(filename):
     """
     Servir archivos HTML de pruebas de laboratorio
     
     GET /api/lab-tests/html/<filename>
+    
+    Query Parameters:
+    - v: versión (hash del contenido, ver /list). Si coincide con la versión
+      actual la respuesta se marca como inmutable; si no, se revalida con ETag.
+    
+    Si la plantilla está compilada (ver lab_template_build) se sirve la versión
+    minificada. Responde 304 a If-None-Match y admite Range.
     """
     try:
-        # Ruta a los archivos HTML
-        html_dir = Path("bocetos_pruebas/html_output")
-        file_path = html_dir / filename
+        # Verificar que es un archivo HTML
+        if not filename.endswith('.html'):
+            return jsonify({
+                'success': False,
+                'message': 'Solo se permiten archivos HTML'
+            }), 400
         
-        # Verificar que el archivo existe
-        if not file_path.exists():
+        # Verificar que la plantilla está en el catálogo (solo nombres conocidos)
+        entry = catalog.get(filename)
+        file_path = entry.path if entry else None
+        if not file_path or not os.path.exists(file_path):
             return jsonify({
                 'success': False,
                 'message': f'Archivo {filename} no encontrado'
             }), 404
         
-        # Verificar que es un archivo HTML
-        if not filename.endswith('.html'):
+        # Servir el archivo HTML (las URLs versionadas nunca cambian de contenido)
+        etag = file_etag(file_path)
+        return send_cached_file(os.path.abspath(file_path), 'text/html', etag=etag,
+                                immutable=request.args.get('v') == etag, private=False)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error al servir archivo: {str(e)}'
+        }), 500
+
+@lab_tests_bp.route('/assets/<filename>')
+def serve_lab_test_asset(filename):
+    """
+    Servir las hojas de estilo compartidas de las plantillas compiladas
+    
+    GET /api/lab-tests/assets/styles.<hash>.css
+    
+    El nombre lleva el hash del contenido, así que la respuesta es inmutable.
+    """
+    try:
+        file_path = catalog.asset(filename)
+        if not file_path or not os.path.exists(file_path):
             return jsonify({
                 'success': False,
-                'message': 'Solo se permiten archivos HTML'
-            }), 400
+                'message': f'Archivo {filename} no encontrado'
+            }), 404
         
-        # Servir el archivo HTML
-        return send_file(file_path, mimetype='text/html')
+        return send_cached_file(os.path.abspath(file_path), 'text/css', etag=file_etag(file_path),
+                                immutable=True, private=False)
         
     except Exception as e:
         return jsonify({
@@ -50,30 +94,17 @@ def list_lab_tests():
     Listar todas las pruebas de laboratorio disponibles
     
     GET /api/lab-tests/list
+    
+    Se responde desde el catálogo en memoria (no recorre el directorio).
     """
     try:
-        html_dir = Path("bocetos_pruebas/html_output")
-        
-        if not html_dir.exists():
+        if not catalog.available:
             return jsonify({
                 'success': False,
                 'message': 'Directorio de pruebas no encontrado'
             }), 404
         
-        # Buscar todos los archivos HTML
-        html_files = []
-        for file_path in html_dir.glob("*.html"):
-            if file_path.name != "index.html":  # Excluir el índice
-                html_files.append({
-                    'filename': file_path.name,
-                    'name': file_path.stem,
-                    'url': f'/api/lab-tests/html/{file_path.name}',
-                    'size': file_path.stat().st_size,
-                    'modified': file_path.stat().st_mtime
-                })
-        
-        # Ordenar por nombre
-        html_files.sort(key=lambda x: x['name'])
+        html_files = catalog.list_tests()
         
         return jsonify({
             'success': True,
@@ -93,124 +124,14 @@ def get_categories():
     Obtener categorías de pruebas de laboratorio
     
     GET /api/lab-tests/categories
+    
+    Las categorías salen de las carpetas bocetos_pruebas/<categoría>/; las
+    plantillas que no están en ninguna carpeta se agrupan en "Otros".
     """
     try:
-        categories = {
-            'Hematología': [
-                '3. HEMATOLOGIA.html',
-                '15. FROTE PERIFERICO, CLASIFICACION DE ANEMIA.html',
-                '22. HEMATOLOGIA CANINO.html',
-                '23. HEMATOLOGIA (FELINO).html',
-                'frote_periferico.html',
-                'clasificacion_anemia.html',
-                'gota_gruesa.html'
-            ],
-            'Bioquímica': [
-                '4. QUIMICA CLINICA.html',
-                '5. ENZIMAS.html',
-                '6. ELECTROLITOS.html',
-                '10. ENDOCRINOLOGIA.html'
-            ],
-            'Microbiología': [
-                '14. CULTIVOS VARIOS.html',
-                '16. HELICOBACTER PYLORI.html',
-                '17. MICROBIOLOGIA.html',
-                'urocultivo_negativo.html',
-                'urocultivo_positivo.html',
-                'orocultivo.html',
-                'secrecion_vaginal.html',
-                'coprocultivo.html',
-                'helicobacter_antigeno_heces.html',
-                'azul_metileno.html',
-                'transferrina_heces.html',
-                'virus_heces.html',
-                'sangre_oculta_heces.html',
-                'helicobacter_igm_1.html',
-                'helicobacter_igg_1.html',
-                'helicobacter_igm_igg_2.html',
-                'panel_parasitos.html',
-                'clostridium_difficile.html',
-                'clinitest_1.html',
-                'clinitest_2.html',
-                'clinitest_sudan_calprotectina.html',
-                'helicobacter_igg_3.html',
-                'ziehl_neelsen_esputo.html',
-                'bk_esputo_1.html',
-                'bk_esputo_2.html',
-                'bk_esputo_3.html',
-                'koh_lesiones_piel.html',
-                'microscopia_azul_metileno.html'
-            ],
-            'Inmunología': [
-                '8. INMUNOLOGIA.html',
-                '9. INFECCIOSAS.html',
-                '11. MARCADORES TUMORALES.html'
-            ],
-            'Urianálisis': [
-                '2. ORINA.html',
-                'orina_completa.html'
-            ],
-            'Coprología': [
-                '1. HECES.html',
-                'heces_completa.html',
-                'coprologia.html'
-            ],
-            'Especiales': [
-                '7. PRUEBA DE EMBARAZO.html',
-                '12. COAGULACION.html',
-                '13. TIPO DE SANGRE.html',
-                '18. ESPERMOGRAMA.html',
-                '19. TARJETA DE SALUD.html',
-                '20. DROGAS.html',
-                'espermograma.html',
-                'inmunologia_infecciosa.html',
-                'hepatitis.html',
-                'heces_completa.html',
-                'orina_completa.html',
-                'acido_valproico_1.html',
-                'acido_valproico_fenitoina.html'
-            ],
-            'Paquetes': [
-                '20. PAQUETE PRENATAL.html',
-                '20. PAQUETE PRENATAL DRA. WENDY MADRID.html',
-                '21. PAQUETE COVID-19.html',
-                '24. PAQUETE DENGUE.html',
-                'hematologia_wendy.html',
-                'tipo_sangre_wendy.html',
-                'bioquimica_wendy.html',
-                'inmunologia_infecciosa_wendy.html',
-                'hepatitis_wendy.html',
-                'orina_completa_wendy.html',
-                'hematologia_prenatal.html',
-                'tipo_sangre_prenatal.html',
-                'bioquimica_prenatal.html',
-                'inmunologia_infecciosa_prenatal.html',
-                'hepatitis_prenatal.html',
-                'heces_completa_prenatal.html',
-                'orina_completa_prenatal.html',
-                'hematologia_covid.html',
-                'bioquimica_covid.html',
-                'inmunologia_covid.html',
-                'proteinas_neoplasicas_covid.html',
-                'coagulacion_covid.html',
-                'enzimas_covid.html',
-                'interleucina_covid.html',
-                'hematologia_canino.html',
-                'bioquimica_canino.html',
-                'bioquimica_hepatica_canino.html',
-                'hematologia_felino.html',
-                'bioquimica_felino.html',
-                'bioquimica_hepatica_felino.html',
-                'bilirrubinas_felino.html',
-                'hematologia_dengue.html',
-                'inmunologia_dengue.html',
-                'orina_completa_dengue.html'
-            ]
-        }
-        
         return jsonify({
             'success': True,
-            'data': categories
+            'data': catalog.categories()
         })
         
     except Exception as e:
@@ -225,6 +146,15 @@ def search_lab_tests():
     Buscar pruebas de laboratorio
     
     GET /api/lab-tests/search?q=<search_term>
+    
+    Busca en el nombre, el título, los analitos y los sinónimos de cada
+    plantilla, sin acentos y tolerando errores de escritura. Los resultados
+    vienen de mayor a menor puntaje (``score``) con los textos que coincidieron
+    (``matches``).
+    
+    Query Parameters:
+    - q: Término de búsqueda (requerido)
+    - limit: Máximo de resultados (opcional, default: 50)
     """
     try:
         search_term = request.args.get('q', '').strip()
@@ -235,25 +165,16 @@ def search_lab_tests():
                 'message': 'Término de búsqueda requerido'
             }), 400
         
-        html_dir = Path("bocetos_pruebas/html_output")
-        
-        if not html_dir.exists():
+        if not catalog.available:
             return jsonify({
                 'success': False,
                 'message': 'Directorio de pruebas no encontrado'
             }), 404
         
-        # Buscar archivos que coincidan con el término
-        matching_files = []
-        for file_path in html_dir.glob("*.html"):
-            if file_path.name != "index.html":
-                filename_lower = file_path.name.lower()
-                if search_term.lower() in filename_lower:
-                    matching_files.append({
-                        'filename': file_path.name,
-                        'name': file_path.stem,
-                        'url': f'/api/lab-tests/html/{file_path.name}'
-                    })
+        limit = request.args.get('limit', 50, type=int)
+        
+        # Buscar plantillas que coincidan con el término (índice en memoria)
+        matching_files = catalog.search(search_term, limit=max(1, limit))
         
         return jsonify({
             'success': True,
@@ -268,3 +189,66 @@ def search_lab_tests():
             'message': f'Error en búsqueda: {str(e)}'
         }), 500
 
+@lab_tests_bp.route('/bundle', methods=['POST'])
+def get_lab_tests_bundle():
+    """
+    Obtener varias plantillas de pruebas en una sola respuesta
+    
+    POST /api/lab-tests/bundle
+    
+    Body:
+    {
+        "ids": ["pruebas_tiroideas", "hematologia_completa.html"]
+    }
+    
+    Las plantillas salen del catálogo en memoria. Cada bloque de estilos se
+    envía una sola vez en ``styles`` y cada plantilla lo referencia por id; la
+    respuesta va comprimida con gzip si el cliente lo acepta.
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "styles": {"6fa5e651c0d2b1a9": "body { ... }"},
+            "templates": [
+                {"id": "pruebas_tiroideas", "filename": "pruebas_tiroideas.html", "title": "PRUEBAS TIROIDEAS",
+                 "version": "...", "styles": ["6fa5e651c0d2b1a9"], "html": "<div class=\"container\">...</div>"}
+            ],
+            "missing": []
+        },
+        "total": 1
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        template_ids = data.get('ids')
+        
+        if not isinstance(template_ids, list) or not template_ids \
+                or not all(isinstance(template_id, str) and template_id for template_id in template_ids):
+            return jsonify({
+                'success': False,
+                'message': "Se requiere 'ids': lista de ids de plantillas"
+            }), 400
+        
+        # Sin repetidos, conservando el orden pedido
+        template_ids = list(dict.fromkeys(template_ids))
+        if len(template_ids) > config.LAB_TESTS_BUNDLE_MAX_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'Máximo {config.LAB_TESTS_BUNDLE_MAX_SIZE} plantillas por solicitud'
+            }), 400
+        
+        bundle = catalog.bundle(template_ids)
+        body = json.dumps({
+            'success': True,
+            'data': bundle,
+            'total': len(bundle['templates'])
+        }, ensure_ascii=False).encode('utf-8')
+        
+        return send_compressed(body, 'application/json', config.HTML_GZIP_COMPRESSION_LEVEL)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error al obtener plantillas: {str(e)}'
+        }), 500
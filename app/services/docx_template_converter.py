@@ -0,0 +1,619 @@
+"""
+Conversión de los documentos Word de pruebas a plantillas HTML
+
+Los ``.docx`` de ``bocetos_pruebas/`` (``3. HEMATOLOGIA.docx``, ``4. QUIMICA
+CLINICA.docx``, ...) son la fuente de las plantillas. Cada documento trae el
+encabezado del laboratorio y los datos del paciente, y después una sección por
+examen: un título seguido de una tabla de encabezado (``EXAMEN | RESULTADO |
+RANGOS DE REFERENCIA``) y un párrafo por analito con las columnas separadas
+por espacios. Cada sección se convierte en una plantilla con el mismo diseño
+y la misma hoja de estilos que las de ``html_output``.
+
+El documento se lee directamente del ZIP (``word/document.xml``), sin
+dependencias adicionales. Los documentos se convierten en un pool de procesos
+y solo los que cambiaron: ``.docx_sources.json`` en el directorio de salida
+guarda el hash de cada origen y las plantillas que generó. Cada plantilla se
+escribe de forma atómica; el convertidor solo sobrescribe o borra archivos que
+generó él mismo, nunca las plantillas hechas a mano. Al terminar se vuelve a
+compilar la biblioteca (``lab_template_build``) y el catálogo del servidor la
+recarga en menos de ``LAB_TESTS_CATALOG_RELOAD_INTERVAL`` segundos.
+
+Uso::
+
+    python -m app.services.docx_template_converter [--source DIR] [--output DIR] [--workers N] [--force]
+"""
+
+import os
+import re
+import sys
+import html
+import json
+import time
+import hashlib
+import logging
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from app.services.lab_test_search import fold
+from app.services.report_storage import atomic_write_bytes
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Versión del convertidor; si cambia, se vuelven a convertir todos los documentos
+CONVERTER_VERSION = '1'
+
+# Registro de orígenes convertidos (en el directorio de salida)
+CACHE_NAME = '.docx_sources.json'
+
+DEFAULT_COLUMNS = ('EXAMEN', 'RESULTADO', 'RANGOS DE REFERENCIA')
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_COLUMN_GAP_RE = re.compile(r'\s{3,}|\t+')
+_SPLIT_DECIMAL_RE = re.compile(r'(\d)\. (\d)')
+_DOCUMENT_NUMBER_RE = re.compile(r'^\s*\d+\.\s*')
+_HEADING_RE = re.compile(r'[A-ZÁÉÍÓÚÜÑ][A-ZÁÉÍÓÚÜÑ .,()/-]*')
+
+# Primeras palabras de las líneas que continúan los rangos de referencia de la fila anterior
+REFERENCE_PREFIXES = {
+    'valor', 'valores', 'rango', 'rangos', 'hombres', 'hombre', 'mujeres', 'mujer', 'ninos', 'nino',
+    'recien', 'adultos', 'mayores', 'mayor', 'menores', 'menor', 'hasta', 'todos', 'semana', 'fase',
+    'embarazo', 'embarazadas', 'positivo', 'negativo', 'dudoso', 'reactivo', 'no', 'optimo', 'normal',
+    'deficiencia', 'insuficiencia', 'toxicidad', 'riesgo', 'alto', 'bajo', 'limite', 'anticonceptivos',
+    'postmenopausia', 'premenopausia'
+}
+
+# Sangría a partir de la cual una línea está alineada con la columna de rangos
+REFERENCE_INDENT = 60
+
+TEMPLATE_STYLE = """
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            line-height: 1.6;
+            margin: 0;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }
+        .container {
+            max-width: 900px;
+            margin: 0 auto;
+            background: white;
+            padding: 30px;
+            border-radius: 10px;
+            box-shadow: 0 0 20px rgba(0,0,0,0.1);
+        }
+        .header {
+            text-align: center;
+            border-bottom: 3px solid #2c3e50;
+            padding-bottom: 20px;
+            margin-bottom: 30px;
+        }
+        .header h1 {
+            color: #2c3e50;
+            margin: 0;
+            font-size: 2.2em;
+        }
+        .header .subtitle {
+            color: #7f8c8d;
+            margin-top: 10px;
+            font-size: 1.1em;
+        }
+        .exam-title {
+            text-align: center;
+            font-size: 1.8em;
+            font-weight: bold;
+            color: #2c3e50;
+            margin: 30px 0;
+            text-transform: uppercase;
+        }
+        .results-table {
+            width: 100%;
+            border-collapse: collapse;
+            margin: 30px 0;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        .results-table th {
+            background-color: #34495e;
+            color: white;
+            padding: 15px;
+            text-align: center;
+            font-weight: bold;
+        }
+        .results-table td {
+            padding: 12px 15px;
+            text-align: left;
+            border-bottom: 1px solid #bdc3c7;
+        }
+        .results-table tr:nth-child(even) {
+            background-color: #f8f9fa;
+        }
+        .results-table tr:hover {
+            background-color: #e8f4fd;
+        }
+        .exam-name {
+            font-weight: bold;
+            color: #2c3e50;
+        }
+        .result-value {
+            color: #34495e;
+            font-weight: 500;
+        }
+        .result-value.normal {
+            color: #27ae60;
+            font-weight: bold;
+        }
+        .result-value.abnormal {
+            color: #e74c3c;
+            font-weight: bold;
+        }
+        .reference-range {
+            color: #7f8c8d;
+            font-style: italic;
+            font-size: 0.9em;
+        }
+        .footer {
+            text-align: center;
+            margin-top: 30px;
+            padding-top: 20px;
+            border-top: 1px solid #bdc3c7;
+            color: #7f8c8d;
+        }
+    """
+
+
+def slugify(text: str) -> str:
+    """Nombre de archivo a partir de un título (``QUIMICA CLÍNICA`` -> ``quimica_clinica``)"""
+    return '_'.join(fold(text).split())
+
+
+def document_title(path: str) -> str:
+    """Título de un documento a partir de su nombre (``3. HEMATOLOGIA.docx`` -> ``HEMATOLOGIA``)"""
+    return _DOCUMENT_NUMBER_RE.sub('', os.path.splitext(os.path.basename(path))[0]).strip()
+
+
+def _text(element) -> str:
+    parts = []
+    for node in element.iter():
+        if node.tag == f'{_W}t':
+            parts.append(node.text or '')
+        elif node.tag == f'{_W}tab':
+            parts.append('\t')
+        elif node.tag in (f'{_W}br', f'{_W}cr'):
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def read_docx(path: str) -> List[Tuple[str, Any]]:
+    """
+    Bloques del cuerpo de un documento, en orden
+    
+    Returns:
+        Lista de ``('p', texto)`` por párrafo y ``('table', filas)`` por tabla,
+        donde cada fila es la lista de textos de sus celdas
+    """
+    with zipfile.ZipFile(path) as document:
+        root = ElementTree.fromstring(document.read('word/document.xml'))
+    
+    blocks = []
+    for element in root.find(f'{_W}body'):
+        if element.tag == f'{_W}p':
+            for line in _text(element).split('\n'):
+                blocks.append(('p', line))
+        elif element.tag == f'{_W}tbl':
+            rows = [[' '.join(_text(cell).split()) for cell in row.findall(f'{_W}tc')]
+                    for row in element.findall(f'{_W}tr')]
+            blocks.append(('table', rows))
+    return blocks
+
+
+def _clean(text: str) -> str:
+    return _SPLIT_DECIMAL_RE.sub(r'\1.\2', ' '.join(text.split()))
+
+
+def _columns(line: str) -> List[str]:
+    """Columnas de un párrafo alineado con espacios (``NOMBRE:  valor   rango``)"""
+    columns = [column.strip() for column in _COLUMN_GAP_RE.split(line.strip()) if column.strip()]
+    # "NOMBRE:  valor" con menos espacios de los habituales entre nombre y valor
+    if columns and ':' in columns[0].rstrip(':'):
+        name, value = columns[0].split(':', 1)
+        if value.strip():
+            columns[0:1] = [f'{name.strip()}:', value.strip()]
+    return [_clean(column) for column in columns]
+
+
+def _is_heading(text: str) -> bool:
+    """Subtítulo dentro de una sección (``MACROSCOPICO:``, ``PERFIL DE LIPIDOS``)"""
+    return text.endswith(':') or bool(_HEADING_RE.fullmatch(text))
+
+
+def _is_reference_line(line: str) -> bool:
+    """Línea que continúa los rangos de referencia de la fila anterior"""
+    words = fold(line).split()
+    indent = len(line) - len(line.lstrip(' \t'))
+    return bool(words) and (indent >= REFERENCE_INDENT or words[0] in REFERENCE_PREFIXES or words[0][0].isdigit())
+
+
+def _is_header_row(cells: List[str]) -> bool:
+    labels = {fold(cell) for cell in cells}
+    return 'examen' in labels or 'resultado' in labels
+
+
+class _Section:
+    """Sección de un documento: título, columnas y filas"""
+    
+    def __init__(self, title: str, columns: List[str]):
+        self.title = title
+        self.columns = columns
+        self.rows: List[Dict[str, Any]] = []
+        # Filas de la columna derecha en las secciones de dos columnas (orina, heces)
+        self.right: List[Dict[str, Any]] = []
+    
+    @property
+    def paired(self) -> bool:
+        """Secciones sin columna de resultado: pares nombre/valor, a veces en dos columnas"""
+        return len(self.columns) == 1
+    
+    def add_line(self, line: str):
+        """Agregar un párrafo (columnas separadas por espacios)"""
+        if not self.paired and len(self.columns) > 2 and self.rows and 'values' in self.rows[-1] \
+                and _is_reference_line(line):
+            self.rows[-1]['values'][-1] += f'\n{_clean(line)}'
+            return
+        self.add_cells(_columns(line))
+    
+    def add_cells(self, cells: List[str]):
+        cells = [cell for cell in cells if cell]
+        if not cells:
+            return
+        
+        if self.paired:
+            # Pares nombre/valor; un nombre seguido de otro nombre es un subtítulo
+            groups, current = [], []
+            for cell in cells:
+                if current and cell.endswith(':'):
+                    groups.append(current)
+                    current = []
+                current.append(cell)
+                if len(current) == 2:
+                    groups.append(current)
+                    current = []
+            if current:
+                groups.append(current)
+            for index, group in enumerate(groups[:2]):
+                rows = self.rows if index == 0 else self.right
+                if len(group) == 1 and _is_heading(group[0]):
+                    rows.append({'heading': group[0]})
+                elif len(group) == 1 and rows and 'heading' not in rows[-1]:
+                    rows[-1]['values'][-1] += f'\n{group[0]}'
+                else:
+                    rows.append({'values': [group[0], ' '.join(group[1:])]})
+            return
+        
+        width = len(self.columns)
+        if len(cells) == 1:
+            text = cells[0]
+            if _is_heading(text):
+                self.rows.append({'heading': text})
+            elif self.rows and 'values' in self.rows[-1]:
+                # Línea de continuación de los rangos de referencia
+                self.rows[-1]['values'][-1] += f'\n{text}'
+            else:
+                self.rows.append({'heading': text})
+            return
+        
+        values = cells[:width - 1] + [' '.join(cells[width - 1:])]
+        values += [''] * (width - len(values))
+        self.rows.append({'values': values})
+    
+    def pop_title(self) -> Optional[str]:
+        """Quitar la última fila si es un título (el de la sección siguiente)"""
+        if self.right and 'heading' in self.right[-1]:
+            return self.right.pop()['heading']
+        if self.rows and 'heading' in self.rows[-1]:
+            return self.rows.pop()['heading']
+        return None
+    
+    def all_rows(self) -> List[Dict[str, Any]]:
+        return self.rows + self.right
+
+
+def parse_sections(blocks: List[Tuple[str, Any]], title: str) -> List[_Section]:
+    """
+    Secciones de examen de un documento
+    
+    Se omite el encabezado (hasta la línea ``Recepción:``). Cada tabla de
+    encabezado abre una sección con el título que la precede; el contenido sin
+    tabla de encabezado queda en una sección con el título del documento.
+    """
+    has_header = any(kind == 'p' and fold(value).startswith('recepcion') for kind, value in blocks)
+    started = not has_header
+    
+    sections: List[_Section] = []
+    current: Optional[_Section] = None
+    for kind, value in blocks:
+        if not started:
+            started = kind == 'p' and fold(value).startswith('recepcion')
+            continue
+        
+        if kind == 'table' and value and _is_header_row(value[0]):
+            section_title = (current.pop_title() if current else None) or title
+            if current and not current.all_rows():
+                sections.remove(current)
+            columns = [_clean(cell) for cell in value[0] if cell.strip()]
+            current = _Section(section_title, columns)
+            sections.append(current)
+            rows = value[1:]
+        elif kind == 'table':
+            rows = value
+        elif value.strip():
+            rows = None
+        else:
+            continue
+        
+        if current is None:
+            current = _Section(title, list(DEFAULT_COLUMNS))
+            sections.append(current)
+        if rows is None:
+            current.add_line(value)
+        for cells in rows or []:
+            current.add_cells([_clean(cell) for cell in cells])
+    
+    return [section for section in sections if section.all_rows()]
+
+
+def render_section(section: _Section, generated_at: datetime) -> str:
+    """HTML de una sección con el diseño de las plantillas de ``html_output``"""
+    escape = html.escape
+    columns = section.columns if not section.paired else [section.columns[0], 'RESULTADO']
+    width = len(columns)
+    
+    rows = []
+    for row in section.all_rows():
+        if 'heading' in row:
+            rows.append(f'                <tr>\n'
+                        f'                    <td class="exam-name" colspan="{width}">{escape(row["heading"])}</td>\n'
+                        f'                </tr>')
+            continue
+        values = [escape(value).replace('\n', '<br>') for value in row['values']]
+        cells = [f'<td class="exam-name">{values[0]}</td>', f'<td class="result-value">{values[1]}</td>']
+        cells += [f'<td class="reference-range">{value}</td>' for value in values[2:]]
+        rows.append('                <tr>\n' + ''.join(f'                    {cell}\n' for cell in cells) +
+                    '                </tr>')
+    
+    headers = ''.join(f'                    <th>{escape(column)}</th>\n' for column in columns)
+    title = escape(section.title)
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title} - Laboratorio Esperanza</title>
+    <style>{TEMPLATE_STYLE}</style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{title}</h1>
+            <div class="subtitle">Laboratorio Esperanza</div>
+        </div>
+
+        <div class="exam-title">EXAMEN</div>
+
+        <table class="results-table">
+            <thead>
+                <tr>
+{headers}                </tr>
+            </thead>
+            <tbody>
+{chr(10).join(rows)}
+            </tbody>
+        </table>
+
+        <div class="footer">
+            <p>Documento generado el {generated_at.strftime('%d/%m/%Y')} a las {generated_at.strftime('%H:%M')}</p>
+            <p>Laboratorio Esperanza - Sistema de Gestión de Laboratorio</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def convert_docx(path: str, generated_at: datetime = None) -> List[Tuple[str, str]]:
+    """
+    Plantillas de un documento (se ejecuta en un proceso del pool)
+    
+    Las secciones repetidas (mismo título y mismas filas) se convierten una
+    sola vez; si dos secciones distintas tienen el mismo título, la segunda
+    lleva en el nombre su primer analito.
+    
+    Returns:
+        Lista de (nombre de archivo, HTML), una por sección
+    """
+    generated_at = generated_at or datetime.now()
+    title = document_title(path)
+    prefix = slugify(title)
+    
+    templates = []
+    used = set()
+    seen = set()
+    for section in parse_sections(read_docx(path), title):
+        key = json.dumps([section.title, section.columns, section.all_rows()], ensure_ascii=False)
+        if key in seen:
+            continue
+        seen.add(key)
+        
+        slug = slugify(section.title)
+        name = prefix if slug == prefix else f'{prefix}_{slug}'
+        first = next((row['values'][0] for row in section.all_rows() if 'values' in row), '')
+        if name in used and slugify(first):
+            name = f"{name}_{'_'.join(slugify(first).split('_')[:3])}"
+        candidate, number = name, 2
+        while candidate in used:
+            candidate, number = f'{name}_{number}', number + 1
+        used.add(candidate)
+        templates.append((f'{candidate}.html', render_section(section, generated_at)))
+    return templates
+
+
+def _source_hash(path: str) -> str:
+    digest = hashlib.sha256(CONVERTER_VERSION.encode('utf-8'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_cache(output_path: str) -> Dict[str, Dict[str, Any]]:
+    path = os.path.join(output_path, CACHE_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('sources', {})
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudo leer {path}, se convierten todos los documentos: {str(e)}")
+        return {}
+
+
+def convert_templates(source_path: str, output_path: str, workers: int = None,
+                      force: bool = False) -> Dict[str, Any]:
+    """
+    Convertir los documentos de ``source_path`` que cambiaron desde la última conversión
+    
+    Args:
+        source_path: Directorio con los ``.docx``
+        output_path: Directorio de plantillas (``html_output``)
+        workers: Procesos del pool (default: número de CPUs)
+        force: Convertir todos los documentos aunque no hayan cambiado
+    
+    Returns:
+        Dict: Resumen (documentos convertidos y omitidos, plantillas escritas,
+        eliminadas y en conflicto, errores y duración)
+    """
+    started = time.monotonic()
+    try:
+        os.makedirs(output_path, exist_ok=True)
+        cache = _load_cache(output_path)
+        # Plantilla -> documento que la generó
+        owners = {filename: name for name, entry in cache.items() for filename in entry.get('outputs', [])}
+        
+        sources = sorted(name for name in os.listdir(source_path)
+                         if name.lower().endswith('.docx') and not name.startswith('~$'))
+        hashes = {name: _source_hash(os.path.join(source_path, name)) for name in sources}
+        pending = [
+            name for name in sources
+            if force or cache.get(name, {}).get('hash') != hashes[name]
+            or not all(os.path.exists(os.path.join(output_path, filename))
+                       for filename in cache[name].get('outputs', []))
+        ]
+        
+        generated_at = datetime.now()
+        results: Dict[str, List[Tuple[str, str]]] = {}
+        errors = []
+        workers = max(1, workers or os.cpu_count() or 2)
+        if workers == 1 or len(pending) <= 1:
+            for name in pending:
+                try:
+                    results[name] = convert_docx(os.path.join(source_path, name), generated_at)
+                except Exception as e:
+                    errors.append({'source': name, 'error': str(e)})
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+                futures = {name: executor.submit(convert_docx, os.path.join(source_path, name), generated_at)
+                           for name in pending}
+                for name, future in futures.items():
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors.append({'source': name, 'error': str(e)})
+        
+        written, removed, conflicts = [], [], []
+        for name, templates in results.items():
+            outputs = []
+            blocked = False
+            for filename, content in templates:
+                target = os.path.join(output_path, filename)
+                # Nunca sobrescribir plantillas hechas a mano ni las de otro documento
+                if os.path.exists(target) and owners.get(filename) != name:
+                    conflicts.append({'source': name, 'file': filename})
+                    blocked = True
+                    continue
+                atomic_write_bytes(target, content.encode('utf-8'), durable=False)
+                owners[filename] = name
+                outputs.append(filename)
+                written.append(filename)
+            
+            for filename in cache.get(name, {}).get('outputs', []):
+                if filename not in outputs and os.path.exists(os.path.join(output_path, filename)):
+                    os.remove(os.path.join(output_path, filename))
+                    removed.append(filename)
+            # Con conflictos el documento se vuelve a intentar (y a reportar) en la próxima ejecución
+            cache[name] = {'hash': None if blocked else hashes[name], 'outputs': outputs,
+                           'converted_at': generated_at.isoformat()}
+        
+        # Documentos que ya no existen: quitar sus plantillas
+        for name in [name for name in cache if name not in hashes]:
+            for filename in cache.pop(name).get('outputs', []):
+                if os.path.exists(os.path.join(output_path, filename)):
+                    os.remove(os.path.join(output_path, filename))
+                    removed.append(filename)
+        
+        if results or removed:
+            atomic_write_bytes(os.path.join(output_path, CACHE_NAME), json.dumps(
+                {'version': CONVERTER_VERSION, 'sources': cache}, ensure_ascii=False, indent=2
+            ).encode('utf-8'))
+        
+        summary = {
+            'converted': sorted(results),
+            'skipped': len(sources) - len(pending),
+            'written': written,
+            'removed': removed,
+            'conflicts': conflicts,
+            'errors': errors,
+            'seconds': round(time.monotonic() - started, 3)
+        }
+        logger.info(f"Documentos convertidos: {len(results)}, sin cambios: {summary['skipped']}, "
+                    f"plantillas escritas: {len(written)}, errores: {len(errors)}")
+        return summary
+    
+    except Exception as e:
+        raise Exception(f"Error al convertir documentos: {str(e)}")
+
+
+def main(argv: List[str] = None) -> int:
+    from app.config import Config
+    from app.services.lab_template_build import build_templates
+    
+    config = Config()
+    parser = argparse.ArgumentParser(description='Convertir los documentos Word de pruebas a plantillas HTML')
+    parser.add_argument('--source', default=config.LAB_TESTS_DOCX_PATH, help='Directorio con los .docx')
+    parser.add_argument('--output', default=config.LAB_TESTS_HTML_PATH, help='Directorio de plantillas')
+    parser.add_argument('--build', default=config.LAB_TESTS_BUILD_PATH,
+                        help='Directorio de la compilación (vacío para no compilar)')
+    parser.add_argument('--workers', type=int, default=config.LAB_TESTS_CONVERT_WORKERS, help='Procesos del pool')
+    parser.add_argument('--force', action='store_true', help='Convertir todo aunque no haya cambios')
+    args = parser.parse_args(argv)
+    
+    summary = convert_templates(args.source, args.output, args.workers, args.force)
+    print(f"{len(summary['converted'])} documentos convertidos, {summary['skipped']} sin cambios, "
+          f"{len(summary['written'])} plantillas escritas, {len(summary['removed'])} eliminadas "
+          f"({summary['seconds']} s)")
+    for conflict in summary['conflicts']:
+        print(f"  Omitida {conflict['file']} ({conflict['source']}): ya existe y no la generó este documento")
+    for error in summary['errors']:
+        print(f"  Error en {error['source']}: {error['error']}")
+    
+    if args.build and (summary['written'] or summary['removed']):
+        manifest = build_templates(args.output, args.build)
+        print(f"Compilación actualizada: {manifest['source_bytes']} -> {manifest['output_bytes']} bytes")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Historial de ediciones en un journal de solo anexado
+
+El historial de cada archivo HTML vive en ``<archivo>.html.journal`` (una
+entrada JSON por línea). Registrar una edición es anexar una línea, sin leer
+ni reescribir el historial; el ``.meta`` solo guarda los campos resumidos
+(``edit_count``, ``is_modified``, ``last_edit_date``).
+
+``file_lock`` serializa las modificaciones de metadatos de un mismo archivo
+entre hilos y, donde está disponible ``fcntl``, entre procesos. Los bloqueos se
+reparten por hash de la ruta en un número fijo de archivos dentro de un
+directorio de bloqueos; esos archivos no se borran nunca (borrar un archivo de
+bloqueo que otro proceso espera deja a dos procesos con "el" bloqueo).
+"""
+
+import os
+import json
+import zlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+JOURNAL_SUFFIX = '.journal'
+
+# Directorio de bloqueos dentro de la carpeta base de cada servicio
+LOCK_DIRECTORY = '.locks'
+
+# Bloqueos repartidos por hash de la ruta (no crece con el número de archivos)
+_LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+
+def journal_path(file_path: str) -> str:
+    """Ruta del journal de un archivo HTML (ruta lógica)"""
+    return f"{file_path}{JOURNAL_SUFFIX}"
+
+
+@contextmanager
+def file_lock(file_path: str, lock_dir: str) -> Iterator[None]:
+    """
+    Bloqueo exclusivo de los metadatos de un archivo
+    
+    Varios archivos comparten cada bloqueo, así que no se debe tomar un
+    ``file_lock`` dentro de otro.
+    
+    Args:
+        file_path: Archivo a bloquear
+        lock_dir: Directorio de los archivos de bloqueo (el mismo para todos los procesos)
+    """
+    # crc32 y no hash(): el reparto debe ser el mismo en todos los procesos
+    stripe = zlib.crc32(os.path.abspath(file_path).encode('utf-8')) % _LOCK_STRIPES
+    
+    with _locks[stripe]:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{stripe:02d}.lock"), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def append_entries(file_path: str, entries: Iterable[Dict[str, Any]]) -> int:
+    """
+    Anexar entradas al journal con una sola escritura
+    
+    Returns:
+        int: Número de entradas anexadas
+    """
+    lines = [json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n' for entry in entries]
+    if not lines:
+        return 0
+    data = ''.join(lines).encode('utf-8')
+    with open(journal_path(file_path), 'ab+') as f:
+        # Si la última escritura quedó cortada, empezar en una línea nueva
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                data = b'\n' + data
+        f.write(data)
+    return len(lines)
+
+
+def read_entries(file_path: str) -> List[Dict[str, Any]]:
+    """Leer el historial completo (las líneas incompletas o dañadas se ignoran)"""
+    path = journal_path(file_path)
+    if not os.path.exists(path):
+        return []
+    
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def remove_journal(file_path: str):
+    """Eliminar el journal de un archivo"""
+    path = journal_path(file_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def migrate_history(file_path: str, metadata: Dict[str, Any]) -> bool:
+    """
+    Mover el ``edit_history`` embebido en metadatos antiguos al journal
+    
+    Modifica ``metadata`` (quita la lista). Si el journal ya existe se asume que
+    la migración ya se hizo y la lista solo se descarta.
+    
+    Returns:
+        bool: True si los metadatos tenían historial embebido
+    """
+    if 'edit_history' not in metadata:
+        return False
+    history = metadata.pop('edit_history') or []
+    if not os.path.exists(journal_path(file_path)):
+        append_entries(file_path, history)
+    return True
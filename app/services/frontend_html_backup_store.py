@@ -0,0 +1,264 @@
+"""
+Backups por guardado de los archivos HTML del frontend
+
+Cada guardado registra una instantánea que apunta a un objeto identificado por
+el SHA-256 del HTML (sin comprimir). Los objetos se guardan comprimidos en
+``backups/objects/ab/cd/<hash>.html.gz``; guardar dos veces el mismo contenido
+no crea una segunda copia. El registro de instantáneas vive en
+``backups/backups.sqlite3``.
+
+La retención (últimas N instantáneas por archivo más la última de cada día
+durante M días) la aplica un compactador en segundo plano, que también borra
+los objetos que dejan de estar referenciados y las copias planas
+``backup_*.html`` del formato anterior que ya salieron de la ventana diaria.
+
+Varios procesos pueden compartir el directorio: el registro de la instantánea y
+la comprobación del objeto, y el borrado de objetos sin referencias, se hacen
+dentro de una transacción ``BEGIN IMMEDIATE`` sobre el registro, de modo que un
+compactador nunca borra un objeto que un backup concurrente está reutilizando.
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.services.report_storage import atomic_write_bytes, iter_html_bytes
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'backups.sqlite3'
+OBJECTS_DIRNAME = 'objects'
+OBJECT_SUFFIX = '.html.gz'
+
+# Copias completas del formato anterior (un archivo por guardado)
+LEGACY_BACKUP_PREFIX = 'backup_'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    object_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_file ON snapshots (file_path, created_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_object ON snapshots (object_hash);
+"""
+
+
+class HTMLBackupStore:
+    """Almacén de backups deduplicado por contenido con retención"""
+    
+    def __init__(self, backup_dir: str, keep_last: int = 10, keep_daily_days: int = 30,
+                 compact_interval: int = 3600, compresslevel: int = 6):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, OBJECTS_DIRNAME)
+        self.keep_last = max(1, keep_last)
+        self.keep_daily_days = max(0, keep_daily_days)
+        self.compact_interval = compact_interval
+        self.compresslevel = compresslevel
+        
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.backup_dir, MANIFEST_FILENAME), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+    
+    def object_path(self, digest: str) -> str:
+        """Ruta del objeto de un hash (dos niveles de subdirectorios)"""
+        return os.path.join(self.objects_dir, digest[:2], digest[2:4], digest + OBJECT_SUFFIX)
+    
+    def backup(self, file_path: str, stored_path: str) -> Dict[str, Any]:
+        """
+        Registrar una instantánea del archivo
+        
+        Args:
+            file_path: Ruta lógica (.html) del archivo
+            stored_path: Ruta en disco (plana o .gz)
+        
+        Returns:
+            Dict con el hash del contenido y si se reutilizó un objeto existente
+        """
+        data = b''.join(iter_html_bytes(stored_path))
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self.object_path(digest)
+        
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # La instantánea se registra con el registro bloqueado y antes de comprobar
+                # el objeto: el compactador de otro proceso ya no puede borrarlo entre medias
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT INTO snapshots (file_path, filename, object_hash, size, created_at) VALUES (?, ?, ?, ?, ?)',
+                    (file_path, os.path.basename(file_path), digest, len(data), datetime.now().isoformat())
+                )
+                deduplicated = os.path.exists(object_path)
+                if not deduplicated:
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    atomic_write_bytes(object_path, gzip.compress(data, self.compresslevel, mtime=0), durable=False)
+        
+        self.start_compactor()
+        return {'hash': digest, 'size': len(data), 'deduplicated': deduplicated}
+    
+    def list_snapshots(self, file_path: str) -> List[Dict[str, Any]]:
+        """Instantáneas de un archivo, más recientes primero"""
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT id, object_hash, size, created_at FROM snapshots WHERE file_path = ? '
+                'ORDER BY created_at DESC, id DESC',
+                (file_path,)
+            ).fetchall()
+        return [
+            {'id': snapshot_id, 'hash': digest, 'size': size, 'created_at': created_at}
+            for snapshot_id, digest, size, created_at in rows
+        ]
+    
+    def rename(self, file_path: str, new_path: str):
+        """Asociar las instantáneas de un archivo a su nueva ruta (el archivo se movió)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('UPDATE snapshots SET file_path = ?, filename = ? WHERE file_path = ?',
+                             (new_path, os.path.basename(new_path), file_path))
+    
+    def read_snapshot(self, digest: str) -> bytes:
+        """Contenido (sin comprimir) de un objeto"""
+        with gzip.open(self.object_path(digest), 'rb') as f:
+            return f.read()
+    
+    def _expired_snapshots(self, rows: List[tuple], now: datetime) -> List[tuple]:
+        """
+        Instantáneas fuera de la política de retención
+        
+        ``rows`` son (id, file_path, object_hash, created_at) ordenadas por archivo
+        y fecha descendente. Se conservan las ``keep_last`` más recientes de cada
+        archivo y la última de cada día dentro de ``keep_daily_days``.
+        """
+        daily_cutoff = (now - timedelta(days=self.keep_daily_days)).date().isoformat()
+        expired = []
+        current_file = None
+        position = 0
+        days_kept = set()
+        
+        for row in rows:
+            snapshot_id, file_path, digest, created_at = row
+            if file_path != current_file:
+                current_file, position, days_kept = file_path, 0, set()
+            position += 1
+            
+            day = created_at[:10]
+            if position <= self.keep_last:
+                days_kept.add(day)
+                continue
+            if day > daily_cutoff and day not in days_kept:
+                days_kept.add(day)
+                continue
+            expired.append(row)
+        return expired
+    
+    def _legacy_backups(self, cutoff: float) -> List[str]:
+        """Copias planas del formato anterior más antiguas que ``cutoff``"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        legacy = []
+        for filename in os.listdir(self.backup_dir):
+            path = os.path.join(self.backup_dir, filename)
+            if filename.startswith(LEGACY_BACKUP_PREFIX) and os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                legacy.append(path)
+        return legacy
+    
+    def compact(self, now: datetime = None) -> Dict[str, Any]:
+        """
+        Aplicar la política de retención y borrar objetos sin referencias
+        
+        Returns:
+            Dict con las instantáneas, objetos y copias antiguas eliminadas y los bytes liberados
+        """
+        now = now or datetime.now()
+        removed_objects = 0
+        freed_bytes = 0
+        
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Las referencias se comprueban y los objetos se borran dentro de la misma
+                # transacción de escritura; un backup concurrente espera a que termine
+                conn.execute('BEGIN IMMEDIATE')
+                rows = conn.execute(
+                    'SELECT id, file_path, object_hash, created_at FROM snapshots '
+                    'ORDER BY file_path, created_at DESC, id DESC'
+                ).fetchall()
+                expired = self._expired_snapshots(rows, now)
+                conn.executemany('DELETE FROM snapshots WHERE id = ?', [(row[0],) for row in expired])
+                
+                for digest in {row[2] for row in expired}:
+                    if conn.execute('SELECT 1 FROM snapshots WHERE object_hash = ? LIMIT 1', (digest,)).fetchone():
+                        continue
+                    object_path = self.object_path(digest)
+                    if os.path.exists(object_path):
+                        freed_bytes += os.path.getsize(object_path)
+                        os.remove(object_path)
+                        removed_objects += 1
+        
+        legacy = self._legacy_backups((now - timedelta(days=self.keep_daily_days)).timestamp())
+        for path in legacy:
+            freed_bytes += os.path.getsize(path)
+            os.remove(path)
+        
+        return {
+            'removed_snapshots': len(expired),
+            'removed_objects': removed_objects,
+            'removed_legacy_backups': len(legacy),
+            'freed_bytes': freed_bytes
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """Número de instantáneas, objetos distintos y bytes lógicos respaldados"""
+        with self._lock:
+            snapshots, objects, logical_bytes = self._connection().execute(
+                'SELECT COUNT(*), COUNT(DISTINCT object_hash), COALESCE(SUM(size), 0) FROM snapshots'
+            ).fetchone()
+        return {'snapshots': snapshots, 'objects': objects, 'logical_bytes': logical_bytes}
+    
+    def start_compactor(self):
+        """Iniciar (una sola vez) el hilo compactador en segundo plano"""
+        if self.compact_interval <= 0 or self._compactor is not None:
+            return
+        with self._lock:
+            if self._compactor is None:
+                self._compactor = threading.Thread(target=self._compact_loop, name='html-backup-compactor',
+                                                   daemon=True)
+                self._compactor.start()
+    
+    def _compact_loop(self):
+        while not self._stop.wait(self.compact_interval):
+            try:
+                result = self.compact()
+                if result['removed_snapshots'] or result['removed_legacy_backups']:
+                    logger.info(f"Compactación de backups HTML: {result}")
+            except Exception as e:
+                logger.error(f"Error en la compactación de backups HTML: {str(e)}")
+    
+    def close(self):
+        """Detener el compactador y cerrar el registro"""
+        self._stop.set()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,512 @@
+"""
+Índice de metadatos de los archivos HTML del frontend
+
+Los archivos ``.meta`` siguen siendo la fuente de verdad; este índice (un
+archivo SQLite junto a los HTML) guarda una fila por archivo con las columnas
+que usan los listados, búsquedas y estadísticas, de modo que esas consultas no
+recorren los directorios ni abren cada ``.meta``.
+
+El servicio actualiza el índice al guardar, editar o eliminar un archivo. Si el
+índice no existe (o quedó marcado como inconsistente) se reconstruye a partir
+de los ``.meta`` en la siguiente consulta; ``rebuild`` lo hace a demanda.
+
+Los contadores de las estadísticas (archivos, tamaño, archivos por estado,
+archivos modificados y total de ediciones) se guardan en la tabla ``counters``
+y se ajustan en la misma transacción que cada alta, cambio o baja, así que las
+estadísticas se leen sin recorrer la tabla. ``rebuild_counters`` los recalcula.
+
+La búsqueda usa la tabla FTS5 ``html_search`` (ver ``frontend_html_search``),
+cuyo rowid es el de ``html_files``; se actualiza en la misma transacción.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.report_storage import GZIP_SUFFIX, logical_path, read_html
+from app.services.frontend_html_search import (
+    SEARCH_SCHEMA, SEARCH_VERSION, SEARCH_COLUMNS, visible_text, search_document, match_expression
+)
+
+INDEX_FILENAME = 'index.sqlite3'
+
+# Directorios del almacenamiento que no contienen reportes
+EXCLUDED_DIRECTORIES = {'backups'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS html_files (
+    file_path TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    modified_at TEXT NOT NULL,
+    status TEXT,
+    sort_created_at TEXT,
+    completed_at TEXT,
+    last_edit_date TEXT,
+    edit_count INTEGER NOT NULL DEFAULT 0,
+    is_modified INTEGER NOT NULL DEFAULT 0,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_html_files_filename ON html_files (filename);
+CREATE INDEX IF NOT EXISTS idx_html_files_modified_at ON html_files (modified_at);
+CREATE INDEX IF NOT EXISTS idx_html_files_status_created ON html_files (status, sort_created_at);
+CREATE INDEX IF NOT EXISTS idx_html_files_status_completed ON html_files (status, completed_at);
+CREATE INDEX IF NOT EXISTS idx_html_files_modified_edit ON html_files (is_modified, last_edit_date);
+CREATE INDEX IF NOT EXISTS idx_html_files_created_at ON html_files (created_at);
+CREATE INDEX IF NOT EXISTS idx_html_files_edit_count ON html_files (edit_count, modified_at);
+CREATE INDEX IF NOT EXISTS idx_html_files_last_edit ON html_files (last_edit_date);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_ROW_COLUMNS = ('file_path', 'filename', 'size', 'created_at', 'modified_at', 'status', 'sort_created_at',
+                'completed_at', 'last_edit_date', 'edit_count', 'is_modified', 'metadata')
+
+_FILE_COLUMNS = 'filename, file_path, size, created_at, modified_at, metadata'
+
+_UPSERT_SQL = (
+    f"INSERT INTO html_files ({', '.join(_ROW_COLUMNS)}) VALUES ({', '.join('?' for _ in _ROW_COLUMNS)}) "
+    f"ON CONFLICT(file_path) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in _ROW_COLUMNS[1:])}"
+)
+
+# Columnas que afectan a los contadores (mismo orden que en ``_counter_deltas``)
+_COUNTED_COLUMNS = 'size, status, edit_count, is_modified'
+
+# Versión del esquema de contadores; si cambia se recalculan al abrir el índice
+COUNTERS_VERSION = '1'
+
+STATUS_COUNTER_PREFIX = 'status:'
+
+
+class FrontendHTMLIndex:
+    """Índice SQLite de metadatos de archivos HTML del frontend"""
+    
+    def __init__(self, index_path: str, base_path: str):
+        self.index_path = index_path
+        self.base_path = base_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+    
+    # Conexión y estado
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Abrir (una sola vez) la conexión y crear el esquema"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            conn.executescript(SEARCH_SCHEMA)
+            self._conn = conn
+            if self._get_state('search_version') != SEARCH_VERSION:
+                # Índice creado sin búsqueda de texto completo: reconstruir en la próxima consulta
+                with conn:
+                    self._set_state(conn, 'built_at', None)
+            if self._get_state('counters_version') != COUNTERS_VERSION:
+                with conn:
+                    self._rebuild_counters(conn)
+        return self._conn
+    
+    def _get_state(self, key: str) -> Optional[str]:
+        row = self._connection().execute('SELECT value FROM index_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_state(self, conn: sqlite3.Connection, key: str, value: Optional[str]):
+        if value is None:
+            conn.execute('DELETE FROM index_state WHERE key = ?', (key,))
+        else:
+            conn.execute('INSERT OR REPLACE INTO index_state (key, value) VALUES (?, ?)', (key, value))
+    
+    def is_built(self) -> bool:
+        """Indica si el índice refleja los archivos ``.meta`` del almacenamiento"""
+        with self._lock:
+            return self._get_state('built_at') is not None
+    
+    def invalidate(self):
+        """Marcar el índice como inconsistente; se reconstruirá en la siguiente consulta"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._set_state(conn, 'built_at', None)
+    
+    def close(self):
+        """Cerrar la conexión"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    # Escritura
+    
+    @staticmethod
+    def _row(file_path: str, stored_path: str, metadata: Dict[str, Any]) -> Tuple:
+        """Fila del índice para un archivo (la información de disco sale de ``stored_path``)"""
+        stat = os.stat(stored_path)
+        created_at = datetime.fromtimestamp(stat.st_ctime).isoformat()
+        filename = os.path.basename(file_path)
+        return (
+            file_path,
+            filename,
+            stat.st_size,
+            created_at,
+            datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            metadata.get('status'),
+            metadata.get('created_at') or created_at,
+            metadata.get('completed_at'),
+            metadata.get('last_edit_date'),
+            int(metadata.get('edit_count') or 0),
+            1 if metadata.get('is_modified') else 0,
+            # El historial embebido (formato anterior) no se copia al índice
+            json.dumps({k: v for k, v in metadata.items() if k != 'edit_history'}, ensure_ascii=False)
+        )
+    
+    @staticmethod
+    def _counter_deltas(values: Optional[Tuple], sign: int, deltas: Dict[str, int]):
+        """Acumular en ``deltas`` el aporte de una fila (``sign`` = 1 alta, -1 baja)"""
+        if values is None:
+            return
+        size, status, edit_count, is_modified = values
+        for key, value in (('total_files', 1), ('total_size', size), ('modified_files', is_modified),
+                           ('total_edits', edit_count), (STATUS_COUNTER_PREFIX + (status or ''), 1)):
+            deltas[key] = deltas.get(key, 0) + sign * value
+    
+    @staticmethod
+    def _apply_counters(conn: sqlite3.Connection, deltas: Dict[str, int]):
+        for key, delta in deltas.items():
+            if delta:
+                conn.execute(
+                    'INSERT INTO counters (key, value) VALUES (?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = value + excluded.value',
+                    (key, delta)
+                )
+    
+    def _current(self, conn: sqlite3.Connection, file_path: str) -> Optional[Tuple]:
+        return conn.execute(
+            f'SELECT {_COUNTED_COLUMNS} FROM html_files WHERE file_path = ?', (file_path,)
+        ).fetchone()
+    
+    def _rebuild_counters(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """Recalcular los contadores a partir de la tabla (dentro de una transacción)"""
+        conn.execute('DELETE FROM counters')
+        deltas = {'total_files': 0, 'total_size': 0, 'modified_files': 0, 'total_edits': 0}
+        total_files, total_size, modified_files, total_edits = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(is_modified), 0), '
+            'COALESCE(SUM(edit_count), 0) FROM html_files'
+        ).fetchone()
+        deltas.update(total_files=total_files, total_size=total_size,
+                      modified_files=modified_files, total_edits=total_edits)
+        for status, count in conn.execute('SELECT status, COUNT(*) FROM html_files GROUP BY status'):
+            deltas[STATUS_COUNTER_PREFIX + (status or '')] = count
+        conn.executemany('INSERT INTO counters (key, value) VALUES (?, ?)', deltas.items())
+        self._set_state(conn, 'counters_version', COUNTERS_VERSION)
+        return deltas
+    
+    def rebuild_counters(self) -> Dict[str, int]:
+        """Recalcular los contadores de estadísticas desde las filas del índice"""
+        self.ensure_built()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return self._rebuild_counters(conn)
+    
+    def _upsert(self, conn: sqlite3.Connection, row: Tuple, metadata: Dict[str, Any], body: Optional[str]):
+        """
+        Agregar o actualizar una fila, sus contadores y su documento de búsqueda
+        
+        Con ``body`` None se conserva el texto indexado anteriormente (cambios
+        que solo tocan metadatos).
+        """
+        deltas: Dict[str, int] = {}
+        self._counter_deltas(self._current(conn, row[0]), -1, deltas)
+        self._counter_deltas((row[2], row[5], row[9], row[10]), 1, deltas)
+        conn.execute(_UPSERT_SQL, row)
+        self._apply_counters(conn, deltas)
+        
+        rowid = conn.execute('SELECT rowid FROM html_files WHERE file_path = ?', (row[0],)).fetchone()[0]
+        if body is None:
+            previous = conn.execute('SELECT body FROM html_search WHERE rowid = ?', (rowid,)).fetchone()
+            body = previous[0] if previous else ''
+        conn.execute('DELETE FROM html_search WHERE rowid = ?', (rowid,))
+        conn.execute(
+            f"INSERT INTO html_search (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (rowid,) + search_document(row[1], metadata, body)
+        )
+    
+    def upsert(self, file_path: str, stored_path: str, metadata: Dict[str, Any], html_content: str = None):
+        """
+        Agregar o actualizar la fila de un archivo
+        
+        Args:
+            html_content: HTML guardado; si se omite se conserva el texto indexado
+        """
+        row = self._row(logical_path(file_path), stored_path, metadata)
+        body = visible_text(html_content) if html_content is not None else None
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._upsert(conn, row, metadata, body)
+    
+    def rename(self, file_path: str, new_path: str):
+        """
+        Cambiar la ruta de un archivo conservando su fila y su documento de búsqueda
+        
+        El nombre del archivo no cambia (solo el directorio), así que los
+        contadores y el texto indexado siguen siendo válidos.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('UPDATE html_files SET file_path = ? WHERE file_path = ?',
+                             (logical_path(new_path), logical_path(file_path)))
+    
+    def remove(self, file_path: str):
+        """Eliminar la fila de un archivo"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                file_path = logical_path(file_path)
+                deltas: Dict[str, int] = {}
+                self._counter_deltas(self._current(conn, file_path), -1, deltas)
+                conn.execute(
+                    'DELETE FROM html_search WHERE rowid IN (SELECT rowid FROM html_files WHERE file_path = ?)',
+                    (file_path,)
+                )
+                conn.execute('DELETE FROM html_files WHERE file_path = ?', (file_path,))
+                self._apply_counters(conn, deltas)
+    
+    def _scan(self):
+        """Recorrer el almacenamiento (YYYY/MM o YYYY/MM/DD/<hash>) devolviendo (ruta lógica, ruta en disco)"""
+        if not os.path.isdir(self.base_path):
+            return
+        for root, dirs, files in os.walk(self.base_path):
+            if root == self.base_path:
+                dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRECTORIES]
+                continue
+            for filename in files:
+                if filename.endswith('.html') or filename.endswith('.html' + GZIP_SUFFIX):
+                    stored_path = os.path.join(root, filename)
+                    yield logical_path(stored_path), stored_path
+    
+    def rebuild(self) -> Dict[str, Any]:
+        """
+        Reconstruir el índice leyendo los archivos ``.meta`` y el HTML existentes
+        
+        Returns:
+            Dict con el número de archivos indexados y los que no se pudieron leer
+        """
+        rows = []
+        errors = []
+        for file_path, stored_path in self._scan():
+            meta_path = f'{file_path}.meta'
+            try:
+                metadata = {}
+                if os.path.exists(meta_path):
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                body = visible_text(read_html(stored_path))
+                rows.append((self._row(file_path, stored_path, metadata), metadata, body))
+            except (OSError, ValueError) as e:
+                errors.append({'file_path': file_path, 'error': str(e)})
+        
+        built_at = datetime.now().isoformat()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM html_files')
+                conn.execute('DELETE FROM html_search')
+                conn.execute('DELETE FROM counters')
+                # Por fecha de creación: el orden de rowid es el de la búsqueda
+                rows.sort(key=lambda item: item[0][6] or '')
+                for row, metadata, body in rows:
+                    self._upsert(conn, row, metadata, body)
+                self._set_state(conn, 'built_at', built_at)
+                self._set_state(conn, 'search_version', SEARCH_VERSION)
+        
+        return {'indexed': len(rows), 'errors': errors, 'built_at': built_at}
+    
+    def ensure_built(self):
+        """Construir el índice la primera vez que se consulta"""
+        if not self.is_built():
+            self.rebuild()
+    
+    # Consultas
+    
+    def _fetch(self, where: str = '', params: Tuple = (), order_by: str = 'modified_at DESC',
+               limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        self.ensure_built()
+        sql = f'SELECT {_FILE_COLUMNS} FROM html_files'
+        if where:
+            sql += f' WHERE {where}'
+        sql += f' ORDER BY {order_by} LIMIT ? OFFSET ?'
+        with self._lock:
+            rows = self._connection().execute(sql, params + (limit, offset)).fetchall()
+        return [self._file_dict(row) for row in rows]
+    
+    @staticmethod
+    def _file_dict(row: Tuple) -> Dict[str, Any]:
+        filename, file_path, size, created_at, modified_at, metadata = row
+        return {
+            'filename': filename,
+            'file_path': file_path,
+            'size': size,
+            'created_at': created_at,
+            'modified_at': modified_at,
+            'metadata': json.loads(metadata)
+        }
+    
+    def find(self, filename: str) -> Optional[str]:
+        """Ruta lógica de un archivo a partir de su nombre (búsqueda por índice)"""
+        self.ensure_built()
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT file_path FROM html_files WHERE filename = ? ORDER BY modified_at DESC LIMIT 1', (filename,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def paths_after(self, after: str = None, limit: int = 200) -> List[str]:
+        """Rutas lógicas ordenadas, a partir de la siguiente a ``after`` (recorrido por lotes)"""
+        self.ensure_built()
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT file_path FROM html_files WHERE file_path > ? ORDER BY file_path LIMIT ?',
+                (after or '', limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def list_files(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Archivos ordenados por fecha de modificación (más recientes primero)"""
+        return self._fetch(limit=limit, offset=offset)
+    
+    def search(self, query: str = None, patient_name: str = None, order_number: str = None,
+               doctor_name: str = None, status: str = None, date_from: str = None, date_to: str = None,
+               limit: Optional[int] = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Búsqueda de texto completo con filtros y paginación
+        
+        Los términos se buscan por prefijo, sin distinguir mayúsculas ni acentos;
+        ``query`` abarca metadatos y texto visible del reporte. Con términos de
+        búsqueda los resultados salen por fecha de alta en el índice (más
+        recientes primero); sin términos, por fecha de modificación.
+        
+        Args:
+            date_from, date_to: Rango (ISO, inclusivo) sobre la fecha de creación
+            limit: Máximo de resultados (None: sin límite)
+        """
+        if limit is None:
+            limit = -1  # Sin límite en SQLite
+        clauses = []
+        params: List[Any] = []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if date_from:
+            clauses.append('sort_created_at >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('sort_created_at <= ?')
+            # Una fecha sin hora incluye todo el día
+            params.append(f'{date_to}T23:59:59.999999' if len(date_to) == 10 else date_to)
+        
+        expression = match_expression(query, patient_name, order_number, doctor_name)
+        if expression is None:
+            return self._fetch(' AND '.join(clauses), tuple(params), limit=limit, offset=offset)
+        
+        self.ensure_built()
+        columns = ', '.join(f'f.{column}' for column in _FILE_COLUMNS.split(', '))
+        sql = (
+            f'SELECT {columns} FROM html_search s JOIN html_files f ON f.rowid = s.rowid '
+            f"WHERE html_search MATCH ?{''.join(' AND f.' + clause for clause in clauses)} "
+            'ORDER BY s.rowid DESC LIMIT ? OFFSET ?'
+        )
+        with self._lock:
+            rows = self._connection().execute(sql, (expression, *params, limit, offset)).fetchall()
+        return [self._file_dict(row) for row in rows]
+    
+    def by_status(self, status: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Archivos con un estado
+        
+        Pendientes: más antiguos primero; completados: por fecha de finalización
+        (más recientes primero); otros estados: por fecha de modificación.
+        """
+        if status == 'pending':
+            order_by = 'sort_created_at ASC'
+        elif status == 'completed':
+            order_by = "COALESCE(completed_at, '') DESC"
+        else:
+            order_by = 'modified_at DESC'
+        return self._fetch('status = ?', (status,), order_by, limit)
+    
+    def modified(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Archivos modificados, por fecha de última edición (más recientes primero)"""
+        return self._fetch('is_modified = 1', (), "COALESCE(last_edit_date, '') DESC", limit)
+    
+    def counters(self) -> Dict[str, int]:
+        """Valores actuales de los contadores"""
+        self.ensure_built()
+        with self._lock:
+            return dict(self._connection().execute('SELECT key, value FROM counters').fetchall())
+    
+    def status_counts(self) -> Dict[Optional[str], int]:
+        """Número de archivos por estado (``None`` para archivos sin estado)"""
+        return {
+            (key[len(STATUS_COUNTER_PREFIX):] or None): value
+            for key, value in self.counters().items()
+            if key.startswith(STATUS_COUNTER_PREFIX) and value
+        }
+    
+    def storage_summary(self) -> Dict[str, Any]:
+        """Total de archivos, tamaño total y fechas extremas de creación"""
+        counters = self.counters()
+        with self._lock:
+            conn = self._connection()
+            # Consultas separadas para que MIN/MAX usen el índice de created_at
+            oldest = conn.execute('SELECT MIN(created_at) FROM html_files').fetchone()[0]
+            newest = conn.execute('SELECT MAX(created_at) FROM html_files').fetchone()[0]
+        return {
+            'total_files': counters.get('total_files', 0),
+            'total_size': counters.get('total_size', 0),
+            'oldest_file': oldest,
+            'newest_file': newest
+        }
+    
+    def edit_summary(self, recent_limit: int = 10) -> Dict[str, Any]:
+        """Totales de edición, archivo más editado y ediciones más recientes"""
+        counters = self.counters()
+        with self._lock:
+            conn = self._connection()
+            most_edited = conn.execute(
+                'SELECT filename, edit_count, last_edit_date FROM html_files WHERE edit_count > 0 '
+                'ORDER BY edit_count DESC, modified_at DESC LIMIT 1'
+            ).fetchone()
+            recent = conn.execute(
+                'SELECT filename, last_edit_date, edit_count FROM html_files WHERE last_edit_date IS NOT NULL '
+                "AND last_edit_date != '' ORDER BY last_edit_date DESC LIMIT ?",
+                (recent_limit,)
+            ).fetchall()
+        
+        return {
+            'total_files': counters.get('total_files', 0),
+            'modified_files': counters.get('modified_files', 0),
+            'total_edits': counters.get('total_edits', 0),
+            'most_edited_file': {
+                'filename': most_edited[0],
+                'edit_count': most_edited[1],
+                'last_edit_date': most_edited[2]
+            } if most_edited else None,
+            'recent_edits': [
+                {'filename': filename, 'last_edit_date': last_edit_date, 'edit_count': edit_count}
+                for filename, last_edit_date, edit_count in recent
+            ]
+        }
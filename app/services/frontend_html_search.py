@@ -0,0 +1,88 @@
+"""
+Búsqueda de texto completo para los archivos HTML del frontend
+
+Índice invertido (SQLite FTS5) dentro del índice de metadatos: un documento
+por archivo con el nombre, los datos del paciente, la orden, el médico, las
+pruebas y el texto visible del reporte. El tokenizador ``unicode61`` pasa todo
+a minúsculas y quita los acentos, tanto al indexar como al buscar, así que
+"jose" encuentra "JOSÉ". Cada término de la consulta se busca por prefijo.
+"""
+
+import re
+import html
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS html_search USING fts5(
+    filename, patient_name, order_number, doctor_name, tests, body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# Versión del esquema de búsqueda; si cambia, el índice se reconstruye
+SEARCH_VERSION = '1'
+
+# Texto visible máximo que se indexa por reporte
+MAX_BODY_CHARS = 20000
+
+SEARCH_COLUMNS = ('filename', 'patient_name', 'order_number', 'doctor_name', 'tests', 'body')
+
+_INVISIBLE_BLOCKS = re.compile(r'<(script|style|head)\b.*?</\1\s*>|<!--.*?-->', re.S | re.I)
+_TAGS = re.compile(r'<[^>]+>')
+_WHITESPACE = re.compile(r'\s+')
+_TERMS = re.compile(r'\w+')
+
+
+def visible_text(content: str, max_chars: int = MAX_BODY_CHARS) -> str:
+    """Texto visible de un HTML (sin scripts, estilos, comentarios ni etiquetas)"""
+    text = _INVISIBLE_BLOCKS.sub(' ', content)
+    text = html.unescape(_TAGS.sub(' ', text))
+    return _WHITESPACE.sub(' ', text).strip()[:max_chars]
+
+
+def _tests_text(tests: Any) -> str:
+    """Nombres de las pruebas (lista de textos o de diccionarios)"""
+    if not isinstance(tests, list):
+        return str(tests or '')
+    names = []
+    for test in tests:
+        if isinstance(test, dict):
+            names.extend(str(value) for value in test.values() if isinstance(value, str))
+        else:
+            names.append(str(test))
+    return ' '.join(names)
+
+
+def search_document(filename: str, metadata: Dict[str, Any], body: str) -> Tuple[str, ...]:
+    """Columnas del documento de búsqueda (mismo orden que ``SEARCH_COLUMNS``)"""
+    return (
+        filename.replace('_', ' '),
+        str(metadata.get('patient_name') or ''),
+        str(metadata.get('order_number') or ''),
+        str(metadata.get('doctor_name') or ''),
+        _tests_text(metadata.get('tests')),
+        body or ''
+    )
+
+
+def _prefix_terms(text: str) -> Iterable[str]:
+    """Términos de una consulta como prefijos FTS5 (entre comillas, sin operadores)"""
+    return [f'"{term}"*' for term in _TERMS.findall(text.replace('_', ' '))]
+
+
+def match_expression(query: str = None, patient_name: str = None, order_number: str = None,
+                     doctor_name: str = None) -> Optional[str]:
+    """
+    Expresión MATCH de FTS5 para una búsqueda
+    
+    ``query`` busca en todas las columnas; los demás filtros solo en su columna.
+    Todos los términos deben aparecer (AND). Devuelve None si no hay términos.
+    """
+    clauses = list(_prefix_terms(query or ''))
+    for column, value in (('patient_name', patient_name), ('order_number', order_number),
+                          ('doctor_name', doctor_name)):
+        terms = _prefix_terms(value or '')
+        if terms:
+            clauses.append(f"{column} : ({' AND '.join(terms)})")
+    return ' AND '.join(clauses) if clauses else None
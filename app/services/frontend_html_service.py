@@ -3,12 +3,92 @@ Servicio para manejo de archivos HTML del frontend
 """
 
 import os
+import re
 import json
-import shutil
 import zipfile
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterable, Iterator, Optional, Any, Tuple
 from app.config import Config
+from app.services.report_storage import (
+    GZIP_SUFFIX, logical_path, physical_path, resolve_stored_path,
+    write_html, write_html_stream, read_html, remove_stored
+)
+from app.services.frontend_html_index import FrontendHTMLIndex, INDEX_FILENAME
+from app.services.metadata_cache import MetadataCache
+from app.services.frontend_html_backup_store import HTMLBackupStore
+from app.services.zip_export import stream_zip
+from app.services.storage_layout import StorageLayout, stage_move, finish_move
+from app.services.edit_journal import (
+    JOURNAL_SUFFIX, LOCK_DIRECTORY, file_lock, append_entries, read_entries, remove_journal, migrate_history
+)
+
+# Fecha y sufijo único que ``generate_file_name`` agrega al nombre:
+# <prefijo>_<original>_YYYYMMDD_HHMMSS_<uuid8>.<ext>
+FILENAME_DATE_PATTERN = re.compile(r'_(\d{8}_\d{6})_[0-9a-f]{8}\.[A-Za-z]+$')
+
+# Caracteres no permitidos en nombres generados (separadores de ruta, espacios, etc.)
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w.\-]+')
+
+# Bytes iniciales de una subida en streaming que se pasan al índice de búsqueda
+STREAM_SEARCH_PREFIX_BYTES = 256 * 1024
+
+
+def is_safe_filename(filename: str) -> bool:
+    """Verificar que un nombre recibido en la URL no contiene rutas"""
+    if not filename or filename in ('.', '..'):
+        return False
+    return not any(char in filename for char in ('/', '\\', '\x00'))
+
+
+def _limit_size(chunks: Iterable[bytes], max_size: int) -> Iterator[bytes]:
+    """Pasar los bloques recibidos cortando la subida si supera ``max_size`` bytes"""
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if total > max_size:
+            raise ValueError(f"El contenido HTML excede el tamaño máximo de {max_size} bytes")
+        yield chunk
+
+
+def _insert_metadata_comment(chunks: Iterable[bytes], comment: bytes,
+                             wrapper: Tuple[bytes, bytes]) -> Iterator[bytes]:
+    """
+    Insertar el comentario de metadatos en un HTML recibido por bloques
+    
+    Produce los mismos bytes que ``_create_full_html``; solo se retiene el
+    inicio del documento hasta saber dónde va el comentario (tras la primera
+    línea si empieza con ``<!DOCTYPE``, al principio si empieza con ``<html``,
+    o dentro de la estructura básica en otro caso).
+    """
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head.lstrip()) >= len(b'<!DOCTYPE'):
+            break
+    
+    start = head.lstrip()
+    if not start:
+        raise ValueError("El contenido HTML no puede estar vacío")
+    
+    if start.startswith(b'<!DOCTYPE'):
+        while b'\n' not in head:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            head += chunk
+        first_line, newline, rest = head.partition(b'\n')
+        yield first_line + b'\n' + comment + (b'\n' + rest if newline else b'')
+        yield from chunks
+    elif start.startswith(b'<html'):
+        yield comment + head
+        yield from chunks
+    else:
+        yield wrapper[0] + head
+        yield from chunks
+        yield wrapper[1]
+
 
 class FrontendHTMLService:
     """Servicio para manejo de archivos HTML del frontend"""
@@ -19,6 +99,32 @@ class FrontendHTMLService:
         self.max_file_size = config.FRONTEND_HTML_MAX_FILE_SIZE
         self.allowed_extensions = config.FRONTEND_HTML_ALLOWED_EXTENSIONS
         self.backup_enabled = config.FRONTEND_HTML_BACKUP_ENABLED
+        self.compress_at_rest = config.FRONTEND_HTML_COMPRESS_AT_REST
+        self.gzip_level = config.HTML_GZIP_COMPRESSION_LEVEL
+        self.migration_batch_size = config.STORAGE_MIGRATION_BATCH_SIZE
+        
+        # Distribución de los archivos en directorios (por mes o por día y prefijo de hash)
+        self.layout = StorageLayout(self.html_base_path, config.FRONTEND_HTML_STORAGE_LAYOUT,
+                                    config.STORAGE_SHARD_WIDTH)
+        
+        # Índice de metadatos para listados y búsquedas
+        index_path = getattr(config, 'FRONTEND_HTML_INDEX_PATH', None) or os.path.join(self.html_base_path, INDEX_FILENAME)
+        self.index = FrontendHTMLIndex(index_path, self.html_base_path)
+        
+        # Bloqueos de metadatos (archivos fijos, compartidos entre procesos)
+        self.lock_dir = os.path.join(self.html_base_path, LOCK_DIRECTORY)
+        
+        # Cache de archivos .meta validado por mtime y tamaño
+        self.meta_cache = MetadataCache(getattr(config, 'FRONTEND_HTML_META_CACHE_SIZE', 1024))
+        
+        # Backups por guardado, deduplicados por contenido
+        self.backup_store = HTMLBackupStore(
+            os.path.join(self.html_base_path, 'backups'),
+            keep_last=config.FRONTEND_HTML_BACKUP_KEEP_LAST,
+            keep_daily_days=config.FRONTEND_HTML_BACKUP_KEEP_DAILY_DAYS,
+            compact_interval=config.FRONTEND_HTML_BACKUP_COMPACT_INTERVAL,
+            compresslevel=self.gzip_level
+        )
         
         # Crear directorio base si no existe
         self._ensure_base_directory()
@@ -50,8 +156,130 @@ class FrontendHTMLService:
         if not ext:
             ext = ".html"
         
+        # Solo el nombre base, sin separadores de ruta ni espacios
+        original_filename = UNSAFE_FILENAME_CHARS.sub('_', os.path.basename(original_filename.replace('\\', '/')))
+        prefix = UNSAFE_FILENAME_CHARS.sub('_', prefix)
+        
         return f"{prefix}_{original_filename}_{timestamp}_{unique_id}{ext}"
     
+    @staticmethod
+    def _file_moment(filename: str) -> Optional[datetime]:
+        """Fecha de un nombre generado por ``generate_file_name`` (None para otros nombres)"""
+        match = FILENAME_DATE_PATTERN.search(filename)
+        return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S') if match else None
+    
+    def new_file_path(self, filename: str) -> str:
+        """Ruta lógica de un archivo nuevo según la distribución configurada (crea su directorio)"""
+        return self.layout.prepare_path(filename, self._file_moment(filename))
+    
+    def resolve_file_path(self, file_path: str) -> Optional[str]:
+        """Obtener la ruta en disco (plana o .gz) de un archivo HTML"""
+        return resolve_stored_path(file_path)
+    
+    def file_exists(self, file_path: str) -> bool:
+        """Verificar si el archivo existe en cualquiera de sus formatos"""
+        return self.resolve_file_path(file_path) is not None
+    
+    def find_file(self, filename: str) -> Optional[str]:
+        """
+        Resolver el nombre de un archivo a su ruta lógica sin recorrer directorios
+        
+        Los nombres generados llevan la fecha (``_YYYYMMDD_HHMMSS_<uuid8>``), así
+        que el directorio se calcula directamente (primero en la distribución
+        configurada y luego en la otra, por si el archivo aún no se migró); para
+        otros nombres (o si el archivo se guardó en otro mes) se consulta el
+        índice de metadatos.
+        
+        Returns:
+            Ruta lógica (.html) o None si el nombre no es válido o no existe
+        """
+        if not is_safe_filename(filename):
+            return None
+        
+        moment = self._file_moment(filename)
+        if moment:
+            for file_path in self.layout.candidate_paths(filename, moment):
+                if self.file_exists(file_path):
+                    return file_path
+        
+        file_path = self.index.find(filename)
+        if file_path and self.file_exists(file_path):
+            return file_path
+        return None
+    
+    def _write_html_file(self, file_path: str, content: str) -> str:
+        """
+        Escribir el HTML según el modo de almacenamiento configurado
+        
+        La ruta lógica (.html) se mantiene para nombres y metadatos; en disco se
+        guarda como .html.gz si la compresión está habilitada. Se elimina la
+        variante anterior para no dejar dos copias del mismo archivo.
+        """
+        stored_path = physical_path(file_path, self.compress_at_rest)
+        write_html(stored_path, content, self.gzip_level)
+        self._remove_stale_variant(file_path)
+        return stored_path
+    
+    def _remove_stale_variant(self, file_path: str):
+        """Eliminar la variante (plana o .gz) que no corresponde al modo configurado"""
+        stale_path = physical_path(file_path, not self.compress_at_rest)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    
+    def _write_metadata(self, file_path: str, metadata: Dict[str, Any], html_content: str = None):
+        """
+        Guardar el archivo .meta y actualizar el índice de metadatos
+        
+        Args:
+            html_content: HTML recién guardado (para el índice de búsqueda); None
+                si solo cambian los metadatos
+        """
+        self.meta_cache.write(f"{file_path}.meta", metadata)
+        
+        try:
+            stored_path = self.resolve_file_path(file_path)
+            if stored_path:
+                self.index.upsert(file_path, stored_path, metadata, html_content)
+        except Exception as e:
+            # El .meta ya está guardado: reconstruir el índice en la siguiente consulta
+            print(f"Warning: No se pudo actualizar el índice de metadatos: {str(e)}")
+            self.index.invalidate()
+    
+    @contextmanager
+    def _locked_file(self, file_path: str) -> Iterator[str]:
+        """
+        Tomar ``file_lock`` sobre la ruta vigente de un archivo
+        
+        ``migrate_storage_layout`` mueve cada archivo con el bloqueo de su ruta
+        anterior tomado; si el archivo se movió después de resolver su ruta, se
+        suelta ese bloqueo y se toma el de la ruta nueva, para no escribir en la
+        ruta que ya se dejó.
+        
+        Yields:
+            Ruta lógica vigente del archivo (la recibida si no existe en otra)
+        """
+        while True:
+            with file_lock(file_path, self.lock_dir):
+                current_path = file_path
+                if not self.file_exists(file_path):
+                    current_path = self.find_file(os.path.basename(file_path)) or file_path
+                if os.path.abspath(current_path) == os.path.abspath(file_path):
+                    yield file_path
+                    return
+            file_path = current_path
+    
+    def _load_for_update(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Leer metadatos para modificarlos (llamar con ``file_lock`` tomado)
+        
+        Si el .meta todavía tiene el ``edit_history`` embebido (formato anterior),
+        el historial se mueve al journal.
+        """
+        metadata = self.get_file_metadata(file_path)
+        if metadata is not None:
+            migrate_history(file_path, metadata)
+        return metadata
+    
     def validate_html_content(self, html_content: str) -> bool:
         """Validar contenido HTML"""
         if len(html_content) > self.max_file_size:
@@ -75,72 +303,149 @@ class FrontendHTMLService:
             full_html = self._create_full_html(html_content, metadata)
             
             # Guardar archivo HTML
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(full_html)
-            
-            # Preparar metadatos para guardar - procesar todos los campos del frontend
-            meta_data = {
-                # Campos básicos del frontend
-                'patient_name': metadata.get('patient_name'),
-                'order_number': metadata.get('order_number'),
-                'doctor_name': metadata.get('doctor_name'),
-                'notes': metadata.get('notes', ''),
-                
-                # Campos adicionales del frontend
-                'patient_age': metadata.get('patient_age'),
-                'patient_gender': metadata.get('patient_gender'),
-                'reception_date': metadata.get('reception_date'),
-                'tests': metadata.get('tests', []),
-                'created_by': metadata.get('created_by'),
-                'source': metadata.get('source', 'frontend'),
-                'prefix': metadata.get('prefix', 'frontend'),
-                'original_filename': metadata.get('original_filename'),
-                
-                # Campos del sistema
-                'uploaded_at': datetime.now().isoformat(),
-                'file_size': len(full_html),
-                'status': metadata.get('status', 'pending'),  # Estado por defecto
-                'created_at': metadata.get('created_at', datetime.now().isoformat()),  # Usar el del frontend o crear uno nuevo
-                
-                # Nuevos campos de edición
-                'edit_count': metadata.get('edit_count', 0),  # Número de veces editado
-                'is_modified': metadata.get('is_modified', False),  # Boolean que indica si fue modificado
-                'edit_history': metadata.get('edit_history', []),  # Array con historial de ediciones
-                'last_edit_date': metadata.get('last_edit_date')  # Fecha de la última edición
+            stored_path = self._write_html_file(file_path, full_html)
+            
+            meta_data = self._saved_metadata(metadata, len(full_html))
+            self._register_saved_file(file_path, stored_path, metadata, meta_data, full_html)
+            
+            return {
+                'filename': os.path.basename(file_path),
+                'file_path': file_path,
+                'size': len(full_html),
+                'uploaded_at': meta_data['uploaded_at'],
+                'metadata': meta_data
             }
             
-            # Filtrar valores None para mantener solo los campos válidos
-            meta_data = {k: v for k, v in meta_data.items() if v is not None}
+        except Exception as e:
+            raise Exception(f"Error al guardar archivo HTML: {str(e)}")
+    
+    def save_html_stream(self, chunks: Iterable[bytes], file_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Guardar un archivo HTML recibido por bloques (subida en streaming)
+        
+        El contenido (UTF-8) se escribe en un temporal a medida que llega, con el
+        comentario de metadatos insertado en el camino; el tamaño y el SHA-256 se
+        calculan sobre la marcha. A diferencia de ``save_html_file``, el tamaño
+        máximo y ``file_size`` se miden en bytes.
+        """
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            
+            comment = self._metadata_comment(metadata)
+            wrapper = tuple(part.encode('utf-8') for part in self._html_wrapper(comment))
             
-            # Guardar metadatos
-            meta_file_path = f"{file_path}.meta"
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, indent=2, ensure_ascii=False)
+            # Inicio del documento para el índice de búsqueda (memoria acotada)
+            search_prefix = bytearray()
             
-            # Crear backup si está habilitado
-            if self.backup_enabled:
-                self._create_backup(file_path)
+            def content():
+                for chunk in _insert_metadata_comment(_limit_size(chunks, self.max_file_size),
+                                                      comment.encode('utf-8'), wrapper):
+                    if len(search_prefix) < STREAM_SEARCH_PREFIX_BYTES:
+                        search_prefix.extend(chunk[:STREAM_SEARCH_PREFIX_BYTES - len(search_prefix)])
+                    yield chunk
+            
+            stored_path = physical_path(file_path, self.compress_at_rest)
+            written = write_html_stream(stored_path, content(), self.gzip_level)
+            self._remove_stale_variant(file_path)
+            
+            meta_data = self._saved_metadata(metadata, written['size'])
+            self._register_saved_file(file_path, stored_path, metadata, meta_data,
+                                      search_prefix.decode('utf-8', 'ignore'))
             
             return {
                 'filename': os.path.basename(file_path),
                 'file_path': file_path,
-                'size': len(full_html),
+                'size': written['size'],
+                'stored_size': written['stored_size'],
+                'sha256': written['sha256'],
                 'uploaded_at': meta_data['uploaded_at'],
                 'metadata': meta_data
             }
             
+        except ValueError:
+            # Contenido vacío o demasiado grande: error del cliente, no del servidor
+            raise
         except Exception as e:
             raise Exception(f"Error al guardar archivo HTML: {str(e)}")
     
-    def _create_full_html(self, html_content: str, metadata: Dict[str, Any]) -> str:
-        """Crear HTML completo con metadatos embebidos"""
-        # Crear comentario con metadatos
-        meta_comment = f"""
+    def _saved_metadata(self, metadata: Dict[str, Any], file_size: int) -> Dict[str, Any]:
+        """Metadatos que se guardan en el .meta de un archivo recién subido"""
+        # Preparar metadatos para guardar - procesar todos los campos del frontend
+        meta_data = {
+            # Campos básicos del frontend
+            'patient_name': metadata.get('patient_name'),
+            'order_number': metadata.get('order_number'),
+            'doctor_name': metadata.get('doctor_name'),
+            'notes': metadata.get('notes', ''),
+            
+            # Campos adicionales del frontend
+            'patient_age': metadata.get('patient_age'),
+            'patient_gender': metadata.get('patient_gender'),
+            'reception_date': metadata.get('reception_date'),
+            'tests': metadata.get('tests', []),
+            'created_by': metadata.get('created_by'),
+            'source': metadata.get('source', 'frontend'),
+            'prefix': metadata.get('prefix', 'frontend'),
+            'original_filename': metadata.get('original_filename'),
+            
+            # Campos del sistema
+            'uploaded_at': datetime.now().isoformat(),
+            'file_size': file_size,
+            'status': metadata.get('status', 'pending'),  # Estado por defecto
+            'created_at': metadata.get('created_at', datetime.now().isoformat()),  # Usar el del frontend o crear uno nuevo
+            
+            # Nuevos campos de edición
+            'edit_count': metadata.get('edit_count', 0),  # Número de veces editado
+            'is_modified': metadata.get('is_modified', False),  # Boolean que indica si fue modificado
+            'last_edit_date': metadata.get('last_edit_date')  # Fecha de la última edición
+        }
+        
+        # Filtrar valores None para mantener solo los campos válidos
+        return {k: v for k, v in meta_data.items() if v is not None}
+    
+    def _register_saved_file(self, file_path: str, stored_path: str, metadata: Dict[str, Any],
+                             meta_data: Dict[str, Any], html_content: str):
+        """Guardar metadatos, historial inicial y backup de un archivo recién subido"""
+        # Guardar metadatos; el historial inicial (si viene del frontend) va al journal
+        with file_lock(file_path, self.lock_dir):
+            remove_journal(file_path)
+            append_entries(file_path, metadata.get('edit_history') or [])
+            self._write_metadata(file_path, meta_data, html_content)
+        
+        # Crear backup si está habilitado
+        if self.backup_enabled:
+            self._create_backup(file_path, stored_path)
+    
+    @staticmethod
+    def _metadata_comment(metadata: Dict[str, Any]) -> str:
+        """Comentario con los metadatos que se embebe en el HTML"""
+        return f"""
 <!-- 
 Frontend HTML Metadata:
 {json.dumps(metadata, indent=2, ensure_ascii=False)}
 -->
 """
+    
+    @staticmethod
+    def _html_wrapper(meta_comment: str) -> Tuple[str, str]:
+        """Inicio y fin de la estructura HTML básica para contenido sin documento completo"""
+        return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Reporte de Laboratorio</title>
+    {meta_comment}
+</head>
+<body>
+""", """
+</body>
+</html>"""
+    
+    def _create_full_html(self, html_content: str, metadata: Dict[str, Any]) -> str:
+        """Crear HTML completo con metadatos embebidos"""
+        # Crear comentario con metadatos
+        meta_comment = self._metadata_comment(metadata)
         
         # Insertar metadatos al inicio del HTML
         if html_content.strip().startswith('<!DOCTYPE') or html_content.strip().startswith('<html'):
@@ -153,79 +458,151 @@ Frontend HTML Metadata:
                 return meta_comment + html_content
         else:
             # Envolver en estructura HTML básica
-            return f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Reporte de Laboratorio</title>
-    {meta_comment}
-</head>
-<body>
-{html_content}
-</body>
-</html>"""
+            head, tail = self._html_wrapper(meta_comment)
+            return head + html_content + tail
     
     def get_html_content(self, file_path: str) -> str:
         """Obtener contenido HTML de un archivo"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            stored_path = self.resolve_file_path(file_path)
+            if not stored_path:
+                raise FileNotFoundError("Archivo no encontrado")
+            return read_html(stored_path)
         except Exception as e:
             raise Exception(f"Error al leer archivo HTML: {str(e)}")
     
     def get_file_metadata(self, file_path: str) -> Optional[Dict[str, Any]]:
         """Obtener metadatos de un archivo"""
-        meta_file_path = f"{file_path}.meta"
+        meta_file_path = f"{logical_path(file_path)}.meta"
         try:
-            if os.path.exists(meta_file_path):
-                with open(meta_file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return None
+            return self.meta_cache.load(meta_file_path)
         except Exception as e:
             raise Exception(f"Error al leer metadatos: {str(e)}")
     
+    def rebuild_counters(self) -> Dict[str, int]:
+        """Recalcular los contadores de estadísticas desde el índice de metadatos"""
+        try:
+            return self.index.rebuild_counters()
+        except Exception as e:
+            raise Exception(f"Error al recalcular contadores: {str(e)}")
+    
+    def update_file_metadata(self, file_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Actualizar solo los metadatos de un archivo (sin cambiar el contenido)"""
+        try:
+            with self._locked_file(file_path) as file_path:
+                existing_metadata = self._load_for_update(file_path) or {}
+                updated_at = existing_metadata.get('updated_at')
+                existing_metadata.update({k: v for k, v in metadata.items() if k != 'edit_history'})
+                existing_metadata['updated_at'] = updated_at
+                
+                self._write_metadata(file_path, existing_metadata)
+            
+            return {
+                'filename': os.path.basename(file_path),
+                'file_path': file_path,
+                'metadata': existing_metadata
+            }
+            
+        except Exception as e:
+            raise Exception(f"Error al actualizar metadatos: {str(e)}")
+    
     def list_html_files(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """Listar archivos HTML con metadatos"""
-        files = []
+        """Listar archivos HTML con metadatos (más recientes primero, desde el índice)"""
+        try:
+            return self.index.list_files(limit=limit, offset=offset)
+        except Exception as e:
+            raise Exception(f"Error al listar archivos: {str(e)}")
+    
+    def rebuild_index(self) -> Dict[str, Any]:
+        """Reconstruir el índice de metadatos a partir de los archivos .meta"""
+        try:
+            return self.index.rebuild()
+        except Exception as e:
+            raise Exception(f"Error al reconstruir el índice: {str(e)}")
+    
+    def migrate_storage_layout(self, after: str = None, batch_size: int = None, max_batches: int = None,
+                               dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Mover los archivos a la distribución configurada sin detener el servicio
+        
+        Recorre el índice por lotes en orden de ruta. Cada archivo se mueve con
+        su ``.meta`` y su journal bajo ``file_lock``; el HTML se crea primero en
+        la nueva ubicación (enlace duro) y el anterior se quita al final, así que
+        las lecturas lo encuentran en todo momento (``find_file`` busca en ambas
+        distribuciones). Las escrituras toman el mismo bloqueo y siguen al
+        archivo si se movió después de resolver su ruta (``_locked_file``). La
+        fila del índice, el documento de búsqueda y las instantáneas de backup se
+        conservan. Se puede interrumpir y continuar con
+        ``after`` (``next_after`` del resumen).
         
+        Args:
+            after: Continuar después de esta ruta lógica
+            batch_size: Archivos por lote
+            max_batches: Máximo de lotes en esta ejecución (None = hasta terminar)
+            dry_run: Solo contar los archivos que se moverían
+            
+        Returns:
+            Dict[str, Any]: Resumen de la migración
+        """
         try:
-            # Recorrer directorios por fecha
-            for year in os.listdir(self.html_base_path):
-                year_path = os.path.join(self.html_base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
+            batch_size = max(1, batch_size or self.migration_batch_size)
+            summary = {
+                'layout': self.layout.layout,
+                'dry_run': dry_run,
+                'checked': 0,
+                'moved': 0,
+                'pending': 0,
+                'missing': [],
+                'errors': [],
+                'next_after': after,
+                'done': False
+            }
+            batches = 0
+            
+            while max_batches is None or batches < max_batches:
+                paths = self.index.paths_after(summary['next_after'], batch_size)
+                if not paths:
+                    summary['done'] = True
+                    break
+                batches += 1
+                summary['next_after'] = paths[-1]
                 
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
+                for file_path in paths:
+                    summary['checked'] += 1
+                    stored_path = self.resolve_file_path(file_path)
+                    if not stored_path:
+                        summary['missing'].append(file_path)
                         continue
-                    
-                    # Buscar archivos HTML
-                    for filename in os.listdir(month_path):
-                        if filename.endswith('.html') and not filename.endswith('.meta'):
-                            file_path = os.path.join(month_path, filename)
-                            
-                            # Obtener información del archivo
-                            stat = os.stat(file_path)
-                            metadata = self.get_file_metadata(file_path) or {}
-                            
-                            files.append({
-                                'filename': filename,
-                                'file_path': file_path,
-                                'size': stat.st_size,
-                                'created_at': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                                'modified_at': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                                'metadata': metadata
-                            })
-            
-            # Ordenar por fecha de modificación (más recientes primero)
-            files.sort(key=lambda x: x['modified_at'], reverse=True)
-            
-            return files[offset:offset + limit]
+                    filename = os.path.basename(file_path)
+                    moment = self._file_moment(filename) or datetime.fromtimestamp(os.path.getmtime(stored_path))
+                    new_path = self.layout.path_for(filename, moment)
+                    if os.path.abspath(new_path) == os.path.abspath(file_path):
+                        continue
+                    if dry_run:
+                        summary['pending'] += 1
+                        continue
+                    try:
+                        self._move_file(file_path, stored_path, new_path)
+                        summary['moved'] += 1
+                    except Exception as e:
+                        summary['errors'].append({'file_path': file_path, 'error': str(e)})
             
+            return summary
         except Exception as e:
-            raise Exception(f"Error al listar archivos: {str(e)}")
+            raise Exception(f"Error al migrar la distribución de archivos: {str(e)}")
+    
+    def _move_file(self, file_path: str, stored_path: str, new_path: str):
+        """Mover un archivo con sus metadatos, journal, fila del índice e instantáneas"""
+        new_stored_path = physical_path(new_path, stored_path.endswith(GZIP_SUFFIX))
+        with file_lock(file_path, self.lock_dir):
+            signature = stage_move(stored_path, new_stored_path)
+            for suffix in ('.meta', JOURNAL_SUFFIX):
+                if os.path.exists(f"{file_path}{suffix}"):
+                    os.replace(f"{file_path}{suffix}", f"{new_path}{suffix}")
+            self.meta_cache.invalidate(f"{file_path}.meta")
+            self.index.rename(file_path, new_path)
+            self.backup_store.rename(file_path, new_path)
+            finish_move(stored_path, new_stored_path, signature)
     
     def update_html_file(self, file_path: str, html_content: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Actualizar archivo HTML existente"""
@@ -236,42 +613,40 @@ Frontend HTML Metadata:
             # Crear HTML completo con metadatos embebidos
             full_html = self._create_full_html(html_content, metadata)
             
-            # Guardar archivo HTML
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(full_html)
-            
-            # Obtener metadatos existentes
-            existing_metadata = self.get_file_metadata(file_path) or {}
-            
-            # Crear entrada de historial de edición
-            edit_entry = {
-                'edit_date': datetime.now().isoformat(),
-                'edited_by': metadata.get('edited_by', existing_metadata.get('created_by', 'unknown')),
-                'edit_reason': metadata.get('edit_reason', 'Actualización de contenido'),
-                'file_size_before': existing_metadata.get('file_size', 0),
-                'file_size_after': len(full_html),
-                'changes_summary': metadata.get('changes_summary', 'Contenido HTML actualizado')
-            }
-            
-            # Actualizar metadatos con información de edición
-            existing_metadata.update(metadata)
-            existing_metadata.update({
-                'updated_at': datetime.now().isoformat(),
-                'file_size': len(full_html),
-                'edit_count': existing_metadata.get('edit_count', 0) + 1,
-                'is_modified': True,
-                'last_edit_date': edit_entry['edit_date']
-            })
-            
-            # Agregar entrada al historial de ediciones
-            edit_history = existing_metadata.get('edit_history', [])
-            edit_history.append(edit_entry)
-            existing_metadata['edit_history'] = edit_history
-            
-            # Guardar metadatos actualizados
-            meta_file_path = f"{file_path}.meta"
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(existing_metadata, f, indent=2, ensure_ascii=False)
+            # Con el bloqueo tomado para que una migración no mueva el archivo a mitad de la escritura
+            with self._locked_file(file_path) as file_path:
+                # Guardar archivo HTML
+                stored_path = self._write_html_file(file_path, full_html)
+                
+                if self.backup_enabled:
+                    self._create_backup(file_path, stored_path)
+                
+                # Obtener metadatos existentes
+                existing_metadata = self._load_for_update(file_path) or {}
+                
+                # Crear entrada de historial de edición
+                edit_entry = {
+                    'edit_date': datetime.now().isoformat(),
+                    'edited_by': metadata.get('edited_by', existing_metadata.get('created_by', 'unknown')),
+                    'edit_reason': metadata.get('edit_reason', 'Actualización de contenido'),
+                    'file_size_before': existing_metadata.get('file_size', 0),
+                    'file_size_after': len(full_html),
+                    'changes_summary': metadata.get('changes_summary', 'Contenido HTML actualizado')
+                }
+                
+                # Actualizar metadatos con información de edición
+                existing_metadata.update({k: v for k, v in metadata.items() if k != 'edit_history'})
+                existing_metadata.update({
+                    'updated_at': datetime.now().isoformat(),
+                    'file_size': len(full_html),
+                    'edit_count': existing_metadata.get('edit_count', 0) + 1,
+                    'is_modified': True,
+                    'last_edit_date': edit_entry['edit_date']
+                })
+                
+                # Anexar la entrada al journal y guardar los metadatos resumidos
+                append_entries(file_path, [edit_entry])
+                self._write_metadata(file_path, existing_metadata, full_html)
             
             return {
                 'filename': os.path.basename(file_path),
@@ -290,14 +665,18 @@ Frontend HTML Metadata:
     def delete_html_file(self, file_path: str) -> bool:
         """Eliminar archivo HTML y sus metadatos"""
         try:
-            # Eliminar archivo HTML
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            # Eliminar archivo de metadatos
-            meta_file_path = f"{file_path}.meta"
-            if os.path.exists(meta_file_path):
-                os.remove(meta_file_path)
+            with self._locked_file(file_path) as file_path:
+                # Eliminar archivo HTML (plano y comprimido)
+                remove_stored(file_path)
+                
+                # Eliminar archivo de metadatos
+                meta_file_path = f"{file_path}.meta"
+                if os.path.exists(meta_file_path):
+                    os.remove(meta_file_path)
+                self.meta_cache.invalidate(meta_file_path)
+                remove_journal(file_path)
+                
+                self.index.remove(file_path)
             
             return True
             
@@ -306,33 +685,55 @@ Frontend HTML Metadata:
     
     def search_html_files(self, query: str = None, patient_name: str = None, 
                          order_number: str = None, doctor_name: str = None,
-                         status: str = None, limit: int = 50) -> List[Dict[str, Any]]:
-        """Buscar archivos HTML con filtros"""
-        all_files = self.list_html_files(limit=1000)  # Obtener todos los archivos
-        filtered_files = []
+                         status: str = None, date_from: str = None, date_to: str = None,
+                         limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Buscar archivos HTML con filtros (búsqueda de texto completo sobre el índice)"""
+        try:
+            return self.index.search(
+                query=query,
+                patient_name=patient_name,
+                order_number=order_number,
+                doctor_name=doctor_name,
+                status=status,
+                date_from=date_from,
+                date_to=date_to,
+                limit=limit,
+                offset=offset
+            )
+        except Exception as e:
+            raise Exception(f"Error al buscar archivos: {str(e)}")
+    
+    def export_html_files(self, filenames: List[str] = None, include_metadata: bool = False,
+                          **filters) -> Iterator[bytes]:
+        """
+        Exportar archivos HTML como un ZIP generado en streaming
         
-        for file_info in all_files:
-            metadata = file_info.get('metadata', {})
-            
-            # Aplicar filtros
-            if query and query.lower() not in file_info['filename'].lower():
-                continue
-            
-            if patient_name and patient_name.lower() not in metadata.get('patient_name', '').lower():
-                continue
-            
-            if order_number and order_number.lower() not in metadata.get('order_number', '').lower():
-                continue
-            
-            if doctor_name and doctor_name.lower() not in metadata.get('doctor_name', '').lower():
-                continue
-            
-            if status and metadata.get('status') != status:
-                continue
+        Args:
+            filenames: Nombres de archivo concretos (se ignoran los que no existen)
+            include_metadata: Incluir también los archivos .meta
+            **filters: Filtros de ``search_html_files`` (query, patient_name,
+                order_number, doctor_name, status, date_from, date_to)
+        
+        Returns:
+            Iterator[bytes]: Bloques del ZIP; los archivos se buscan y se leen a
+            medida que se consume el iterador
+        """
+        def files():
+            if filenames:
+                paths = (self.find_file(filename) for filename in filenames)
+            else:
+                paths = (f['file_path'] for f in self.index.search(limit=None, **filters))
             
-            filtered_files.append(file_info)
+            for file_path in paths:
+                stored_path = self.resolve_file_path(file_path) if file_path else None
+                if not stored_path:
+                    continue
+                arcname = os.path.relpath(file_path, self.html_base_path)
+                yield stored_path, arcname
+                if include_metadata and os.path.exists(f"{file_path}.meta"):
+                    yield f"{file_path}.meta", f"{arcname}.meta"
         
-        return filtered_files[:limit]
+        return stream_zip(files(), self.gzip_level)
     
     def backup_html_files(self) -> str:
         """Crear backup de archivos HTML"""
@@ -351,7 +752,7 @@ Frontend HTML Metadata:
                         dirs.remove('backups')
                     
                     for file in files:
-                        if file.endswith('.html') or file.endswith('.meta'):
+                        if file.endswith(('.html', '.html' + GZIP_SUFFIX, '.meta', '.html' + JOURNAL_SUFFIX)):
                             file_path = os.path.join(root, file)
                             arcname = os.path.relpath(file_path, self.html_base_path)
                             zipf.write(file_path, arcname)
@@ -382,16 +783,19 @@ Frontend HTML Metadata:
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
         """Obtener información detallada de un archivo"""
         try:
-            if not os.path.exists(file_path):
+            stored_path = self.resolve_file_path(file_path)
+            if not stored_path:
                 raise FileNotFoundError("Archivo no encontrado")
             
-            stat = os.stat(file_path)
+            file_path = logical_path(file_path)
+            stat = os.stat(stored_path)
             metadata = self.get_file_metadata(file_path) or {}
             
             return {
                 'filename': os.path.basename(file_path),
                 'file_path': file_path,
                 'size': stat.st_size,
+                'compressed': stored_path != file_path,
                 'created_at': datetime.fromtimestamp(stat.st_ctime).isoformat(),
                 'modified_at': datetime.fromtimestamp(stat.st_mtime).isoformat(),
                 'metadata': metadata
@@ -434,24 +838,23 @@ Frontend HTML Metadata:
             if new_status not in ['pending', 'completed', 'cancelled']:
                 raise ValueError("Estado inválido. Debe ser: pending, completed, o cancelled")
             
-            # Obtener metadatos actuales
-            metadata = self.get_file_metadata(file_path)
-            if not metadata:
-                raise FileNotFoundError("Metadatos no encontrados")
-            
-            # Actualizar estado y timestamps
-            metadata['status'] = new_status
-            metadata['updated_at'] = datetime.now().isoformat()
-            
-            if new_status == 'completed':
-                metadata['completed_at'] = datetime.now().isoformat()
-            elif new_status == 'cancelled':
-                metadata['cancelled_at'] = datetime.now().isoformat()
-            
-            # Guardar metadatos actualizados
-            meta_file_path = f"{file_path}.meta"
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            with self._locked_file(file_path) as file_path:
+                # Obtener metadatos actuales
+                metadata = self._load_for_update(file_path)
+                if not metadata:
+                    raise FileNotFoundError("Metadatos no encontrados")
+                
+                # Actualizar estado y timestamps
+                metadata['status'] = new_status
+                metadata['updated_at'] = datetime.now().isoformat()
+                
+                if new_status == 'completed':
+                    metadata['completed_at'] = datetime.now().isoformat()
+                elif new_status == 'cancelled':
+                    metadata['cancelled_at'] = datetime.now().isoformat()
+                
+                # Guardar metadatos actualizados
+                self._write_metadata(file_path, metadata)
             
             return {
                 'filename': os.path.basename(file_path),
@@ -466,121 +869,81 @@ Frontend HTML Metadata:
     def get_pending_files(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Obtener archivos pendientes ordenados por fecha de creación (más antiguos primero)"""
         try:
-            all_files = self.list_html_files(limit=1000)
-            pending_files = []
-            
-            for file_info in all_files:
-                metadata = file_info.get('metadata', {})
-                if metadata.get('status') == 'pending':
-                    pending_files.append(file_info)
-            
-            # Ordenar por fecha de creación (más antiguos primero)
-            pending_files.sort(key=lambda x: x.get('metadata', {}).get('created_at', x.get('created_at', '')), reverse=False)
-            
-            return pending_files[:limit]
-            
+            return self.index.by_status('pending', limit)
         except Exception as e:
             raise Exception(f"Error al obtener archivos pendientes: {str(e)}")
     
     def get_completed_files(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Obtener archivos completados ordenados por fecha de finalización (más recientes primero)"""
         try:
-            all_files = self.list_html_files(limit=1000)
-            completed_files = []
-            
-            for file_info in all_files:
-                metadata = file_info.get('metadata', {})
-                if metadata.get('status') == 'completed':
-                    completed_files.append(file_info)
-            
-            # Ordenar por fecha de finalización (más recientes primero)
-            completed_files.sort(key=lambda x: x.get('metadata', {}).get('completed_at', ''), reverse=True)
-            
-            return completed_files[:limit]
-            
+            return self.index.by_status('completed', limit)
         except Exception as e:
             raise Exception(f"Error al obtener archivos completados: {str(e)}")
     
     def get_files_by_status(self, status: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Obtener archivos por estado específico"""
         try:
-            all_files = self.list_html_files(limit=1000)
-            filtered_files = []
-            
-            for file_info in all_files:
-                metadata = file_info.get('metadata', {})
-                if metadata.get('status') == status:
-                    filtered_files.append(file_info)
-            
-            # Ordenar según el estado
-            if status == 'pending':
-                # Pendientes: más antiguos primero
-                filtered_files.sort(key=lambda x: x.get('metadata', {}).get('created_at', x.get('created_at', '')), reverse=False)
-            elif status == 'completed':
-                # Completados: más recientes primero
-                filtered_files.sort(key=lambda x: x.get('metadata', {}).get('completed_at', ''), reverse=True)
-            else:
-                # Otros estados: por fecha de modificación
-                filtered_files.sort(key=lambda x: x.get('modified_at', ''), reverse=True)
-            
-            return filtered_files[:limit]
-            
+            return self.index.by_status(status, limit)
         except Exception as e:
             raise Exception(f"Error al obtener archivos por estado: {str(e)}")
     
     def get_status_stats(self) -> Dict[str, Any]:
         """Obtener estadísticas por estado"""
         try:
-            all_files = self.list_html_files(limit=1000)
-            stats = {
-                'total_files': len(all_files),
-                'by_status': {
-                    'pending': 0,
-                    'completed': 0,
-                    'cancelled': 0,
-                    'unknown': 0
-                },
-                'pending_count': 0,
-                'completed_count': 0,
-                'cancelled_count': 0
+            counts = self.index.status_counts()
+            by_status = {
+                'pending': counts.get('pending', 0),
+                'completed': counts.get('completed', 0),
+                'cancelled': counts.get('cancelled', 0),
+                'unknown': counts.get(None, 0) + counts.get('unknown', 0)
             }
             
-            for file_info in all_files:
-                metadata = file_info.get('metadata', {})
-                status = metadata.get('status', 'unknown')
-                
-                if status in stats['by_status']:
-                    stats['by_status'][status] += 1
-                
-                if status == 'pending':
-                    stats['pending_count'] += 1
-                elif status == 'completed':
-                    stats['completed_count'] += 1
-                elif status == 'cancelled':
-                    stats['cancelled_count'] += 1
-            
-            return stats
+            return {
+                'total_files': sum(counts.values()),
+                'by_status': by_status,
+                'pending_count': by_status['pending'],
+                'completed_count': by_status['completed'],
+                'cancelled_count': by_status['cancelled']
+            }
             
         except Exception as e:
             raise Exception(f"Error al obtener estadísticas: {str(e)}")
     
-    def _create_backup(self, file_path: str):
-        """Crear backup de un archivo específico"""
+    def get_storage_stats(self) -> Dict[str, Any]:
+        """Obtener estadísticas generales de almacenamiento"""
         try:
-            backup_dir = os.path.join(self.html_base_path, 'backups')
-            os.makedirs(backup_dir, exist_ok=True)
+            summary = self.index.storage_summary()
+            total_files = summary['total_files']
             
-            # Crear backup del archivo individual
-            filename = os.path.basename(file_path)
-            backup_filename = f"backup_{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-            backup_path = os.path.join(backup_dir, backup_filename)
-            
-            shutil.copy2(file_path, backup_path)
+            return {
+                'total_files': total_files,
+                'total_size': summary['total_size'],
+                'average_size': summary['total_size'] / total_files if total_files else 0,
+                'oldest_file': summary['oldest_file'],
+                'newest_file': summary['newest_file'],
+                'metadata_cache': self.meta_cache.stats()
+            }
             
+        except Exception as e:
+            raise Exception(f"Error al obtener estadísticas: {str(e)}")
+    
+    def _create_backup(self, file_path: str, stored_path: str):
+        """Registrar una instantánea del archivo (el contenido repetido no se vuelve a copiar)"""
+        try:
+            self.backup_store.backup(logical_path(file_path), stored_path)
         except Exception as e:
             # No fallar si el backup no se puede crear
             print(f"Warning: No se pudo crear backup: {str(e)}")
     
+    def compact_backups(self) -> Dict[str, Any]:
+        """Aplicar ahora la política de retención de backups por guardado"""
+        try:
+            result = self.backup_store.compact()
+            result.update(self.backup_store.stats())
+            return result
+        except Exception as e:
+            raise Exception(f"Error al compactar backups: {str(e)}")
+    
     # Métodos específicos para manejo de ediciones
     
     def get_edit_history(self, file_path: str) -> List[Dict[str, Any]]:
@@ -590,7 +953,10 @@ Frontend HTML Metadata:
             if not metadata:
                 return []
             
-            return metadata.get('edit_history', [])
+            # Metadatos del formato anterior (aún sin migrar al journal)
+            if 'edit_history' in metadata:
+                return metadata['edit_history'] or []
+            return read_entries(file_path)
             
         except Exception as e:
             raise Exception(f"Error al obtener historial de ediciones: {str(e)}")
@@ -611,7 +977,7 @@ Frontend HTML Metadata:
                 'edit_count': metadata.get('edit_count', 0),
                 'is_modified': metadata.get('is_modified', False),
                 'last_edit_date': metadata.get('last_edit_date'),
-                'edit_history': metadata.get('edit_history', [])
+                'edit_history': self.get_edit_history(file_path)
             }
             
         except Exception as e:
@@ -620,37 +986,32 @@ Frontend HTML Metadata:
     def mark_as_modified(self, file_path: str, edited_by: str = None, edit_reason: str = None) -> Dict[str, Any]:
         """Marcar un archivo como modificado sin cambiar el contenido"""
         try:
-            metadata = self.get_file_metadata(file_path)
-            if not metadata:
-                raise FileNotFoundError("Metadatos no encontrados")
-            
-            # Crear entrada de historial de edición
-            edit_entry = {
-                'edit_date': datetime.now().isoformat(),
-                'edited_by': edited_by or metadata.get('created_by', 'unknown'),
-                'edit_reason': edit_reason or 'Archivo marcado como modificado',
-                'file_size_before': metadata.get('file_size', 0),
-                'file_size_after': metadata.get('file_size', 0),
-                'changes_summary': 'Archivo marcado como modificado sin cambios de contenido'
-            }
-            
-            # Actualizar metadatos
-            metadata.update({
-                'updated_at': datetime.now().isoformat(),
-                'edit_count': metadata.get('edit_count', 0) + 1,
-                'is_modified': True,
-                'last_edit_date': edit_entry['edit_date']
-            })
-            
-            # Agregar entrada al historial de ediciones
-            edit_history = metadata.get('edit_history', [])
-            edit_history.append(edit_entry)
-            metadata['edit_history'] = edit_history
-            
-            # Guardar metadatos actualizados
-            meta_file_path = f"{file_path}.meta"
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            with self._locked_file(file_path) as file_path:
+                metadata = self._load_for_update(file_path)
+                if not metadata:
+                    raise FileNotFoundError("Metadatos no encontrados")
+                
+                # Crear entrada de historial de edición
+                edit_entry = {
+                    'edit_date': datetime.now().isoformat(),
+                    'edited_by': edited_by or metadata.get('created_by', 'unknown'),
+                    'edit_reason': edit_reason or 'Archivo marcado como modificado',
+                    'file_size_before': metadata.get('file_size', 0),
+                    'file_size_after': metadata.get('file_size', 0),
+                    'changes_summary': 'Archivo marcado como modificado sin cambios de contenido'
+                }
+                
+                # Actualizar metadatos
+                metadata.update({
+                    'updated_at': datetime.now().isoformat(),
+                    'edit_count': metadata.get('edit_count', 0) + 1,
+                    'is_modified': True,
+                    'last_edit_date': edit_entry['edit_date']
+                })
+                
+                # Anexar la entrada al journal y guardar los metadatos resumidos
+                append_entries(file_path, [edit_entry])
+                self._write_metadata(file_path, metadata)
             
             return {
                 'filename': os.path.basename(file_path),
@@ -666,23 +1027,22 @@ Frontend HTML Metadata:
     def reset_edit_tracking(self, file_path: str) -> Dict[str, Any]:
         """Resetear el seguimiento de ediciones de un archivo"""
         try:
-            metadata = self.get_file_metadata(file_path)
-            if not metadata:
-                raise FileNotFoundError("Metadatos no encontrados")
-            
-            # Resetear campos de edición
-            metadata.update({
-                'updated_at': datetime.now().isoformat(),
-                'edit_count': 0,
-                'is_modified': False,
-                'last_edit_date': None,
-                'edit_history': []
-            })
-            
-            # Guardar metadatos actualizados
-            meta_file_path = f"{file_path}.meta"
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            with self._locked_file(file_path) as file_path:
+                metadata = self.get_file_metadata(file_path)
+                if not metadata:
+                    raise FileNotFoundError("Metadatos no encontrados")
+                
+                # Resetear campos de edición y descartar el journal
+                metadata.pop('edit_history', None)
+                metadata.update({
+                    'updated_at': datetime.now().isoformat(),
+                    'edit_count': 0,
+                    'is_modified': False,
+                    'last_edit_date': None
+                })
+                
+                remove_journal(file_path)
+                self._write_metadata(file_path, metadata)
             
             return {
                 'filename': os.path.basename(file_path),
@@ -698,76 +1058,25 @@ Frontend HTML Metadata:
     def get_modified_files(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Obtener archivos que han sido modificados"""
         try:
-            all_files = self.list_html_files(limit=1000)
-            modified_files = []
-            
-            for file_info in all_files:
-                metadata = file_info.get('metadata', {})
-                if metadata.get('is_modified', False):
-                    modified_files.append(file_info)
-            
-            # Ordenar por fecha de última edición (más recientes primero)
-            modified_files.sort(key=lambda x: x.get('metadata', {}).get('last_edit_date', ''), reverse=True)
-            
-            return modified_files[:limit]
-            
+            return self.index.modified(limit)
         except Exception as e:
             raise Exception(f"Error al obtener archivos modificados: {str(e)}")
     
     def get_edit_stats_summary(self) -> Dict[str, Any]:
         """Obtener resumen de estadísticas de edición de todos los archivos"""
         try:
-            all_files = self.list_html_files(limit=1000)
-            stats = {
-                'total_files': len(all_files),
-                'modified_files': 0,
-                'unmodified_files': 0,
-                'total_edits': 0,
-                'average_edits_per_file': 0,
-                'most_edited_file': None,
-                'recent_edits': []
-            }
-            
-            max_edits = 0
-            recent_edits = []
+            summary = self.index.edit_summary(recent_limit=10)  # Últimas 10 ediciones
+            total_files = summary['total_files']
             
-            for file_info in all_files:
-                metadata = file_info.get('metadata', {})
-                edit_count = metadata.get('edit_count', 0)
-                is_modified = metadata.get('is_modified', False)
-                last_edit_date = metadata.get('last_edit_date')
-                
-                if is_modified:
-                    stats['modified_files'] += 1
-                else:
-                    stats['unmodified_files'] += 1
-                
-                stats['total_edits'] += edit_count
-                
-                if edit_count > max_edits:
-                    max_edits = edit_count
-                    stats['most_edited_file'] = {
-                        'filename': file_info['filename'],
-                        'edit_count': edit_count,
-                        'last_edit_date': last_edit_date
-                    }
-                
-                if last_edit_date:
-                    recent_edits.append({
-                        'filename': file_info['filename'],
-                        'last_edit_date': last_edit_date,
-                        'edit_count': edit_count
-                    })
-            
-            # Calcular promedio de ediciones
-            if stats['total_files'] > 0:
-                stats['average_edits_per_file'] = round(stats['total_edits'] / stats['total_files'], 2)
-            
-            # Ordenar ediciones recientes por fecha
-            recent_edits.sort(key=lambda x: x['last_edit_date'], reverse=True)
-            stats['recent_edits'] = recent_edits[:10]  # Últimas 10 ediciones
-            
-            return stats
+            return {
+                'total_files': total_files,
+                'modified_files': summary['modified_files'],
+                'unmodified_files': total_files - summary['modified_files'],
+                'total_edits': summary['total_edits'],
+                'average_edits_per_file': round(summary['total_edits'] / total_files, 2) if total_files else 0,
+                'most_edited_file': summary['most_edited_file'],
+                'recent_edits': summary['recent_edits']
+            }
             
         except Exception as e:
-            raise Exception(f"Error al obtener resumen de estadísticas de edición: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error al obtener resumen de estadísticas de edición: {str(e)}")
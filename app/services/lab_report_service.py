@@ -3,22 +3,71 @@ Servicio para manejo de reportes de laboratorio
 """
 
 import os
+import re
 import shutil
 import json
+import base64
 import logging
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from pathlib import Path
-import zipfile
 import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import defer, selectinload
 
 from database import db
 from app.models.lab_report import LabReport, ReportTest
 from app.config import Config
+from app.services.report_storage import (
+    GZIP_SUFFIX, TEMP_SUFFIX, is_compressed, physical_path, logical_path, stored_size, remove_stored,
+    resolve_stored_path
+)
+from app.services.storage_layout import StorageLayout, stage_move, finish_move
+from app.services.edit_journal import LOCK_DIRECTORY, file_lock
+from app.services.zip_export import stream_zip
+from app.services.report_file_writer import ReportFileWriter
+from app.services.report_backup_service import EXCLUDED_DIRECTORIES
+from app.services.report_pdf_service import ReportPDFService
+from app.services.report_composer import ReportComposer, METADATA_FIELDS
+from app.services.report_stats_service import ReportStatsService
+from app.services.report_revision_service import ReportRevisionService
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+REPORT_STATUSES = ['draft', 'final', 'printed']
+
+# Antigüedad a partir de la cual un temporal se considera de una escritura interrumpida
+STALE_TEMP_FILE_SECONDS = 3600
+
+# Fecha que ``generate_file_name`` agrega al nombre: ORDEN_PACIENTE_YYYYMMDD_HHMMSS.html
+FILE_NAME_DATE_PATTERN = re.compile(r'_(\d{8}_\d{6})\.html$')
+
+# Transiciones permitidas en el cambio de estado masivo
+STATUS_TRANSITIONS = {
+    'draft': {'final', 'printed'},
+    'final': {'printed'},
+}
+
+
+def encode_cursor(reception_date: date, report_id: int) -> str:
+    """Codificar la posición (reception_date, id) como cursor opaco"""
+    raw = f"{reception_date.isoformat()}|{report_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """Decodificar un cursor de paginación"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_str, id_str = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        return date.fromisoformat(date_str), int(id_str)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
 
 class LabReportService:
     """Servicio para manejo de reportes de laboratorio"""
@@ -30,6 +79,21 @@ class LabReportService:
         self.max_file_size = config.REPORTS_MAX_FILE_SIZE
         self.backup_enabled = config.REPORTS_BACKUP_ENABLED
         self.backup_retention_days = config.REPORTS_BACKUP_RETENTION_DAYS
+        self.compress_at_rest = config.REPORTS_COMPRESS_AT_REST
+        self.batch_max_size = config.REPORTS_BATCH_MAX_SIZE
+        self.batch_write_workers = config.REPORTS_BATCH_WRITE_WORKERS
+        self.page_size = config.REPORTS_PAGE_SIZE
+        self.max_page_size = config.REPORTS_MAX_PAGE_SIZE
+        self.export_batch_size = config.REPORTS_EXPORT_BATCH_SIZE
+        self.migration_batch_size = config.STORAGE_MIGRATION_BATCH_SIZE
+        self.layout = StorageLayout(self.reports_base_path, config.REPORTS_STORAGE_LAYOUT,
+                                    config.STORAGE_SHARD_WIDTH)
+        self.lock_dir = os.path.join(self.reports_base_path, LOCK_DIRECTORY)
+        self.file_writer = ReportFileWriter(config)
+        self.pdf_service = ReportPDFService(config)
+        self.composer = ReportComposer(config)
+        self.stats_service = ReportStatsService(config)
+        self.revision_service = ReportRevisionService(config)
         
         # Crear directorio base si no existe
         self._ensure_base_directory()
@@ -102,10 +166,45 @@ class LabReportService:
             logger.error(f"Error al generar nombre de archivo: {str(e)}")
             raise
     
+    @staticmethod
+    def _file_moment(file_name: str, default: datetime = None) -> datetime:
+        """Fecha de un archivo a partir de su nombre (la de ``generate_file_name``)"""
+        match = FILE_NAME_DATE_PATTERN.search(logical_path(file_name))
+        if match:
+            return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+        return default or datetime.now()
+    
+    def report_file_path(self, file_name: str) -> str:
+        """
+        Ruta en disco de un archivo de reporte nuevo según la distribución configurada
+        
+        Crea el directorio; la ruta lleva .gz si se comprime en disco.
+        """
+        return physical_path(self.layout.prepare_path(file_name, self._file_moment(file_name)),
+                             self.compress_at_rest)
+    
+    def _validate_report_file(self, html_content: str, file_path: str) -> None:
+        """Validar tamaño y ubicación de un archivo de reporte y crear su directorio"""
+        content_size = len(html_content.encode('utf-8'))
+        if content_size > self.max_file_size:
+            raise ValueError(f"El contenido excede el tamaño máximo de {self.max_file_size} bytes")
+        
+        # Crear directorio padre si no existe
+        file_path_obj = Path(file_path)
+        file_path_obj.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Validar que el directorio padre es seguro
+        if not str(file_path_obj.parent).startswith(str(self.reports_base_path)):
+            raise ValueError("Ruta de archivo no permitida")
+    
     def save_report_file(self, html_content: str, file_path: str) -> bool:
         """
         Guardar contenido HTML en archivo
         
+        La escritura es atómica (temporal + fsync + rename): un corte a mitad de
+        escritura no deja archivos truncados. Si la ruta termina en .gz el
+        contenido se guarda comprimido con gzip.
+        
         Args:
             html_content: Contenido HTML a guardar
             file_path: Ruta completa del archivo
@@ -114,26 +213,8 @@ class LabReportService:
             bool: True si se guardó exitosamente
         """
         try:
-            # Validar tamaño del contenido
-            content_size = len(html_content.encode('utf-8'))
-            if content_size > self.max_file_size:
-                raise ValueError(f"El contenido excede el tamaño máximo de {self.max_file_size} bytes")
-            
-            # Crear directorio padre si no existe
-            file_path_obj = Path(file_path)
-            file_path_obj.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Validar que el directorio padre es seguro
-            if not str(file_path_obj.parent).startswith(str(self.reports_base_path)):
-                raise ValueError("Ruta de archivo no permitida")
-            
-            # Escribir archivo
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            # Verificar que el archivo se escribió correctamente
-            if not os.path.exists(file_path):
-                raise Exception("El archivo no se creó correctamente")
+            self._validate_report_file(html_content, file_path)
+            self.file_writer.write(file_path, html_content)
             
             logger.info(f"Archivo guardado exitosamente: {file_path}")
             return True
@@ -142,6 +223,78 @@ class LabReportService:
             logger.error(f"Error al guardar archivo {file_path}: {str(e)}")
             raise
     
+    def _start_report_file(self, html_content: str, file_path: str) -> Future:
+        """
+        Validar e iniciar la escritura de un archivo de reporte
+        
+        En modo write-behind la escritura corre mientras se hace commit; el
+        resultado se recoge con _finish_report_file. En modo síncrono un error
+        de escritura se lanza aquí, antes del commit, como hacía save_html_file.
+        """
+        self._validate_report_file(html_content, file_path)
+        future = self.file_writer.submit(file_path, html_content)
+        if not self.file_writer.write_behind:
+            future.result()
+        return future
+    
+    def _finish_report_file(self, future: Future, html_content: str, file_path: str) -> None:
+        """
+        Esperar una escritura iniciada con _start_report_file después del commit
+        
+        La base de datos ya tiene el contenido; si la escritura falló se reintenta
+        una vez y, si vuelve a fallar, el archivo queda para reconcile_files.
+        """
+        try:
+            future.result()
+            logger.info(f"Archivo guardado exitosamente: {file_path}")
+        except Exception as e:
+            logger.warning(f"Error al guardar archivo {file_path}, reintentando: {str(e)}")
+            try:
+                self.file_writer.write(file_path, html_content)
+            except Exception as retry_error:
+                logger.error(f"Archivo pendiente de reconciliación {file_path}: {str(retry_error)}")
+    
+    def _follow_moved_file(self, report_id: int, file_path: str, html_content: str) -> None:
+        """
+        Llevar a la ruta vigente un archivo escrito en una ruta que la migración ya cambió
+        
+        ``update_report`` escribe en el ``file_path`` que leyó al empezar; si
+        ``migrate_storage_layout`` movió el reporte mientras tanto, la escritura
+        pudo quedar en la ruta anterior o perderse al quitar el origen. Con el
+        mismo bloqueo que toma la migración para quitar el origen, se relee la
+        ruta y, si cambió, se escribe allí el contenido y se quita la anterior.
+        """
+        with file_lock(logical_path(file_path), self.lock_dir):
+            try:
+                current_path = db.session.query(LabReport.file_path).filter_by(id=report_id).scalar()
+                if not current_path or os.path.abspath(logical_path(current_path)) == os.path.abspath(logical_path(file_path)):
+                    return
+                self.file_writer.write(current_path, html_content)
+                remove_stored(file_path)
+                logger.info(f"Archivo del reporte {report_id} movido durante la escritura: {current_path}")
+            except Exception as e:
+                logger.error(f"Archivo del reporte {report_id} pendiente de reconciliación: {str(e)}")
+    
+    def _add_report_tests(self, lab_report: LabReport, selected_tests: Any) -> None:
+        """Agregar a la sesión los registros ReportTest de las pruebas seleccionadas"""
+        if not isinstance(selected_tests, list):
+            return
+        
+        for test_data in selected_tests:
+            if isinstance(test_data, dict):
+                test_name = test_data.get('name', test_data.get('test_name', ''))
+                test_filename = test_data.get('filename', test_data.get('test_filename'))
+            else:
+                test_name = str(test_data)
+                test_filename = None
+            
+            if test_name:
+                db.session.add(ReportTest(
+                    report_id=lab_report.id,
+                    test_name=test_name,
+                    test_filename=test_filename
+                ))
+    
     def create_report(self, report_data: Dict[str, Any], created_by: int) -> LabReport:
         """
         Crear nuevo reporte
@@ -153,7 +306,13 @@ class LabReportService:
         Returns:
             LabReport: Reporte creado
         """
+        file_write = None
+        committed = False
         try:
+            # Componer el HTML en el servidor si se enviaron plantillas y resultados
+            if not report_data.get('html_content') and report_data.get('tests'):
+                report_data = {**report_data, **self.composer.compose(report_data)}
+            
             # Validar datos requeridos
             required_fields = ['order_number', 'patient_name', 'html_content', 'selected_tests']
             for field in required_fields:
@@ -165,20 +324,17 @@ class LabReportService:
             if existing_report:
                 raise ValueError(f"Ya existe un reporte con el número de orden: {report_data['order_number']}")
             
-            # Crear estructura de directorios
-            directory_path = self.create_directory_structure()
-            
             # Generar nombre de archivo
             file_name = self.generate_file_name(
                 report_data['order_number'],
                 report_data['patient_name']
             )
             
-            # Ruta completa del archivo
-            file_path = os.path.join(directory_path, file_name)
+            # Ruta completa del archivo (según la distribución, .html.gz si se comprime en disco)
+            file_path = self.report_file_path(file_name)
             
-            # Guardar archivo HTML
-            self.save_report_file(report_data['html_content'], file_path)
+            # Guardar archivo HTML (en modo write-behind se escribe durante el commit)
+            file_write = self._start_report_file(report_data['html_content'], file_path)
             
             # Crear objeto del reporte
             lab_report = LabReport(
@@ -201,44 +357,46 @@ class LabReportService:
             db.session.flush()  # Para obtener el ID
             
             # Crear registros de pruebas si se proporcionan
-            if isinstance(report_data['selected_tests'], list):
-                for test_data in report_data['selected_tests']:
-                    if isinstance(test_data, dict):
-                        test_name = test_data.get('name', test_data.get('test_name', ''))
-                        test_filename = test_data.get('filename', test_data.get('test_filename'))
-                    else:
-                        test_name = str(test_data)
-                        test_filename = None
-                    
-                    if test_name:
-                        report_test = ReportTest(
-                            report_id=lab_report.id,
-                            test_name=test_name,
-                            test_filename=test_filename
-                        )
-                        db.session.add(report_test)
+            self._add_report_tests(lab_report, report_data['selected_tests'])
+            
+            # Primera revisión del historial (contenido completo)
+            self.revision_service.record_revision(lab_report.id, lab_report.html_content, created_by=created_by)
+            
+            # Contadores de estadísticas en la misma transacción
+            self.stats_service.on_report_created(db.session, lab_report.status, lab_report.patient_name,
+                                                 lab_report.doctor_name)
             
             db.session.commit()
+            committed = True
+            
+            self._finish_report_file(file_write, report_data['html_content'], file_path)
             
             logger.info(f"Reporte creado exitosamente: {lab_report.order_number}")
             return lab_report
             
         except Exception as e:
             db.session.rollback()
+            if file_write is not None and not committed:
+                # El reporte no se guardó: descartar su archivo
+                file_write.exception()
+                remove_stored(file_path)
             logger.error(f"Error al crear reporte: {str(e)}")
             raise
     
-    def update_report(self, report_id: int, update_data: Dict[str, Any]) -> LabReport:
+    def update_report(self, report_id: int, update_data: Dict[str, Any], updated_by: int = None) -> LabReport:
         """
         Actualizar reporte existente
         
         Args:
             report_id: ID del reporte
             update_data: Datos a actualizar
+            updated_by: ID del usuario que actualiza (se registra en el historial)
             
         Returns:
             LabReport: Reporte actualizado
         """
+        file_write = None
+        committed = False
         try:
             # Buscar reporte
             lab_report = LabReport.query.get(report_id)
@@ -255,13 +413,32 @@ class LabReportService:
                 'reception_date', 'selected_tests', 'html_content', 'status'
             ]
             
+            previous_html = lab_report.html_content
+            previous_status = lab_report.status
+            previous_pdf_title = self._pdf_title(lab_report)
+            
+            # Recomponer el HTML si se enviaron plantillas y resultados
+            if 'tests' in update_data and 'html_content' not in update_data:
+                metadata = {field: update_data.get(field, getattr(lab_report, field))
+                            for field, _ in METADATA_FIELDS}
+                update_data = {**update_data, **self.composer.compose({**metadata, 'tests': update_data['tests']})}
+            
             for field in updatable_fields:
                 if field in update_data:
                     setattr(lab_report, field, update_data[field])
             
             # Si se actualiza el contenido HTML, actualizar el archivo
             if 'html_content' in update_data:
-                self.save_report_file(update_data['html_content'], lab_report.file_path)
+                file_path = lab_report.file_path
+                file_write = self._start_report_file(update_data['html_content'], file_path)
+                
+                # Guardar la nueva versión como diferencia respecto a la anterior
+                self.revision_service.record_revision(report_id, update_data['html_content'],
+                                                      previous_html, created_by=updated_by)
+            
+            # El PDF del contenido o título anterior deja de ser válido (se descarta tras el commit)
+            pdf_changed = bool(previous_html) and (previous_html, previous_pdf_title) != \
+                (lab_report.html_content, self._pdf_title(lab_report))
             
             # Actualizar timestamp
             lab_report.updated_at = datetime.utcnow()
@@ -272,33 +449,241 @@ class LabReportService:
                 ReportTest.query.filter_by(report_id=report_id).delete()
                 
                 # Crear nuevas pruebas
-                if isinstance(update_data['selected_tests'], list):
-                    for test_data in update_data['selected_tests']:
-                        if isinstance(test_data, dict):
-                            test_name = test_data.get('name', test_data.get('test_name', ''))
-                            test_filename = test_data.get('filename', test_data.get('test_filename'))
-                        else:
-                            test_name = str(test_data)
-                            test_filename = None
-                        
-                        if test_name:
-                            report_test = ReportTest(
-                                report_id=lab_report.id,
-                                test_name=test_name,
-                                test_filename=test_filename
-                            )
-                            db.session.add(report_test)
+                self._add_report_tests(lab_report, update_data['selected_tests'])
+            
+            # Contadores de estadísticas en la misma transacción
+            self.stats_service.on_report_updated(db.session, previous_status, lab_report.status,
+                                                 lab_report.patient_name, lab_report.doctor_name)
             
             db.session.commit()
+            committed = True
+            
+            if file_write is not None:
+                self._finish_report_file(file_write, lab_report.html_content, file_path)
+                self._follow_moved_file(report_id, file_path, lab_report.html_content)
+            
+            if pdf_changed:
+                self.pdf_service.invalidate(previous_html, previous_pdf_title)
             
             logger.info(f"Reporte actualizado exitosamente: {lab_report.order_number}")
             return lab_report
             
         except Exception as e:
             db.session.rollback()
+            if file_write is not None and not committed and previous_html:
+                # Restaurar en disco el contenido que sigue en la base de datos
+                file_write.exception()
+                try:
+                    self.file_writer.write(file_path, previous_html)
+                except Exception as restore_error:
+                    logger.error(f"Archivo pendiente de reconciliación {file_path}: {str(restore_error)}")
+                self._follow_moved_file(report_id, file_path, previous_html)
             logger.error(f"Error al actualizar reporte {report_id}: {str(e)}")
             raise
     
+    def create_reports_batch(self, items: List[Dict[str, Any]], created_by: int) -> List[Dict[str, Any]]:
+        """
+        Crear varios reportes en una sola operación
+        
+        Valida todo el lote de una vez (incluye una sola consulta de números de
+        orden existentes), escribe los archivos en paralelo y guarda los reportes
+        válidos en una única transacción. Los elementos inválidos no impiden que
+        se creen los demás.
+        
+        Args:
+            items: Lista de datos de reportes (mismo formato que create_report)
+            created_by: ID del usuario que crea los reportes
+            
+        Returns:
+            List[Dict[str, Any]]: Resultado por elemento, en el orden recibido
+        """
+        if not isinstance(items, list) or not items:
+            raise ValueError("Se requiere una lista 'reports' con al menos un reporte")
+        if len(items) > self.batch_max_size:
+            raise ValueError(f"El lote excede el máximo de {self.batch_max_size} reportes")
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        
+        def fail(index, message):
+            results[index] = {'index': index, 'success': False, 'error': message}
+        
+        # Validación individual y composición en el servidor
+        seen_orders = {}
+        for index, report_data in enumerate(items):
+            try:
+                if not isinstance(report_data, dict):
+                    raise ValueError("Cada reporte debe ser un objeto")
+                if not report_data.get('html_content') and report_data.get('tests'):
+                    report_data = {**report_data, **self.composer.compose(report_data)}
+                
+                for field in ['order_number', 'patient_name', 'html_content', 'selected_tests']:
+                    if field not in report_data or not report_data[field]:
+                        raise ValueError(f"Campo requerido faltante: {field}")
+                
+                content_size = len(report_data['html_content'].encode('utf-8'))
+                if content_size > self.max_file_size:
+                    raise ValueError(f"El contenido excede el tamaño máximo de {self.max_file_size} bytes")
+                
+                order_number = str(report_data['order_number']).strip().upper()
+                if order_number in seen_orders:
+                    raise ValueError(f"Número de orden repetido en el lote (elemento {seen_orders[order_number]})")
+                seen_orders[order_number] = index
+                pending.append((index, order_number, report_data))
+            except ValueError as e:
+                fail(index, str(e))
+        
+        # Números de orden existentes: una sola consulta para todo el lote
+        if pending:
+            existing = {row[0] for row in db.session.query(LabReport.order_number).filter(
+                LabReport.order_number.in_([order_number for _, order_number, _ in pending])
+            )}
+            for index, order_number, _ in pending:
+                if order_number in existing:
+                    fail(index, f"Ya existe un reporte con el número de orden: {order_number}")
+            pending = [entry for entry in pending if results[entry[0]] is None]
+        
+        # Construir los objetos (los validadores del modelo pueden rechazar datos)
+        timestamp = datetime.now()
+        reports = []
+        for index, order_number, report_data in pending:
+            try:
+                file_name = self.generate_file_name(order_number, report_data['patient_name'], timestamp)
+                file_path = self.report_file_path(file_name)
+                lab_report = LabReport(
+                    order_number=report_data['order_number'],
+                    patient_name=report_data['patient_name'],
+                    patient_age=report_data.get('patient_age'),
+                    patient_gender=report_data.get('patient_gender'),
+                    doctor_name=report_data.get('doctor_name'),
+                    reception_date=report_data.get('reception_date'),
+                    file_path=file_path,
+                    file_name=file_name,
+                    selected_tests=report_data['selected_tests'],
+                    html_content=report_data['html_content'],
+                    status=report_data.get('status', 'draft'),
+                    created_by=created_by
+                )
+                reports.append((index, lab_report))
+            except ValueError as e:
+                fail(index, str(e))
+        
+        # Escribir los archivos en paralelo
+        written = []
+        if reports:
+            workers = max(1, min(self.batch_write_workers, len(reports)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self.save_report_file, lab_report.html_content, lab_report.file_path): (index, lab_report)
+                    for index, lab_report in reports
+                }
+                for future, (index, lab_report) in futures.items():
+                    try:
+                        future.result()
+                        written.append((index, lab_report))
+                    except Exception as e:
+                        fail(index, f"Error al guardar archivo: {str(e)}")
+            written.sort(key=lambda entry: entry[0])
+        
+        # Persistir todos los reportes válidos en una sola transacción
+        if written:
+            try:
+                db.session.add_all([lab_report for _, lab_report in written])
+                db.session.flush()  # Para obtener los IDs
+                for _, lab_report in written:
+                    self._add_report_tests(lab_report, lab_report.selected_tests)
+                    self.revision_service.record_revision(lab_report.id, lab_report.html_content,
+                                                          created_by=created_by)
+                created = [lab_report for _, lab_report in written]
+                status_deltas = {}
+                for lab_report in created:
+                    status_deltas[lab_report.status] = status_deltas.get(lab_report.status, 0) + 1
+                self.stats_service.record(db.session, status_deltas,
+                                          [lab_report.patient_name for lab_report in created],
+                                          [lab_report.doctor_name for lab_report in created])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                for _, lab_report in written:
+                    remove_stored(lab_report.file_path)
+                logger.error(f"Error al guardar lote de reportes: {str(e)}")
+                raise
+            
+            for index, lab_report in written:
+                results[index] = {'index': index, 'success': True, 'data': lab_report.to_dict_summary()}
+        
+        logger.info(f"Lote de reportes procesado: {len(written)} de {len(items)} creados")
+        return results
+    
+    def update_reports_status(self, report_ids: List[int], new_status: str) -> List[Dict[str, Any]]:
+        """
+        Cambiar el estado de varios reportes en una sola transacción
+        
+        Solo se permiten transiciones hacia adelante (draft -> final/printed,
+        final -> printed). Un reporte que ya tiene el estado pedido se informa
+        como exitoso sin cambios.
+        
+        Args:
+            report_ids: IDs de los reportes
+            new_status: Estado destino
+            
+        Returns:
+            List[Dict[str, Any]]: Resultado por ID, en el orden recibido
+        """
+        if new_status not in REPORT_STATUSES:
+            raise ValueError(f"Estado inválido: {new_status}. Use: {', '.join(REPORT_STATUSES)}")
+        if not isinstance(report_ids, list) or not report_ids:
+            raise ValueError("Se requiere una lista 'report_ids' con al menos un ID")
+        if len(report_ids) > self.batch_max_size:
+            raise ValueError(f"El lote excede el máximo de {self.batch_max_size} reportes")
+        if not all(isinstance(report_id, int) and not isinstance(report_id, bool) for report_id in report_ids):
+            raise ValueError("Los IDs de reportes deben ser números enteros")
+        
+        try:
+            reports = {report.id: report for report in LabReport.query.filter(LabReport.id.in_(set(report_ids)))}
+            
+            results = []
+            changed = []
+            seen = set()
+            for index, report_id in enumerate(report_ids):
+                lab_report = reports.get(report_id)
+                if not lab_report:
+                    results.append({'index': index, 'id': report_id, 'success': False,
+                                    'error': f"Reporte con ID {report_id} no encontrado"})
+                    continue
+                
+                if report_id in seen or lab_report.status == new_status:
+                    results.append({'index': index, 'id': report_id, 'success': True, 'changed': False,
+                                    'status': new_status})
+                    seen.add(report_id)
+                    continue
+                
+                if new_status not in STATUS_TRANSITIONS.get(lab_report.status, ()):
+                    results.append({'index': index, 'id': report_id, 'success': False,
+                                    'error': f"No se puede cambiar de '{lab_report.status}' a '{new_status}'"})
+                    continue
+                
+                changed.append((lab_report.status, lab_report))
+                lab_report.update_status(new_status)
+                seen.add(report_id)
+                results.append({'index': index, 'id': report_id, 'success': True, 'changed': True,
+                                'status': new_status})
+            
+            if changed:
+                status_deltas = {new_status: len(changed)}
+                for previous_status, _ in changed:
+                    status_deltas[previous_status] = status_deltas.get(previous_status, 0) - 1
+                self.stats_service.record(db.session, status_deltas)
+                db.session.commit()
+            
+            logger.info(f"Estado '{new_status}' aplicado a {len(changed)} de {len(report_ids)} reportes")
+            return results
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error al cambiar estado de reportes: {str(e)}")
+            raise
+    
     def get_report(self, report_id: int, include_html: bool = True) -> Optional[LabReport]:
         """
         Obtener reporte por ID
@@ -357,15 +742,150 @@ class LabReportService:
             logger.error(f"Error al buscar reportes por rango de fechas: {str(e)}")
             raise
     
-    def get_reports_stats(self) -> Dict[str, Any]:
+    def get_reports_page(self, start_date: date, end_date: date, limit: int = None,
+                         cursor: str = None, include_html: bool = False) -> Dict[str, Any]:
+        """
+        Obtener una página de reportes de un rango de fechas
+        
+        Paginación por cursor sobre (reception_date, id): cada página continúa
+        donde terminó la anterior sin OFFSET, y las inserciones concurrentes no
+        desplazan ni repiten resultados.
+        
+        Args:
+            start_date: Fecha de inicio
+            end_date: Fecha de fin
+            limit: Reportes por página
+            cursor: Cursor devuelto por la página anterior
+            include_html: Cargar el contenido HTML
+            
+        Returns:
+            Dict[str, Any]: reports, next_cursor y has_more
+        """
+        limit = self.page_size if limit is None else limit
+        if not 1 <= limit <= self.max_page_size:
+            raise ValueError(f"El límite debe estar entre 1 y {self.max_page_size}")
+        
+        query = LabReport.query_by_date_range(start_date, end_date)
+        if include_html:
+            # to_dict incluye las pruebas: cargarlas en una consulta para toda la página
+            query = query.options(selectinload(LabReport.tests))
+        else:
+            query = query.options(defer(LabReport.html_content))
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(LabReport.reception_date, LabReport.id) < tuple_(cursor_date, cursor_id)
+            )
+        
+        try:
+            # Una fila extra indica si hay otra página
+            reports = query.limit(limit + 1).all()
+        except Exception as e:
+            logger.error(f"Error al paginar reportes por rango de fechas: {str(e)}")
+            raise
+        
+        has_more = len(reports) > limit
+        reports = reports[:limit]
+        next_cursor = encode_cursor(reports[-1].reception_date, reports[-1].id) if has_more else None
+        
+        return {'reports': reports, 'next_cursor': next_cursor, 'has_more': has_more}
+    
+    def iter_reports_by_date_range(self, start_date: date, end_date: date,
+                                   include_html: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Recorrer los reportes de un rango de fechas por lotes
+        
+        Usa yield_per, por lo que la memoria no depende del tamaño del rango.
+        
+        Yields:
+            Dict[str, Any]: Reporte como diccionario (resumido si no se incluye HTML)
+        """
+        query = LabReport.query_by_date_range(start_date, end_date)
+        if include_html:
+            query = query.options(selectinload(LabReport.tests))
+        else:
+            query = query.options(defer(LabReport.html_content))
+        
+        for report in query.yield_per(self.export_batch_size):
+            yield report.to_dict() if include_html else report.to_dict_summary()
+    
+    def export_reports_zip(self, report_ids: List[int] = None, order_number: str = None,
+                           status: str = None, start_date: date = None,
+                           end_date: date = None) -> Iterator[bytes]:
+        """
+        Exportar los archivos HTML de los reportes filtrados como un ZIP en streaming
+        
+        Los reportes se leen por lotes (yield_per) y cada archivo se agrega al
+        ZIP a medida que se consume el iterador, así que la memoria no depende
+        de la cantidad de reportes. Los reportes sin archivo en disco se omiten.
+        
+        Args:
+            report_ids: IDs concretos
+            order_number: Número de orden (exacto)
+            status: Estado del reporte
+            start_date: Fecha de recepción mínima
+            end_date: Fecha de recepción máxima
+            
+        Returns:
+            Iterator[bytes]: Bloques del archivo ZIP
+        """
+        query = LabReport.query_for_export(report_ids, order_number, status, start_date, end_date)
+        query = query.options(defer(LabReport.html_content))
+        
+        def files():
+            for report in query.yield_per(self.export_batch_size):
+                stored_path = resolve_stored_path(report.file_path)
+                if stored_path:
+                    yield stored_path, report.file_name
+        
+        return stream_zip(files(), self.config.HTML_GZIP_COMPRESSION_LEVEL)
+    
+    def get_report_revisions(self, report_id: int) -> Dict[str, Any]:
+        """
+        Listar el historial de revisiones de un reporte
+        
+        Args:
+            report_id: ID del reporte
+            
+        Returns:
+            Dict[str, Any]: Revisiones (sin contenido) y tamaños totales
+        """
+        lab_report = LabReport.query.get(report_id)
+        if not lab_report:
+            raise ValueError(f"Reporte con ID {report_id} no encontrado")
+        
+        return self.revision_service.list_revisions(report_id)
+    
+    def get_report_revision(self, report_id: int, revision: int) -> Dict[str, Any]:
+        """
+        Obtener el contenido de una revisión de un reporte
+        
+        Args:
+            report_id: ID del reporte
+            revision: Número de revisión
+            
+        Returns:
+            Dict[str, Any]: Metadatos de la revisión y html_content
+        """
+        lab_report = LabReport.query.get(report_id)
+        if not lab_report:
+            raise ValueError(f"Reporte con ID {report_id} no encontrado")
+        
+        report_revision, html_content = self.revision_service.get_revision(report_id, revision)
+        return {**report_revision.to_dict(), 'report_id': report_id, 'html_content': html_content}
+    
+    def get_reports_stats(self, exact: bool = False) -> Dict[str, Any]:
         """
         Obtener estadísticas de reportes
         
+        Args:
+            exact: Forzar recálculo exacto en lugar de usar los contadores
+            
         Returns:
             Dict[str, Any]: Estadísticas
         """
         try:
-            return LabReport.get_stats()
+            return self.stats_service.get_stats(exact=exact)
             
         except Exception as e:
             logger.error(f"Error al obtener estadísticas: {str(e)}")
@@ -398,10 +918,17 @@ class LabReportService:
                 except Exception as e:
                     logger.warning(f"No se pudo eliminar archivo {lab_report.file_path}: {str(e)}")
             
+            html_content, pdf_title = lab_report.html_content, self._pdf_title(lab_report)
+            
             # Eliminar de base de datos (cascade eliminará las pruebas)
             db.session.delete(lab_report)
+            self.stats_service.on_report_deleted(db.session, lab_report.status)
             db.session.commit()
             
+            # Eliminar PDF en cache (solo si el reporte ya no existe)
+            if html_content:
+                self.pdf_service.invalidate(html_content, pdf_title)
+            
             logger.info(f"Reporte eliminado exitosamente: {lab_report.order_number}")
             return True
             
@@ -421,35 +948,11 @@ class LabReportService:
             str: Ruta del archivo de backup creado
         """
         try:
-            if not self.backup_enabled:
-                raise ValueError("Backup no está habilitado")
+            # Usa el mismo pipeline que los trabajos en segundo plano, pero de forma síncrona
+            from app.services.report_backup_service import ReportBackupService
             
-            if backup_date is None:
-                backup_date = date.today()
-            
-            # Crear directorio de backup
-            backup_dir = self.reports_base_path / "backups"
-            backup_dir.mkdir(exist_ok=True)
-            
-            # Nombre del archivo de backup
-            backup_filename = f"reports_backup_{backup_date.strftime('%Y%m%d')}.zip"
-            backup_path = backup_dir / backup_filename
-            
-            # Crear archivo ZIP
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(self.reports_base_path):
-                    # Excluir directorio de backups
-                    if 'backups' in root:
-                        continue
-                    
-                    for file in files:
-                        if file.endswith('.html'):
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, self.reports_base_path)
-                            zipf.write(file_path, arcname)
-            
-            logger.info(f"Backup creado exitosamente: {backup_path}")
-            return str(backup_path)
+            job = ReportBackupService(self.config).run_backup(backup_date)
+            return job['backup_path']
             
         except Exception as e:
             logger.error(f"Error al crear backup: {str(e)}")
@@ -494,6 +997,263 @@ class LabReportService:
             logger.error(f"Error en limpieza de backups: {str(e)}")
             raise
     
+    def reconcile_files(self, repair: bool = True, remove_orphans: bool = False) -> Dict[str, Any]:
+        """
+        Reconciliar los archivos en disco con la base de datos
+        
+        Detecta archivos faltantes o con tamaño distinto al ``html_content``
+        guardado (por ejemplo, escrituras interrumpidas) y los vuelve a escribir
+        desde la base de datos. También lista archivos sin reporte asociado y
+        elimina temporales abandonados de escrituras que no terminaron.
+        
+        Args:
+            repair: Reescribir archivos dañados y eliminar temporales abandonados
+            remove_orphans: Eliminar archivos sin reporte en la base de datos
+            
+        Returns:
+            Dict[str, Any]: Resumen de la reconciliación
+        """
+        try:
+            summary = {
+                'checked': 0,
+                'missing': [],
+                'mismatched': [],
+                'repaired': 0,
+                'orphans': [],
+                'orphans_removed': 0,
+                'temp_files_removed': 0
+            }
+            
+            # Comparar tamaños sin cargar el HTML de todos los reportes
+            known_paths = set()
+            damaged = []
+            rows = db.session.query(
+                LabReport.id, LabReport.file_path, func.octet_length(LabReport.html_content)
+            ).yield_per(500)
+            for report_id, file_path, content_size in rows:
+                summary['checked'] += 1
+                known_paths.add(os.path.abspath(logical_path(file_path)))
+                
+                size = stored_size(file_path)
+                if size is None:
+                    summary['missing'].append(report_id)
+                elif content_size is not None and size != content_size % (1 << 32):
+                    summary['mismatched'].append(report_id)
+                else:
+                    continue
+                damaged.append(report_id)
+            
+            if repair:
+                for report_id in damaged:
+                    lab_report = LabReport.query.get(report_id)
+                    if not lab_report or not lab_report.html_content:
+                        continue
+                    try:
+                        self._validate_report_file(lab_report.html_content, lab_report.file_path)
+                        self.file_writer.write(lab_report.file_path, lab_report.html_content)
+                        summary['repaired'] += 1
+                    except Exception as e:
+                        logger.error(f"No se pudo reparar el archivo del reporte {report_id}: {str(e)}")
+            
+            # Archivos sin reporte y temporales de escrituras interrumpidas
+            stale_before = time.time() - STALE_TEMP_FILE_SECONDS
+            for root, dirs, files in os.walk(self.reports_base_path):
+                if root == str(self.reports_base_path):
+                    dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRECTORIES]
+                
+                for name in files:
+                    path = os.path.join(root, name)
+                    if name.endswith(TEMP_SUFFIX):
+                        if repair and os.path.getmtime(path) < stale_before:
+                            os.remove(path)
+                            summary['temp_files_removed'] += 1
+                    elif name.endswith(('.html', '.html' + GZIP_SUFFIX)):
+                        if os.path.abspath(logical_path(path)) in known_paths:
+                            continue
+                        summary['orphans'].append(os.path.relpath(path, self.reports_base_path))
+                        if remove_orphans:
+                            os.remove(path)
+                            summary['orphans_removed'] += 1
+            
+            logger.info(
+                f"Reconciliación de archivos: {summary['checked']} revisados, "
+                f"{len(damaged)} dañados, {summary['repaired']} reparados, "
+                f"{len(summary['orphans'])} sin reporte"
+            )
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Error en reconciliación de archivos: {str(e)}")
+            raise
+    
+    def migrate_storage_layout(self, after_id: int = 0, batch_size: int = None, max_batches: int = None,
+                               dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Mover los archivos de reportes a la distribución configurada sin detener el servicio
+        
+        Recorre los reportes por lotes en orden de ID. En cada lote los archivos
+        se crean en la nueva ubicación (enlace duro) sin quitar los anteriores,
+        se actualiza ``file_path`` de todo el lote en una sola transacción y
+        solo después se quitan los archivos anteriores. Una lectura concurrente
+        encuentra el archivo en cualquier momento; si un reporte se reescribe
+        durante el lote, se conserva la versión más reciente. Se puede
+        interrumpir y continuar con ``after_id`` (``next_after_id`` del resumen).
+        
+        Args:
+            after_id: Continuar después de este ID
+            batch_size: Reportes por lote
+            max_batches: Máximo de lotes en esta ejecución (None = hasta terminar)
+            dry_run: Solo contar los archivos que se moverían
+            
+        Returns:
+            Dict[str, Any]: Resumen de la migración
+        """
+        batch_size = max(1, batch_size or self.migration_batch_size)
+        summary = {
+            'layout': self.layout.layout,
+            'dry_run': dry_run,
+            'checked': 0,
+            'moved': 0,
+            'pending': 0,
+            'missing': [],
+            'errors': [],
+            'next_after_id': after_id,
+            'done': False
+        }
+        batches = 0
+        
+        try:
+            while max_batches is None or batches < max_batches:
+                rows = LabReport.file_rows_after(summary['next_after_id'], batch_size)
+                if not rows:
+                    summary['done'] = True
+                    break
+                batches += 1
+                summary['next_after_id'] = rows[-1][0]
+                
+                moves = []
+                for report_id, file_path, file_name, created_at in rows:
+                    summary['checked'] += 1
+                    stored_path = resolve_stored_path(file_path)
+                    if not stored_path:
+                        summary['missing'].append(report_id)
+                        continue
+                    target = physical_path(
+                        self.layout.path_for(file_name, self._file_moment(file_name, created_at)),
+                        is_compressed(stored_path)
+                    )
+                    if os.path.abspath(stored_path) != os.path.abspath(target):
+                        moves.append((report_id, stored_path, target))
+                
+                if dry_run:
+                    summary['pending'] += len(moves)
+                    continue
+                self._move_report_files(moves, summary)
+            
+            logger.info(
+                f"Migración de distribución ({self.layout.layout}): {summary['checked']} revisados, "
+                f"{summary['moved']} movidos, {len(summary['errors'])} errores"
+            )
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Error en migración de distribución de archivos: {str(e)}")
+            raise
+    
+    def _move_report_files(self, moves: List[Tuple[int, str, str]], summary: Dict[str, Any]) -> None:
+        """Mover un lote de archivos: copiar, actualizar ``file_path`` y quitar los anteriores"""
+        staged = []
+        for report_id, source, target in moves:
+            try:
+                staged.append((report_id, source, target, stage_move(source, target)))
+            except OSError as e:
+                summary['errors'].append({'id': report_id, 'error': str(e)})
+        if not staged:
+            return
+        
+        try:
+            LabReport.update_file_paths({report_id: target for report_id, _, target, _ in staged})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for _, _, target, _ in staged:
+                if os.path.exists(target):
+                    os.remove(target)
+            raise
+        
+        for report_id, source, target, signature in staged:
+            try:
+                # Mismo bloqueo que update_report al seguir un archivo movido
+                with file_lock(logical_path(source), self.lock_dir):
+                    finish_move(source, target, signature)
+            except OSError as e:
+                summary['errors'].append({'id': report_id, 'error': str(e)})
+            summary['moved'] += 1
+    
+    def get_report_file(self, report_id: int) -> Tuple[str, str, str]:
+        """
+        Obtener la ruta en disco del archivo HTML del reporte
+        
+        Args:
+            report_id: ID del reporte
+            
+        Returns:
+            Tuple[str, str, str]: (ruta del archivo, nombre de descarga, estado del reporte)
+        """
+        lab_report = LabReport.query.get(report_id)
+        if not lab_report:
+            raise ValueError(f"Reporte con ID {report_id} no encontrado")
+        
+        if not lab_report.file_exists():
+            raise ValueError(f"Archivo del reporte {report_id} no encontrado")
+        
+        return lab_report.file_path, lab_report.file_name, lab_report.status
+    
+    @staticmethod
+    def _pdf_title(lab_report: LabReport) -> str:
+        """Título del PDF de un reporte (forma parte de su clave de cache)"""
+        return f"Reporte {lab_report.order_number} - {lab_report.patient_name}"
+    
+    def request_report_pdf(self, report_id: int) -> Dict[str, Any]:
+        """
+        Encolar la generación del PDF del reporte
+        
+        Args:
+            report_id: ID del reporte
+            
+        Returns:
+            Dict[str, Any]: Estado del renderizado
+        """
+        lab_report = LabReport.query.get(report_id)
+        if not lab_report:
+            raise ValueError(f"Reporte con ID {report_id} no encontrado")
+        
+        status = self.pdf_service.request_render(lab_report.html_content, self._pdf_title(lab_report))
+        status['report_id'] = report_id
+        return status
+    
+    def get_report_pdf(self, report_id: int) -> Tuple[Dict[str, Any], Optional[str], str]:
+        """
+        Obtener el PDF del reporte desde la cache
+        
+        Args:
+            report_id: ID del reporte
+            
+        Returns:
+            Tuple: (estado del renderizado, ruta del PDF o None, nombre de descarga)
+        """
+        lab_report = LabReport.query.get(report_id)
+        if not lab_report:
+            raise ValueError(f"Reporte con ID {report_id} no encontrado")
+        
+        title = self._pdf_title(lab_report)
+        status = self.pdf_service.get_render_status(lab_report.html_content, title)
+        status['report_id'] = report_id
+        status['report_status'] = lab_report.status
+        pdf_path = self.pdf_service.get_cached_pdf(lab_report.html_content, title)
+        download_name = f"{os.path.splitext(lab_report.file_name)[0]}.pdf"
+        return status, pdf_path, download_name
+    
     def get_file_info(self, report_id: int) -> Dict[str, Any]:
         """
         Obtener información del archivo del reporte
@@ -0,0 +1,264 @@
+"""
+Compilación de la biblioteca de plantillas de pruebas
+
+Las plantillas de ``bocetos_pruebas/html_output`` repiten casi el mismo bloque
+``<style>`` en cada archivo. La compilación:
+
+- minifica cada bloque de estilos (sin comentarios ni espacios sobrantes) y
+  extrae a ``assets/styles.<hash>.css`` los que comparten dos o más
+  plantillas; cada plantilla los enlaza con ``<link>`` (el nombre lleva el
+  hash, así que el archivo se puede cachear como inmutable);
+- minifica el HTML: quita comentarios y colapsa los espacios, y elimina los
+  que quedan junto a etiquetas de bloque (donde no se muestran);
+- escribe ``manifest.json`` con la versión de cada plantilla de origen y de
+  salida, las hojas de estilo y los bytes antes y después.
+
+Cada archivo se escribe de forma atómica y el manifiesto al final, así que el
+catálogo nunca ve una compilación a medias. El catálogo sirve la versión
+compilada de una plantilla solo si su ``source_version`` coincide con el
+archivo de origen actual; si no, sirve el origen.
+
+Uso::
+
+    python -m app.services.lab_template_build [--source DIR] [--output DIR]
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.services.report_storage import atomic_write_bytes
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+ASSETS_DIRECTORY = 'assets'
+ASSET_URL = '/api/lab-tests/assets/{filename}'
+
+# Versión del formato del manifiesto
+BUILD_VERSION = 1
+
+# Plantillas que deben compartir un bloque de estilos para extraerlo a un archivo
+MIN_SHARED_TEMPLATES = 2
+
+# Etiquetas junto a las que los espacios no se muestran
+BLOCK_TAGS = {
+    'html', 'head', 'body', 'meta', 'title', 'link', 'style', 'base',
+    'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'footer', 'section', 'article', 'main', 'nav',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th', 'caption', 'colgroup', 'col',
+    'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'hr', 'br', 'blockquote', 'form', 'fieldset', '!doctype'
+}
+
+_STYLE_BLOCK_RE = re.compile(r'<style[^>]*>(.*?)</style\s*>', re.S | re.I)
+_CSS_STRING_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+# "propiedad : valor" solo dentro de declaraciones (no en selectores como "a :hover")
+_CSS_PROPERTY_RE = re.compile(r'([{;])([-\w]+)\s*:\s*(?=[^{};]*[;}]|$)')
+# Bloques de texto literal, comentarios y etiquetas
+_HTML_TOKEN_RE = re.compile(
+    r'(<(script|style|pre|textarea)\b[^>]*>.*?</\2\s*>|<!--.*?-->|<[^>]*>)', re.S | re.I
+)
+_TAG_NAME_RE = re.compile(r'</?\s*(!?[\w-]+)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def content_version(data: bytes) -> str:
+    """Versión de un contenido (el mismo hash que el ETag de ``file_etag``)"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def minify_css(css: str) -> str:
+    """CSS sin comentarios ni espacios sobrantes (las cadenas entre comillas no se tocan)"""
+    parts = _CSS_STRING_RE.split(_CSS_COMMENT_RE.sub('', css))
+    for index in range(0, len(parts), 2):
+        text = _CSS_PUNCTUATION_RE.sub(r'\1', _WHITESPACE_RE.sub(' ', parts[index]))
+        parts[index] = _CSS_PROPERTY_RE.sub(r'\1\2:', text)
+    css = ''.join(parts).strip()
+    return css.replace(';}', '}')
+
+
+def _tag_name(tag: str) -> str:
+    match = _TAG_NAME_RE.match(tag)
+    return match.group(1).lower() if match else ''
+
+
+def minify_html(content: str) -> str:
+    """
+    HTML sin comentarios y con los espacios colapsados
+    
+    Los espacios junto a etiquetas de bloque se eliminan; entre elementos en
+    línea se deja uno. El contenido de ``script``, ``pre`` y ``textarea`` no se
+    toca y el de ``style`` se minifica.
+    """
+    tokens = _HTML_TOKEN_RE.split(content)
+    # split devuelve texto, etiqueta, nombre del bloque literal, texto, ...; sin los
+    # comentarios, el texto de ambos lados queda unido
+    texts, tags = [tokens[0]], []
+    for tag, text in zip(tokens[1::3], tokens[3::3]):
+        if tag.startswith('<!--'):
+            texts[-1] += text
+        else:
+            tags.append(tag)
+            texts.append(text)
+    
+    output = []
+    for index, text in enumerate(texts):
+        before = _tag_name(tags[index - 1]) if index else 'html'
+        after = _tag_name(tags[index]) if index < len(tags) else 'html'
+        text = _WHITESPACE_RE.sub(' ', text)
+        if before in BLOCK_TAGS:
+            text = text.lstrip(' ')
+        if after in BLOCK_TAGS:
+            text = text.rstrip(' ')
+        output.append(text)
+        
+        if index < len(tags):
+            tag = tags[index]
+            if _tag_name(tag) == 'style':
+                style = _STYLE_BLOCK_RE.match(tag)
+                tag = tag[:style.start(1)] + minify_css(style.group(1)) + tag[style.end(1):]
+            output.append(tag)
+    return ''.join(output)
+
+
+def stylesheet_filename(identifier: str) -> str:
+    return f'styles.{identifier}.css'
+
+
+def load_manifest(output_path: str) -> Optional[Dict[str, Any]]:
+    """Manifiesto de una compilación (None si no existe, no se puede leer o es de otro formato)"""
+    path = os.path.join(output_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudo leer el manifiesto de plantillas {path}: {str(e)}")
+        return None
+    return manifest if manifest.get('version') == BUILD_VERSION else None
+
+
+def build_templates(source_path: str, output_path: str,
+                    min_shared: int = MIN_SHARED_TEMPLATES) -> Dict[str, Any]:
+    """
+    Compilar las plantillas de ``source_path`` en ``output_path``
+    
+    Args:
+        source_path: Directorio con las plantillas originales
+        output_path: Directorio de salida (se crea si no existe)
+        min_shared: Plantillas que deben compartir un bloque de estilos para extraerlo
+    
+    Returns:
+        Dict: El manifiesto escrito
+    """
+    try:
+        sources = []
+        for filename in sorted(os.listdir(source_path)):
+            if not filename.endswith('.html') or filename == 'index.html':
+                continue
+            with open(os.path.join(source_path, filename), 'rb') as f:
+                data = f.read()
+            sources.append((filename, data, data.decode('utf-8', errors='replace')))
+        
+        # Bloques de estilo minificados y cuántas plantillas usan cada uno
+        usage = Counter()
+        for _, _, content in sources:
+            usage.update({content_version(minify_css(css).encode('utf-8'))[:16]
+                          for css in _STYLE_BLOCK_RE.findall(content)})
+        
+        assets_path = os.path.join(output_path, ASSETS_DIRECTORY)
+        os.makedirs(assets_path, exist_ok=True)
+        
+        stylesheets: Dict[str, Dict[str, Any]] = {}
+        templates: Dict[str, Dict[str, Any]] = {}
+        for filename, data, content in sources:
+            linked: List[str] = []
+            
+            def replace_style(match):
+                css = minify_css(match.group(1))
+                identifier = content_version(css.encode('utf-8'))[:16]
+                if usage[identifier] < min_shared:
+                    return f'<style>{css}</style>'
+                if identifier not in stylesheets:
+                    asset = stylesheet_filename(identifier)
+                    atomic_write_bytes(os.path.join(assets_path, asset), css.encode('utf-8'), durable=False)
+                    stylesheets[identifier] = {
+                        'file': f'{ASSETS_DIRECTORY}/{asset}',
+                        'url': ASSET_URL.format(filename=asset),
+                        'size': len(css.encode('utf-8')),
+                        'templates': usage[identifier]
+                    }
+                linked.append(identifier)
+                return f'<link rel="stylesheet" href="{stylesheets[identifier]["url"]}">'
+            
+            output = minify_html(_STYLE_BLOCK_RE.sub(replace_style, content)).encode('utf-8')
+            atomic_write_bytes(os.path.join(output_path, filename), output, durable=False)
+            templates[filename] = {
+                'source_version': content_version(data),
+                'version': content_version(output),
+                'source_size': len(data),
+                'size': len(output),
+                'stylesheets': linked
+            }
+        
+        source_bytes = sum(len(data) for _, data, _ in sources)
+        output_bytes = sum(entry['size'] for entry in templates.values()) + \
+            sum(sheet['size'] for sheet in stylesheets.values())
+        manifest = {
+            'version': BUILD_VERSION,
+            'built_at': datetime.now().isoformat(),
+            'stylesheets': stylesheets,
+            'templates': templates,
+            'source_bytes': source_bytes,
+            'output_bytes': output_bytes
+        }
+        atomic_write_bytes(os.path.join(output_path, MANIFEST_NAME),
+                           json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+        
+        # Quitar lo que dejó una compilación anterior y ya no está en el manifiesto
+        for filename in os.listdir(output_path):
+            if filename.endswith('.html') and filename not in templates:
+                os.remove(os.path.join(output_path, filename))
+        current = {stylesheet_filename(identifier) for identifier in stylesheets}
+        for filename in os.listdir(assets_path):
+            if filename.endswith('.css') and filename not in current:
+                os.remove(os.path.join(assets_path, filename))
+        
+        logger.info(f"Plantillas compiladas: {len(templates)} archivos, {len(stylesheets)} hojas de estilo, "
+                    f"{source_bytes} -> {output_bytes} bytes")
+        return manifest
+    
+    except Exception as e:
+        raise Exception(f"Error al compilar plantillas: {str(e)}")
+
+
+def main(argv: List[str] = None) -> int:
+    from app.config import Config
+    
+    config = Config()
+    parser = argparse.ArgumentParser(description='Compilar las plantillas de pruebas de laboratorio')
+    parser.add_argument('--source', default=config.LAB_TESTS_HTML_PATH, help='Directorio de plantillas originales')
+    parser.add_argument('--output', default=config.LAB_TESTS_BUILD_PATH, help='Directorio de salida')
+    args = parser.parse_args(argv)
+    
+    manifest = build_templates(args.source, args.output)
+    saved = manifest['source_bytes'] - manifest['output_bytes']
+    print(f"{len(manifest['templates'])} plantillas, {len(manifest['stylesheets'])} hojas de estilo compartidas")
+    print(f"{manifest['source_bytes']} -> {manifest['output_bytes']} bytes "
+          f"({saved * 100 // max(manifest['source_bytes'], 1)}% menos)")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
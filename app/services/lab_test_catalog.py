@@ -0,0 +1,380 @@
+"""
+Catálogo en memoria de las plantillas de pruebas de laboratorio
+
+Las plantillas de ``bocetos_pruebas/html_output`` se recorren una sola vez al
+iniciar: por cada archivo se guarda el nombre, la versión (hash del contenido,
+la misma que usa el ETag), el tamaño y la fecha de modificación. Las
+categorías salen de las carpetas ``bocetos_pruebas/<categoría>/``: una
+plantilla pertenece a cada carpeta que tiene un archivo con su nombre; las
+que no están en ninguna carpeta quedan en "Otros".
+
+Al recorrer las plantillas también se extraen su título, analitos y sinónimos
+para la búsqueda aproximada por contenido (ver ``lab_test_search``), y se
+guardan separados sus estilos y su cuerpo para ``bundle``: los bloques
+``<style>`` se identifican por hash, así que las plantillas que comparten CSS
+(casi todas) lo referencian en lugar de repetirlo.
+
+Si hay una compilación (``lab_template_build``) en ``build_path``, cada
+plantilla cuyo origen no cambió desde la compilación se sirve minificada desde
+allí, con sus hojas de estilo compartidas como archivos aparte; las demás se
+sirven desde el origen.
+
+Los endpoints del catálogo (listado, categorías y búsqueda) solo leen la
+instantánea en memoria. Un hilo en segundo plano compara el mtime de los
+directorios y vuelve a recorrerlos cuando cambian (al agregar, quitar o
+renombrar plantillas); la nueva instantánea reemplaza a la anterior de una vez.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.controllers.file_response import file_etag
+from app.services.lab_template_build import ASSETS_DIRECTORY, load_manifest, stylesheet_filename
+from app.services.lab_test_search import LabTestSearchIndex, extract_terms
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Categoría de las plantillas que no están en ninguna carpeta
+UNCATEGORIZED = 'Otros'
+
+# Carpetas del directorio de categorías que no son categorías
+EXCLUDED_DIRECTORIES = {'html_output', '__pycache__'}
+
+TEMPLATE_URL = '/api/lab-tests/html/{filename}?v={version}'
+
+_STYLE_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_BODY_RE = re.compile(r'<body[^>]*>(.*)</body>', re.S | re.I)
+
+
+class LabTestEntry(NamedTuple):
+    """Plantilla del catálogo"""
+    filename: str
+    name: str
+    title: str
+    version: str
+    size: int
+    modified: float
+    categories: Tuple[str, ...]
+    # Archivo que se sirve (el compilado si está al día, si no el origen)
+    path: str = ''
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'filename': self.filename,
+            'name': self.name,
+            'title': self.title,
+            'version': self.version,
+            'url': TEMPLATE_URL.format(filename=self.filename, version=self.version),
+            'size': self.size,
+            'modified': self.modified,
+            'categories': list(self.categories)
+        }
+
+
+def split_template(html_content: str) -> Tuple[List[str], str]:
+    """Bloques ``<style>`` (con espacios normalizados) y contenido del ``<body>`` de una plantilla"""
+    styles = [' '.join(style.split()) for style in _STYLE_RE.findall(html_content)]
+    body_match = _BODY_RE.search(html_content)
+    return styles, (body_match.group(1) if body_match else html_content).strip()
+
+
+def style_id(css: str) -> str:
+    """Identificador de un bloque de estilos (hash del contenido)"""
+    return hashlib.sha256(css.encode('utf-8')).hexdigest()[:16]
+
+
+def category_label(folder: str) -> str:
+    """Nombre de una categoría a partir de su carpeta (``quimica_clinica`` -> ``Quimica Clinica``)"""
+    return folder.replace('_', ' ').strip().title()
+
+
+class _Snapshot:
+    """Estado inmutable del catálogo (se reemplaza completo al recargar)"""
+    
+    __slots__ = ('entries', 'by_filename', 'categories', 'search_index', 'styles', 'documents',
+                 'assets', 'signature', 'available')
+    
+    def __init__(self, entries: List[LabTestEntry], categories: Dict[str, List[str]], signature: Tuple,
+                 available: bool = True, search_index: LabTestSearchIndex = None,
+                 styles: Dict[str, str] = None, documents: Dict[str, Tuple[Tuple[str, ...], str]] = None,
+                 assets: Dict[str, str] = None):
+        self.available = available
+        # Hojas de estilo compiladas: nombre de archivo -> ruta
+        self.assets = assets or {}
+        self.search_index = search_index or LabTestSearchIndex()
+        # Estilos por id y, por plantilla, (ids de sus estilos, cuerpo)
+        self.styles = styles or {}
+        self.documents = documents or {}
+        self.entries = tuple(sorted(entries, key=lambda entry: entry.name))
+        self.by_filename = {entry.filename: entry for entry in self.entries}
+        self.categories = categories
+        self.signature = signature
+
+
+class LabTestCatalog:
+    """Índice en memoria de las plantillas de pruebas con recarga por cambio de directorio"""
+    
+    def __init__(self, templates_path: str, categories_path: str = None, reload_interval: int = 5,
+                 build_path: str = None):
+        self.templates_path = str(templates_path)
+        self.categories_path = str(categories_path or os.path.dirname(os.path.abspath(self.templates_path)))
+        self.build_path = str(build_path) if build_path else None
+        self.reload_interval = reload_interval
+        
+        self._snapshot = _Snapshot([], {}, (), available=False)
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        
+        self.reload()
+    
+    # Recorrido del disco (solo al iniciar y cuando cambian los directorios)
+    
+    def _category_folders(self) -> List[str]:
+        if not os.path.isdir(self.categories_path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.categories_path)
+            if name not in EXCLUDED_DIRECTORIES and not name.startswith('.')
+            and os.path.isdir(os.path.join(self.categories_path, name))
+            and os.path.abspath(os.path.join(self.categories_path, name)) != os.path.abspath(self.templates_path)
+        )
+    
+    def _signature(self) -> Tuple:
+        """mtime de los directorios observados (cambia al agregar, quitar o renombrar archivos)"""
+        signature = []
+        build_paths = [self.build_path] if self.build_path else []
+        for path in [self.templates_path, self.categories_path] + build_paths + [
+            os.path.join(self.categories_path, folder) for folder in self._category_folders()
+        ]:
+            try:
+                signature.append((path, os.stat(path).st_mtime_ns))
+            except FileNotFoundError:
+                signature.append((path, None))
+        return tuple(signature)
+    
+    def _scan(self, signature: Tuple) -> _Snapshot:
+        membership: Dict[str, List[str]] = {}
+        for folder in self._category_folders():
+            label = category_label(folder)
+            for filename in os.listdir(os.path.join(self.categories_path, folder)):
+                if filename.endswith('.html'):
+                    membership.setdefault(filename, []).append(label)
+        
+        # Compilación: hojas de estilo compartidas (id -> CSS) y plantillas compiladas
+        manifest = load_manifest(self.build_path) if self.build_path else None
+        built_templates = manifest['templates'] if manifest else {}
+        assets: Dict[str, str] = {}
+        shared_styles: Dict[str, str] = {}
+        for identifier in (manifest['stylesheets'] if manifest else {}):
+            asset_path = os.path.join(self.build_path, ASSETS_DIRECTORY, stylesheet_filename(identifier))
+            try:
+                with open(asset_path, 'r', encoding='utf-8') as f:
+                    shared_styles[identifier] = f.read()
+                assets[stylesheet_filename(identifier)] = asset_path
+            except OSError as e:
+                logger.warning(f"No se pudo leer la hoja de estilo {asset_path}: {str(e)}")
+        
+        entries = []
+        search_index = LabTestSearchIndex()
+        styles: Dict[str, str] = {}
+        documents: Dict[str, Tuple[Tuple[str, ...], str]] = {}
+        available = os.path.isdir(self.templates_path)
+        if available:
+            for filename in os.listdir(self.templates_path):
+                if not filename.endswith('.html') or filename == 'index.html':
+                    continue
+                path = os.path.join(self.templates_path, filename)
+                try:
+                    stat = os.stat(path)
+                    version = file_etag(path)
+                    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                        content = f.read()
+                except OSError as e:
+                    logger.warning(f"No se pudo leer la plantilla {filename}: {str(e)}")
+                    continue
+                name = os.path.splitext(filename)[0]
+                terms = extract_terms(content)
+                search_index.add(filename, name, terms)
+                
+                # Servir la versión compilada si se compiló a partir de este mismo origen
+                style_ids = []
+                built = built_templates.get(filename)
+                if built and built.get('source_version') == version \
+                        and all(identifier in shared_styles for identifier in built['stylesheets']):
+                    built_path = os.path.join(self.build_path, filename)
+                    try:
+                        built_version = file_etag(built_path)
+                        with open(built_path, 'r', encoding='utf-8', errors='replace') as f:
+                            built_content = f.read()
+                        path, version, content = built_path, built_version, built_content
+                        stat = os.stat(built_path)
+                        for identifier in built['stylesheets']:
+                            styles[identifier] = shared_styles[identifier]
+                            style_ids.append(identifier)
+                    except OSError as e:
+                        logger.warning(f"No se pudo leer la plantilla compilada {filename}: {str(e)}")
+                
+                template_styles, body = split_template(content)
+                for css in template_styles:
+                    styles.setdefault(style_id(css), css)
+                    style_ids.append(style_id(css))
+                documents[filename] = (tuple(style_ids), body)
+                
+                entries.append(LabTestEntry(
+                    filename=filename,
+                    name=name,
+                    title=terms['title'] or name,
+                    version=version,
+                    size=stat.st_size,
+                    modified=stat.st_mtime,
+                    categories=tuple(membership.get(filename) or (UNCATEGORIZED,)),
+                    path=path
+                ))
+        else:
+            logger.warning(f"Directorio de plantillas no encontrado: {self.templates_path}")
+        
+        categories: Dict[str, List[str]] = {}
+        for entry in sorted(entries, key=lambda entry: entry.filename):
+            for label in entry.categories:
+                categories.setdefault(label, []).append(entry.filename)
+        # Orden alfabético, con "Otros" al final
+        order = sorted(categories, key=lambda label: (label == UNCATEGORIZED, label))
+        categories = {label: categories[label] for label in order}
+        
+        return _Snapshot(entries, categories, signature, available, search_index, styles, documents, assets)
+    
+    def reload(self) -> int:
+        """
+        Volver a recorrer las plantillas y las carpetas de categorías
+        
+        Returns:
+            int: Número de plantillas en el catálogo
+        """
+        snapshot = self._scan(self._signature())
+        with self._lock:
+            self._snapshot = snapshot
+        logger.info(f"Catálogo de pruebas cargado: {len(snapshot.entries)} plantillas, "
+                    f"{len(snapshot.categories)} categorías")
+        return len(snapshot.entries)
+    
+    def refresh(self) -> bool:
+        """
+        Recargar solo si cambió el mtime de algún directorio
+        
+        Returns:
+            bool: True si el catálogo se recargó
+        """
+        if self._signature() == self._snapshot.signature:
+            return False
+        self.reload()
+        return True
+    
+    def start_watcher(self):
+        """Iniciar (una sola vez) el hilo que recarga el catálogo cuando cambian los directorios"""
+        if self.reload_interval <= 0 or self._watcher is not None:
+            return
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_loop, name='lab-test-catalog-watcher',
+                                                 daemon=True)
+                self._watcher.start()
+    
+    def _watch_loop(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error al recargar el catálogo de pruebas: {str(e)}")
+    
+    def close(self):
+        """Detener el hilo de recarga"""
+        self._stop.set()
+    
+    # Consultas (solo memoria)
+    
+    def __len__(self) -> int:
+        return len(self._snapshot.entries)
+    
+    @property
+    def available(self) -> bool:
+        """Indica si el directorio de plantillas existía en el último recorrido"""
+        return self._snapshot.available
+    
+    def get(self, filename: str) -> Optional[LabTestEntry]:
+        """Plantilla por nombre de archivo"""
+        return self._snapshot.by_filename.get(filename)
+    
+    def asset(self, filename: str) -> Optional[str]:
+        """Ruta de una hoja de estilo compilada (solo las del manifiesto vigente)"""
+        return self._snapshot.assets.get(filename)
+    
+    @staticmethod
+    def _filename(template_id: str) -> str:
+        template_id = str(template_id)
+        return template_id if template_id.endswith('.html') else f'{template_id}.html'
+    
+    def resolve(self, template_id: str) -> Optional[LabTestEntry]:
+        """Plantilla por id (nombre sin extensión) o por nombre de archivo"""
+        return self.get(self._filename(template_id))
+    
+    def bundle(self, template_ids: List[str]) -> Dict[str, Any]:
+        """
+        Varias plantillas en una sola respuesta, desde memoria
+        
+        Cada plantilla trae su cuerpo y los ids de sus estilos; cada bloque de
+        estilos aparece una sola vez en ``styles`` aunque lo usen varias plantillas.
+        
+        Returns:
+            Dict con ``styles`` (id -> CSS), ``templates`` (en el orden pedido) y
+            ``missing`` (ids que no están en el catálogo)
+        """
+        snapshot = self._snapshot
+        styles: Dict[str, str] = {}
+        templates = []
+        missing = []
+        for template_id in template_ids:
+            entry = snapshot.by_filename.get(self._filename(template_id))
+            if entry is None:
+                missing.append(template_id)
+                continue
+            style_ids, body = snapshot.documents[entry.filename]
+            for identifier in style_ids:
+                styles[identifier] = snapshot.styles[identifier]
+            templates.append({
+                'id': entry.name,
+                'filename': entry.filename,
+                'title': entry.title,
+                'version': entry.version,
+                'styles': list(style_ids),
+                'html': body
+            })
+        return {'styles': styles, 'templates': templates, 'missing': missing}
+    
+    def list_tests(self) -> List[Dict[str, Any]]:
+        """Plantillas ordenadas por nombre"""
+        return [entry.to_dict() for entry in self._snapshot.entries]
+    
+    def categories(self) -> Dict[str, List[str]]:
+        """Nombres de archivo por categoría"""
+        return {label: list(filenames) for label, filenames in self._snapshot.categories.items()}
+    
+    def search(self, term: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Plantillas que coinciden con ``term`` por nombre, título, analitos o sinónimos
+        
+        Búsqueda aproximada sin acentos (ver ``lab_test_search``), de mayor a
+        menor puntaje. Cada resultado incluye ``score`` y los textos que coincidieron.
+        """
+        snapshot = self._snapshot
+        results = []
+        for hit in snapshot.search_index.search(term, limit):
+            result = snapshot.by_filename[hit['key']].to_dict()
+            result.update(score=hit['score'], matches=hit['matches'])
+            results.append(result)
+        return results
@@ -0,0 +1,186 @@
+"""
+Búsqueda aproximada de plantillas de pruebas por contenido
+
+De cada plantilla se extraen el título (``<title>`` o ``<h1>``), los analitos
+(primera celda de cada fila de resultados, p. ej. "HEMOGLOBINA (HB)") y los
+sinónimos (las abreviaturas entre paréntesis, p. ej. "HB", "TSH"). Todo se
+normaliza sin acentos y en minúsculas, así que "hemoglobina" encuentra
+"HEMOGLOBÍNA" y "tiroides" encuentra "TIROIDES".
+
+Cada palabra del vocabulario se indexa por sus trigramas. Una palabra de la
+consulta se compara con las palabras que comparten algún trigrama
+(similitud de Jaccard entre los conjuntos de trigramas; los prefijos cuentan
+como coincidencia fuerte), por lo que tolera errores de escritura
+("hemoglovina"). El puntaje de una plantilla suma, por cada palabra de la
+consulta, la mejor similitud ponderada por el campo donde aparece (título y
+sinónimos pesan más que los analitos). Todas las palabras de la consulta deben
+coincidir con algo en la plantilla.
+"""
+
+import re
+import html
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# Peso de cada campo en el puntaje
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'title': 3.0,
+    'synonym': 2.5,
+    'analyte': 2.0,
+}
+
+# Similitud mínima (Jaccard de trigramas) para considerar que dos palabras coinciden
+MIN_SIMILARITY = 0.35
+
+# Similitud de una palabra que empieza con la de la consulta
+PREFIX_SIMILARITY = 0.9
+
+_STYLE_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.S | re.I)
+_TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.S | re.I)
+_H1_RE = re.compile(r'<h1[^>]*>(.*?)</h1>', re.S | re.I)
+_ROW_RE = re.compile(r'<tr[^>]*>(.*?)</tr>', re.S | re.I)
+_FIRST_CELL_RE = re.compile(r'<td[^>]*>(.*?)</td>', re.S | re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+_PARENTHESES_RE = re.compile(r'\(([^()]{1,30})\)')
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+_TITLE_SUFFIX = ' - Laboratorio Esperanza'
+
+
+def fold(text: str) -> str:
+    """Texto sin acentos, en minúsculas y con la puntuación reemplazada por espacios"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigramas de una palabra (con relleno para que las palabras cortas tengan trigramas)"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _text(fragment: str) -> str:
+    return ' '.join(html.unescape(_TAG_RE.sub(' ', fragment)).split())
+
+
+def extract_terms(html_content: str) -> Dict[str, Any]:
+    """
+    Título, analitos y sinónimos de una plantilla
+    
+    Returns:
+        Dict con ``title`` (texto), ``analytes`` y ``synonyms`` (listas sin repetir)
+    """
+    content = _STYLE_RE.sub(' ', html_content)
+    title_match = _TITLE_RE.search(content) or _H1_RE.search(content)
+    title = _text(title_match.group(1)).replace(_TITLE_SUFFIX, '') if title_match else ''
+    
+    analytes = []
+    for row in _ROW_RE.findall(content):
+        cell = _FIRST_CELL_RE.search(row)
+        if cell:
+            label = _text(cell.group(1)).rstrip(':').strip()
+            if label and label not in analytes and any(char.isalpha() for char in label):
+                analytes.append(label)
+    
+    synonyms = []
+    for text in [title] + analytes:
+        for synonym in _PARENTHESES_RE.findall(text):
+            synonym = synonym.strip()
+            if synonym and synonym not in synonyms:
+                synonyms.append(synonym)
+    
+    return {'title': title, 'analytes': analytes, 'synonyms': synonyms}
+
+
+class LabTestSearchIndex:
+    """Índice invertido por trigramas de las plantillas de pruebas (solo memoria)"""
+    
+    def __init__(self):
+        self._documents: List[str] = []
+        # Palabra -> {documento: (peso, texto original donde aparece)}
+        self._postings: Dict[str, Dict[int, Tuple[float, str]]] = {}
+        self._trigram_words: Dict[str, Set[str]] = defaultdict(set)
+        self._word_trigrams: Dict[str, Set[str]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._documents)
+    
+    def add(self, key: str, name: str, terms: Dict[str, Any]):
+        """Agregar una plantilla (``terms`` como lo devuelve ``extract_terms``)"""
+        document = len(self._documents)
+        self._documents.append(key)
+        
+        fields = [('name', name.replace('_', ' ')), ('title', terms.get('title') or '')]
+        fields += [('synonym', synonym) for synonym in terms.get('synonyms') or []]
+        fields += [('analyte', analyte) for analyte in terms.get('analytes') or []]
+        
+        for field, text in fields:
+            weight = FIELD_WEIGHTS[field]
+            for word in fold(text).split():
+                postings = self._postings.setdefault(word, {})
+                if weight > postings.get(document, (0.0, ''))[0]:
+                    postings[document] = (weight, text)
+                if word not in self._word_trigrams:
+                    grams = trigrams(word)
+                    self._word_trigrams[word] = grams
+                    for gram in grams:
+                        self._trigram_words[gram].add(word)
+    
+    def _similar_words(self, word: str) -> Iterable[Tuple[str, float]]:
+        """Palabras del vocabulario parecidas a ``word`` con su similitud"""
+        grams = trigrams(word)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigram_words.get(gram, ()):
+                shared[candidate] += 1
+        
+        for candidate, count in shared.items():
+            if candidate == word:
+                similarity = 1.0
+            elif candidate.startswith(word):
+                similarity = PREFIX_SIMILARITY
+            else:
+                similarity = count / (len(grams) + len(self._word_trigrams[candidate]) - count)
+            if similarity >= MIN_SIMILARITY:
+                yield candidate, similarity
+    
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Plantillas que coinciden con la consulta, de mayor a menor puntaje
+        
+        Returns:
+            Lista de {``key``, ``score``, ``matches``}; ``matches`` son los textos
+            de la plantilla que coincidieron (título, sinónimos o analitos)
+        """
+        words = fold(query).split()
+        if not words:
+            return []
+        
+        scores: Dict[int, float] = {}
+        matches: Dict[int, List[str]] = defaultdict(list)
+        for position, word in enumerate(words):
+            best: Dict[int, Tuple[float, str]] = {}
+            for candidate, similarity in self._similar_words(word):
+                for document, (weight, text) in self._postings[candidate].items():
+                    score = similarity * weight
+                    if score > best.get(document, (0.0, ''))[0]:
+                        best[document] = (score, text)
+            
+            # Todas las palabras deben coincidir: quedarse con los documentos que siguen en carrera
+            if position:
+                best = {document: value for document, value in best.items() if document in scores}
+            scores = {document: scores.get(document, 0.0) + score for document, (score, _) in best.items()}
+            for document, (_, text) in best.items():
+                if text not in matches[document]:
+                    matches[document].append(text)
+            if not scores:
+                return []
+        
+        ranked = sorted(scores, key=lambda document: (-scores[document], self._documents[document]))
+        return [
+            {'key': self._documents[document], 'score': round(scores[document], 3), 'matches': matches[document]}
+            for document in ranked[:limit]
+        ]
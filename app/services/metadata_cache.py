@@ -0,0 +1,99 @@
+"""
+Cache en memoria de archivos de metadatos (.meta)
+
+Cada entrada guarda el texto JSON del archivo junto con ``(st_mtime_ns,
+st_size)``; una lectura cuesta un ``os.stat`` y solo vuelve a abrir el archivo
+si cambió en disco. El tamaño está acotado con desalojo LRU. Cada lectura
+devuelve un diccionario nuevo, por lo que quien lo reciba puede modificarlo sin
+afectar al cache.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.services.report_storage import atomic_write_bytes
+
+
+class MetadataCache:
+    """Cache LRU de metadatos JSON validado por mtime y tamaño"""
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(0, max_entries)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def _signature(stat: os.stat_result) -> tuple:
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _store(self, path: str, signature: tuple, text: str):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[path] = (signature, text)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def load(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Leer un archivo de metadatos usando el cache
+        
+        Returns:
+            Diccionario con los metadatos o None si el archivo no existe
+        """
+        try:
+            signature = self._signature(os.stat(path))
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+        
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached and cached[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return json.loads(cached[1])
+            self.misses += 1
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        metadata = json.loads(text)
+        self._store(path, signature, text)
+        return metadata
+    
+    def write(self, path: str, metadata: Dict[str, Any]):
+        """Escribir (de forma atómica y en formato compacto) un archivo de metadatos y actualizar su entrada"""
+        text = json.dumps(metadata, ensure_ascii=False, separators=(',', ':'))
+        atomic_write_bytes(path, text.encode('utf-8'), durable=False)
+        self._store(path, self._signature(os.stat(path)), text)
+    
+    def invalidate(self, path: str):
+        """Descartar la entrada de un archivo"""
+        with self._lock:
+            self._entries.pop(path, None)
+    
+    def clear(self):
+        """Vaciar el cache"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso (aciertos, fallos, desalojos y tasa de aciertos)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,191 @@
+"""
+Conversión de reportes HTML a PDF con reportlab
+
+Es un renderizador deliberadamente simple: interpreta la estructura de los
+reportes del laboratorio (encabezados, párrafos, tablas de resultados) y la
+dibuja con platypus. No ejecuta CSS ni JavaScript.
+"""
+
+import io
+import re
+from html import escape
+from html.parser import HTMLParser
+from typing import List, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+# Incrementar cuando cambie la salida del renderizador: invalida la cache de PDFs
+RENDERER_VERSION = '1'
+
+# Etiquetas cuyo contenido no se dibuja
+_SKIPPED_TAGS = {'head', 'style', 'script', 'title', 'noscript'}
+
+# Etiquetas que cierran el párrafo en curso
+_BLOCK_TAGS = {'p', 'div', 'section', 'article', 'header', 'footer', 'li', 'ul', 'ol', 'br', 'hr'}
+
+# Formato en línea soportado por Paragraph de reportlab
+_INLINE_TAGS = {'b': 'b', 'strong': 'b', 'i': 'i', 'em': 'i', 'u': 'u', 'sub': 'sub', 'sup': 'super'}
+
+
+def _paragraph(markup: str, style) -> Paragraph:
+    """Crear párrafo; si el formato en línea quedó mal anidado se usa texto plano"""
+    try:
+        return Paragraph(markup, style)
+    except ValueError:
+        plain = re.sub(r'</?(b|i|u|sub|super)>', '', markup)
+        return Paragraph(plain, style)
+
+
+class _ReportHTMLParser(HTMLParser):
+    """Convierte el HTML del reporte en una lista de flowables de platypus"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        styles = getSampleStyleSheet()
+        self.body_style = styles['BodyText']
+        self.heading_styles = {
+            'h1': styles['Heading1'], 'h2': styles['Heading2'], 'h3': styles['Heading3'],
+            'h4': styles['Heading4'], 'h5': styles['Heading5'], 'h6': styles['Heading6']
+        }
+        self.flowables = []
+        self._skip_depth = 0
+        self._text: List[str] = []
+        self._heading: Optional[str] = None
+        self._rows: Optional[List[List[Paragraph]]] = None
+        self._header_rows = 0
+        self._row: Optional[List[Paragraph]] = None
+        self._in_header_cell = False
+    
+    # Manejo del texto acumulado
+    
+    def _flush_text(self) -> Optional[Paragraph]:
+        markup = ' '.join(''.join(self._text).split())
+        self._text = []
+        if not markup:
+            return None
+        style = self.heading_styles.get(self._heading, self.body_style)
+        return _paragraph(markup, style)
+    
+    def _flush_block(self) -> None:
+        if self._row is not None:
+            return
+        paragraph = self._flush_text()
+        if paragraph is not None:
+            self.flowables.append(paragraph)
+    
+    # Callbacks de HTMLParser
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        
+        if tag in self.heading_styles:
+            self._flush_block()
+            self._heading = tag
+        elif tag in _BLOCK_TAGS:
+            self._flush_block()
+        elif tag in _INLINE_TAGS:
+            self._text.append(f'<{_INLINE_TAGS[tag]}>')
+        elif tag == 'table':
+            self._flush_block()
+            self._rows = []
+            self._header_rows = 0
+        elif tag == 'tr' and self._rows is not None:
+            self._row = []
+            self._in_header_cell = False
+        elif tag in ('td', 'th') and self._row is not None:
+            self._text = []
+            self._in_header_cell = self._in_header_cell or tag == 'th'
+        elif tag == 'input':
+            # Los reportes editables guardan valores en inputs
+            value = dict(attrs).get('value')
+            if value:
+                self._text.append(escape(value))
+    
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if self._skip_depth:
+            return
+        
+        if tag in self.heading_styles:
+            self._flush_block()
+            self._heading = None
+        elif tag in _BLOCK_TAGS:
+            self._flush_block()
+        elif tag in _INLINE_TAGS:
+            self._text.append(f'</{_INLINE_TAGS[tag]}>')
+        elif tag in ('td', 'th') and self._row is not None:
+            markup = ' '.join(''.join(self._text).split())
+            self._text = []
+            self._row.append(_paragraph(markup, self.body_style))
+        elif tag == 'tr' and self._row is not None:
+            if self._row:
+                if self._in_header_cell and len(self._rows) == self._header_rows:
+                    self._header_rows += 1
+                self._rows.append(self._row)
+            self._row = None
+        elif tag == 'table' and self._rows is not None:
+            self._append_table(self._rows, self._header_rows)
+            self._rows = None
+    
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._text.append(escape(data))
+    
+    def close(self):
+        super().close()
+        self._flush_block()
+    
+    def _append_table(self, rows: List[List[Paragraph]], header_rows: int) -> None:
+        if not rows:
+            return
+        columns = max(len(row) for row in rows)
+        rows = [row + [''] * (columns - len(row)) for row in rows]
+        
+        table = Table(rows, repeatRows=header_rows, hAlign='LEFT')
+        style = [
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]
+        if header_rows:
+            style.append(('BACKGROUND', (0, 0), (-1, header_rows - 1), colors.HexColor('#e8eef5')))
+        table.setStyle(TableStyle(style))
+        
+        self.flowables.append(table)
+        self.flowables.append(Spacer(1, 0.4 * cm))
+
+
+def render_html_to_pdf(html_content: str, title: str = 'Reporte de Laboratorio') -> bytes:
+    """
+    Renderizar HTML de un reporte a PDF
+    
+    Args:
+        html_content: HTML del reporte
+        title: Título de los metadatos del PDF
+    
+    Returns:
+        bytes: Documento PDF
+    """
+    parser = _ReportHTMLParser()
+    parser.feed(html_content)
+    parser.close()
+    
+    flowables = parser.flowables or [Paragraph('', parser.body_style)]
+    
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=letter, title=title,
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        invariant=1  # Sin fecha de creación: el mismo HTML produce los mismos bytes
+    )
+    document.build(flowables)
+    return buffer.getvalue()
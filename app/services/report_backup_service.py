@@ -0,0 +1,290 @@
+"""
+Servicio para backups de reportes en segundo plano
+"""
+
+import os
+import json
+import uuid
+import zlib
+import zipfile
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import Config
+from app.services.zip_stream import ZipStreamWriter, get_zip_method, compress_bytes
+from app.services.report_storage import GZIP_SUFFIX, is_compressed
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Directorios dentro de la carpeta de reportes que no forman parte del backup
+EXCLUDED_DIRECTORIES = {'backups', 'pdf_cache'}
+
+
+def _compress_chunk(tasks: List[Tuple[str, str]], method: int, level: int) -> List[Tuple[str, bytes, int, int, float, int]]:
+    """
+    Comprimir un bloque de archivos (se ejecuta en un proceso del pool)
+    
+    Los archivos ya comprimidos en disco (.html.gz) se guardan sin recomprimir.
+    
+    Returns:
+        List: (arcname, datos comprimidos, crc32, tamaño original, mtime, método) por archivo
+    """
+    results = []
+    for file_path, arcname in tasks:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        mtime = os.path.getmtime(file_path)
+        entry_method = zipfile.ZIP_STORED if is_compressed(file_path) else method
+        results.append((arcname, compress_bytes(data, entry_method, level), zlib.crc32(data),
+                        len(data), mtime, entry_method))
+    return results
+
+
+class ReportBackupService:
+    """Servicio para crear backups comprimidos de reportes como trabajos en segundo plano"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.reports_base_path = Path(config.REPORTS_BASE_PATH)
+        self.backup_dir = self.reports_base_path / "backups"
+        self.jobs_dir = self.backup_dir / "jobs"
+        self.backup_enabled = config.REPORTS_BACKUP_ENABLED
+        self.codec = config.REPORTS_BACKUP_CODEC
+        self.compression_level = config.REPORTS_BACKUP_COMPRESSION_LEVEL
+        self.max_workers = max(1, config.REPORTS_BACKUP_WORKERS)
+        self.chunk_size = max(1, config.REPORTS_BACKUP_CHUNK_SIZE)
+        
+        # Validar codec al iniciar para fallar temprano con una configuración inválida
+        self.method = get_zip_method(self.codec)
+        
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def start_backup_job(self, backup_date: date = None) -> Dict[str, Any]:
+        """
+        Encolar la creación de un backup en segundo plano
+        
+        Args:
+            backup_date: Fecha del backup (por defecto hoy)
+        
+        Returns:
+            Dict[str, Any]: Estado inicial del trabajo
+        """
+        if not self.backup_enabled:
+            raise ValueError("Backup no está habilitado")
+        
+        if backup_date is None:
+            backup_date = date.today()
+        
+        backup_filename = f"reports_backup_{backup_date.strftime('%Y%m%d')}.zip"
+        
+        with self._lock:
+            # Reutilizar un trabajo en curso para el mismo archivo de backup
+            for job in self._jobs.values():
+                if job['backup_filename'] == backup_filename and job['status'] in ('queued', 'running'):
+                    return dict(job)
+            
+            job = self._new_job(backup_date, backup_filename)
+            self._jobs[job['job_id']] = job
+            self._persist_job(job)
+        
+        thread = threading.Thread(
+            target=self._run_job,
+            args=(job['job_id'],),
+            name=f"report-backup-{job['job_id'][:8]}",
+            daemon=True
+        )
+        thread.start()
+        
+        logger.info(f"Trabajo de backup encolado: {job['job_id']}")
+        return dict(job)
+    
+    def run_backup(self, backup_date: date = None) -> Dict[str, Any]:
+        """
+        Crear un backup de forma síncrona (para scripts y tareas programadas)
+        
+        Returns:
+            Dict[str, Any]: Estado final del trabajo
+        """
+        if not self.backup_enabled:
+            raise ValueError("Backup no está habilitado")
+        
+        if backup_date is None:
+            backup_date = date.today()
+        
+        job = self._new_job(backup_date, f"reports_backup_{backup_date.strftime('%Y%m%d')}.zip")
+        with self._lock:
+            self._jobs[job['job_id']] = job
+        self._run_job(job['job_id'])
+        
+        job = self.get_backup_job(job['job_id'])
+        if job['status'] == 'failed':
+            raise Exception(job['error'])
+        return job
+    
+    def get_backup_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el estado de un trabajo de backup
+        
+        Busca primero en memoria y luego en el registro en disco, de modo que el
+        progreso es visible desde cualquier proceso del servidor.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        
+        # Validar formato del identificador antes de tocar el sistema de archivos
+        try:
+            uuid.UUID(hex=job_id)
+        except (ValueError, TypeError):
+            return None
+        
+        job_file = self.jobs_dir / f"{job_id}.json"
+        try:
+            with open(job_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado del backup {job_id}: {str(e)}")
+            return None
+    
+    def _new_job(self, backup_date: date, backup_filename: str) -> Dict[str, Any]:
+        """Crear registro inicial de un trabajo"""
+        return {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'backup_date': backup_date.isoformat(),
+            'backup_filename': backup_filename,
+            'backup_path': None,
+            'codec': self.codec,
+            'compression_level': self.compression_level,
+            'workers': self.max_workers,
+            'files_total': 0,
+            'files_done': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'progress': 0.0,
+            'created_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None
+        }
+    
+    def _update_job(self, job_id: str, **changes) -> None:
+        """Actualizar estado del trabajo en memoria y en disco"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            if job['files_total']:
+                job['progress'] = round(job['files_done'] * 100.0 / job['files_total'], 1)
+            snapshot = dict(job)
+        self._persist_job(snapshot)
+    
+    def _persist_job(self, job: Dict[str, Any]) -> None:
+        """Guardar estado del trabajo en disco de forma atómica"""
+        try:
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            job_file = self.jobs_dir / f"{job['job_id']}.json"
+            tmp_file = job_file.with_suffix('.json.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(tmp_file, job_file)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el estado del backup {job['job_id']}: {str(e)}")
+    
+    def _collect_files(self) -> List[Tuple[str, str]]:
+        """Listar archivos de reportes a incluir en el backup"""
+        tasks = []
+        for root, dirs, files in os.walk(self.reports_base_path):
+            # Excluir directorios que no contienen reportes
+            if root == str(self.reports_base_path):
+                dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRECTORIES]
+            
+            for file in files:
+                if file.endswith(('.html', '.html' + GZIP_SUFFIX)):
+                    file_path = os.path.join(root, file)
+                    arcname = os.path.relpath(file_path, self.reports_base_path)
+                    tasks.append((file_path, arcname))
+        tasks.sort(key=lambda task: task[1])
+        return tasks
+    
+    def _run_job(self, job_id: str) -> None:
+        """Ejecutar el trabajo de backup"""
+        with self._lock:
+            backup_filename = self._jobs[job_id]['backup_filename']
+        
+        backup_path = self.backup_dir / backup_filename
+        partial_path = self.backup_dir / f"{backup_filename}.partial"
+        
+        try:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            tasks = self._collect_files()
+            self._update_job(job_id, status='running', files_total=len(tasks),
+                             started_at=datetime.utcnow().isoformat())
+            
+            chunks = [tasks[i:i + self.chunk_size] for i in range(0, len(tasks), self.chunk_size)]
+            
+            # El ZIP se escribe directamente a disco a medida que llegan los bloques comprimidos
+            with open(partial_path, 'wb') as f:
+                writer = ZipStreamWriter(f, self.method, self.compression_level)
+                for results in self._compress_chunks(chunks):
+                    bytes_in = 0
+                    for arcname, compressed, crc, file_size, mtime, method in results:
+                        writer.write_compressed(arcname, compressed, crc, file_size, method, mtime)
+                        bytes_in += file_size
+                    with self._lock:
+                        job = self._jobs[job_id]
+                        files_done = job['files_done'] + len(results)
+                        total_in = job['bytes_in'] + bytes_in
+                    self._update_job(job_id, files_done=files_done, bytes_in=total_in,
+                                     bytes_out=writer.offset)
+                writer.close()
+                f.flush()
+                os.fsync(f.fileno())
+            
+            os.replace(partial_path, backup_path)
+            
+            self._update_job(job_id, status='completed', backup_path=str(backup_path),
+                             bytes_out=backup_path.stat().st_size,
+                             finished_at=datetime.utcnow().isoformat())
+            logger.info(f"Backup creado exitosamente: {backup_path}")
+        
+        except Exception as e:
+            logger.error(f"Error al crear backup {job_id}: {str(e)}")
+            try:
+                if partial_path.exists():
+                    partial_path.unlink()
+            except Exception:
+                pass
+            self._update_job(job_id, status='failed', error=str(e),
+                             finished_at=datetime.utcnow().isoformat())
+    
+    def _compress_chunks(self, chunks: List[List[Tuple[str, str]]]):
+        """
+        Comprimir bloques de archivos en un pool de procesos
+        
+        Produce los resultados en orden, manteniendo como máximo dos bloques
+        pendientes por proceso para acotar el uso de memoria.
+        """
+        if self.max_workers == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield _compress_chunk(chunk, self.method, self.compression_level)
+            return
+        
+        max_pending = self.max_workers * 2
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_compress_chunk, chunk, self.method, self.compression_level))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
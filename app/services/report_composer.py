@@ -0,0 +1,367 @@
+"""
+Composición de reportes en el servidor a partir de las plantillas de pruebas
+
+Las plantillas de ``bocetos_pruebas/html_output`` se compilan una sola vez: se
+separan en fragmentos literales y "campos" (las celdas ``result-value`` de cada
+fila de resultados). Componer un reporte consiste en concatenar fragmentos y
+valores escapados, sin volver a analizar el HTML.
+
+Como ``LabTestCatalog``, el compositor compara el mtime del directorio de
+plantillas (a lo sumo cada ``LAB_TESTS_CATALOG_RELOAD_INTERVAL`` segundos) y
+vuelve a compilarlas cuando cambia, de modo que las plantillas regeneradas por
+``docx_template_converter`` se usan sin reiniciar el servidor.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from html import escape, unescape
+from typing import List, Dict, Any, Optional, Union
+
+from app.config import Config
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Campos de la orden que se muestran en el encabezado del reporte
+METADATA_FIELDS = [
+    ('order_number', 'No. de orden'),
+    ('patient_name', 'Paciente'),
+    ('patient_age', 'Edad'),
+    ('patient_gender', 'Sexo'),
+    ('doctor_name', 'Médico'),
+    ('reception_date', 'Fecha de recepción'),
+]
+
+# Indicadores permitidos para un resultado (clase CSS de la celda)
+RESULT_FLAGS = {'normal', 'abnormal'}
+
+_STYLE_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.S | re.I)
+_H1_RE = re.compile(r'<h1[^>]*>(.*?)</h1>', re.S | re.I)
+_BODY_RE = re.compile(r'<body[^>]*>(.*)</body>', re.S | re.I)
+_FOOTER_RE = re.compile(r'\s*<div class="footer">.*?</div>', re.S)
+_ROW_RE = re.compile(r'<tr[^>]*>(.*?)</tr>', re.S)
+_CELL_RE = re.compile(r'<td([^>]*)>(.*?)</td>', re.S)
+_RESULT_CELL_RE = re.compile(r'<td class="result-value[^"]*">.*?</td>', re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# Estilos propios del documento compuesto
+_REPORT_STYLE = """
+.report-patient { max-width: 900px; margin: 0 auto 20px auto; background: white; padding: 20px 30px; }
+.report-patient table { width: 100%; border-collapse: collapse; }
+.report-patient th { text-align: left; color: #2c3e50; padding: 4px 8px; width: 25%; }
+.report-patient td { padding: 4px 8px; }
+.report-test { margin-bottom: 20px; }
+"""
+
+
+def _text(fragment: str) -> str:
+    """Texto plano de un fragmento HTML"""
+    return ' '.join(unescape(_TAG_RE.sub(' ', fragment)).split())
+
+
+def normalize_field_key(label: str) -> str:
+    """Normalizar el nombre de un examen para usarlo como clave de campo"""
+    return ' '.join(label.split()).rstrip(':').strip().upper()
+
+
+class CompiledTemplate:
+    """Plantilla de prueba separada en fragmentos literales y campos de resultado"""
+    
+    __slots__ = ('template_id', 'filename', 'title', 'styles', 'parts', 'fields', 'mtime')
+    
+    def __init__(self, template_id: str, filename: str, title: str, styles: List[str],
+                 parts: List[str], fields: List[Dict[str, Any]], mtime: float):
+        self.template_id = template_id
+        self.filename = filename
+        self.title = title
+        self.styles = styles
+        # parts tiene len(fields) + 1 elementos: los campos van entre fragmentos
+        self.parts = parts
+        self.fields = fields
+        self.mtime = mtime
+    
+    @classmethod
+    def compile(cls, file_path: str) -> 'CompiledTemplate':
+        """Compilar una plantilla HTML"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        
+        filename = os.path.basename(file_path)
+        template_id = os.path.splitext(filename)[0]
+        
+        title_match = _TITLE_RE.search(html_content) or _H1_RE.search(html_content)
+        title = _text(title_match.group(1)) if title_match else template_id
+        title = title.replace(' - Laboratorio Esperanza', '')
+        
+        styles = [' '.join(style.split()) for style in _STYLE_RE.findall(html_content)]
+        
+        body_match = _BODY_RE.search(html_content)
+        body = body_match.group(1) if body_match else html_content
+        # El pie de las plantillas tiene fechas de ejemplo; el reporte no lo incluye
+        body = _FOOTER_RE.sub('', body).strip()
+        
+        parts = []
+        fields = []
+        seen_keys = {}
+        position = 0
+        for row in _ROW_RE.finditer(body):
+            cell = _RESULT_CELL_RE.search(row.group(0))
+            if not cell:
+                continue
+            
+            cells = _CELL_RE.findall(row.group(1))
+            label = _text(cells[0][1]) if cells else ''
+            reference = next((_text(content) for attrs, content in cells if 'reference-range' in attrs), '')
+            
+            key = normalize_field_key(label) or str(len(fields))
+            seen_keys[key] = seen_keys.get(key, 0) + 1
+            if seen_keys[key] > 1:
+                key = f"{key} ({seen_keys[key]})"
+            
+            start = row.start() + cell.start()
+            parts.append(body[position:start])
+            position = row.start() + cell.end()
+            fields.append({
+                'index': len(fields),
+                'key': key,
+                'label': label,
+                'reference_range': reference,
+                'sample_value': _text(cell.group(0))
+            })
+        parts.append(body[position:])
+        
+        return cls(template_id, filename, title, styles, parts, fields, os.path.getmtime(file_path))
+    
+    def resolve_results(self, results: Union[Dict[str, Any], List[Any], None]) -> Dict[str, Any]:
+        """
+        Asociar los resultados enviados por el cliente a las claves de los campos
+        
+        Acepta un diccionario por nombre de examen o por índice, o una lista en
+        el orden de los campos.
+        """
+        if not results:
+            return {}
+        
+        if isinstance(results, list):
+            if len(results) > len(self.fields):
+                raise ValueError(f"La plantilla {self.template_id} tiene {len(self.fields)} campos de resultado")
+            return {self.fields[i]['key']: value for i, value in enumerate(results) if value is not None}
+        
+        if not isinstance(results, dict):
+            raise ValueError(f"Resultados inválidos para la plantilla {self.template_id}")
+        
+        by_key = {field['key']: field for field in self.fields}
+        resolved = {}
+        for key, value in results.items():
+            key = str(key)
+            if key.isdigit() and int(key) < len(self.fields):
+                field_key = self.fields[int(key)]['key']
+            else:
+                field_key = normalize_field_key(key)
+            if field_key not in by_key:
+                raise ValueError(f"Campo '{key}' no existe en la plantilla {self.template_id}")
+            if value is not None:
+                resolved[field_key] = value
+        return resolved
+    
+    def render(self, results: Dict[str, Any]) -> str:
+        """Renderizar el cuerpo de la plantilla con resultados ya resueltos"""
+        output = [self.parts[0]]
+        for field, part in zip(self.fields, self.parts[1:]):
+            output.append(_render_result_cell(results.get(field['key'])))
+            output.append(part)
+        return ''.join(output)
+
+
+def _render_result_cell(result: Any) -> str:
+    """Renderizar una celda de resultado; acepta un valor o {'value', 'flag'}"""
+    flag = None
+    if isinstance(result, dict):
+        flag = result.get('flag')
+        result = result.get('value')
+        if flag is not None and flag not in RESULT_FLAGS:
+            raise ValueError(f"Indicador de resultado inválido: {flag}. Use: {', '.join(sorted(RESULT_FLAGS))}")
+    
+    css_class = f"result-value {flag}" if flag else "result-value"
+    value = '' if result is None else escape(str(result))
+    return f'<td class="{css_class}">{value}</td>'
+
+
+class ReportComposer:
+    """Compone el HTML final de un reporte a partir de plantillas precompiladas"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.templates_path = config.LAB_TESTS_HTML_PATH
+        self.reload_interval = config.LAB_TESTS_CATALOG_RELOAD_INTERVAL
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._signature: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        
+        self.load_templates()
+    
+    def _directory_signature(self) -> Optional[int]:
+        """mtime del directorio de plantillas (cambia al agregar, quitar o reemplazar plantillas)"""
+        try:
+            return os.stat(self.templates_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def load_templates(self) -> int:
+        """
+        Compilar todas las plantillas del directorio
+        
+        Returns:
+            int: Número de plantillas compiladas
+        """
+        signature = self._directory_signature()
+        templates = {}
+        if os.path.isdir(self.templates_path):
+            for filename in sorted(os.listdir(self.templates_path)):
+                if not filename.endswith('.html') or filename == 'index.html':
+                    continue
+                try:
+                    template = CompiledTemplate.compile(os.path.join(self.templates_path, filename))
+                    templates[template.template_id] = template
+                except Exception as e:
+                    logger.warning(f"No se pudo compilar la plantilla {filename}: {str(e)}")
+        else:
+            logger.warning(f"Directorio de plantillas no encontrado: {self.templates_path}")
+        
+        with self._lock:
+            self._templates = templates
+            self._signature = signature
+            self._checked_at = time.monotonic()
+        
+        logger.info(f"Plantillas de pruebas compiladas: {len(templates)}")
+        return len(templates)
+    
+    def refresh(self) -> bool:
+        """
+        Volver a compilar las plantillas si cambió el mtime del directorio
+        
+        La comprobación se hace a lo sumo una vez cada ``reload_interval``
+        segundos (0 = nunca).
+        
+        Returns:
+            bool: True si las plantillas se recompilaron
+        """
+        if self.reload_interval <= 0 or time.monotonic() - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = time.monotonic()
+        if self._directory_signature() == self._signature:
+            return False
+        try:
+            self.load_templates()
+        except Exception as e:
+            logger.error(f"Error al recompilar las plantillas de pruebas: {str(e)}")
+            return False
+        return True
+    
+    def get_template(self, template_id: str) -> Optional[CompiledTemplate]:
+        """Obtener una plantilla compilada por id (nombre de archivo sin extensión)"""
+        self.refresh()
+        template_id = os.path.splitext(os.path.basename(str(template_id)))[0]
+        with self._lock:
+            return self._templates.get(template_id)
+    
+    def get_template_fields(self, template_id: str) -> Dict[str, Any]:
+        """Describir los campos de resultado de una plantilla"""
+        template = self.get_template(template_id)
+        if not template:
+            raise ValueError(f"Plantilla no encontrada: {template_id}")
+        
+        return {
+            'template_id': template.template_id,
+            'filename': template.filename,
+            'title': template.title,
+            'fields': template.fields
+        }
+    
+    def compose(self, report_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Componer el HTML del reporte
+        
+        Args:
+            report_data: Metadatos de la orden y ``tests``: lista de
+                {"template_id": str, "results": dict | list}
+        
+        Returns:
+            Dict[str, Any]: ``html_content`` y ``selected_tests`` normalizados
+        """
+        tests = report_data.get('tests')
+        if not tests or not isinstance(tests, list):
+            raise ValueError("Se requiere la lista 'tests' con las plantillas del reporte")
+        
+        templates = []
+        sections = []
+        selected_tests = []
+        for test in tests:
+            if isinstance(test, str):
+                test = {'template_id': test}
+            elif not isinstance(test, dict):
+                raise ValueError("Cada prueba debe ser el id de una plantilla o un objeto con 'template_id'")
+            template_id = test.get('template_id') or test.get('filename')
+            template = self.get_template(template_id) if template_id else None
+            if not template:
+                raise ValueError(f"Plantilla no encontrada: {template_id}")
+            
+            results = template.resolve_results(test.get('results'))
+            templates.append(template)
+            sections.append(
+                f'<section class="report-test" data-template="{escape(template.template_id)}">\n'
+                f'{template.render(results)}\n</section>'
+            )
+            selected_tests.append({
+                'name': template.title,
+                'filename': template.filename,
+                'template_id': template.template_id,
+                'results': results
+            })
+        
+        return {
+            'html_content': self._build_document(report_data, templates, sections),
+            'selected_tests': selected_tests
+        }
+    
+    def _build_document(self, report_data: Dict[str, Any], templates: List[CompiledTemplate],
+                        sections: List[str]) -> str:
+        """Armar el documento completo con estilos sin duplicar"""
+        styles = []
+        for template in templates:
+            for style in template.styles:
+                if style not in styles:
+                    styles.append(style)
+        styles.append(' '.join(_REPORT_STYLE.split()))
+        
+        rows = []
+        for field, label in METADATA_FIELDS:
+            value = report_data.get(field)
+            if value not in (None, ''):
+                rows.append(f'<tr><th>{escape(label)}</th><td>{escape(str(value))}</td></tr>')
+        
+        title = f"Reporte {report_data.get('order_number', '')} - {report_data.get('patient_name', '')}"
+        return '\n'.join([
+            '<!DOCTYPE html>',
+            '<html lang="es">',
+            '<head>',
+            '<meta charset="UTF-8">',
+            '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
+            f'<title>{escape(title.strip(" -"))}</title>',
+            '<style>',
+            '\n'.join(styles),
+            '</style>',
+            '</head>',
+            '<body>',
+            '<div class="report-patient"><table>',
+            '\n'.join(rows),
+            '</table></div>',
+            '\n'.join(sections),
+            '</body>',
+            '</html>'
+        ])
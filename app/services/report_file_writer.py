@@ -0,0 +1,78 @@
+"""
+Escritor de archivos de reportes: escrituras atómicas y, opcionalmente, en segundo plano
+
+En modo write-behind la escritura del HTML se encola en un pool de hilos de E/S
+y se ejecuta mientras la transacción de base de datos hace commit; el servicio
+espera el resultado antes de responder. Si algo falla entre ambos pasos, el
+trabajo de reconciliación (``LabReportService.reconcile_files``) vuelve a
+escribir el archivo a partir de ``html_content``.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from app.config import Config
+from app.services.report_storage import write_html
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class ReportFileWriter:
+    """Escritura atómica (temporal + fsync + rename) de archivos HTML de reportes"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.write_behind = config.REPORTS_WRITE_BEHIND
+        self.max_workers = max(1, config.REPORTS_FILE_WRITE_WORKERS)
+        self.durable = config.REPORTS_FILE_FSYNC
+        self.gzip_level = config.HTML_GZIP_COMPRESSION_LEVEL
+        
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def write(self, file_path: str, html_content: str) -> int:
+        """
+        Escribir el archivo de forma síncrona
+        
+        Returns:
+            int: Bytes escritos en disco
+        """
+        return write_html(file_path, html_content, self.gzip_level, self.durable)
+    
+    def submit(self, file_path: str, html_content: str) -> Future:
+        """
+        Iniciar la escritura del archivo
+        
+        En modo write-behind se ejecuta en el pool de E/S; si no, se escribe en
+        el momento y se devuelve un Future ya resuelto.
+        
+        Returns:
+            Future: Resultado de la escritura (bytes escritos)
+        """
+        if self.write_behind:
+            return self._get_executor().submit(self.write, file_path, html_content)
+        
+        future = Future()
+        try:
+            future.set_result(self.write(file_path, html_content))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Crear el pool de hilos bajo demanda"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='report-writer')
+            return self._executor
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Detener el pool de hilos"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,277 @@
+"""
+Servicio para generación de PDFs de reportes en segundo plano
+
+El estado de los renderizados en curso o fallidos se guarda en
+``pdf_cache/jobs/<clave>.json``, de modo que cualquier proceso del servidor ve
+un PDF que otro está generando; cuando termina bien, el PDF en la cache pasa a
+ser la fuente de verdad y el registro se elimina.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.config import Config
+from app.services.pdf_renderer import RENDERER_VERSION, render_html_to_pdf
+from app.services.report_storage import atomic_write_bytes
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Título del PDF cuando no se indica otro
+DEFAULT_TITLE = 'Reporte de Laboratorio'
+
+# Segundos tras los que un renderizado pendiente se da por perdido (el proceso que lo encoló terminó)
+PENDING_JOB_TIMEOUT = 10 * 60
+
+
+def _render_to_cache(html_content: str, cache_path: str, title: str) -> int:
+    """
+    Renderizar un PDF y guardarlo en la cache (se ejecuta en un proceso del pool)
+    
+    Returns:
+        int: Tamaño del PDF en bytes
+    """
+    pdf = render_html_to_pdf(html_content, title)
+    
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, cache_path)
+    return len(pdf)
+
+
+class ReportPDFService:
+    """Servicio para renderizar reportes a PDF con cache por contenido"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.cache_dir = Path(config.REPORTS_BASE_PATH) / "pdf_cache"
+        self.jobs_dir = self.cache_dir / "jobs"
+        self.max_workers = max(1, config.REPORTS_PDF_WORKERS)
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def cache_key(html_content: str, title: str = DEFAULT_TITLE) -> str:
+        """
+        Clave de cache: hash del contenido y del título combinado con la versión del renderizador
+        
+        El título va dentro del PDF (los reportes llevan el número de orden y el
+        paciente), así que forma parte de la clave: dos reportes con el mismo HTML
+        no comparten PDF y cada archivo de la cache pertenece a un solo reporte.
+        """
+        digest = hashlib.sha256(f"pdf-v{RENDERER_VERSION}\0".encode('utf-8'))
+        digest.update(title.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(html_content.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get_cache_path(self, cache_key: str) -> Path:
+        """Ruta del PDF en la cache (subdirectorio por prefijo del hash)"""
+        return self.cache_dir / cache_key[:2] / f"{cache_key}.pdf"
+    
+    def get_cached_pdf(self, html_content: str, title: str = DEFAULT_TITLE) -> Optional[str]:
+        """Obtener la ruta del PDF ya renderizado para este contenido, si existe"""
+        cache_path = self.get_cache_path(self.cache_key(html_content, title))
+        return str(cache_path) if cache_path.is_file() else None
+    
+    def request_render(self, html_content: str, title: str = DEFAULT_TITLE) -> Dict[str, Any]:
+        """
+        Encolar el renderizado del PDF si no está en cache
+        
+        Si otro proceso del servidor ya lo está renderizando, se devuelve su
+        estado en lugar de encolarlo de nuevo.
+        
+        Args:
+            html_content: HTML del reporte
+            title: Título del documento PDF
+        
+        Returns:
+            Dict[str, Any]: Estado del renderizado
+        """
+        cache_key = self.cache_key(html_content, title)
+        cache_path = self.get_cache_path(cache_key)
+        
+        with self._lock:
+            job = self._jobs.get(cache_key) or self._load_job(cache_key)
+            if job and job['status'] == 'pending':
+                # El contenido vuelve a ser vigente: conservar el resultado
+                if job.pop('invalidated', None):
+                    self._persist_job(job)
+                return dict(job)
+            
+            if cache_path.is_file():
+                return self._cached_status(cache_key, cache_path)
+            
+            job = {
+                'cache_key': cache_key,
+                'status': 'pending',
+                'renderer_version': RENDERER_VERSION,
+                'size': None,
+                'created_at': datetime.utcnow().isoformat(),
+                'finished_at': None,
+                'error': None
+            }
+            self._jobs[cache_key] = job
+            self._persist_job(job)
+            
+            future = self._get_executor().submit(_render_to_cache, html_content, str(cache_path), title)
+        
+        future.add_done_callback(lambda done: self._on_render_done(cache_key, done))
+        logger.info(f"Renderizado de PDF encolado: {cache_key[:12]}")
+        return dict(job)
+    
+    def get_render_status(self, html_content: str, title: str = DEFAULT_TITLE) -> Dict[str, Any]:
+        """Obtener el estado del PDF para este contenido (también si lo renderiza otro proceso)"""
+        cache_key = self.cache_key(html_content, title)
+        cache_path = self.get_cache_path(cache_key)
+        
+        with self._lock:
+            job = self._jobs.get(cache_key) or self._load_job(cache_key)
+            if job:
+                return {key: value for key, value in job.items() if key != 'invalidated'}
+        
+        if cache_path.is_file():
+            return self._cached_status(cache_key, cache_path)
+        
+        return {
+            'cache_key': cache_key,
+            'status': 'not_requested',
+            'renderer_version': RENDERER_VERSION
+        }
+    
+    def invalidate(self, html_content: str, title: str = DEFAULT_TITLE) -> bool:
+        """
+        Eliminar de la cache el PDF de un contenido que ya no está vigente
+        
+        Solo afecta al PDF de ese contenido con ese título (el de un reporte);
+        otro reporte con el mismo HTML tiene su propio archivo.
+        
+        Returns:
+            bool: True si se eliminó un PDF de la cache
+        """
+        cache_key = self.cache_key(html_content, title)
+        
+        with self._lock:
+            job = self._jobs.get(cache_key) or self._load_job(cache_key)
+            if job and job['status'] == 'pending':
+                # El resultado se descartará cuando termine el renderizado (en este u otro proceso)
+                job['invalidated'] = True
+                self._persist_job(job)
+            elif job:
+                self._jobs.pop(cache_key, None)
+                self._remove_job(cache_key)
+        
+        try:
+            self.get_cache_path(cache_key).unlink()
+            logger.info(f"PDF invalidado: {cache_key[:12]}")
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def _on_render_done(self, cache_key: str, future) -> None:
+        """Actualizar el estado cuando el proceso termina de renderizar"""
+        error = future.exception()
+        
+        with self._lock:
+            job = self._jobs.get(cache_key)
+            if job is None:
+                return
+            
+            # La invalidación pudo llegar desde otro proceso a través del registro en disco
+            stored = self._load_job(cache_key) or {}
+            if job.pop('invalidated', False) or stored.get('invalidated'):
+                # El contenido cambió mientras se renderizaba
+                self._jobs.pop(cache_key, None)
+                self._remove_job(cache_key)
+                try:
+                    self.get_cache_path(cache_key).unlink()
+                except FileNotFoundError:
+                    pass
+                return
+            
+            if error is None:
+                # El PDF en disco pasa a ser la fuente de verdad
+                self._jobs.pop(cache_key, None)
+                self._remove_job(cache_key)
+            else:
+                job['status'] = 'failed'
+                job['finished_at'] = datetime.utcnow().isoformat()
+                job['error'] = str(error)
+                self._persist_job(job)
+                logger.error(f"Error al renderizar PDF {cache_key[:12]}: {str(error)}")
+    
+    def _job_file(self, cache_key: str) -> Path:
+        return self.jobs_dir / f"{cache_key}.json"
+    
+    def _load_job(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Leer el registro en disco de un renderizado
+        
+        Un registro pendiente más antiguo que PENDING_JOB_TIMEOUT se ignora: el
+        proceso que lo encoló terminó sin completarlo.
+        """
+        try:
+            with open(self._job_file(cache_key), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado del PDF {cache_key[:12]}: {str(e)}")
+            return None
+        
+        if job.get('status') == 'pending':
+            age = (datetime.utcnow() - datetime.fromisoformat(job['created_at'])).total_seconds()
+            if age > PENDING_JOB_TIMEOUT:
+                return None
+        return job
+    
+    def _persist_job(self, job: Dict[str, Any]) -> None:
+        """Guardar el estado del renderizado en disco de forma atómica"""
+        try:
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write_bytes(str(self._job_file(job['cache_key'])),
+                               json.dumps(job, ensure_ascii=False).encode('utf-8'), durable=False)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el estado del PDF {job['cache_key'][:12]}: {str(e)}")
+    
+    def _remove_job(self, cache_key: str) -> None:
+        try:
+            self._job_file(cache_key).unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _cached_status(self, cache_key: str, cache_path: Path) -> Dict[str, Any]:
+        """Estado de un PDF que ya existe en la cache"""
+        stat = cache_path.stat()
+        return {
+            'cache_key': cache_key,
+            'status': 'completed',
+            'renderer_version': RENDERER_VERSION,
+            'size': stat.st_size,
+            'finished_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+            'error': None
+        }
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Crear el pool de procesos de renderizado al primer uso"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Detener el pool de procesos"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,244 @@
+"""
+Historial de revisiones del contenido HTML de los reportes
+
+La primera revisión se guarda completa y las siguientes como diferencias
+respecto a la anterior, comprimidas con zlib. Cada ``REPORTS_REVISION_KEYFRAME_INTERVAL``
+revisiones se guarda una completa ("keyframe") para que reconstruir cualquier
+versión requiera aplicar como mucho ese número de diferencias.
+
+Las diferencias se calculan sobre fragmentos que terminan en ``>`` o en salto de
+línea, de modo que funcionan tanto con HTML indentado como minificado.
+"""
+
+import re
+import json
+import zlib
+import difflib
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import defer
+
+from database import db
+from app.config import Config
+from app.models.lab_report import ReportRevision
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'(?<=[>\n])')
+
+ZLIB_LEVEL = 9
+
+
+def content_hash(html_content: str) -> str:
+    """Hash SHA-256 del contenido"""
+    return hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+
+
+def _tokenize(html_content: str) -> List[str]:
+    """Separar el HTML en fragmentos terminados en '>' o salto de línea"""
+    return [token for token in _TOKEN_RE.split(html_content) if token]
+
+
+def make_delta(old: str, new: str) -> bytes:
+    """
+    Calcular la diferencia comprimida entre dos versiones
+    
+    Formato (JSON comprimido): lista de operaciones, ``[inicio, fin]`` copia
+    fragmentos de la versión anterior y una cadena inserta texto nuevo.
+    """
+    old_tokens = _tokenize(old)
+    new_tokens = _tokenize(new)
+    
+    # Las ediciones suelen ser locales: el prefijo y sufijo comunes se copian
+    # sin pasar por SequenceMatcher, que es cuadrático en el peor caso
+    limit = min(len(old_tokens), len(new_tokens))
+    prefix = 0
+    while prefix < limit and old_tokens[prefix] == new_tokens[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_tokens[-1 - suffix] == new_tokens[-1 - suffix]:
+        suffix += 1
+    
+    ops: List[Union[List[int], str]] = []
+    if prefix:
+        ops.append([0, prefix])
+    
+    old_middle = old_tokens[prefix:len(old_tokens) - suffix]
+    new_middle = new_tokens[prefix:len(new_tokens) - suffix]
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([prefix + i1, prefix + i2])
+        elif j2 > j1:  # replace o insert
+            ops.append(''.join(new_middle[j1:j2]))
+    
+    if suffix:
+        ops.append([len(old_tokens) - suffix, len(old_tokens)])
+    
+    payload = json.dumps(ops, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(payload, ZLIB_LEVEL)
+
+
+def apply_delta(old: str, delta: bytes) -> str:
+    """Aplicar una diferencia creada con make_delta"""
+    old_tokens = _tokenize(old)
+    output = []
+    for op in json.loads(zlib.decompress(delta).decode('utf-8')):
+        if isinstance(op, list):
+            output.extend(old_tokens[op[0]:op[1]])
+        else:
+            output.append(op)
+    return ''.join(output)
+
+
+def encode_revision(revision: int, html_content: str, base_content: Optional[str],
+                    keyframe_interval: int) -> Tuple[str, bytes]:
+    """
+    Decidir cómo guardar una revisión
+    
+    Returns:
+        Tuple[str, bytes]: ('full' | 'delta', datos comprimidos)
+    """
+    full = zlib.compress(html_content.encode('utf-8'), ZLIB_LEVEL)
+    if base_content is None or (revision - 1) % keyframe_interval == 0:
+        return 'full', full
+    
+    delta = make_delta(base_content, html_content)
+    # Si el cambio es casi total, la versión completa ocupa menos
+    return ('delta', delta) if len(delta) < len(full) else ('full', full)
+
+
+def reconstruct(chain: Sequence[Any]) -> str:
+    """
+    Reconstruir el contenido de la última revisión de una cadena
+    
+    Args:
+        chain: Revisiones ordenadas, empezando por una completa
+    """
+    if not chain or chain[0].kind != 'full':
+        raise ValueError("La cadena de revisiones debe empezar con una revisión completa")
+    
+    html_content = zlib.decompress(chain[0].data).decode('utf-8')
+    for revision in chain[1:]:
+        if revision.kind == 'full':
+            html_content = zlib.decompress(revision.data).decode('utf-8')
+        else:
+            html_content = apply_delta(html_content, revision.data)
+    
+    if content_hash(html_content) != chain[-1].content_hash:
+        raise RuntimeError(f"Historial dañado: la revisión {chain[-1].revision} no coincide con su hash")
+    return html_content
+
+
+class ReportRevisionService:
+    """Servicio para guardar y reconstruir revisiones de reportes"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.keyframe_interval = max(1, config.REPORTS_REVISION_KEYFRAME_INTERVAL)
+    
+    def _latest(self, report_id: int) -> Optional[ReportRevision]:
+        """Última revisión de un reporte"""
+        return ReportRevision.query.filter_by(report_id=report_id).order_by(
+            ReportRevision.revision.desc()
+        ).first()
+    
+    def _add(self, report_id: int, revision: int, html_content: str,
+             base_content: Optional[str], created_by: Optional[int]) -> ReportRevision:
+        """Agregar una revisión a la sesión (se guarda con el commit del llamador)"""
+        kind, data = encode_revision(revision, html_content, base_content, self.keyframe_interval)
+        report_revision = ReportRevision(
+            report_id=report_id,
+            revision=revision,
+            kind=kind,
+            data=data,
+            content_size=len(html_content.encode('utf-8')),
+            stored_size=len(data),
+            content_hash=content_hash(html_content),
+            created_by=created_by
+        )
+        db.session.add(report_revision)
+        return report_revision
+    
+    def record_revision(self, report_id: int, html_content: str, previous_html: str = None,
+                        created_by: int = None) -> Optional[ReportRevision]:
+        """
+        Registrar una nueva versión del contenido de un reporte
+        
+        Args:
+            report_id: ID del reporte
+            html_content: Contenido nuevo
+            previous_html: Contenido anterior (base de la diferencia)
+            created_by: ID del usuario que hizo el cambio
+            
+        Returns:
+            ReportRevision: Revisión creada, o None si el contenido no cambió
+        """
+        latest = self._latest(report_id)
+        
+        # Reportes creados antes del historial: su contenido actual es la revisión 1
+        if latest is None and previous_html and previous_html != html_content:
+            latest = self._add(report_id, 1, previous_html, None, None)
+        
+        new_hash = content_hash(html_content)
+        if latest is not None and latest.content_hash == new_hash:
+            return None
+        
+        revision = latest.revision + 1 if latest is not None else 1
+        # Solo se usa como base si coincide con la última revisión guardada
+        base_content = None
+        if latest is not None and previous_html is not None and latest.content_hash == content_hash(previous_html):
+            base_content = previous_html
+        
+        report_revision = self._add(report_id, revision, html_content, base_content, created_by)
+        logger.debug(f"Revisión {revision} ({report_revision.kind}) registrada para el reporte {report_id}")
+        return report_revision
+    
+    def list_revisions(self, report_id: int) -> Dict[str, Any]:
+        """
+        Listar las revisiones de un reporte (sin contenido)
+        
+        Returns:
+            Dict[str, Any]: Revisiones y tamaños totales
+        """
+        # Los datos comprimidos no hacen falta para el listado
+        query = ReportRevision.query.options(defer(ReportRevision.data)).filter_by(
+            report_id=report_id
+        ).order_by(ReportRevision.revision)
+        revisions = [revision.to_dict() for revision in query]
+        return {
+            'report_id': report_id,
+            'revisions': revisions,
+            'count': len(revisions),
+            'total_content_size': sum(revision['content_size'] for revision in revisions),
+            'total_stored_size': sum(revision['stored_size'] for revision in revisions)
+        }
+    
+    def get_revision(self, report_id: int, revision: int) -> Tuple[ReportRevision, str]:
+        """
+        Reconstruir el contenido de una revisión
+        
+        Returns:
+            Tuple[ReportRevision, str]: (revisión, contenido HTML)
+        """
+        keyframe = ReportRevision.query.filter(
+            ReportRevision.report_id == report_id,
+            ReportRevision.revision <= revision,
+            ReportRevision.kind == 'full'
+        ).order_by(ReportRevision.revision.desc()).first()
+        if keyframe is None:
+            raise ValueError(f"Revisión {revision} del reporte {report_id} no encontrada")
+        
+        chain = [keyframe] + ReportRevision.query.filter(
+            ReportRevision.report_id == report_id,
+            ReportRevision.revision > keyframe.revision,
+            ReportRevision.revision <= revision
+        ).order_by(ReportRevision.revision).all()
+        
+        if chain[-1].revision != revision:
+            raise ValueError(f"Revisión {revision} del reporte {report_id} no encontrada")
+        
+        return chain[-1], reconstruct(chain)
@@ -0,0 +1,405 @@
+"""
+Servicio de estadísticas de reportes con contadores incrementales
+
+Evita recorrer la tabla ``lab_reports`` en cada consulta de ``/api/reports/stats``:
+los totales por estado se mantienen en ``report_stats_counters`` y los
+pacientes/médicos únicos se estiman con HyperLogLog cuyos registros viven en
+``report_stats_registers``. Ambas tablas se actualizan en la misma transacción
+que crea, modifica o elimina el reporte, así que todos los procesos del
+servidor responden con los mismos valores.
+
+Cada cierto tiempo se recalcula todo de forma exacta en un hilo de fondo: una
+pasada en streaming sobre la tabla, en una instantánea que también incluye los
+contadores, y luego se suma a cada contador la diferencia entre lo recorrido y
+su valor en la instantánea. Así los cambios confirmados durante el recorrido se
+conservan en lugar de pisarse.
+"""
+
+import math
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import select, update, delete, insert, bindparam
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from app.config import Config
+from app.models.lab_report import LabReport, ReportStatsCounter, ReportStatsRegister
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Estados que siempre tienen contador
+STATUSES = ('draft', 'final', 'printed')
+
+# Estimadores de únicos (columna del reporte que cuentan)
+SKETCHES = ('patients', 'doctors')
+
+COUNTERS = ReportStatsCounter.__table__
+REGISTERS = ReportStatsRegister.__table__
+
+
+class HyperLogLog:
+    """Estimador de cardinalidad (cantidad de valores distintos) con memoria fija"""
+    
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("La precisión debe estar entre 4 y 16")
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = bytearray(self.num_registers)
+        
+        if self.num_registers >= 128:
+            self._alpha = 0.7213 / (1 + 1.079 / self.num_registers)
+        else:
+            self._alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self.num_registers]
+    
+    @staticmethod
+    def hash_value(value: Any) -> Optional[int]:
+        """Hash de 64 bits de un valor (None para valores vacíos)"""
+        if value is None or value == '':
+            return None
+        digest = hashlib.sha1(str(value).encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big')
+    
+    def add(self, value: Any) -> None:
+        """Agregar un valor (los valores vacíos se ignoran)"""
+        hashed = self.hash_value(value)
+        if hashed is not None:
+            self.add_hash(hashed)
+    
+    def register_rank(self, hashed: int) -> Tuple[int, int]:
+        """Registro y rango que corresponden a un valor ya pasado por hash_value"""
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        # Posición del primer bit en 1 dentro de los bits restantes
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        return index, rank
+    
+    def add_hash(self, hashed: int) -> None:
+        """Agregar un valor ya pasado por hash_value"""
+        index, rank = self.register_rank(hashed)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def merge(self, other: 'HyperLogLog') -> None:
+        """Unir otro estimador de la misma precisión (máximo registro a registro)"""
+        for index, rank in enumerate(other.registers):
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+    
+    def update(self, values: Iterable[Any]) -> None:
+        """Agregar varios valores"""
+        for value in values:
+            self.add(value)
+    
+    def count(self) -> int:
+        """Estimar la cantidad de valores distintos"""
+        m = self.num_registers
+        estimate = self._alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        
+        # Corrección para cardinalidades pequeñas (conteo lineal)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        
+        return int(round(estimate))
+
+
+class ReportStatsService:
+    """Estadísticas de reportes compartidas por todos los procesos y recalculadas periódicamente"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.recompute_interval = config.REPORTS_STATS_RECOMPUTE_SECONDS
+        self.precision = config.REPORTS_STATS_HLL_PRECISION
+        # Los registros de otra precisión se ignoran (y se borran en el siguiente recálculo)
+        self.sketches = {kind: f"{kind}:{self.precision}" for kind in SKETCHES}
+        
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+    
+    def get_stats(self, exact: bool = False) -> Dict[str, Any]:
+        """
+        Obtener estadísticas de reportes
+        
+        La primera consulta (sin contadores todavía) y ``exact`` recalculan en
+        el momento; cuando el recálculo periódico vence, un solo proceso lo
+        lanza en segundo plano y se responde con los contadores actuales.
+        
+        Args:
+            exact: Forzar un recálculo exacto contra la base de datos
+        
+        Returns:
+            Dict[str, Any]: Mismo formato que LabReport.get_stats, más metadatos
+        """
+        counters = self._read_counters()
+        computed_at = counters.get('computed_at')
+        
+        if exact or not computed_at:
+            self.recompute()
+            counters = self._read_counters()
+        elif time.time() - computed_at >= self.recompute_interval and self._claim_refresh(computed_at):
+            self._refresh_in_background()
+        
+        estimates = {kind: hll.count() for kind, hll in self._read_registers(db.session).items()}
+        unique = {}
+        for kind in SKETCHES:
+            base = counters.get(f'unique:{kind}', 0)
+            unique[kind] = base + max(0, estimates[kind] - counters.get(f'hll_base:{kind}', 0))
+        counts = {status: max(0, counters.get(f'status:{status}', 0)) for status in STATUSES}
+        
+        return {
+            'total_reports': sum(max(0, value) for name, value in counters.items() if name.startswith('status:')),
+            'unique_patients': unique['patients'],
+            'unique_doctors': unique['doctors'],
+            'draft_reports': counts['draft'],
+            'final_reports': counts['final'],
+            'printed_reports': counts['printed'],
+            'approximate': any(unique[kind] != counters.get(f'unique:{kind}', 0) for kind in SKETCHES),
+            'computed_at': datetime.utcfromtimestamp(counters.get('computed_at', 0)).isoformat()
+        }
+    
+    def recompute(self) -> bool:
+        """
+        Recalcular las estadísticas de forma exacta
+        
+        1. En una transacción de solo lectura con instantánea se leen los
+           contadores y los registros y se recorren los reportes (conteos por
+           estado, registros HyperLogLog y únicos exactos por hash de 64 bits),
+           todo en el mismo momento.
+        2. En una transacción corta se suma a cada contador de estado la
+           diferencia entre lo recorrido y su valor en la instantánea; los
+           registros se unen (máximo) con los recorridos.
+        
+        El contador ``generation`` detecta otro recálculo terminado después de
+        la instantánea: en ese caso este se descarta (aplicar dos veces la
+        corrección la duplicaría).
+        
+        Returns:
+            bool: True si se aplicó el recálculo
+        """
+        snapshot_isolation = 'REPEATABLE READ' if db.engine.dialect.name == 'postgresql' else 'SERIALIZABLE'
+        with db.engine.connect().execution_options(isolation_level=snapshot_isolation) as connection:
+            with connection.begin():
+                counters = dict(connection.execute(select(COUNTERS.c.name, COUNTERS.c.value)).all())
+                stored = self._read_registers(connection)
+                
+                counts: Dict[str, int] = {}
+                scanned = {kind: HyperLogLog(self.precision) for kind in SKETCHES}
+                seen = {kind: set() for kind in SKETCHES}
+                for status, patient_name, doctor_name in self._iter_reports(connection):
+                    counts[status] = counts.get(status, 0) + 1
+                    for kind, value in (('patients', patient_name), ('doctors', doctor_name)):
+                        hashed = HyperLogLog.hash_value(value)
+                        if hashed is not None:
+                            scanned[kind].add_hash(hashed)
+                            seen[kind].add(hashed)
+        
+        # Estimación en la instantánea: base de los únicos que se agreguen después
+        for kind in SKETCHES:
+            stored[kind].merge(scanned[kind])
+        
+        session = db.session
+        try:
+            if not self._bump_generation(session, counters.get('generation')):
+                session.rollback()
+                logger.info("Recálculo de estadísticas descartado: otro proceso terminó uno más reciente")
+                return False
+            
+            values = {'computed_at': int(time.time())}
+            for kind in SKETCHES:
+                values[f'unique:{kind}'] = len(seen[kind])
+                values[f'hll_base:{kind}'] = stored[kind].count()
+            deltas = {}
+            for status in set(STATUSES) | set(counts):
+                name = f'status:{status}'
+                if name in counters:
+                    deltas[name] = counts.get(status, 0) - counters[name]
+                else:
+                    values[name] = counts.get(status, 0)
+            
+            # Mismo orden que ``record`` (contadores por nombre y luego registros)
+            for name in sorted(set(values) | set(deltas)):
+                if name in deltas:
+                    if deltas[name]:
+                        session.execute(update(COUNTERS).where(COUNTERS.c.name == name)
+                                        .values(value=COUNTERS.c.value + deltas[name]))
+                elif name in counters:
+                    session.execute(update(COUNTERS).where(COUNTERS.c.name == name).values(value=values[name]))
+                else:
+                    session.execute(insert(COUNTERS).values(name=name, value=values[name]))
+            
+            self._merge_registers(session, scanned)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        
+        logger.info("Estadísticas de reportes recalculadas")
+        return True
+    
+    def _bump_generation(self, session, generation: Optional[int]) -> bool:
+        """Avanzar ``generation`` solo si sigue en el valor de la instantánea"""
+        if generation is None:
+            try:
+                session.execute(insert(COUNTERS).values(name='generation', value=1))
+                session.flush()
+                return True
+            except IntegrityError:
+                return False
+        result = session.execute(update(COUNTERS).where(COUNTERS.c.name == 'generation',
+                                                        COUNTERS.c.value == generation)
+                                 .values(value=generation + 1))
+        return result.rowcount == 1
+    
+    def _merge_registers(self, session, scanned: Dict[str, HyperLogLog]) -> None:
+        """Unir los registros recorridos con los guardados (crea los que faltan)"""
+        session.execute(delete(REGISTERS).where(REGISTERS.c.sketch.notin_(list(self.sketches.values()))))
+        existing = {(sketch, register) for sketch, register in session.execute(
+            select(REGISTERS.c.sketch, REGISTERS.c.register))}
+        
+        missing, raised = [], []
+        for kind in SKETCHES:
+            sketch = self.sketches[kind]
+            for register, rank in enumerate(scanned[kind].registers):
+                if (sketch, register) not in existing:
+                    missing.append({'sketch': sketch, 'register': register, 'rank': rank})
+                elif rank:
+                    raised.append({'b_sketch': sketch, 'b_register': register, 'b_rank': rank})
+        
+        if missing:
+            session.execute(insert(REGISTERS), missing)
+        if raised:
+            session.execute(self._raise_register_statement(), raised)
+    
+    @staticmethod
+    def _raise_register_statement():
+        """UPDATE que sube un registro solo si el rango nuevo es mayor (sin carreras entre procesos)"""
+        return update(REGISTERS).where(
+            REGISTERS.c.sketch == bindparam('b_sketch'),
+            REGISTERS.c.register == bindparam('b_register'),
+            REGISTERS.c.rank < bindparam('b_rank')
+        ).values(rank=bindparam('b_rank'))
+    
+    def _read_counters(self) -> Dict[str, int]:
+        return dict(db.session.execute(select(COUNTERS.c.name, COUNTERS.c.value)).all())
+    
+    def _read_registers(self, connection) -> Dict[str, HyperLogLog]:
+        """Estimadores guardados (vacíos si todavía no hay registros)"""
+        sketches = {kind: HyperLogLog(self.precision) for kind in SKETCHES}
+        by_sketch = {sketch: kind for kind, sketch in self.sketches.items()}
+        for sketch, register, rank in connection.execute(
+                select(REGISTERS.c.sketch, REGISTERS.c.register, REGISTERS.c.rank)
+                .where(REGISTERS.c.sketch.in_(list(by_sketch)))):
+            sketches[by_sketch[sketch]].registers[register] = rank
+        return sketches
+    
+    def _claim_refresh(self, computed_at: int) -> bool:
+        """
+        Reservar el recálculo vencido para este proceso
+        
+        Se adelanta ``computed_at`` con un UPDATE condicional: solo el proceso
+        que lo logra lanza el recálculo; los demás siguen respondiendo con los
+        contadores.
+        """
+        try:
+            result = db.session.execute(update(COUNTERS).where(COUNTERS.c.name == 'computed_at',
+                                                               COUNTERS.c.value == computed_at)
+                                        .values(value=int(time.time())))
+            db.session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"No se pudo reservar el recálculo de estadísticas: {str(e)}")
+            return False
+    
+    def _refresh_in_background(self) -> None:
+        """Lanzar el recálculo exacto en un hilo (uno a la vez)"""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            app = current_app._get_current_object() if has_app_context() else None
+            self._refresher = threading.Thread(target=self._refresh, args=(app,),
+                                               name='report-stats-refresh', daemon=True)
+            self._refresher.start()
+    
+    def _refresh(self, app) -> None:
+        try:
+            if app is None:
+                self.recompute()
+            else:
+                with app.app_context():
+                    self.recompute()
+        except Exception as e:
+            logger.error(f"Error al recalcular estadísticas de reportes: {str(e)}")
+    
+    def _iter_reports(self, connection) -> Iterable[Tuple[str, Optional[str], Optional[str]]]:
+        """Recorrer (estado, paciente, médico) de todos los reportes en streaming"""
+        return connection.execute(
+            select(LabReport.status, LabReport.patient_name, LabReport.doctor_name)
+            .execution_options(yield_per=1000)
+        )
+    
+    # Actualizaciones incrementales (en la transacción de LabReportService, antes del commit)
+    
+    def record(self, session, status_deltas: Dict[str, int], patients: Iterable[Any] = (),
+               doctors: Iterable[Any] = ()) -> None:
+        """
+        Registrar en la transacción de ``session`` los cambios de uno o varios reportes
+        
+        Si la transacción se revierte, los contadores no cambian. Las filas se
+        actualizan en un orden fijo (contadores por nombre y luego registros)
+        para que dos transacciones concurrentes no se bloqueen mutuamente.
+        Antes del primer recálculo no hay filas y no se registra nada.
+        
+        Args:
+            session: Sesión de la escritura del reporte
+            status_deltas: Cambio del número de reportes por estado
+            patients: Pacientes de los reportes creados o modificados
+            doctors: Médicos de los reportes creados o modificados
+        """
+        for status, delta in sorted(status_deltas.items()):
+            if delta:
+                session.execute(update(COUNTERS).where(COUNTERS.c.name == f'status:{status}')
+                                .values(value=COUNTERS.c.value + delta))
+        
+        ranks: Dict[Tuple[str, int], int] = {}
+        estimator = HyperLogLog(self.precision)
+        for kind, values in (('patients', patients), ('doctors', doctors)):
+            for value in values:
+                hashed = HyperLogLog.hash_value(value)
+                if hashed is None:
+                    continue
+                register, rank = estimator.register_rank(hashed)
+                key = (self.sketches[kind], register)
+                ranks[key] = max(rank, ranks.get(key, 0))
+        if ranks:
+            session.execute(self._raise_register_statement(), [
+                {'b_sketch': sketch, 'b_register': register, 'b_rank': rank}
+                for (sketch, register), rank in sorted(ranks.items())
+            ])
+    
+    def on_report_created(self, session, status: str, patient_name: str, doctor_name: str = None) -> None:
+        """Registrar un reporte creado"""
+        self.record(session, {status: 1}, [patient_name], [doctor_name])
+    
+    def on_report_updated(self, session, old_status: str, new_status: str,
+                          patient_name: str = None, doctor_name: str = None) -> None:
+        """Registrar cambio de estado y/o de paciente o médico"""
+        deltas = {old_status: -1, new_status: 1} if old_status != new_status else {}
+        self.record(session, deltas, [patient_name], [doctor_name])
+    
+    def on_report_deleted(self, session, status: str) -> None:
+        """
+        Registrar un reporte eliminado
+        
+        Los únicos de HyperLogLog no se pueden decrementar; se corrigen en el
+        siguiente recálculo exacto.
+        """
+        self.record(session, {status: -1})
@@ -0,0 +1,245 @@
+"""
+Almacenamiento de archivos HTML en disco (plano o comprimido con gzip)
+"""
+
+import os
+import gzip
+import shutil
+import struct
+import hashlib
+import tempfile
+from typing import Any, Dict, Iterable, Optional, Iterator
+
+# Sufijo de los archivos comprimidos en disco
+GZIP_SUFFIX = '.gz'
+
+# Sufijo de los archivos temporales de una escritura en curso
+TEMP_SUFFIX = '.tmp'
+
+# Tamaño de bloque para lecturas en streaming
+READ_CHUNK_SIZE = 64 * 1024
+
+# umask del proceso (se lee al importar: cambiarla no es seguro entre hilos)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def is_compressed(path: str) -> bool:
+    """Verificar si la ruta corresponde a un archivo comprimido"""
+    return str(path).endswith(GZIP_SUFFIX)
+
+
+def logical_path(path: str) -> str:
+    """Obtener la ruta lógica (.html) de un archivo, comprimido o no"""
+    path = str(path)
+    return path[:-len(GZIP_SUFFIX)] if is_compressed(path) else path
+
+
+def physical_path(path: str, compress: bool) -> str:
+    """Obtener la ruta en disco para una ruta lógica según el modo de almacenamiento"""
+    path = logical_path(path)
+    return path + GZIP_SUFFIX if compress else path
+
+
+def resolve_stored_path(path: str) -> Optional[str]:
+    """
+    Encontrar el archivo en disco para una ruta lógica o física
+    
+    Returns:
+        str: Ruta existente (plana o .gz), o None si no existe ninguna
+    """
+    base = logical_path(path)
+    for candidate in (str(path), base, base + GZIP_SUFFIX):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def fsync_directory(directory: str) -> None:
+    """Sincronizar la entrada de directorio para que un rename sobreviva a un corte"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # Windows no permite abrir directorios
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _file_mode(path: str) -> int:
+    """Permisos para un archivo reescrito: los del archivo actual o los de uno nuevo según la umask"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path: str, data: bytes, durable: bool = True) -> None:
+    """
+    Escribir un archivo de forma atómica
+    
+    Los datos se escriben en un temporal del mismo directorio que luego se
+    renombra sobre el destino; un corte a mitad de escritura deja el archivo
+    anterior intacto en lugar de uno truncado. El temporal (que ``mkstemp``
+    crea con 0600) recibe los permisos del archivo que reemplaza.
+    
+    Args:
+        path: Ruta destino
+        data: Contenido
+        durable: Hacer fsync del archivo y del directorio
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix=TEMP_SUFFIX, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    if durable:
+        fsync_directory(directory)
+
+
+def write_html(path: str, content: str, compresslevel: int = 6, durable: bool = True) -> int:
+    """
+    Escribir contenido HTML en disco de forma atómica
+    
+    El formato lo determina la ruta: si termina en .gz se guarda comprimido.
+    
+    Returns:
+        int: Bytes escritos en disco
+    """
+    data = content.encode('utf-8')
+    if is_compressed(path):
+        # mtime=0 para que el mismo contenido produzca siempre los mismos bytes
+        data = gzip.compress(data, compresslevel=compresslevel, mtime=0)
+    
+    atomic_write_bytes(path, data, durable)
+    return len(data)
+
+
+def write_html_stream(path: str, chunks: Iterable[bytes], compresslevel: int = 6,
+                      durable: bool = True) -> Dict[str, Any]:
+    """
+    Escribir HTML recibido por bloques de forma atómica, sin tenerlo completo en memoria
+    
+    Igual que ``write_html``, pero el contenido (UTF-8) llega como un iterable
+    de bytes que se va escribiendo en el temporal; el tamaño y el SHA-256 se
+    calculan sobre la marcha. Si el iterable lanza una excepción el destino no
+    se modifica.
+    
+    Returns:
+        Dict con ``size`` (bytes sin comprimir), ``stored_size`` (bytes en disco)
+        y ``sha256`` (del contenido sin comprimir)
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix=TEMP_SUFFIX, dir=directory)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            target = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=compresslevel, mtime=0) \
+                if is_compressed(path) else f
+            try:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    target.write(chunk)
+            finally:
+                if target is not f:
+                    target.close()
+            stored = f.tell()
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    if durable:
+        fsync_directory(directory)
+    return {'size': size, 'stored_size': stored, 'sha256': digest.hexdigest()}
+
+
+def stored_size(path: str) -> Optional[int]:
+    """
+    Tamaño del HTML sin comprimir de un archivo almacenado, sin leerlo completo
+    
+    Para .gz se usa el campo ISIZE del final del archivo (tamaño módulo 2^32).
+    
+    Returns:
+        int: Tamaño en bytes, o None si el archivo no existe
+    """
+    try:
+        if not is_compressed(path):
+            return os.path.getsize(path)
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < 18:  # Cabecera (10) + pie (8) de gzip
+                return -1
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', f.read(4))[0]
+    except FileNotFoundError:
+        return None
+
+
+def read_html(path: str) -> str:
+    """Leer contenido HTML de disco, descomprimiendo si es necesario"""
+    if is_compressed(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read()
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def iter_html_bytes(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    """Leer el HTML sin comprimir por bloques, sin cargarlo completo en memoria"""
+    opener = gzip.open if is_compressed(path) else open
+    with opener(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def remove_stored(path: str) -> bool:
+    """
+    Eliminar todas las variantes (plana y .gz) de una ruta lógica
+    
+    Returns:
+        bool: True si se eliminó algún archivo
+    """
+    removed = False
+    base = logical_path(path)
+    for candidate in (base, base + GZIP_SUFFIX):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+            removed = True
+    return removed
+
+
+def copy_stored(source: str, destination_without_suffix: str) -> str:
+    """
+    Copiar un archivo almacenado conservando su formato
+    
+    Returns:
+        str: Ruta de destino (con .gz si el origen estaba comprimido)
+    """
+    destination = destination_without_suffix + (GZIP_SUFFIX if is_compressed(source) else '')
+    shutil.copy2(source, destination)
+    return destination
@@ -0,0 +1,118 @@
+"""
+Distribución de archivos de reportes en directorios
+
+- ``monthly``: ``YYYY/MM/<archivo>`` (distribución original).
+- ``sharded``: ``YYYY/MM/DD/<hh>/<archivo>``, donde ``hh`` son los primeros
+  caracteres hexadecimales del SHA-1 del nombre lógico del archivo. Con el
+  ancho por defecto (2) cada día se reparte en hasta 256 directorios.
+
+La ubicación depende solo del nombre y de su fecha, así que un archivo se
+puede encontrar sin recorrer directorios. Mientras se migra de una
+distribución a otra, ``candidate_paths`` devuelve ambas ubicaciones.
+
+Para mover archivos sin detener el servicio, ``stage_move`` crea el archivo en
+el destino (enlace duro) sin quitar el origen; cuando las referencias ya
+apuntan al destino, ``finish_move`` quita el origen. Si el origen se reescribió
+entre ambos pasos, su contenido (más reciente) reemplaza al del destino.
+"""
+
+import os
+import shutil
+import hashlib
+from datetime import datetime
+from typing import List, Tuple
+
+from app.services.report_storage import TEMP_SUFFIX, logical_path
+
+LAYOUT_MONTHLY = 'monthly'
+LAYOUT_SHARDED = 'sharded'
+LAYOUTS = (LAYOUT_MONTHLY, LAYOUT_SHARDED)
+
+
+def shard_prefix(filename: str, width: int = 2) -> str:
+    """Prefijo hexadecimal del hash del nombre lógico (sin .gz) de un archivo"""
+    name = os.path.basename(logical_path(filename))
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:width]
+
+
+class StorageLayout:
+    """Rutas de archivos según la distribución configurada"""
+    
+    def __init__(self, base_path: str, layout: str = LAYOUT_MONTHLY, shard_width: int = 2):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Distribución de almacenamiento no soportada: {layout}. Use: {', '.join(LAYOUTS)}")
+        if not 1 <= shard_width <= 8:
+            raise ValueError("El ancho del prefijo de hash debe estar entre 1 y 8")
+        self.base_path = str(base_path)
+        self.layout = layout
+        self.shard_width = shard_width
+    
+    def relative_directory(self, filename: str, moment: datetime, layout: str = None) -> str:
+        """Directorio (relativo a la base) de un archivo"""
+        parts = [moment.strftime('%Y'), moment.strftime('%m')]
+        if (layout or self.layout) == LAYOUT_SHARDED:
+            parts += [moment.strftime('%d'), shard_prefix(filename, self.shard_width)]
+        return os.path.join(*parts)
+    
+    def path_for(self, filename: str, moment: datetime, layout: str = None) -> str:
+        """Ruta completa de un archivo (sin crear directorios)"""
+        return os.path.join(self.base_path, self.relative_directory(filename, moment, layout),
+                            os.path.basename(filename))
+    
+    def prepare_path(self, filename: str, moment: datetime = None) -> str:
+        """Ruta de un archivo nuevo en la distribución configurada, creando su directorio"""
+        path = self.path_for(filename, moment or datetime.now())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+    
+    def candidate_paths(self, filename: str, moment: datetime) -> List[str]:
+        """Ubicaciones posibles de un archivo: la distribución configurada primero"""
+        others = [layout for layout in LAYOUTS if layout != self.layout]
+        return [self.path_for(filename, moment, layout) for layout in [self.layout] + others]
+
+
+def _signature(stat: os.stat_result) -> Tuple[int, int, int]:
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def stage_move(source: str, destination: str) -> Tuple[int, int, int]:
+    """
+    Crear el archivo en el destino sin quitar el origen
+    
+    Usa un enlace duro (sin copiar datos); si el destino está en otro sistema
+    de archivos, copia. Un destino que quedó de una migración interrumpida se
+    reemplaza.
+    
+    Returns:
+        Firma (inodo, mtime, tamaño) del origen, para ``finish_move``
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    signature = _signature(os.stat(source))
+    temp_path = destination + TEMP_SUFFIX
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+    return signature
+
+
+def finish_move(source: str, destination: str, signature: Tuple[int, int, int]) -> bool:
+    """
+    Quitar el origen una vez que las referencias apuntan al destino
+    
+    Returns:
+        bool: True si el origen había cambiado y se movió sobre el destino
+    """
+    try:
+        stat = os.stat(source)
+    except FileNotFoundError:
+        return False
+    if _signature(stat) != signature:
+        # Escritura concurrente en la ruta anterior: conservar la versión más reciente
+        os.replace(source, destination)
+        return True
+    os.remove(source)
+    return False
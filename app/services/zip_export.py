@@ -0,0 +1,152 @@
+"""
+Exportación de archivos almacenados como un ZIP generado en streaming
+
+El ZIP se produce por bloques a medida que se leen los archivos (sin archivo
+temporal ni el ZIP completo en memoria), por lo que puede enviarse como cuerpo
+de una respuesta HTTP desde el primer archivo.
+
+- Archivos guardados con gzip (.html.gz): el flujo deflate del .gz se copia
+  tal cual como entrada ``deflated`` del ZIP (con CRC y tamaño tomados del pie
+  del gzip), sin descomprimir ni volver a comprimir; dentro del ZIP el archivo
+  aparece con su nombre lógico (.html).
+- Formatos ya comprimidos (PDF, imágenes, Office, ZIP): entradas ``stored``.
+- Resto: comprimido con deflate al vuelo.
+"""
+
+import os
+import struct
+import logging
+import zipfile
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+
+from app.services.report_storage import READ_CHUNK_SIZE, is_compressed
+from app.services.zip_stream import ZipStreamWriter
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Extensiones cuyo contenido ya está comprimido: se guardan sin recomprimir
+ALREADY_COMPRESSED_EXTENSIONS = (
+    '.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.zip', '.docx', '.xlsx', '.pptx'
+)
+
+# Banderas del encabezado gzip (RFC 1952)
+_GZIP_FHCRC = 0x02
+_GZIP_FEXTRA = 0x04
+_GZIP_FNAME = 0x08
+_GZIP_FCOMMENT = 0x10
+
+
+class _ChunkBuffer:
+    """Destino de escritura del ZIP que acumula bytes hasta entregarlos"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data: bytes) -> None:
+        self._chunks.append(data)
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def gzip_deflate_span(f: BinaryIO) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Ubicar el flujo deflate de un archivo gzip de un solo miembro
+    
+    Returns:
+        (desplazamiento, longitud, crc32, tamaño sin comprimir), o None si el
+        archivo no tiene un encabezado gzip válido
+    """
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'\x1f\x8b\x08':
+        return None
+    flags = header[3]
+    if flags & _GZIP_FEXTRA:
+        extra_length, = struct.unpack('<H', f.read(2))
+        f.seek(extra_length, os.SEEK_CUR)
+    for flag in (_GZIP_FNAME, _GZIP_FCOMMENT):
+        if flags & flag:
+            while f.read(1) not in (b'\x00', b''):
+                pass
+    if flags & _GZIP_FHCRC:
+        f.seek(2, os.SEEK_CUR)
+    start = f.tell()
+    
+    end = f.seek(0, os.SEEK_END) - 8
+    if end < start:
+        return None
+    f.seek(end)
+    crc, size = struct.unpack('<II', f.read(8))
+    return start, end - start, crc, size
+
+
+def _iter_range(f: BinaryIO, start: int, length: Optional[int] = None) -> Iterator[bytes]:
+    """Leer el archivo por bloques desde ``start`` (hasta ``length`` bytes) y cerrarlo"""
+    with f:
+        f.seek(start)
+        while length is None or length > 0:
+            chunk = f.read(READ_CHUNK_SIZE if length is None else min(READ_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+
+
+def _write_file(writer: ZipStreamWriter, path: str, arcname: str) -> Iterable[None]:
+    """
+    Escribir un archivo en el ZIP eligiendo cómo comprimirlo según su formato
+    
+    El archivo se abre antes de escribir el encabezado de la entrada: si ya no
+    existe, ``FileNotFoundError`` se lanza sin haber escrito nada.
+    """
+    f = open(path, 'rb')
+    try:
+        mtime = os.fstat(f.fileno()).st_mtime
+        span = gzip_deflate_span(f) if is_compressed(path) else None
+    except BaseException:
+        f.close()
+        raise
+    
+    if span is not None:
+        start, length, crc, size = span
+        return writer.write_compressed_stream(arcname, _iter_range(f, start, length), crc, length,
+                                              size, zipfile.ZIP_DEFLATED, mtime)
+    method = zipfile.ZIP_STORED if path.lower().endswith(ALREADY_COMPRESSED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+    return writer.write_stream(arcname, _iter_range(f, 0), method, mtime)
+
+
+def stream_zip(files: Iterable[Tuple[str, str]], compresslevel: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Generar un ZIP por bloques a partir de archivos en disco
+    
+    Args:
+        files: Pares (ruta en disco, nombre dentro del ZIP); puede ser un
+            generador, se consume a medida que se escribe el ZIP
+        compresslevel: Nivel de deflate para los archivos que se comprimen al vuelo
+    
+    Yields:
+        bytes: Bloques consecutivos del archivo ZIP
+    
+    Los archivos que desaparecen antes de leerse se omiten.
+    """
+    buffer = _ChunkBuffer()
+    writer = ZipStreamWriter(buffer, zipfile.ZIP_DEFLATED, compresslevel)
+    
+    for path, arcname in files:
+        try:
+            steps = _write_file(writer, path, arcname)
+        except FileNotFoundError:
+            logger.warning(f"Archivo omitido en la exportación (no existe): {path}")
+            continue
+        for _ in steps:
+            data = buffer.drain()
+            if data:
+                yield data
+    
+    writer.close()
+    yield buffer.drain()
@@ -0,0 +1,327 @@
+"""
+Escritor de archivos ZIP en streaming
+
+Permite construir un ZIP escribiendo secuencialmente sobre cualquier objeto
+con método ``write`` (archivo en disco, socket, buffer de respuesta HTTP),
+sin necesidad de hacer ``seek`` ni de mantener el archivo completo en memoria.
+Soporta entradas ya comprimidas (por ejemplo, en un pool de procesos) y
+entradas cuyo contenido se recibe por bloques.
+"""
+
+import bz2
+import struct
+import time
+import zlib
+import zipfile
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+# Métodos de compresión soportados (nombre de configuración -> constante ZIP)
+ZIP_CODECS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+}
+
+_LOCAL_HEADER_SIGNATURE = 0x04034b50
+_DATA_DESCRIPTOR_SIGNATURE = 0x08074b50
+_CENTRAL_HEADER_SIGNATURE = 0x02014b50
+_END_OF_CENTRAL_DIR_SIGNATURE = 0x06054b50
+_ZIP64_END_OF_CENTRAL_DIR_SIGNATURE = 0x06064b50
+_ZIP64_LOCATOR_SIGNATURE = 0x07064b50
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_COUNT_LIMIT = 0xFFFF
+
+
+def get_zip_method(codec: str) -> int:
+    """Obtener la constante ZIP correspondiente al nombre del codec"""
+    try:
+        return ZIP_CODECS[codec.lower()]
+    except (KeyError, AttributeError):
+        raise ValueError(f"Codec de compresión no soportado: {codec}. Use: {', '.join(ZIP_CODECS)}")
+
+
+def make_compressor(method: int, level: Optional[int] = None):
+    """Crear compresor incremental para el método ZIP indicado"""
+    if method == zipfile.ZIP_STORED:
+        return None
+    if method == zipfile.ZIP_DEFLATED:
+        # wbits negativo: flujo deflate "raw", que es lo que espera el formato ZIP
+        return zlib.compressobj(level if level is not None else 6, zlib.DEFLATED, -15)
+    if method == zipfile.ZIP_BZIP2:
+        return bz2.BZ2Compressor(level if level else 9)
+    raise ValueError(f"Método de compresión no soportado: {method}")
+
+
+def compress_bytes(data: bytes, method: int, level: Optional[int] = None) -> bytes:
+    """Comprimir un bloque completo de datos para una entrada ZIP"""
+    compressor = make_compressor(method, level)
+    if compressor is None:
+        return data
+    return compressor.compress(data) + compressor.flush()
+
+
+def _dos_datetime(timestamp: Optional[float]) -> Tuple[int, int]:
+    """Convertir timestamp a fecha/hora en formato DOS"""
+    if timestamp is None:
+        timestamp = time.time()
+    moment = datetime.fromtimestamp(timestamp)
+    if moment.year < 1980:
+        moment = datetime(1980, 1, 1)
+    dos_time = (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2)
+    dos_date = ((moment.year - 1980) << 9) | (moment.month << 5) | moment.day
+    return dos_time, dos_date
+
+
+class _Entry:
+    """Información de una entrada ya escrita, necesaria para el directorio central"""
+    
+    __slots__ = ('name', 'flags', 'method', 'dos_time', 'dos_date', 'crc',
+                 'compressed_size', 'file_size', 'header_offset')
+    
+    def __init__(self, name: bytes, flags: int, method: int, dos_time: int, dos_date: int):
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.crc = 0
+        self.compressed_size = 0
+        self.file_size = 0
+        self.header_offset = 0
+
+
+class ZipStreamWriter:
+    """Escritor secuencial de archivos ZIP (no requiere seek)"""
+    
+    def __init__(self, fileobj, method: int = zipfile.ZIP_DEFLATED, compresslevel: Optional[int] = None):
+        self.fileobj = fileobj
+        self.method = method
+        self.compresslevel = compresslevel
+        self.offset = 0
+        self.entries: List[_Entry] = []
+        self._closed = False
+    
+    def _write(self, data: bytes) -> None:
+        if data:
+            self.fileobj.write(data)
+            self.offset += len(data)
+    
+    @staticmethod
+    def _encode_name(arcname: str) -> Tuple[bytes, int]:
+        arcname = arcname.replace('\\', '/').lstrip('/')
+        try:
+            return arcname.encode('ascii'), 0
+        except UnicodeEncodeError:
+            return arcname.encode('utf-8'), _FLAG_UTF8
+    
+    @staticmethod
+    def _version_needed(method: int) -> int:
+        return 46 if method == zipfile.ZIP_BZIP2 else 20
+    
+    def _write_local_header(self, entry: _Entry) -> None:
+        entry.header_offset = self.offset
+        header = struct.pack(
+            '<IHHHHHIIIHH',
+            _LOCAL_HEADER_SIGNATURE,
+            self._version_needed(entry.method),
+            entry.flags,
+            entry.method,
+            entry.dos_time,
+            entry.dos_date,
+            entry.crc,
+            entry.compressed_size,
+            entry.file_size,
+            len(entry.name),
+            0
+        )
+        self._write(header + entry.name)
+    
+    def write_compressed(self, arcname: str, compressed: bytes, crc: int, file_size: int,
+                         method: Optional[int] = None, mtime: Optional[float] = None) -> None:
+        """
+        Escribir una entrada cuyo contenido ya fue comprimido
+        
+        Args:
+            arcname: Nombre dentro del ZIP
+            compressed: Datos comprimidos con el método indicado
+            crc: CRC32 de los datos sin comprimir
+            file_size: Tamaño de los datos sin comprimir
+            method: Método ZIP usado (por defecto el del escritor)
+            mtime: Fecha de modificación (timestamp)
+        """
+        if self._closed:
+            raise ValueError("El archivo ZIP ya fue cerrado")
+        if len(compressed) > _ZIP32_LIMIT or file_size > _ZIP32_LIMIT:
+            raise ValueError(f"La entrada {arcname} excede el tamaño máximo soportado")
+        
+        name, flags = self._encode_name(arcname)
+        entry = _Entry(name, flags, self.method if method is None else method, *_dos_datetime(mtime))
+        entry.crc = crc & 0xFFFFFFFF
+        entry.compressed_size = len(compressed)
+        entry.file_size = file_size
+        
+        self._write_local_header(entry)
+        self._write(compressed)
+        self.entries.append(entry)
+    
+    def write_compressed_stream(self, arcname: str, chunks: Iterable[bytes], crc: int,
+                                compressed_size: int, file_size: int, method: Optional[int] = None,
+                                mtime: Optional[float] = None) -> Iterable[None]:
+        """
+        Escribir por bloques una entrada ya comprimida de tamaño conocido
+        
+        Como ``write_compressed``, pero los datos comprimidos no se cargan
+        completos (por ejemplo, el flujo deflate de un archivo .gz leído de
+        disco). Es un generador, igual que ``write_stream``.
+        """
+        if self._closed:
+            raise ValueError("El archivo ZIP ya fue cerrado")
+        if compressed_size > _ZIP32_LIMIT or file_size > _ZIP32_LIMIT:
+            raise ValueError(f"La entrada {arcname} excede el tamaño máximo soportado")
+        
+        name, flags = self._encode_name(arcname)
+        entry = _Entry(name, flags, self.method if method is None else method, *_dos_datetime(mtime))
+        entry.crc = crc & 0xFFFFFFFF
+        entry.compressed_size = compressed_size
+        entry.file_size = file_size
+        self._write_local_header(entry)
+        
+        written = 0
+        for chunk in chunks:
+            written += len(chunk)
+            self._write(chunk)
+            yield None
+        if written != compressed_size:
+            raise ValueError(f"La entrada {arcname} cambió de tamaño durante la escritura")
+        self.entries.append(entry)
+    
+    def write_bytes(self, arcname: str, data: bytes, method: Optional[int] = None,
+                    mtime: Optional[float] = None) -> None:
+        """Comprimir y escribir una entrada a partir de sus bytes"""
+        method = self.method if method is None else method
+        self.write_compressed(arcname, compress_bytes(data, method, self.compresslevel),
+                              zlib.crc32(data), len(data), method, mtime)
+    
+    def write_stream(self, arcname: str, chunks: Iterable[bytes], method: Optional[int] = None,
+                     mtime: Optional[float] = None) -> Iterable[None]:
+        """
+        Escribir una entrada cuyo contenido llega por bloques
+        
+        Usa un "data descriptor" al final de la entrada, por lo que no es
+        necesario conocer el tamaño ni el CRC antes de empezar. Es un generador:
+        produce ``None`` después de cada bloque escrito para que el llamador
+        pueda vaciar su buffer de salida.
+        """
+        if self._closed:
+            raise ValueError("El archivo ZIP ya fue cerrado")
+        
+        name, flags = self._encode_name(arcname)
+        method = self.method if method is None else method
+        entry = _Entry(name, flags | _FLAG_DATA_DESCRIPTOR, method, *_dos_datetime(mtime))
+        self._write_local_header(entry)
+        
+        compressor = make_compressor(method, self.compresslevel)
+        crc = 0
+        file_size = 0
+        compressed_size = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            data = compressor.compress(chunk) if compressor else chunk
+            compressed_size += len(data)
+            self._write(data)
+            yield None
+        
+        if compressor:
+            tail = compressor.flush()
+            compressed_size += len(tail)
+            self._write(tail)
+        
+        if compressed_size > _ZIP32_LIMIT or file_size > _ZIP32_LIMIT:
+            raise ValueError(f"La entrada {arcname} excede el tamaño máximo soportado")
+        
+        entry.crc = crc & 0xFFFFFFFF
+        entry.compressed_size = compressed_size
+        entry.file_size = file_size
+        self._write(struct.pack('<IIII', _DATA_DESCRIPTOR_SIGNATURE, entry.crc,
+                                entry.compressed_size, entry.file_size))
+        self.entries.append(entry)
+        yield None
+    
+    def close(self) -> None:
+        """Escribir el directorio central y cerrar el ZIP"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        central_offset = self.offset
+        for entry in self.entries:
+            extra = b''
+            header_offset = entry.header_offset
+            version = self._version_needed(entry.method)
+            if header_offset > _ZIP32_LIMIT:
+                # Campo extra ZIP64 con el desplazamiento del encabezado local
+                extra = struct.pack('<HHQ', 0x0001, 8, header_offset)
+                header_offset = _ZIP32_LIMIT
+                version = max(version, 45)
+            
+            self._write(struct.pack(
+                '<IHHHHHHIIIHHHHHII',
+                _CENTRAL_HEADER_SIGNATURE,
+                (3 << 8) | version,  # Creado en sistema tipo Unix
+                version,
+                entry.flags,
+                entry.method,
+                entry.dos_time,
+                entry.dos_date,
+                entry.crc,
+                entry.compressed_size,
+                entry.file_size,
+                len(entry.name),
+                len(extra),
+                0,
+                0,
+                0,
+                0o100644 << 16,  # Permisos de archivo regular
+                header_offset
+            ) + entry.name + extra)
+        
+        central_size = self.offset - central_offset
+        entry_count = len(self.entries)
+        
+        if (entry_count > _ZIP32_COUNT_LIMIT or central_offset > _ZIP32_LIMIT
+                or central_size > _ZIP32_LIMIT):
+            zip64_offset = self.offset
+            self._write(struct.pack(
+                '<IQHHIIQQQQ',
+                _ZIP64_END_OF_CENTRAL_DIR_SIGNATURE,
+                44, 45, 45, 0, 0,
+                entry_count, entry_count, central_size, central_offset
+            ))
+            self._write(struct.pack('<IIQI', _ZIP64_LOCATOR_SIGNATURE, 0, zip64_offset, 1))
+            entry_count = min(entry_count, _ZIP32_COUNT_LIMIT)
+            central_size = min(central_size, _ZIP32_LIMIT)
+            central_offset = min(central_offset, _ZIP32_LIMIT)
+        
+        self._write(struct.pack(
+            '<IHHHHIIH',
+            _END_OF_CENTRAL_DIR_SIGNATURE,
+            0, 0,
+            entry_count, entry_count,
+            central_size, central_offset,
+            0
+        ))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
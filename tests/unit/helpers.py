@@ -0,0 +1,48 @@
+"""
+Utilidades compartidas por las pruebas unitarias de archivos HTML del frontend
+"""
+
+import shutil
+import tempfile
+import unittest
+from typing import Any, Dict
+
+from app.config import Config
+from app.services.frontend_html_service import FrontendHTMLService
+
+HTML = '<!DOCTYPE html>\n<html><body>Resultado</body></html>'
+
+
+def frontend_html_config(base_path: str, **overrides) -> Config:
+    """
+    Configuración del frontend HTML sobre ``base_path``
+    
+    Sin backups y con el índice SQLite dentro del directorio base; ``overrides``
+    reemplaza cualquier otro atributo de Config.
+    """
+    settings = {
+        'FRONTEND_HTML_BASE_PATH': base_path,
+        'FRONTEND_HTML_BACKUP_ENABLED': False,
+        'FRONTEND_HTML_INDEX_PATH': None,
+        **overrides
+    }
+    return type('FrontendHTMLTestConfig', (Config,), settings)()
+
+
+class FrontendHTMLTestCase(unittest.TestCase):
+    """Base para pruebas con un FrontendHTMLService sobre un directorio temporal"""
+    
+    # Atributos de Config propios de cada clase de pruebas
+    config_overrides: Dict[str, Any] = {}
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        self.config = frontend_html_config(self.base_path, **self.config_overrides)
+        self.service = FrontendHTMLService(self.config)
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        self.service.backup_store.close()
+        self.service.index.close()
+        shutil.rmtree(self.base_path, ignore_errors=True)
@@ -0,0 +1,168 @@
+"""
+Pruebas unitarias para la conversión de documentos Word de pruebas a plantillas HTML
+"""
+
+import os
+import re
+import json
+import shutil
+import zipfile
+import tempfile
+import unittest
+from xml.sax.saxutils import escape
+
+from app.services.docx_template_converter import (
+    CACHE_NAME, convert_docx, convert_templates, document_title, slugify
+)
+from app.services.lab_test_catalog import LabTestCatalog
+
+DOCX_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'bocetos_pruebas')
+
+NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+HEADER = [
+    'LABORATORIO CLINICO',
+    'Paciente: JUAN PEREZ',
+    'Recepción: 12/09/2025                              Responsable',
+]
+
+
+def paragraph(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def table(*rows):
+    cells = ''.join(
+        '<w:tr>' + ''.join(f'<w:tc>{paragraph(cell)}</w:tc>' for cell in row) + '</w:tr>' for row in rows
+    )
+    return f'<w:tbl>{cells}</w:tbl>'
+
+
+def write_docx(path, *blocks):
+    """Documento mínimo con párrafos (texto) y tablas (``table(...)``)"""
+    body = ''.join(block if block.startswith('<w:tbl>') else paragraph(block) for block in blocks)
+    with zipfile.ZipFile(path, 'w') as document:
+        document.writestr('word/document.xml',
+                          f'<w:document xmlns:w="{NAMESPACE}"><w:body>{body}</w:body></w:document>')
+
+
+def cells(content):
+    """Textos de las celdas de una plantilla (los saltos de línea como |)"""
+    body = content[content.index('<tbody>'):content.index('</tbody>')]
+    return [re.sub(r'<[^>]+>', '', cell.replace('<br>', '|')) for cell in re.findall(r'<td[^>]*>.*?</td>', body)]
+
+
+class TestDocxTemplateConverter(unittest.TestCase):
+    """Pruebas para convert_docx y convert_templates"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.source_path = tempfile.mkdtemp()
+        self.output_path = tempfile.mkdtemp()
+        self.quimica = os.path.join(self.source_path, '4. QUIMICA CLINICA.docx')
+        write_docx(
+            self.quimica, *HEADER,
+            'BIOQUIMICA',
+            table(['', 'EXAMEN', 'RESULTADO', 'RANGOS DE REFERENCIA']),
+            'GLUCOSA PRE:                  85 mg/dl                 70 – 110 mg/dl',
+            'CREATININA                    1. 2 mg/dl               Mujeres 0.7 – 1.4',
+            'Hombres 0.9 – 1.5',
+            'PERFIL DE LIPIDOS',
+            'COLESTEROL HDL:  41 mg/dl                              35 – 55 mg/dl',
+            'ORINA COMPLETA',
+            table(['', '', 'EXAMEN', '']),
+            'MACROSCOPICO:                                    MICROSCOPICO:',
+            'COLOR:           AMARILLO                        LEUCOCITOS:      2 X CAMPO',
+            'PH:              6.0',
+        )
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.source_path, ignore_errors=True)
+        shutil.rmtree(self.output_path, ignore_errors=True)
+    
+    def test_sections_become_templates(self):
+        """Probar títulos, columnas, rangos de varias líneas, subtítulos y secciones en dos columnas"""
+        self.assertEqual(document_title(self.quimica), 'QUIMICA CLINICA')
+        self.assertEqual(slugify('Química Clínica (suero)'), 'quimica_clinica_suero')
+        
+        templates = dict(convert_docx(self.quimica))
+        self.assertEqual(sorted(templates), ['quimica_clinica_bioquimica.html', 'quimica_clinica_orina_completa.html'])
+        
+        bioquimica = templates['quimica_clinica_bioquimica.html']
+        self.assertIn('<h1>BIOQUIMICA</h1>', bioquimica)
+        self.assertNotIn('JUAN PEREZ', bioquimica)
+        self.assertEqual(cells(bioquimica), [
+            'GLUCOSA PRE:', '85 mg/dl', '70 – 110 mg/dl',
+            'CREATININA', '1.2 mg/dl', 'Mujeres 0.7 – 1.4|Hombres 0.9 – 1.5',
+            'PERFIL DE LIPIDOS',
+            'COLESTEROL HDL:', '41 mg/dl', '35 – 55 mg/dl',
+        ])
+        
+        # Las filas de la columna derecha van después de las de la izquierda
+        orina = templates['quimica_clinica_orina_completa.html']
+        self.assertEqual(re.findall(r'<th>(.*?)</th>', orina), ['EXAMEN', 'RESULTADO'])
+        self.assertEqual(cells(orina), [
+            'MACROSCOPICO:', 'COLOR:', 'AMARILLO', 'PH:', '6.0',
+            'MICROSCOPICO:', 'LEUCOCITOS:', '2 X CAMPO',
+        ])
+    
+    def test_real_document(self):
+        """Probar la conversión de un documento real de bocetos_pruebas"""
+        templates = dict(convert_docx(os.path.join(DOCX_PATH, '3. HEMATOLOGIA.docx')))
+        
+        self.assertIn('hematologia.html', templates)
+        self.assertIn('hematologia_bioquimica_hepatica.html', templates)
+        hematologia = cells(templates['hematologia.html'])
+        self.assertIn('HEMOGLOBINA (HB):', hematologia)
+        self.assertEqual(hematologia[hematologia.index('HEMOGLOBINA (HB):') + 1], '11.4 g/dl')
+    
+    def test_pipeline_skips_unchanged_sources_and_keeps_manual_templates(self):
+        """Probar la conversión en paralelo, la cache por hash y que no se pisan plantillas ajenas"""
+        write_docx(os.path.join(self.source_path, '1. HECES.docx'), *HEADER, 'COPROLOGIA',
+                   table(['', 'EXAMEN', 'RESULTADO', 'RANGOS DE REFERENCIA']),
+                   'SANGRE OCULTA:        NEGATIVO          NEGATIVO')
+        # Plantilla hecha a mano con el mismo nombre que una sección
+        manual = os.path.join(self.output_path, 'quimica_clinica_orina_completa.html')
+        with open(manual, 'w', encoding='utf-8') as f:
+            f.write('<p>Manual</p>')
+        
+        summary = convert_templates(self.source_path, self.output_path, workers=2)
+        self.assertEqual(summary['converted'], ['1. HECES.docx', '4. QUIMICA CLINICA.docx'])
+        self.assertEqual(sorted(summary['written']), ['heces_coprologia.html', 'quimica_clinica_bioquimica.html'])
+        self.assertEqual(summary['conflicts'], [{'source': '4. QUIMICA CLINICA.docx',
+                                                  'file': 'quimica_clinica_orina_completa.html'}])
+        with open(manual, encoding='utf-8') as f:
+            self.assertEqual(f.read(), '<p>Manual</p>')
+        
+        # Sin cambios solo se reintenta el documento con conflictos
+        summary = convert_templates(self.source_path, self.output_path, workers=2)
+        self.assertEqual(summary['converted'], ['4. QUIMICA CLINICA.docx'])
+        self.assertEqual(summary['skipped'], 1)
+        os.remove(manual)
+        summary = convert_templates(self.source_path, self.output_path)
+        self.assertEqual(summary['written'], ['quimica_clinica_bioquimica.html', 'quimica_clinica_orina_completa.html'])
+        self.assertEqual(convert_templates(self.source_path, self.output_path)['converted'], [])
+        
+        # Un documento modificado reemplaza sus plantillas y quita las que ya no genera
+        write_docx(self.quimica, *HEADER, 'BIOQUIMICA', table(['', 'EXAMEN', 'RESULTADO', 'RANGOS DE REFERENCIA']),
+                   'GLUCOSA PRE:                  90 mg/dl                 70 – 110 mg/dl')
+        summary = convert_templates(self.source_path, self.output_path)
+        self.assertEqual(summary['converted'], ['4. QUIMICA CLINICA.docx'])
+        self.assertEqual(summary['removed'], ['quimica_clinica_orina_completa.html'])
+        
+        catalog = LabTestCatalog(self.output_path, reload_interval=0)
+        self.assertEqual([entry['filename'] for entry in catalog.list_tests()],
+                         ['heces_coprologia.html', 'quimica_clinica_bioquimica.html'])
+        self.assertEqual(catalog.search('glucosa')[0]['filename'], 'quimica_clinica_bioquimica.html')
+        
+        # Un documento eliminado se lleva sus plantillas
+        os.remove(os.path.join(self.source_path, '1. HECES.docx'))
+        summary = convert_templates(self.source_path, self.output_path)
+        self.assertEqual(summary['removed'], ['heces_coprologia.html'])
+        with open(os.path.join(self.output_path, CACHE_NAME), encoding='utf-8') as f:
+            self.assertEqual(list(json.load(f)['sources']), ['4. QUIMICA CLINICA.docx'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Pruebas unitarias para el journal de ediciones de archivos HTML del frontend
+"""
+
+import json
+import os
+import threading
+import unittest
+
+from app.services.edit_journal import LOCK_DIRECTORY, journal_path, read_entries
+from tests.unit.helpers import HTML, FrontendHTMLTestCase
+
+
+class TestEditJournal(FrontendHTMLTestCase):
+    """Pruebas para el historial de ediciones en journal de solo anexado"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        super().setUp()
+        self.file_path = os.path.join(self.base_path, '2024', '01', 'frontend_a.html')
+        self.service.save_html_file(HTML, self.file_path, {'patient_name': 'Juan', 'created_by': 'ana'})
+    
+    def _meta_size(self):
+        return os.path.getsize(f'{self.file_path}.meta')
+    
+    def test_edits_append_to_journal_and_meta_stays_small(self):
+        """Probar que las ediciones se anexan al journal sin hacer crecer el .meta"""
+        self.service.mark_as_modified(self.file_path, edited_by='ana', edit_reason='Revisión')
+        size_after_first = self._meta_size()
+        for _ in range(20):
+            self.service.mark_as_modified(self.file_path, edited_by='ana', edit_reason='Revisión')
+        self.service.update_html_file(self.file_path, HTML + '<p>v2</p>', {'edited_by': 'luis'})
+        
+        with open(f'{self.file_path}.meta', 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        self.assertNotIn('edit_history', metadata)
+        self.assertEqual(metadata['edit_count'], 22)
+        self.assertLessEqual(self._meta_size(), size_after_first + 64)
+        
+        history = self.service.get_edit_history(self.file_path)
+        self.assertEqual(len(history), 22)
+        self.assertEqual(history[-1]['edited_by'], 'luis')
+        self.assertEqual(len(self.service.get_edit_stats(self.file_path)['edit_history']), 22)
+        
+        self.service.reset_edit_tracking(self.file_path)
+        self.assertEqual(self.service.get_edit_history(self.file_path), [])
+        self.assertFalse(os.path.exists(journal_path(self.file_path)))
+    
+    def test_legacy_history_is_migrated(self):
+        """Probar que un .meta con edit_history embebido se migra al journal"""
+        legacy = {'patient_name': 'Juan', 'edit_count': 1, 'is_modified': True,
+                  'edit_history': [{'edit_date': '2024-01-01T10:00:00', 'edited_by': 'ana'}]}
+        with open(f'{self.file_path}.meta', 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, indent=2)
+        
+        self.assertEqual(len(self.service.get_edit_history(self.file_path)), 1)
+        
+        self.service.mark_as_modified(self.file_path, edited_by='luis')
+        self.assertNotIn('edit_history', self.service.get_file_metadata(self.file_path))
+        self.assertEqual([entry['edited_by'] for entry in read_entries(self.file_path)], ['ana', 'luis'])
+        self.assertEqual(self.service.get_file_metadata(self.file_path)['edit_count'], 2)
+    
+    def test_concurrent_edits_are_not_lost(self):
+        """Probar que ediciones concurrentes no se pierden (sin lost updates)"""
+        def edit():
+            for _ in range(10):
+                self.service.mark_as_modified(self.file_path, edited_by='concurrente')
+        
+        threads = [threading.Thread(target=edit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(self.service.get_file_metadata(self.file_path)['edit_count'], 40)
+        self.assertEqual(len(read_entries(self.file_path)), 40)
+    
+    def test_torn_last_line_is_ignored(self):
+        """Probar que una línea incompleta al final del journal no rompe la lectura"""
+        self.service.mark_as_modified(self.file_path, edited_by='ana')
+        with open(journal_path(self.file_path), 'a', encoding='utf-8') as f:
+            f.write('{"edit_date": "2024-')
+        self.assertEqual(len(self.service.get_edit_history(self.file_path)), 1)
+        
+        self.service.mark_as_modified(self.file_path, edited_by='luis')
+        self.assertEqual([entry['edited_by'] for entry in self.service.get_edit_history(self.file_path)],
+                         ['ana', 'luis'])
+    
+    def test_lock_files_are_shared_and_never_removed(self):
+        """Probar que los bloqueos viven en un directorio fijo y no se borran con el archivo"""
+        other_path = os.path.join(self.base_path, '2024', '01', 'frontend_b.html')
+        self.service.save_html_file(HTML, other_path, {'patient_name': 'Luis'})
+        self.service.mark_as_modified(self.file_path, edited_by='ana')
+        lock_dir = os.path.join(self.base_path, LOCK_DIRECTORY)
+        locks = sorted(os.listdir(lock_dir))
+        
+        self.service.delete_html_file(self.file_path)
+        self.service.mark_as_modified(other_path, edited_by='luis')
+        
+        self.assertTrue(set(locks) <= set(os.listdir(lock_dir)))
+        self.assertFalse([name for name in os.listdir(os.path.dirname(other_path)) if name.endswith('.lock')])
+
+
+if __name__ == '__main__':
+    unittest.main()
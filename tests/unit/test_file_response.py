@@ -0,0 +1,188 @@
+"""
+Pruebas unitarias para respuestas condicionales y por rangos de archivos
+"""
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from app.controllers.file_response import file_etag, send_html_file
+from app.controllers.lab_report_controller import LabReportController
+from app.routes.lab_tests_routes import lab_tests_bp
+from app.services.report_storage import write_html
+
+HTML = '<!DOCTYPE html>\n<html><body>' + '<p>Hemoglobina: 14 g/dl</p>\n' * 100 + '</body></html>'
+
+
+class TestFileResponse(unittest.TestCase):
+    """Pruebas para send_html_file"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        self.plain_path = os.path.join(self.base_path, 'reporte.html')
+        self.gzip_path = os.path.join(self.base_path, 'comprimido.html.gz')
+        write_html(self.plain_path, HTML)
+        write_html(self.gzip_path, HTML)
+        
+        self.app = Flask(__name__)
+        
+        @self.app.route('/file/<name>')
+        def serve(name):
+            from flask import request
+            return send_html_file(os.path.join(self.base_path, name),
+                                  immutable=request.args.get('final') == '1')
+        
+        self.client = self.app.test_client()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_etag_and_not_modified(self):
+        """Probar ETag por contenido y respuesta 304"""
+        response = self.client.get('/file/reporte.html')
+        etag = response.headers['ETag']
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(etag, f'"{file_etag(self.plain_path)}"')
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        
+        response = self.client.get('/file/reporte.html', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        
+        # Al cambiar el contenido cambia el ETag
+        write_html(self.plain_path, HTML.replace('14', '13'))
+        response = self.client.get('/file/reporte.html', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_range_request(self):
+        """Probar respuesta parcial con Range"""
+        response = self.client.get('/file/reporte.html', headers={'Range': 'bytes=0-14'})
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, HTML.encode('utf-8')[:15])
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+    
+    def test_immutable_policy(self):
+        """Probar cabeceras de cache para contenido que no cambia"""
+        response = self.client.get('/file/reporte.html?final=1')
+        cache_control = response.headers['Cache-Control']
+        
+        self.assertIn('immutable', cache_control)
+        self.assertIn('max-age=31536000', cache_control)
+        self.assertIn('private', cache_control)
+    
+    def test_gzip_variants_have_distinct_etags(self):
+        """Probar ETags distintos para bytes gzip y contenido descomprimido"""
+        gzip_response = self.client.get('/file/comprimido.html.gz', headers={'Accept-Encoding': 'gzip'})
+        plain_response = self.client.get('/file/comprimido.html.gz', headers={'Accept-Encoding': 'identity'})
+        
+        self.assertEqual(gzip_response.headers['Content-Encoding'], 'gzip')
+        self.assertNotEqual(gzip_response.headers['ETag'], plain_response.headers['ETag'])
+        self.assertEqual(plain_response.data.decode('utf-8'), HTML)
+        
+        response = self.client.get('/file/comprimido.html.gz', headers={
+            'Accept-Encoding': 'identity', 'If-None-Match': plain_response.headers['ETag']
+        })
+        self.assertEqual(response.status_code, 304)
+
+
+class TestReportFileVersioning(unittest.TestCase):
+    """Pruebas para las URLs versionadas de /api/reports/{id}/file"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.base_path, 'reporte.html')
+        write_html(self.file_path, HTML)
+        
+        file_path = self.file_path
+        
+        class ReportFiles:
+            def get_report_file(self, report_id):
+                return file_path, 'reporte.html', 'final'
+            
+            def get_file_info(self, report_id):
+                return {'file_path': file_path, 'file_name': 'reporte.html', 'file_exists': True}
+        
+        controller = LabReportController.__new__(LabReportController)
+        controller.service = ReportFiles()
+        
+        self.app = Flask(__name__)
+        self.app.add_url_rule('/api/reports/<int:report_id>/file', view_func=controller.get_report_file)
+        self.app.add_url_rule('/api/reports/<int:report_id>/file-info', view_func=controller.get_file_info)
+        self.client = self.app.test_client()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_only_current_version_is_immutable(self):
+        """Probar que un reporte final solo es inmutable con la versión vigente en la URL"""
+        file_url = self.client.get('/api/reports/1/file-info').get_json()['data']['file_url']
+        self.assertEqual(file_url, f'/api/reports/1/file?v={file_etag(self.file_path)}')
+        self.assertIn('immutable', self.client.get(file_url).headers['Cache-Control'])
+        self.assertIn('no-cache', self.client.get('/api/reports/1/file').headers['Cache-Control'])
+        
+        # El reporte vuelve a borrador y cambia: la URL anterior ya no es inmutable
+        write_html(self.file_path, HTML.replace('14', '13'))
+        response = self.client.get(file_url)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertIn(b'13 g/dl', response.data)
+        self.assertNotEqual(self.client.get('/api/reports/1/file-info').get_json()['data']['file_url'], file_url)
+
+
+class TestLabTestTemplates(unittest.TestCase):
+    """Pruebas para el servicio de plantillas con URLs versionadas"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        app = Flask(__name__)
+        app.register_blueprint(lab_tests_bp)
+        self.client = app.test_client()
+    
+    def test_versioned_template_is_immutable(self):
+        """Probar que la URL con versión se sirve como inmutable"""
+        templates = self.client.get('/api/lab-tests/list').get_json()['data']
+        url = templates[0]['url']
+        self.assertIn('?v=', url)
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('public', response.headers['Cache-Control'])
+        
+        response = self.client.get(url.split('?')[0])
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        
+        response = self.client.get(url, headers={'If-None-Match': f'"{templates[0]["version"]}"'})
+        self.assertEqual(response.status_code, 304)
+    
+    def test_bundle_is_compressed(self):
+        """Probar que /bundle devuelve varias plantillas comprimidas con gzip"""
+        templates = self.client.get('/api/lab-tests/list').get_json()['data']
+        ids = [template['name'] for template in templates[:5]] + ['no_existe']
+        
+        response = self.client.post('/api/lab-tests/bundle', json={'ids': ids},
+                                    headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        
+        data = json.loads(gzip.decompress(response.data))['data']
+        self.assertEqual([template['id'] for template in data['templates']], ids[:5])
+        self.assertEqual(data['missing'], ['no_existe'])
+        
+        response = self.client.post('/api/lab-tests/bundle', json={'ids': []})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Pruebas unitarias para los backups deduplicados de archivos HTML del frontend
+"""
+
+import os
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.services.frontend_html_backup_store import HTMLBackupStore
+from tests.unit.helpers import HTML, FrontendHTMLTestCase
+
+
+class TestHTMLBackupStore(FrontendHTMLTestCase):
+    """Pruebas para HTMLBackupStore y su uso desde FrontendHTMLService"""
+    
+    config_overrides = {
+        'FRONTEND_HTML_BACKUP_ENABLED': True,
+        'FRONTEND_HTML_BACKUP_KEEP_LAST': 2,
+        'FRONTEND_HTML_BACKUP_KEEP_DAILY_DAYS': 3,
+        'FRONTEND_HTML_BACKUP_COMPACT_INTERVAL': 0
+    }
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        super().setUp()
+        self.store = self.service.backup_store
+        self.file_path = os.path.join(self.base_path, '2024', '01', 'frontend_a.html')
+    
+    def _objects(self):
+        return [name for _, _, files in os.walk(self.store.objects_dir) for name in files]
+    
+    def test_identical_content_is_stored_once(self):
+        """Probar que guardar el mismo contenido no crea otro objeto"""
+        self.service.save_html_file(HTML, self.file_path, {'patient_name': 'Juan'})
+        self.service.update_html_file(self.file_path, HTML, {'patient_name': 'Juan'})
+        self.service.update_html_file(self.file_path, HTML + '<p>v2</p>', {'patient_name': 'Juan'})
+        
+        snapshots = self.store.list_snapshots(self.file_path)
+        self.assertEqual(len(snapshots), 3)
+        self.assertEqual(len(self._objects()), 2)
+        self.assertEqual(snapshots[1]['hash'], snapshots[2]['hash'])
+        
+        digest = snapshots[0]['hash']
+        self.assertTrue(self.store.object_path(digest).endswith(f'{digest[:2]}/{digest[2:4]}/{digest}.html.gz'))
+        self.assertIn(b'v2', self.store.read_snapshot(digest))
+    
+    def test_retention_keeps_last_and_daily(self):
+        """Probar la retención: últimas N más una diaria dentro de la ventana"""
+        source = os.path.join(self.base_path, 'fuente.html')
+        now = datetime(2024, 3, 10, 12, 0, 0)
+        moments = [
+            now - timedelta(days=10),                  # fuera de la ventana diaria
+            now - timedelta(days=2, hours=3),          # día -2 (anterior)
+            now - timedelta(days=2),                   # día -2 (última del día)
+            now - timedelta(days=1),
+            now - timedelta(hours=1),
+            now
+        ]
+        for position, moment in enumerate(moments):
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(f'{HTML}<!-- {position} -->')
+            with patch('app.services.frontend_html_backup_store.datetime') as mock_datetime:
+                mock_datetime.now.return_value = moment
+                self.store.backup(self.file_path, source)
+        
+        result = self.store.compact(now=now)
+        self.assertEqual(result['removed_snapshots'], 2)
+        self.assertEqual(result['removed_objects'], 2)
+        
+        # Últimas 2 (ambas de hoy) + la última de ayer y de hace 2 días
+        kept = [snapshot['created_at'] for snapshot in self.store.list_snapshots(self.file_path)]
+        self.assertEqual(kept, [moment.isoformat() for moment in reversed(moments[2:])])
+        self.assertEqual(len(self._objects()), 4)
+    
+    def test_legacy_flat_backups_are_removed_after_window(self):
+        """Probar que las copias planas antiguas se eliminan al compactar"""
+        os.makedirs(self.store.backup_dir, exist_ok=True)
+        old_copy = os.path.join(self.store.backup_dir, 'backup_frontend_a.html_20240101_000000.html')
+        recent_copy = os.path.join(self.store.backup_dir, 'backup_frontend_b.html_20240301_000000.html')
+        for path in (old_copy, recent_copy):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(HTML)
+        old_time = time.time() - 10 * 24 * 3600
+        os.utime(old_copy, (old_time, old_time))
+        
+        result = self.service.compact_backups()
+        self.assertEqual(result['removed_legacy_backups'], 1)
+        self.assertFalse(os.path.exists(old_copy))
+        self.assertTrue(os.path.exists(recent_copy))
+    
+    def test_compaction_from_other_process_keeps_reused_object(self):
+        """Probar que otro proceso no borra un objeto que un backup en curso reutiliza"""
+        source = os.path.join(self.base_path, 'fuente.html')
+        now = datetime(2024, 3, 10, 12, 0, 0)
+        for position, moment in enumerate([now - timedelta(days=10), now - timedelta(hours=1), now]):
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(HTML if position == 0 else f'{HTML}<!-- {position} -->')
+            with patch('app.services.frontend_html_backup_store.datetime') as mock_datetime:
+                mock_datetime.now.return_value = moment
+                self.store.backup(self.file_path, source)
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write(HTML)
+        
+        # Otra instancia sobre el mismo directorio simula el compactador de otro proceso
+        other = HTMLBackupStore(self.store.backup_dir, keep_last=2, keep_daily_days=3, compact_interval=0)
+        compactor = threading.Thread(target=other.compact, kwargs={'now': now})
+        
+        def compact_during_backup():
+            compactor.start()
+            compactor.join(timeout=0.5)
+            return now
+        
+        other_file = os.path.join(self.base_path, '2024', '01', 'frontend_b.html')
+        try:
+            with patch('app.services.frontend_html_backup_store.datetime') as mock_datetime:
+                mock_datetime.now.side_effect = compact_during_backup
+                result = self.store.backup(other_file, source)
+            compactor.join()
+        finally:
+            other.close()
+        
+        self.assertTrue(result['deduplicated'])
+        self.assertEqual(len(self.store.list_snapshots(self.file_path)), 2)
+        self.assertEqual(self.store.read_snapshot(result['hash']), HTML.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
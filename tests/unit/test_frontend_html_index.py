@@ -0,0 +1,162 @@
+"""
+Pruebas unitarias para el índice de metadatos de archivos HTML del frontend
+"""
+
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+from app.services.frontend_html_index import FrontendHTMLIndex
+from tests.unit.helpers import HTML, FrontendHTMLTestCase
+
+
+class TestFrontendHTMLIndex(FrontendHTMLTestCase):
+    """Pruebas para FrontendHTMLService respaldado por el índice SQLite"""
+    
+    config_overrides = {'FRONTEND_HTML_COMPRESS_AT_REST': False}
+    
+    def _save(self, name, **metadata):
+        file_path = os.path.join(self.base_path, '2024', '01', name)
+        self.service.save_html_file(HTML, file_path, metadata)
+        return file_path
+    
+    def test_save_update_delete_keep_index_in_sync(self):
+        """Probar que el índice refleja altas, cambios de estado, ediciones y bajas"""
+        first = self._save('frontend_a.html', patient_name='Juan Pérez', order_number='ORD-1',
+                           created_at='2024-01-01T08:00:00')
+        second = self._save('frontend_b.html', patient_name='Ana López', order_number='ORD-2',
+                            created_at='2024-01-02T08:00:00')
+        
+        self.assertEqual(len(self.service.list_html_files()), 2)
+        pending = self.service.get_pending_files()
+        self.assertEqual([f['filename'] for f in pending], ['frontend_a.html', 'frontend_b.html'])
+        
+        self.service.update_file_status(first, 'completed')
+        self.assertEqual([f['filename'] for f in self.service.get_completed_files()], ['frontend_a.html'])
+        stats = self.service.get_status_stats()
+        self.assertEqual(stats['pending_count'], 1)
+        self.assertEqual(stats['completed_count'], 1)
+        self.assertEqual(stats['total_files'], 2)
+        
+        self.service.update_html_file(second, HTML, {'edited_by': 'ana'})
+        modified = self.service.get_modified_files()
+        self.assertEqual([f['filename'] for f in modified], ['frontend_b.html'])
+        summary = self.service.get_edit_stats_summary()
+        self.assertEqual(summary['modified_files'], 1)
+        self.assertEqual(summary['most_edited_file']['filename'], 'frontend_b.html')
+        
+        self.service.delete_html_file(first)
+        files = self.service.list_html_files()
+        self.assertEqual([f['filename'] for f in files], ['frontend_b.html'])
+        self.assertEqual(self.service.get_storage_stats()['total_files'], 1)
+    
+    def test_search_ignores_case_and_accents(self):
+        """Probar búsqueda por prefijo sin distinguir mayúsculas ni acentos"""
+        self._save('frontend_a.html', patient_name='JOSÉ Ramírez', doctor_name='Dr. Soto', order_number='ORD-10')
+        self._save('frontend_b.html', patient_name='María Díaz', doctor_name='Dra. Vega', order_number='ORD-20')
+        
+        self.assertEqual(len(self.service.search_html_files(patient_name='josé')), 1)
+        self.assertEqual(len(self.service.search_html_files(patient_name='jose ram')), 1)
+        self.assertEqual(len(self.service.search_html_files(order_number='ord')), 2)
+        self.assertEqual(len(self.service.search_html_files(query='B.HTML')), 1)
+        self.assertEqual(self.service.search_html_files(doctor_name='vega')[0]['filename'], 'frontend_b.html')
+        self.assertEqual(self.service.search_html_files(status='completed'), [])
+    
+    def test_import_existing_meta_files(self):
+        """Probar que un índice nuevo se construye a partir de los .meta existentes"""
+        directory = os.path.join(self.base_path, '2023', '12')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'legacy.html'), 'w', encoding='utf-8') as f:
+            f.write(HTML)
+        with open(os.path.join(directory, 'legacy.html.meta'), 'w', encoding='utf-8') as f:
+            json.dump({'patient_name': 'Legado', 'status': 'pending'}, f)
+        with open(os.path.join(directory, 'broken.html'), 'w', encoding='utf-8') as f:
+            f.write(HTML)
+        with open(os.path.join(directory, 'broken.html.meta'), 'w', encoding='utf-8') as f:
+            f.write('{no es json')
+        
+        files = self.service.list_html_files()
+        self.assertEqual([f['metadata']['patient_name'] for f in files], ['Legado'])
+        
+        index = FrontendHTMLIndex(os.path.join(self.base_path, 'otro.sqlite3'), self.base_path)
+        result = index.rebuild()
+        index.close()
+        self.assertEqual(result['indexed'], 1)
+        self.assertEqual(len(result['errors']), 1)
+    
+    def test_invalidated_index_is_rebuilt(self):
+        """Probar que un índice marcado como inconsistente se reconstruye al consultar"""
+        self._save('frontend_a.html', patient_name='Juan')
+        self.service.list_html_files()
+        
+        self.service.index.invalidate()
+        self.assertFalse(self.service.index.is_built())
+        self.assertEqual(len(self.service.list_html_files()), 1)
+        self.assertTrue(self.service.index.is_built())
+    
+    def test_counters_are_maintained_incrementally(self):
+        """Probar que los contadores coinciden con un recálculo completo tras cada operación"""
+        index = self.service.index
+        first = self._save('frontend_a.html', status='pending')
+        second = self._save('frontend_b.html', status='pending')
+        self._save('frontend_c.html', status='cancelled')
+        self.service.update_file_status(first, 'completed')
+        self.service.mark_as_modified(second, edited_by='ana')
+        self.service.mark_as_modified(second, edited_by='ana')
+        self.service.update_html_file(first, HTML + '<!-- v2 -->', {})
+        self.service.delete_html_file(self._save('frontend_d.html'))
+        
+        counters = index.counters()
+        self.assertEqual(counters['total_files'], 3)
+        self.assertEqual(counters['modified_files'], 2)
+        self.assertEqual(counters['total_edits'], 3)
+        self.assertEqual(index.status_counts(), {'pending': 1, 'completed': 1, 'cancelled': 1})
+        
+        self.assertEqual({k: v for k, v in index.rebuild_counters().items() if v}, {k: v for k, v in counters.items() if v})
+        
+        summary = self.service.get_edit_stats_summary()
+        self.assertEqual(summary['unmodified_files'], 1)
+        self.assertEqual(summary['most_edited_file']['filename'], 'frontend_b.html')
+    
+    def test_counters_recalculated_for_older_index(self):
+        """Probar que un índice sin contadores (versión anterior) los recalcula al abrirse"""
+        self._save('frontend_a.html', status='pending')
+        index = self.service.index
+        with index._connection() as conn:
+            conn.execute('DELETE FROM counters')
+            conn.execute("DELETE FROM index_state WHERE key = 'counters_version'")
+        index.close()
+        
+        self.assertEqual(index.status_counts(), {'pending': 1})
+        self.assertEqual(self.service.get_status_stats()['total_files'], 1)
+    
+    def test_find_file_by_name(self):
+        """Probar la resolución de nombres por fecha en el nombre y por índice"""
+        directory = self.service.create_directory_structure()
+        filename = self.service.generate_file_name('reporte final.html', 'frontend')
+        file_path = os.path.join(directory, filename)
+        self.service.save_html_file(HTML, file_path, {})
+        self.assertNotIn(' ', filename)
+        
+        with patch.object(self.service.index, 'find') as find:
+            self.assertEqual(self.service.find_file(filename), file_path)
+            find.assert_not_called()
+        
+        # Nombre sin fecha: se resuelve con el índice
+        other = self._save('plantilla.html')
+        self.assertEqual(self.service.find_file('plantilla.html'), other)
+        
+        self.assertIsNone(self.service.find_file('no_existe.html'))
+        self.assertIsNone(self.service.find_file('../plantilla.html'))
+        self.assertIsNone(self.service.find_file('..'))
+    
+    def test_generated_name_has_no_path_separators(self):
+        """Probar que el nombre original no puede salir del directorio"""
+        filename = self.service.generate_file_name('../../etc/passwd.html', 'front/end')
+        self.assertTrue(filename.startswith('front_end_passwd.html_'))
+        self.assertNotIn('/', filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
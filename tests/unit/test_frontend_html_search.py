@@ -0,0 +1,83 @@
+"""
+Pruebas unitarias para la búsqueda de texto completo de archivos HTML del frontend
+"""
+
+import os
+import unittest
+
+from app.services.frontend_html_search import match_expression, visible_text
+from tests.unit.helpers import FrontendHTMLTestCase
+
+
+def report(text):
+    return f'<!DOCTYPE html>\n<html><head><style>.hemoglobina {{}}</style></head><body><p>{text}</p></body></html>'
+
+
+class TestFrontendHTMLSearch(FrontendHTMLTestCase):
+    """Pruebas para el índice invertido (FTS5) de metadatos y contenido"""
+    
+    config_overrides = {'FRONTEND_HTML_COMPRESS_AT_REST': False}
+    
+    def _save(self, name, text, **metadata):
+        file_path = os.path.join(self.base_path, '2024', '01', name)
+        self.service.save_html_file(report(text), file_path, metadata)
+        return file_path
+    
+    def _names(self, **filters):
+        return [f['filename'] for f in self.service.search_html_files(**filters)]
+    
+    def test_visible_text_and_match_expression(self):
+        """Probar extracción de texto visible y construcción de la consulta"""
+        text = visible_text('<html><head><title>x</title></head><body><!-- oculto --><b>Glucosa</b>&nbsp;95'
+                            '<script>var a = 1;</script></body></html>')
+        self.assertEqual(text, 'Glucosa 95')
+        self.assertIsNone(match_expression('  ', None, '', None))
+        self.assertEqual(match_expression('glu" OR', doctor_name='vega'),
+                         '"glu"* AND "OR"* AND doctor_name : ("vega"*)')
+    
+    def test_search_report_content_by_prefix(self):
+        """Probar búsqueda en el texto visible del reporte (no en estilos ni metadatos embebidos)"""
+        self._save('frontend_a.html', 'Hemoglobina 14.2 g/dL', patient_name='Ana')
+        self._save('frontend_b.html', 'Glucosa en ayunas 95 mg/dL', patient_name='Luis')
+        
+        self.assertEqual(self._names(query='hemog'), ['frontend_a.html'])
+        self.assertEqual(self._names(query='GLUCOSA ayu'), ['frontend_b.html'])
+        self.assertEqual(self._names(query='glucosa ana'), [])
+        self.assertEqual(self._names(query='luis'), ['frontend_b.html'])
+    
+    def test_content_changes_and_metadata_updates(self):
+        """Probar que el contenido indexado sigue a las ediciones y sobrevive a cambios de metadatos"""
+        file_path = self._save('frontend_a.html', 'Colesterol total 180', patient_name='Ana')
+        
+        self.service.update_html_file(file_path, report('Triglicéridos 150'), {'edited_by': 'ana'})
+        self.assertEqual(self._names(query='colesterol'), [])
+        self.assertEqual(self._names(query='trigliceridos'), ['frontend_a.html'])
+        
+        self.service.update_file_status(file_path, 'completed')
+        self.assertEqual(self._names(query='trigliceridos', status='completed'), ['frontend_a.html'])
+        self.assertEqual(self._names(query='trigliceridos', status='pending'), [])
+        
+        self.service.delete_html_file(file_path)
+        self.assertEqual(self._names(query='trigliceridos'), [])
+    
+    def test_date_filters_and_pagination(self):
+        """Probar filtros por fecha de creación y paginación con limit/offset"""
+        for day in range(1, 6):
+            self._save(f'frontend_{day}.html', 'Urocultivo negativo', created_at=f'2024-01-0{day}T09:00:00')
+        
+        self.assertEqual(self._names(query='urocultivo', limit=2), ['frontend_5.html', 'frontend_4.html'])
+        self.assertEqual(self._names(query='urocultivo', limit=2, offset=2), ['frontend_3.html', 'frontend_2.html'])
+        self.assertEqual(self._names(query='urocultivo', date_from='2024-01-02', date_to='2024-01-03'),
+                         ['frontend_3.html', 'frontend_2.html'])
+        self.assertEqual(len(self._names(date_to='2024-01-02')), 2)
+    
+    def test_rebuild_indexes_existing_content(self):
+        """Probar que la reconstrucción vuelve a indexar el contenido desde disco"""
+        self._save('frontend_a.html', 'Perfil tiroideo TSH 2.1')
+        self.service.index.invalidate()
+        
+        self.assertEqual(self._names(query='tiroideo tsh'), ['frontend_a.html'])
+
+
+if __name__ == '__main__':
+    unittest.main()
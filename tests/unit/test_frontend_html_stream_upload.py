@@ -0,0 +1,110 @@
+"""
+Pruebas unitarias para la subida en streaming de archivos HTML del frontend
+"""
+
+import gzip
+import hashlib
+import os
+import unittest
+
+from flask import Flask
+
+from app.controllers.frontend_html_controller import FrontendHTMLController
+from app.services.report_storage import read_html, resolve_stored_path
+from tests.unit.helpers import FrontendHTMLTestCase
+
+
+def chunked(text, size=7):
+    data = text.encode('utf-8')
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestFrontendHTMLStreamUpload(FrontendHTMLTestCase):
+    """Pruebas para FrontendHTMLService.save_html_stream"""
+    
+    config_overrides = {'FRONTEND_HTML_COMPRESS_AT_REST': False, 'FRONTEND_HTML_MAX_FILE_SIZE': 1024}
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        super().setUp()
+        self.metadata = {'patient_name': 'José Pérez', 'order_number': 'ORD-1', 'created_at': '2024-01-01T08:00:00'}
+    
+    def _path(self, name):
+        return os.path.join(self.base_path, '2024', '01', name)
+    
+    def test_stream_matches_buffered_save(self):
+        """Probar que el HTML guardado en streaming es idéntico al de la subida JSON"""
+        documents = [
+            '<!DOCTYPE html>\n<html><body><p>Hemoglobina ñ</p></body></html>',
+            '  <!DOCTYPE html>',
+            '<html><body>Glucosa</body></html>',
+            '<div>Fragmento sin documento</div>'
+        ]
+        for number, document in enumerate(documents):
+            with self.subTest(document=document):
+                buffered = self._path(f'buffered_{number}.html')
+                streamed = self._path(f'streamed_{number}.html')
+                self.service.save_html_file(document, buffered, self.metadata)
+                result = self.service.save_html_stream(chunked(document), streamed, self.metadata)
+                
+                with open(buffered, 'rb') as f:
+                    expected = f.read()
+                with open(streamed, 'rb') as f:
+                    self.assertEqual(f.read(), expected)
+                self.assertEqual(result['size'], len(expected))
+                self.assertEqual(result['sha256'], hashlib.sha256(expected).hexdigest())
+                self.assertEqual(self.service.get_file_metadata(streamed)['file_size'], len(expected))
+    
+    def test_stream_is_indexed_and_compressed_at_rest(self):
+        """Probar compresión en disco y que el contenido subido se puede buscar"""
+        self.service.compress_at_rest = True
+        file_path = self._path('frontend_a.html')
+        document = '<html><body>Perfil lipídico</body></html>'
+        
+        result = self.service.save_html_stream(chunked(document), file_path, self.metadata)
+        
+        stored_path = resolve_stored_path(file_path)
+        self.assertTrue(stored_path.endswith('.gz'))
+        self.assertEqual(result['stored_size'], os.path.getsize(stored_path))
+        with gzip.open(stored_path, 'rb') as f:
+            self.assertEqual(hashlib.sha256(f.read()).hexdigest(), result['sha256'])
+        self.assertIn('Perfil lipídico', read_html(stored_path))
+        self.assertEqual([f['filename'] for f in self.service.search_html_files(query='lipidico')],
+                         ['frontend_a.html'])
+    
+    def test_oversized_or_empty_upload_leaves_nothing_behind(self):
+        """Probar que una subida inválida no deja el archivo ni temporales"""
+        file_path = self._path('frontend_big.html')
+        
+        with self.assertRaisesRegex(ValueError, 'tamaño máximo'):
+            self.service.save_html_stream(chunked('<p>' + 'x' * 2000 + '</p>', 100), file_path, self.metadata)
+        with self.assertRaisesRegex(ValueError, 'vacío'):
+            self.service.save_html_stream(iter([b'  ', b'\n']), file_path, self.metadata)
+        
+        self.assertEqual(os.listdir(os.path.dirname(file_path)), [])
+        self.assertEqual(self.service.list_html_files(), [])
+    
+    def test_invalid_upload_is_a_client_error(self):
+        """Probar que el endpoint responde 400 (no 500) a un cuerpo demasiado grande o vacío"""
+        controller = FrontendHTMLController.__new__(FrontendHTMLController)
+        controller.config = self.service.config
+        controller.service = self.service
+        
+        app = Flask(__name__)
+        # Sin token_required: se prueba solo el manejo de errores del controlador
+        app.add_url_rule('/upload/stream', methods=['POST'],
+                         view_func=lambda: FrontendHTMLController.upload_html_stream.__wrapped__(controller))
+        client = app.test_client()
+        
+        for body, message in (('<p>' + 'x' * 2000 + '</p>', 'tamaño máximo'), ('  \n', 'vacío')):
+            with self.subTest(message=message):
+                response = client.post('/upload/stream', data=body.encode('utf-8'),
+                                       content_type='text/html')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.get_json()['success'])
+                self.assertIn(message, response.get_json()['message'])
+        self.assertEqual(self.service.list_html_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Pruebas unitarias para la compilación de plantillas de pruebas
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from html.parser import HTMLParser
+
+from app.services.lab_template_build import (
+    ASSETS_DIRECTORY, MANIFEST_NAME, build_templates, load_manifest, minify_css, minify_html
+)
+from app.services.lab_test_catalog import LabTestCatalog
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'bocetos_pruebas', 'html_output')
+
+SHARED_STYLE = """
+    /* Estilos comunes */
+    body { font-family: 'Segoe UI', sans-serif; margin : 0; }
+    .results-table td, .results-table th > b { padding: 12px 15px; }
+"""
+
+
+def css_rules(css):
+    """Reglas de un CSS como (selector, declaraciones) sin depender de los espacios"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    rules = []
+    for selector, body in re.findall(r'([^{}]+)\{([^{}]*)\}', css):
+        selector = re.sub(r'\s*([,>])\s*', r'\1', ' '.join(selector.split()))
+        declarations = [
+            tuple(re.sub(r'\s*,\s*', ',', ' '.join(part.split())) for part in declaration.split(':', 1))
+            for declaration in body.split(';') if declaration.strip()
+        ]
+        rules.append((selector, declarations))
+    return rules
+
+
+class RenderTree(HTMLParser):
+    """Etiquetas, texto visible y reglas CSS de un HTML (las hojas enlazadas se leen del disco)"""
+    
+    def __init__(self, stylesheets=None):
+        super().__init__(convert_charrefs=True)
+        self.stylesheets = stylesheets or {}
+        self.tokens = []
+        self._in_style = False
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'link' and dict(attrs).get('rel') == 'stylesheet':
+            self.tokens.append(('style', css_rules(self.stylesheets[dict(attrs)['href']])))
+        elif tag == 'style':
+            self._in_style = True
+        else:
+            self.tokens.append(('start', tag, attrs))
+    
+    def handle_endtag(self, tag):
+        if tag == 'style':
+            self._in_style = False
+        else:
+            self.tokens.append(('end', tag))
+    
+    def handle_data(self, data):
+        if self._in_style:
+            self.tokens.append(('style', css_rules(data)))
+        elif data.strip():
+            self.tokens.append(('text', ' '.join(data.split())))
+    
+    @classmethod
+    def parse(cls, content, stylesheets=None):
+        parser = cls(stylesheets)
+        parser.feed(content)
+        parser.close()
+        return parser.tokens
+
+
+class TestLabTemplateBuild(unittest.TestCase):
+    """Pruebas para build_templates y el catálogo servido desde la compilación"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.source_path = tempfile.mkdtemp()
+        self.output_path = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.source_path, ignore_errors=True)
+        shutil.rmtree(self.output_path, ignore_errors=True)
+    
+    def _write(self, filename, style, body):
+        with open(os.path.join(self.source_path, filename), 'w', encoding='utf-8') as f:
+            f.write(f'<!DOCTYPE html>\n<html>\n<head>\n    <style>{style}</style>\n</head>\n<body>\n'
+                    f'    <!-- comentario -->\n    <div class="container">\n        {body}\n    </div>\n</body>\n</html>\n')
+    
+    def test_minify(self):
+        """Probar la minificación de CSS y HTML"""
+        self.assertEqual(minify_css(SHARED_STYLE),
+                         "body{font-family:'Segoe UI',sans-serif;margin:0}"
+                         ".results-table td,.results-table th>b{padding:12px 15px}")
+        self.assertEqual(minify_css('a :hover { content: "a ; b" }'), 'a :hover{content:"a ; b"}')
+        self.assertEqual(minify_html('<div>\n  <b>Hola</b>\n  <i>mundo</i> <!-- x -->\n</div>\n<pre>  a\n  b</pre>'),
+                         '<div><b>Hola</b> <i>mundo</i></div><pre>  a\n  b</pre>')
+    
+    def test_library_build_saves_bytes_and_renders_the_same(self):
+        """Probar con la biblioteca real: menos bytes y el mismo árbol, texto y reglas CSS"""
+        manifest = build_templates(TEMPLATES_PATH, self.output_path)
+        
+        self.assertGreater(len(manifest['templates']), 200)
+        self.assertLess(manifest['output_bytes'], manifest['source_bytes'] * 0.5)
+        written = sum(os.path.getsize(os.path.join(self.output_path, filename)) for filename in manifest['templates'])
+        written += sum(os.path.getsize(os.path.join(self.output_path, sheet['file']))
+                       for sheet in manifest['stylesheets'].values())
+        self.assertEqual(written, manifest['output_bytes'])
+        
+        # Casi todas las plantillas enlazan una hoja compartida en lugar de repetirla
+        linked = [entry for entry in manifest['templates'].values() if entry['stylesheets']]
+        self.assertGreater(len(linked), len(manifest['templates']) * 0.9)
+        
+        stylesheets = {}
+        for sheet in manifest['stylesheets'].values():
+            with open(os.path.join(self.output_path, sheet['file']), encoding='utf-8') as f:
+                stylesheets[sheet['url']] = f.read()
+        for filename in manifest['templates']:
+            with open(os.path.join(TEMPLATES_PATH, filename), encoding='utf-8') as f:
+                source = f.read()
+            with open(os.path.join(self.output_path, filename), encoding='utf-8') as f:
+                built = f.read()
+            self.assertEqual(RenderTree.parse(built, stylesheets), RenderTree.parse(source), filename)
+    
+    def test_catalog_serves_current_build(self):
+        """Probar que el catálogo sirve lo compilado solo mientras el origen no cambie"""
+        self._write('hemograma.html', SHARED_STYLE, '<h1>HEMOGRAMA</h1>')
+        self._write('glucosa.html', SHARED_STYLE, '<h1>GLUCOSA</h1>')
+        self._write('orina.html', '.unica { color: red; }', '<h1>ORINA</h1>')
+        
+        manifest = build_templates(self.source_path, self.output_path)
+        self.assertEqual(load_manifest(self.output_path), manifest)
+        self.assertEqual(len(manifest['stylesheets']), 1)
+        self.assertEqual(manifest['templates']['orina.html']['stylesheets'], [])
+        
+        catalog = LabTestCatalog(self.source_path, reload_interval=0, build_path=self.output_path)
+        self.assertEqual(catalog.get('hemograma.html').path, os.path.join(self.output_path, 'hemograma.html'))
+        asset = os.path.basename(manifest['stylesheets'][manifest['templates']['glucosa.html']['stylesheets'][0]]['file'])
+        self.assertEqual(catalog.asset(asset), os.path.join(self.output_path, ASSETS_DIRECTORY, asset))
+        
+        bundle = catalog.bundle(['hemograma', 'glucosa', 'orina'])
+        self.assertEqual(len(bundle['styles']), 2)
+        self.assertEqual(bundle['templates'][0]['styles'], bundle['templates'][1]['styles'])
+        self.assertEqual(bundle['templates'][0]['html'], '<div class="container"><h1>HEMOGRAMA</h1></div>')
+        
+        # Un origen modificado después de compilar se sirve desde el origen
+        self._write('glucosa.html', SHARED_STYLE, '<h1>GLUCOSA EN AYUNAS</h1>')
+        catalog.reload()
+        self.assertEqual(catalog.get('glucosa.html').path, os.path.join(self.source_path, 'glucosa.html'))
+        
+        # Recompilar quita lo que ya no tiene origen
+        os.remove(os.path.join(self.source_path, 'orina.html'))
+        build_templates(self.source_path, self.output_path)
+        self.assertEqual(sorted(os.listdir(self.output_path)),
+                         [ASSETS_DIRECTORY, 'glucosa.html', 'hemograma.html', MANIFEST_NAME])
+        catalog.reload()
+        self.assertEqual(catalog.get('glucosa.html').path, os.path.join(self.output_path, 'glucosa.html'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Pruebas unitarias para el catálogo en memoria de plantillas de pruebas
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.services.lab_test_catalog import LabTestCatalog, UNCATEGORIZED, category_label
+
+
+class TestLabTestCatalog(unittest.TestCase):
+    """Pruebas para LabTestCatalog"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.root = tempfile.mkdtemp()
+        self.templates_path = os.path.join(self.root, 'html_output')
+        os.makedirs(self.templates_path)
+        for filename in ('hematologia_completa.html', 'perfil_tiroideo.html', 'nueva.html', 'index.html'):
+            self._write(os.path.join(self.templates_path, filename),
+                        f'<html><head><style>\n  .exam-name {{ color: red; }}\n</style></head>'
+                        f'<body><h1>{filename}</h1></body></html>')
+        for folder, filename in (('hematologia', 'hematologia_completa.html'),
+                                 ('quimica_clinica', 'perfil_tiroideo.html'),
+                                 ('paquete_prenatal', 'hematologia_completa.html')):
+            os.makedirs(os.path.join(self.root, folder), exist_ok=True)
+            self._write(os.path.join(self.root, folder, filename), '')
+        
+        self.catalog = LabTestCatalog(self.templates_path, reload_interval=0)
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        self.catalog.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    @staticmethod
+    def _write(path, content):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    
+    def test_categories_from_folders(self):
+        """Probar que las categorías salen de las carpetas y lo demás queda en Otros"""
+        self.assertEqual(category_label('quimica_clinica'), 'Quimica Clinica')
+        self.assertEqual(self.catalog.categories(), {
+            'Hematologia': ['hematologia_completa.html'],
+            'Paquete Prenatal': ['hematologia_completa.html'],
+            'Quimica Clinica': ['perfil_tiroideo.html'],
+            UNCATEGORIZED: ['nueva.html']
+        })
+        self.assertEqual(self.catalog.get('hematologia_completa.html').categories,
+                         ('Hematologia', 'Paquete Prenatal'))
+    
+    def test_queries_do_not_touch_filesystem(self):
+        """Probar que listar, buscar y obtener categorías solo usan memoria"""
+        with patch('os.stat', side_effect=AssertionError('stat')), \
+                patch('os.listdir', side_effect=AssertionError('listdir')), \
+                patch('builtins.open', side_effect=AssertionError('open')):
+            tests = self.catalog.list_tests()
+            found = self.catalog.search('TIROIDEO')
+            self.catalog.categories()
+        
+        self.assertEqual([test['name'] for test in tests], ['hematologia_completa', 'nueva', 'perfil_tiroideo'])
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0]['url'], f"/api/lab-tests/html/perfil_tiroideo.html?v={found[0]['version']}")
+    
+    def test_bundle_shares_styles(self):
+        """Probar que el bundle envía cada bloque de estilos una sola vez"""
+        bundle = self.catalog.bundle(['perfil_tiroideo', 'nueva.html', 'no_existe'])
+        
+        self.assertEqual([template['id'] for template in bundle['templates']], ['perfil_tiroideo', 'nueva'])
+        self.assertEqual(bundle['missing'], ['no_existe'])
+        self.assertEqual(list(bundle['styles'].values()), ['.exam-name { color: red; }'])
+        self.assertEqual(bundle['templates'][0]['styles'], list(bundle['styles']))
+        self.assertEqual(bundle['templates'][0]['html'], '<h1>perfil_tiroideo.html</h1>')
+    
+    def test_refresh_reloads_on_directory_change(self):
+        """Probar que la recarga ocurre solo si cambia el mtime de un directorio"""
+        self.assertFalse(self.catalog.refresh())
+        
+        self._write(os.path.join(self.templates_path, 'agregada.html'), '<h1>Agregada</h1>')
+        os.utime(self.templates_path, ns=(0, 1))  # Forzar un mtime distinto
+        os.makedirs(os.path.join(self.root, 'hormonas'))
+        self._write(os.path.join(self.root, 'hormonas', 'nueva.html'), '')
+        
+        self.assertTrue(self.catalog.refresh())
+        self.assertIsNotNone(self.catalog.get('agregada.html'))
+        self.assertEqual(self.catalog.get('nueva.html').categories, ('Hormonas',))
+        self.assertEqual(len(self.catalog), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Pruebas unitarias para la búsqueda aproximada de plantillas de pruebas
+"""
+
+import unittest
+
+from app.services.lab_test_search import LabTestSearchIndex, extract_terms, fold, trigrams
+
+THYROID = """<!DOCTYPE html>
+<html><head><title>PRUEBAS TIROIDEAS - Laboratorio Esperanza</title>
+<style>.exam-name { color: red; }</style></head>
+<body><table class="results-table">
+<thead><tr><th>EXAMEN</th><th>RESULTADO</th></tr></thead>
+<tbody>
+<tr><td class="exam-name">Hormona Estimulante de Tiroides (TSH):</td><td class="result-value">2.1</td></tr>
+<tr><td class="exam-name">T4 LIBRE:</td><td class="result-value">1.2</td></tr>
+</tbody></table></body></html>"""
+
+BLOOD = """<html><head><title>HEMATOLOGÍA COMPLETA</title></head><body><table>
+<tr><td>HEMOGLOBINA (HB):</td><td class="result-value">14</td></tr>
+<tr><td>HEMATOCRITO (HCT):</td><td class="result-value">42</td></tr>
+<tr><td>&nbsp;</td><td></td></tr>
+</table></body></html>"""
+
+CHEMISTRY = """<html><head><title>BIOQUÍMICA BÁSICA</title></head><body><table>
+<tr><td>GLUCOSA:</td><td class="result-value">90</td></tr>
+<tr><td>HEMOGLOBINA GLICOSILADA:</td><td class="result-value">5</td></tr>
+</table></body></html>"""
+
+
+class TestLabTestSearch(unittest.TestCase):
+    """Pruebas para extract_terms y LabTestSearchIndex"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.index = LabTestSearchIndex()
+        for key, content in (('pruebas_tiroideas.html', THYROID), ('hematologia_completa.html', BLOOD),
+                             ('bioquimica_basica.html', CHEMISTRY)):
+            self.index.add(key, key[:-len('.html')], extract_terms(content))
+    
+    def _keys(self, query):
+        return [hit['key'] for hit in self.index.search(query)]
+    
+    def test_extract_terms(self):
+        """Probar la extracción de título, analitos y sinónimos"""
+        terms = extract_terms(THYROID)
+        
+        self.assertEqual(terms['title'], 'PRUEBAS TIROIDEAS')
+        self.assertEqual(terms['analytes'], ['Hormona Estimulante de Tiroides (TSH)', 'T4 LIBRE'])
+        self.assertEqual(terms['synonyms'], ['TSH'])
+        self.assertEqual(extract_terms(BLOOD)['synonyms'], ['HB', 'HCT'])
+        self.assertEqual(fold('HEMATOLOGÍA (Niños)'), 'hematologia ninos')
+        self.assertIn('  t', trigrams('tsh'))
+    
+    def test_content_and_synonym_matches(self):
+        """Probar que se encuentran analitos y abreviaturas que no están en el nombre del archivo"""
+        hits = self.index.search('tsh')
+        self.assertEqual([hit['key'] for hit in hits], ['pruebas_tiroideas.html'])
+        self.assertEqual(hits[0]['matches'], ['TSH'])
+        
+        self.assertEqual(self._keys('T4 libre'), ['pruebas_tiroideas.html'])
+        self.assertEqual(self._keys('hematologia'), ['hematologia_completa.html'])
+        self.assertEqual(self._keys('bioquímica'), ['bioquimica_basica.html'])
+    
+    def test_fuzzy_ranking(self):
+        """Probar tolerancia a errores de escritura, prefijos y orden por puntaje"""
+        self.assertEqual(self._keys('hemoglovina'), ['bioquimica_basica.html', 'hematologia_completa.html'])
+        self.assertEqual(self._keys('glucos'), ['bioquimica_basica.html'])
+        
+        # Todas las palabras deben coincidir; la abreviatura pesa más que el analito
+        self.assertEqual(self._keys('hemoglobina hb'), ['hematologia_completa.html'])
+        hits = self.index.search('hemo')
+        self.assertGreaterEqual(hits[0]['score'], hits[-1]['score'])
+        self.assertEqual(self._keys('vih'), [])
+        self.assertEqual(self._keys('  '), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
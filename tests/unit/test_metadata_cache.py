@@ -0,0 +1,79 @@
+"""
+Pruebas unitarias para el cache de metadatos (.meta)
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.services.metadata_cache import MetadataCache
+
+
+class TestMetadataCache(unittest.TestCase):
+    """Pruebas para MetadataCache"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        self.cache = MetadataCache(max_entries=2)
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def _meta_path(self, name, metadata):
+        path = os.path.join(self.base_path, f'{name}.html.meta')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        return path
+    
+    def test_hit_does_not_reopen_file(self):
+        """Probar que una segunda lectura sin cambios no abre el archivo"""
+        path = self._meta_path('a', {'status': 'pending'})
+        self.assertEqual(self.cache.load(path), {'status': 'pending'})
+        
+        with patch('builtins.open', side_effect=AssertionError('no debe abrir el archivo')):
+            self.assertEqual(self.cache.load(path), {'status': 'pending'})
+        
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+    
+    def test_returned_dict_is_independent(self):
+        """Probar que modificar el resultado no altera el cache"""
+        path = self._meta_path('a', {'edit_history': []})
+        self.cache.load(path)['edit_history'].append({'edit_date': 'x'})
+        self.assertEqual(self.cache.load(path), {'edit_history': []})
+    
+    def test_external_change_is_detected(self):
+        """Probar que un cambio en disco (mtime/tamaño) invalida la entrada"""
+        path = self._meta_path('a', {'status': 'pending'})
+        self.cache.load(path)
+        
+        self._meta_path('a', {'status': 'completed'})
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(self.cache.load(path)['status'], 'completed')
+        
+        os.remove(path)
+        self.assertIsNone(self.cache.load(path))
+    
+    def test_write_updates_entry_and_lru_eviction(self):
+        """Probar que las escrituras propias actualizan el cache y el desalojo LRU"""
+        path_a = os.path.join(self.base_path, 'a.html.meta')
+        self.cache.write(path_a, {'status': 'pending'})
+        self.assertEqual(self.cache.load(path_a), {'status': 'pending'})
+        self.assertEqual(self.cache.stats()['misses'], 0)
+        
+        self.cache.load(self._meta_path('b', {}))
+        self.cache.load(self._meta_path('c', {}))
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
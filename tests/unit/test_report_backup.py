@@ -0,0 +1,114 @@
+"""
+Pruebas unitarias para backups de reportes
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+
+from app.config import Config
+from app.services.report_backup_service import ReportBackupService
+from app.services.zip_stream import ZipStreamWriter, get_zip_method
+
+
+class TestZipStreamWriter(unittest.TestCase):
+    """Pruebas para ZipStreamWriter"""
+    
+    def test_compressed_and_streamed_entries_are_readable(self):
+        """Probar que las entradas escritas se leen con zipfile"""
+        for codec in ('stored', 'deflated', 'bzip2'):
+            buffer = io.BytesIO()
+            writer = ZipStreamWriter(buffer, get_zip_method(codec), 6)
+            writer.write_bytes('2024/01/reporte.html', b'<html>' + b'a' * 5000 + b'</html>')
+            for _ in writer.write_stream('2024/01/año.html', [b'<html>', b'b' * 3000, b'</html>']):
+                pass
+            writer.close()
+            
+            with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as zipf:
+                self.assertIsNone(zipf.testzip())
+                self.assertEqual(zipf.read('2024/01/reporte.html'), b'<html>' + b'a' * 5000 + b'</html>')
+                self.assertEqual(zipf.read('2024/01/año.html'), b'<html>' + b'b' * 3000 + b'</html>')
+    
+    def test_invalid_codec(self):
+        """Probar codec no soportado"""
+        with self.assertRaises(ValueError):
+            get_zip_method('rar')
+
+
+class TestReportBackupService(unittest.TestCase):
+    """Pruebas para ReportBackupService"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        for month in ('01', '02'):
+            directory = os.path.join(self.base_path, '2024', month)
+            os.makedirs(directory)
+            for i in range(5):
+                with open(os.path.join(directory, f'ORD-{month}{i}.html'), 'w', encoding='utf-8') as f:
+                    f.write(f'<html><body>Reporte {month}-{i} ' + 'resultado ' * 200 + '</body></html>')
+        
+        class BackupConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_BACKUP_ENABLED = True
+            REPORTS_BACKUP_WORKERS = 2
+            REPORTS_BACKUP_CHUNK_SIZE = 3
+        
+        self.config = BackupConfig()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_run_backup_with_process_pool(self):
+        """Probar creación síncrona de backup con pool de procesos"""
+        service = ReportBackupService(self.config)
+        job = service.run_backup()
+        
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['files_total'], 10)
+        self.assertEqual(job['files_done'], 10)
+        self.assertEqual(job['progress'], 100.0)
+        
+        with zipfile.ZipFile(job['backup_path']) as zipf:
+            self.assertIsNone(zipf.testzip())
+            names = sorted(zipf.namelist())
+            self.assertEqual(len(names), 10)
+            with open(os.path.join(self.base_path, '2024', '01', 'ORD-010.html'), 'rb') as f:
+                self.assertEqual(zipf.read('2024/01/ORD-010.html'), f.read())
+    
+    def test_background_job_progress_is_visible(self):
+        """Probar que el progreso del trabajo se puede consultar"""
+        service = ReportBackupService(self.config)
+        job = service.start_backup_job()
+        
+        for _ in range(100):
+            status = service.get_backup_job(job['job_id'])
+            if status['status'] in ('completed', 'failed'):
+                break
+            time.sleep(0.05)
+        
+        self.assertEqual(status['status'], 'completed')
+        self.assertTrue(os.path.exists(status['backup_path']))
+        
+        # Otro proceso solo ve el registro en disco
+        other = ReportBackupService(self.config)
+        self.assertEqual(other.get_backup_job(job['job_id'])['status'], 'completed')
+        self.assertIsNone(other.get_backup_job('../../etc/passwd'))
+    
+    def test_backup_disabled(self):
+        """Probar backup deshabilitado"""
+        self.config.REPORTS_BACKUP_ENABLED = False
+        service = ReportBackupService(self.config)
+        
+        with self.assertRaises(ValueError):
+            service.start_backup_job()
+
+
+if __name__ == '__main__':
+    unittest.main()
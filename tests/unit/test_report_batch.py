@@ -0,0 +1,123 @@
+"""
+Pruebas unitarias para operaciones por lote de reportes
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from app.config import Config
+from app.services.lab_report_service import LabReportService
+
+
+def _report(order_number, patient_name='Juan Perez'):
+    return {
+        'order_number': order_number,
+        'patient_name': patient_name,
+        'html_content': f'<html><body>{order_number}</body></html>',
+        'selected_tests': [{'name': 'Glucosa', 'filename': 'glucosa.html'}]
+    }
+
+
+class TestLabReportBatch(unittest.TestCase):
+    """Pruebas para create_reports_batch y update_reports_status"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class BatchConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_BATCH_MAX_SIZE = 5
+        
+        self.service = LabReportService(BatchConfig())
+        self.db_patch = patch('app.services.lab_report_service.db')
+        self.mock_db = self.db_patch.start()
+        self.mock_db.session.query.return_value.filter.return_value = [('ORD-003',)]
+        self.revision_patch = patch.object(self.service.revision_service, 'record_revision')
+        self.mock_record_revision = self.revision_patch.start()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        self.revision_patch.stop()
+        self.db_patch.stop()
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_create_batch_partial(self):
+        """Probar lote con reportes válidos, repetidos, existentes e incompletos"""
+        items = [
+            _report('ord-001'),
+            _report('ORD-002', 'Maria Lopez'),
+            _report('ORD-001'),
+            _report('ORD-003'),
+            {'order_number': 'ORD-004', 'patient_name': 'Ana Ruiz'},
+        ]
+        results = self.service.create_reports_batch(items, created_by=1)
+        
+        self.assertEqual([r['success'] for r in results], [True, True, False, False, False])
+        self.assertIn('repetido', results[2]['error'])
+        self.assertIn('Ya existe', results[3]['error'])
+        self.assertIn('html_content', results[4]['error'])
+        self.assertEqual(results[0]['data']['order_number'], 'ORD-001')
+        
+        # Un solo commit y un archivo por reporte creado
+        self.mock_db.session.commit.assert_called_once()
+        self.assertEqual(len(self.mock_db.session.add_all.call_args[0][0]), 2)
+        self.assertEqual(self.mock_record_revision.call_count, 2)
+        written = [name for _, _, files in os.walk(self.base_path) for name in files]
+        self.assertEqual(len(written), 2)
+    
+    def test_create_batch_invalid_tests_fail_per_item(self):
+        """Probar que una lista de pruebas inválida solo hace fallar su elemento"""
+        items = [_report('ORD-001'), {'order_number': 'ORD-002', 'patient_name': 'Ana Ruiz', 'tests': [123]}]
+        results = self.service.create_reports_batch(items, created_by=1)
+        
+        self.assertEqual([r['success'] for r in results], [True, False])
+        self.assertIn('Cada prueba', results[1]['error'])
+    
+    def test_create_batch_rolls_back_files(self):
+        """Probar que los archivos se eliminan si falla la transacción"""
+        self.mock_db.session.commit.side_effect = RuntimeError('fallo de base de datos')
+        
+        with self.assertRaises(RuntimeError):
+            self.service.create_reports_batch([_report('ORD-010'), _report('ORD-011')], created_by=1)
+        
+        self.mock_db.session.rollback.assert_called_once()
+        written = [name for _, _, files in os.walk(self.base_path) for name in files]
+        self.assertEqual(written, [])
+    
+    def test_create_batch_limit(self):
+        """Probar tamaño máximo del lote"""
+        with self.assertRaises(ValueError):
+            self.service.create_reports_batch([_report(f'ORD-{i}') for i in range(6)], created_by=1)
+    
+    def test_update_status_transitions(self):
+        """Probar transiciones permitidas, repetidas e inexistentes"""
+        reports = [
+            SimpleNamespace(id=1, status='draft', update_status=MagicMock()),
+            SimpleNamespace(id=2, status='final', update_status=MagicMock()),
+            SimpleNamespace(id=3, status='printed', update_status=MagicMock()),
+        ]
+        mock_query = MagicMock()
+        mock_query.filter.return_value = reports
+        
+        with patch('app.services.lab_report_service.LabReport') as mock_model:
+            mock_model.query = mock_query
+            results = self.service.update_reports_status([1, 2, 3, 99], 'final')
+        
+        self.assertEqual([r['success'] for r in results], [True, True, False, False])
+        self.assertTrue(results[0]['changed'])
+        self.assertFalse(results[1]['changed'])
+        reports[0].update_status.assert_called_once_with('final')
+        reports[2].update_status.assert_not_called()
+        self.mock_db.session.commit.assert_called_once()
+        
+        with self.assertRaises(ValueError):
+            self.service.update_reports_status([1], 'archived')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Pruebas unitarias para la composición de reportes desde plantillas
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.config import Config
+from app.services.report_composer import ReportComposer
+
+STYLE = '<style>\n    .results-table { width: 100%; }\n</style>'
+
+TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+    <title>{title} - Laboratorio Esperanza</title>
+    {style}
+</head>
+<body>
+    <div class="container">
+        <h1>{title}</h1>
+        <table class="results-table">
+            <tr><th>EXAMEN</th><th>RESULTADO</th><th>RANGOS DE REFERENCIA</th></tr>
+            {rows}
+        </table>
+        <div class="footer">
+            <p>Documento generado el 23/09/2025 a las 00:23</p>
+        </div>
+    </div>
+</body>
+</html>"""
+
+ROW = '<tr><td class="exam-name">{name}:</td><td class="result-value normal">{sample}</td><td class="reference-range">{ref}</td></tr>'
+
+
+class TestReportComposer(unittest.TestCase):
+    """Pruebas para ReportComposer"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.templates_path = tempfile.mkdtemp()
+        self._write('glucosa', 'GLUCOSA', [('GLUCOSA', '90 mg/dl', '70 - 110 mg/dl')])
+        self._write('hematologia', 'HEMATOLOGIA', [
+            ('HEMOGLOBINA', '14 g/dl', '12 - 16 g/dl'),
+            ('HEMATOCRITO', '42%', '37 - 47%'),
+        ])
+        
+        class ComposerConfig(Config):
+            LAB_TESTS_HTML_PATH = self.templates_path
+        
+        self.composer = ReportComposer(ComposerConfig())
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.templates_path, ignore_errors=True)
+    
+    def _write(self, template_id, title, rows):
+        rows_html = '\n'.join(ROW.format(name=n, sample=s, ref=r) for n, s, r in rows)
+        with open(os.path.join(self.templates_path, f'{template_id}.html'), 'w', encoding='utf-8') as f:
+            f.write(TEMPLATE.format(title=title, style=STYLE, rows=rows_html))
+    
+    def test_template_fields(self):
+        """Probar extracción de campos de resultado"""
+        info = self.composer.get_template_fields('hematologia.html')
+        
+        self.assertEqual(info['title'], 'HEMATOLOGIA')
+        self.assertEqual([f['key'] for f in info['fields']], ['HEMOGLOBINA', 'HEMATOCRITO'])
+        self.assertEqual(info['fields'][1]['reference_range'], '37 - 47%')
+    
+    def test_compose_report(self):
+        """Probar composición con resultados por nombre, índice y lista"""
+        data = {
+            'order_number': 'ORD-001',
+            'patient_name': 'Juan Pérez',
+            'tests': [
+                {'template_id': 'hematologia', 'results': {'hemoglobina': {'value': '< 11', 'flag': 'abnormal'}, '1': '40%'}},
+                {'template_id': 'glucosa', 'results': ['95 mg/dl']}
+            ]
+        }
+        composed = self.composer.compose(data)
+        html_content = composed['html_content']
+        
+        self.assertIn('<td class="result-value abnormal">&lt; 11</td>', html_content)
+        self.assertIn('<td class="result-value">40%</td>', html_content)
+        self.assertIn('<td class="result-value">95 mg/dl</td>', html_content)
+        self.assertIn('Juan Pérez', html_content)
+        # Los valores de ejemplo y el pie de la plantilla no se copian al reporte
+        self.assertNotIn('14 g/dl', html_content)
+        self.assertNotIn('Documento generado', html_content)
+        # Los estilos repetidos se incluyen una sola vez
+        self.assertEqual(html_content.count('.results-table { width: 100%; }'), 1)
+        
+        self.assertEqual(composed['selected_tests'][0]['results']['HEMATOCRITO'], '40%')
+        self.assertEqual(composed['selected_tests'][1]['filename'], 'glucosa.html')
+        
+        # Recomponer con los resultados guardados produce el mismo HTML
+        recomposed = self.composer.compose({**data, 'tests': composed['selected_tests']})
+        self.assertEqual(recomposed['html_content'], html_content)
+    
+    def test_invalid_input(self):
+        """Probar plantillas y campos inexistentes"""
+        with self.assertRaises(ValueError):
+            self.composer.compose({'tests': [{'template_id': 'no_existe'}]})
+        with self.assertRaises(ValueError):
+            self.composer.compose({'tests': [{'template_id': 'glucosa', 'results': {'UREA': '30'}}]})
+        with self.assertRaises(ValueError):
+            self.composer.compose({'tests': [{'template_id': 'glucosa', 'results': [{'value': '1', 'flag': 'alto'}]}]})
+        with self.assertRaises(ValueError):
+            self.composer.compose({'tests': [123]})
+    
+    def test_regenerated_templates_are_reloaded(self):
+        """Probar que una plantilla nueva se compila sin reiniciar (por mtime del directorio)"""
+        self.assertIsNone(self.composer.get_template('urea'))
+        
+        self._write('urea', 'UREA', [('UREA', '30 mg/dl', '15 - 45 mg/dl')])
+        os.utime(self.templates_path, ns=(0, self.composer._signature + 1))
+        self.composer._checked_at -= self.composer.reload_interval
+        
+        self.assertEqual(self.composer.get_template('urea').title, 'UREA')
+        self.assertFalse(self.composer.refresh())
+
+
+if __name__ == '__main__':
+    unittest.main()
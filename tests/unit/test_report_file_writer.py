@@ -0,0 +1,136 @@
+"""
+Pruebas unitarias para el escritor de archivos de reportes y la reconciliación
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.config import Config
+from app.services.lab_report_service import LabReportService
+from app.services.report_file_writer import ReportFileWriter
+from app.services.report_storage import read_html, write_html
+
+HTML = '<html><body>Glucosa: 95 mg/dl</body></html>'
+
+
+class TestReportFileWriter(unittest.TestCase):
+    """Pruebas para ReportFileWriter"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_sync_and_write_behind(self):
+        """Probar escritura síncrona y en el pool de E/S"""
+        for write_behind in (False, True):
+            class WriterConfig(Config):
+                REPORTS_WRITE_BEHIND = write_behind
+            
+            writer = ReportFileWriter(WriterConfig())
+            path = os.path.join(self.base_path, f'reporte_{write_behind}.html.gz')
+            future = writer.submit(path, HTML)
+            
+            self.assertGreater(future.result(timeout=5), 0)
+            self.assertEqual(read_html(path), HTML)
+            writer.shutdown()
+    
+    def test_submit_reports_errors(self):
+        """Probar que los errores de escritura se entregan en el Future"""
+        writer = ReportFileWriter(Config())
+        future = writer.submit(os.path.join(self.base_path, 'no_existe', 'reporte.html'), HTML)
+        self.assertIsInstance(future.exception(), OSError)
+    
+    def test_sync_write_error_prevents_commit(self):
+        """Probar que sin write-behind un error de escritura se lanza antes del commit"""
+        class ReportConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_WRITE_BEHIND = False
+        
+        service = LabReportService(ReportConfig())
+        report_data = {'order_number': 'ORD-001', 'patient_name': 'Ana', 'html_content': HTML,
+                       'selected_tests': ['Glucosa']}
+        with patch('app.services.lab_report_service.db') as mock_db, \
+                patch('app.services.lab_report_service.LabReport') as mock_model, \
+                patch('app.services.report_file_writer.write_html', side_effect=OSError('disco lleno')):
+            mock_model.get_by_order_number.return_value = None
+            with self.assertRaises(OSError):
+                service.create_report(report_data, created_by=1)
+        
+        mock_db.session.commit.assert_not_called()
+        mock_db.session.rollback.assert_called_once()
+
+
+class TestReconcileFiles(unittest.TestCase):
+    """Pruebas para LabReportService.reconcile_files"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class ReconcileConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+        
+        self.service = LabReportService(ReconcileConfig())
+        month_path = os.path.join(self.base_path, '2024', '01')
+        os.makedirs(month_path)
+        
+        self.ok_path = os.path.join(month_path, 'ORD-001.html')
+        self.truncated_path = os.path.join(month_path, 'ORD-002.html.gz')
+        self.missing_path = os.path.join(month_path, 'ORD-003.html')
+        self.orphan_path = os.path.join(month_path, 'ORD-999.html')
+        write_html(self.ok_path, HTML)
+        write_html(self.truncated_path, HTML)
+        with open(self.truncated_path, 'r+b') as f:
+            f.truncate(15)
+        write_html(self.orphan_path, HTML)
+        
+        size = len(HTML.encode('utf-8'))
+        self.rows = [(1, self.ok_path, size), (2, self.truncated_path, size), (3, self.missing_path, size)]
+        self.reports = {
+            report_id: SimpleNamespace(id=report_id, file_path=path, html_content=HTML)
+            for report_id, path, _ in self.rows
+        }
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def _reconcile(self, **kwargs):
+        with patch('app.services.lab_report_service.db') as mock_db, \
+                patch('app.services.lab_report_service.LabReport') as mock_model:
+            mock_db.session.query.return_value.yield_per.return_value = self.rows
+            mock_model.query.get.side_effect = self.reports.get
+            return self.service.reconcile_files(**kwargs)
+    
+    def test_dry_run(self):
+        """Probar que el modo informativo no modifica archivos"""
+        summary = self._reconcile(repair=False)
+        
+        self.assertEqual(summary['checked'], 3)
+        self.assertEqual(summary['missing'], [3])
+        self.assertEqual(summary['mismatched'], [2])
+        self.assertEqual(summary['repaired'], 0)
+        self.assertEqual(summary['orphans'], [os.path.join('2024', '01', 'ORD-999.html')])
+        self.assertFalse(os.path.exists(self.missing_path))
+    
+    def test_repair(self):
+        """Probar reparación desde la base de datos"""
+        summary = self._reconcile(repair=True, remove_orphans=True)
+        
+        self.assertEqual(summary['repaired'], 2)
+        self.assertEqual(summary['orphans_removed'], 1)
+        self.assertEqual(read_html(self.truncated_path), HTML)
+        self.assertEqual(read_html(self.missing_path), HTML)
+        self.assertFalse(os.path.exists(self.orphan_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
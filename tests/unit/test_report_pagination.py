@@ -0,0 +1,117 @@
+"""
+Pruebas unitarias para la paginación por cursor y la exportación de reportes
+"""
+
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.config import Config
+from app.models.lab_report import LabReport
+from app.services.lab_report_service import LabReportService, encode_cursor, decode_cursor
+
+
+class FakeDateRangeQuery:
+    """Consulta en memoria con la misma interfaz que usa el servicio"""
+    
+    def __init__(self, reports):
+        # Mismo orden que LabReport.query_by_date_range
+        self.reports = sorted(reports, key=lambda r: (r.reception_date, r.id), reverse=True)
+        self.batch_sizes = []
+    
+    def options(self, *args):
+        return self
+    
+    def filter(self, clause):
+        # (reception_date, id) < (fecha, id) del cursor
+        cursor = tuple(bind.value for bind in clause.right.clauses)
+        return FakeDateRangeQuery([r for r in self.reports if (r.reception_date, r.id) < cursor])
+    
+    def limit(self, limit):
+        return FakeDateRangeQuery(self.reports[:limit])
+    
+    def all(self):
+        return list(self.reports)
+    
+    def yield_per(self, batch_size):
+        self.batch_sizes.append(batch_size)
+        return iter(self.reports)
+
+
+def _report(report_id, reception_date):
+    return SimpleNamespace(id=report_id, reception_date=reception_date,
+                           to_dict_summary=lambda: {'id': report_id})
+
+
+class TestReportPagination(unittest.TestCase):
+    """Pruebas para get_reports_page e iter_reports_by_date_range"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class PaginationConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_MAX_PAGE_SIZE = 10
+        
+        self.service = LabReportService(PaginationConfig())
+        # Varios reportes con la misma fecha: el id desempata
+        self.reports = [_report(i, date(2024, 1, 1 + i // 3)) for i in range(1, 8)]
+        self.query = FakeDateRangeQuery(self.reports)
+        self.query_patch = patch.object(LabReport, 'query_by_date_range', return_value=self.query)
+        self.query_patch.start()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        self.query_patch.stop()
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_cursor_round_trip(self):
+        """Probar codificación y decodificación del cursor"""
+        cursor = encode_cursor(date(2024, 1, 15), 42)
+        self.assertEqual(decode_cursor(cursor), (date(2024, 1, 15), 42))
+        
+        with self.assertRaises(ValueError):
+            decode_cursor('no-es-un-cursor')
+    
+    def test_pages_cover_range_without_repeats(self):
+        """Probar que las páginas recorren todo el rango sin repetir reportes"""
+        seen = []
+        cursor = None
+        while True:
+            page = self.service.get_reports_page(date(2024, 1, 1), date(2024, 1, 31), limit=3, cursor=cursor)
+            seen.extend(report.id for report in page['reports'])
+            if not page['has_more']:
+                self.assertIsNone(page['next_cursor'])
+                break
+            cursor = page['next_cursor']
+        
+        self.assertEqual(seen, [7, 6, 5, 4, 3, 2, 1])
+    
+    def test_invalid_limit(self):
+        """Probar límite fuera de rango"""
+        with self.assertRaises(ValueError):
+            self.service.get_reports_page(date(2024, 1, 1), date(2024, 1, 31), limit=11)
+    
+    def test_page_with_html_loads_tests_in_one_query(self):
+        """Probar que con include_html las pruebas de la página se cargan juntas (sin N+1)"""
+        with patch('app.services.lab_report_service.selectinload') as selectinload:
+            self.service.get_reports_page(date(2024, 1, 1), date(2024, 1, 31), limit=3, include_html=True)
+            selectinload.assert_called_once_with(LabReport.tests)
+            
+            self.service.get_reports_page(date(2024, 1, 1), date(2024, 1, 31), limit=3)
+            selectinload.assert_called_once()
+    
+    def test_export_iterates_in_batches(self):
+        """Probar exportación por lotes"""
+        rows = list(self.service.iter_reports_by_date_range(date(2024, 1, 1), date(2024, 1, 31)))
+        
+        self.assertEqual([row['id'] for row in rows], [7, 6, 5, 4, 3, 2, 1])
+        self.assertEqual(self.query.batch_sizes, [Config.REPORTS_EXPORT_BATCH_SIZE])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Pruebas unitarias para la generación de PDFs de reportes
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.config import Config
+from app.services.lab_report_service import LabReportService
+from app.services.pdf_renderer import render_html_to_pdf
+from app.services.report_pdf_service import ReportPDFService
+
+HTML = """<!DOCTYPE html>
+<html><head><style>body { font-family: Arial; }</style></head>
+<body>
+    <h1>HEMOGRAMA</h1>
+    <table>
+        <tr><th>EXAMEN</th><th>RESULTADO</th><th>RANGOS DE REFERENCIA</th></tr>
+        <tr><td>Hemoglobina</td><td><b>14.2</b> g/dl</td><td>12 - 16 g/dl</td></tr>
+    </table>
+    <p>Laboratorio Esperanza</p>
+</body></html>"""
+
+
+class TestPDFRenderer(unittest.TestCase):
+    """Pruebas para render_html_to_pdf"""
+    
+    def test_render_is_deterministic(self):
+        """Probar que el mismo HTML produce el mismo PDF"""
+        pdf = render_html_to_pdf(HTML)
+        
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(pdf, render_html_to_pdf(HTML))
+    
+    def test_malformed_inline_markup(self):
+        """Probar HTML con etiquetas mal anidadas"""
+        pdf = render_html_to_pdf('<p><b>Glucosa <i>95</b></i> mg/dl</p>')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+
+class TestReportPDFService(unittest.TestCase):
+    """Pruebas para ReportPDFService"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class PDFConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_PDF_WORKERS = 1
+        
+        self.service = ReportPDFService(PDFConfig())
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        self.service.shutdown()
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def _wait_for(self, html_content):
+        for _ in range(200):
+            status = self.service.get_render_status(html_content)
+            if status['status'] in ('completed', 'failed'):
+                return status
+            time.sleep(0.05)
+        return status
+    
+    def test_render_in_background_and_cache(self):
+        """Probar renderizado en segundo plano y reutilización de la cache"""
+        self.assertEqual(self.service.get_render_status(HTML)['status'], 'not_requested')
+        
+        job = self.service.request_render(HTML)
+        self.assertIn(job['status'], ('pending', 'completed'))
+        
+        status = self._wait_for(HTML)
+        self.assertEqual(status['status'], 'completed')
+        
+        pdf_path = self.service.get_cached_pdf(HTML)
+        self.assertTrue(os.path.exists(pdf_path))
+        self.assertIn(self.service.cache_key(HTML), pdf_path)
+        
+        # Una segunda solicitud no vuelve a renderizar
+        self.assertEqual(self.service.request_render(HTML)['status'], 'completed')
+    
+    def test_invalidate_removes_cached_pdf(self):
+        """Probar invalidación cuando cambia el contenido"""
+        self.service.request_render(HTML)
+        self._wait_for(HTML)
+        
+        self.assertTrue(self.service.invalidate(HTML))
+        self.assertIsNone(self.service.get_cached_pdf(HTML))
+        self.assertEqual(self.service.get_render_status(HTML)['status'], 'not_requested')
+        
+        updated = HTML.replace('14.2', '13.9')
+        self.assertNotEqual(self.service.cache_key(HTML), self.service.cache_key(updated))
+    
+    def test_title_is_part_of_the_key(self):
+        """Probar que dos reportes con el mismo HTML no comparten PDF ni invalidación"""
+        first, second = 'Reporte ORD-001 - Ana Pérez', 'Reporte ORD-002 - Luis Gómez'
+        self.assertNotEqual(self.service.cache_key(HTML, first), self.service.cache_key(HTML, second))
+        
+        for title in (first, second):
+            self.service.request_render(HTML, title)
+        for title in (first, second):
+            for _ in range(200):
+                if self.service.get_cached_pdf(HTML, title):
+                    break
+                time.sleep(0.05)
+        
+        self.assertTrue(self.service.invalidate(HTML, first))
+        self.assertIsNone(self.service.get_cached_pdf(HTML, first))
+        self.assertIsNotNone(self.service.get_cached_pdf(HTML, second))
+    
+    def test_job_state_is_shared_between_processes(self):
+        """Probar que otro proceso ve un renderizado en curso y puede invalidarlo"""
+        render = Future()
+        self.service._get_executor = MagicMock(return_value=MagicMock(submit=MagicMock(return_value=render)))
+        self.service.request_render(HTML)
+        
+        # Otra instancia (otro worker del servidor) con el mismo directorio
+        other = ReportPDFService(self.service.config)
+        other._get_executor = MagicMock()
+        self.assertEqual(other.get_render_status(HTML)['status'], 'pending')
+        self.assertEqual(other.request_render(HTML)['status'], 'pending')
+        other._get_executor.assert_not_called()
+        
+        # La invalidación desde el otro proceso descarta el resultado al terminar
+        other.invalidate(HTML)
+        cache_path = self.service.get_cache_path(self.service.cache_key(HTML))
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_bytes(b'%PDF-1.4')
+        render.set_result(8)
+        self.assertEqual(other.get_render_status(HTML)['status'], 'not_requested')
+        self.assertEqual(os.listdir(self.service.jobs_dir), [])
+        
+        # Un fallo también es visible desde el otro proceso
+        render = Future()
+        self.service._get_executor.return_value.submit.return_value = render
+        self.service.request_render(HTML)
+        render.set_exception(RuntimeError('sin memoria'))
+        status = other.get_render_status(HTML)
+        self.assertEqual(status['status'], 'failed')
+        self.assertEqual(status['error'], 'sin memoria')
+
+
+
+class TestReportPDFInvalidation(unittest.TestCase):
+    """Pruebas para la invalidación del PDF desde LabReportService"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class ReportConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+        
+        self.service = LabReportService(ReportConfig())
+        self.service.pdf_service = MagicMock()
+        self.service.stats_service = MagicMock()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def _update(self, commit_error=None):
+        report = SimpleNamespace(id=1, order_number='ORD-001', patient_name='Ana', doctor_name=None,
+                                 status='draft', html_content=HTML, is_editable=lambda: True)
+        with patch('app.services.lab_report_service.db') as mock_db, \
+                patch('app.services.lab_report_service.LabReport') as mock_model:
+            mock_model.query.get.return_value = report
+            mock_db.session.commit.side_effect = commit_error
+            self.service.update_report(1, {'patient_name': 'Ana Pérez'})
+    
+    def test_pdf_is_invalidated_only_after_commit(self):
+        """Probar que un commit fallido conserva el PDF del contenido vigente"""
+        with self.assertRaises(RuntimeError):
+            self._update(RuntimeError('conexión perdida'))
+        self.service.pdf_service.invalidate.assert_not_called()
+        
+        self._update()
+        self.service.pdf_service.invalidate.assert_called_once_with(HTML, 'Reporte ORD-001 - Ana')
+
+
+if __name__ == '__main__':
+    unittest.main()
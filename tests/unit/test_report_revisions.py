@@ -0,0 +1,158 @@
+"""
+Pruebas unitarias para el historial de revisiones de reportes
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy import event
+
+from database import db
+from app.config import Config
+from app.models.lab_report import ReportRevision
+from app.services.report_revision_service import (
+    ReportRevisionService, apply_delta, content_hash, encode_revision, make_delta, reconstruct
+)
+
+ROW = '        <tr><td class="exam-name">EXAMEN {i}:</td><td class="result-value">{value}</td><td>0 - 100</td></tr>\n'
+
+
+def _report(values):
+    rows = ''.join(ROW.format(i=i, value=value) for i, value in enumerate(values))
+    return f'<!DOCTYPE html>\n<html>\n<body>\n    <table>\n{rows}    </table>\n</body>\n</html>'
+
+
+class TestRevisionCodec(unittest.TestCase):
+    """Pruebas para las diferencias comprimidas"""
+    
+    def test_delta_round_trip(self):
+        """Probar reconstrucción exacta con HTML indentado y minificado"""
+        old = _report(range(300))
+        new = _report([v if v != 150 else 'ALTO' for v in range(300)]) + '\n<p>Nota</p>'
+        
+        self.assertEqual(apply_delta(old, make_delta(old, new)), new)
+        
+        old_min, new_min = old.replace('\n', ''), new.replace('\n', '')
+        self.assertEqual(apply_delta(old_min, make_delta(old_min, new_min)), new_min)
+    
+    def test_storage_scales_with_edit_size(self):
+        """Probar que una edición pequeña ocupa mucho menos que el reporte"""
+        old = _report(range(300))
+        new = _report([v if v != 10 else 11 for v in range(300)])
+        
+        kind, data = encode_revision(2, new, old, keyframe_interval=20)
+        self.assertEqual(kind, 'delta')
+        self.assertLess(len(data) * 20, len(zlib.compress(new.encode('utf-8'), 9)))
+    
+    def test_keyframes(self):
+        """Probar revisiones completas en la primera y cada N revisiones"""
+        old, new = _report(range(50)), _report(range(1, 51))
+        self.assertEqual(encode_revision(1, new, None, 5)[0], 'full')
+        self.assertEqual(encode_revision(6, new, old, 5)[0], 'full')
+        self.assertEqual(encode_revision(7, new, old, 5)[0], 'delta')
+    
+    def test_reconstruct_chain(self):
+        """Probar reconstrucción de una cadena de revisiones"""
+        versions = [_report([v + n for v in range(100)][:100 - n]) for n in range(6)]
+        chain = []
+        for number, html_content in enumerate(versions, start=1):
+            base = versions[number - 2] if number > 1 else None
+            kind, data = encode_revision(number, html_content, base, keyframe_interval=20)
+            chain.append(SimpleNamespace(revision=number, kind=kind, data=data,
+                                         content_hash=content_hash(html_content)))
+        
+        for number in range(1, len(versions) + 1):
+            self.assertEqual(reconstruct(chain[:number]), versions[number - 1])
+        
+        chain[-1].content_hash = content_hash('otro contenido')
+        with self.assertRaises(RuntimeError):
+            reconstruct(chain)
+
+
+class TestReportRevisionService(unittest.TestCase):
+    """Pruebas para ReportRevisionService.record_revision"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.service = ReportRevisionService(Config())
+        self.db_patch = patch('app.services.report_revision_service.db')
+        self.mock_db = self.db_patch.start()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        self.db_patch.stop()
+    
+    def test_legacy_report_gets_base_revision(self):
+        """Probar que un reporte sin historial guarda primero su contenido anterior"""
+        old, new = _report(range(100)), _report([v if v != 50 else 'ALTO' for v in range(100)])
+        
+        with patch.object(self.service, '_latest', return_value=None):
+            revision = self.service.record_revision(7, new, previous_html=old, created_by=3)
+        
+        added = [call.args[0] for call in self.mock_db.session.add.call_args_list]
+        self.assertEqual([(r.revision, r.kind) for r in added], [(1, 'full'), (2, 'delta')])
+        self.assertEqual(revision.created_by, 3)
+        self.assertEqual(reconstruct(added), new)
+    
+    def test_unchanged_content_is_skipped(self):
+        """Probar que no se registra una revisión sin cambios"""
+        html_content = _report(range(10))
+        latest = SimpleNamespace(revision=4, content_hash=content_hash(html_content))
+        
+        with patch.object(self.service, '_latest', return_value=latest):
+            self.assertIsNone(self.service.record_revision(7, html_content, previous_html=html_content))
+        self.mock_db.session.add.assert_not_called()
+
+
+class TestListRevisions(unittest.TestCase):
+    """Pruebas para ReportRevisionService.list_revisions con SQLite"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.db_path = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.db_path, 'revisions.db')}"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        ReportRevision.__table__.create(db.engine)
+        self.service = ReportRevisionService(Config())
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        db.session.remove()
+        db.engine.dispose()
+        self.context.pop()
+        shutil.rmtree(self.db_path, ignore_errors=True)
+    
+    def test_listing_does_not_load_stored_data(self):
+        """Probar que el listado usa stored_size sin leer los datos comprimidos"""
+        versions = [_report(range(n, 100 + n)) for n in range(3)]
+        for number, html_content in enumerate(versions):
+            self.service.record_revision(7, html_content, versions[number - 1] if number else None)
+            db.session.commit()
+        sizes = [len(revision.data) for revision in ReportRevision.query.order_by(ReportRevision.revision)]
+        db.session.expunge_all()
+        
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            listing = self.service.list_revisions(7)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        self.assertEqual([revision['stored_size'] for revision in listing['revisions']], sizes)
+        self.assertEqual(listing['total_stored_size'], sum(sizes))
+        self.assertTrue(statements)
+        self.assertFalse(any('report_revisions.data' in statement for statement in statements))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Pruebas unitarias para estadísticas incrementales de reportes
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from database import db
+from app.config import Config
+from app.models.lab_report import ReportStatsCounter, ReportStatsRegister
+from app.services.report_stats_service import HyperLogLog, ReportStatsService
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """Pruebas para HyperLogLog"""
+    
+    def test_small_cardinality_is_exact(self):
+        """Probar conteo con pocos valores y duplicados"""
+        hll = HyperLogLog()
+        hll.update(['Juan Perez', 'Maria Lopez', 'Juan Perez', None, '', 'Ana Ruiz'])
+        self.assertEqual(hll.count(), 3)
+    
+    def test_large_cardinality_error(self):
+        """Probar que el error relativo está dentro de lo esperado"""
+        hll = HyperLogLog(precision=12)
+        hll.update(f'paciente-{i}' for i in range(50000))
+        hll.update(f'paciente-{i}' for i in range(10000))  # Repetidos
+        
+        error = abs(hll.count() - 50000) / 50000
+        self.assertLess(error, 0.05)
+    
+    def test_invalid_precision(self):
+        """Probar precisión fuera de rango"""
+        with self.assertRaises(ValueError):
+            HyperLogLog(precision=20)
+
+
+REPORTS = [('draft', 'Juan Perez', 'Dr. Garcia'), ('draft', 'Maria Lopez', None),
+           ('final', 'Juan Perez', 'Dr. Garcia')]
+
+
+class FakeStatsService(ReportStatsService):
+    """Servicio que recorre una lista fija en lugar de la tabla lab_reports"""
+    
+    loads = 0
+    during_scan = None
+    
+    def _iter_reports(self, connection):
+        FakeStatsService.loads += 1
+        if FakeStatsService.during_scan:
+            FakeStatsService.during_scan()
+        return iter(REPORTS)
+
+
+class TestReportStatsService(unittest.TestCase):
+    """Pruebas para ReportStatsService con las tablas de contadores en SQLite"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.db_path = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.db_path, 'stats.db')}"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        ReportStatsCounter.__table__.create(db.engine)
+        ReportStatsRegister.__table__.create(db.engine)
+        
+        FakeStatsService.loads = 0
+        FakeStatsService.during_scan = None
+        self.service = FakeStatsService(Config())
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        db.session.remove()
+        db.engine.dispose()
+        self.context.pop()
+        shutil.rmtree(self.db_path, ignore_errors=True)
+    
+    def test_counters_are_shared_and_transactional(self):
+        """Probar contadores en la transacción del reporte, visibles para otro proceso"""
+        stats = self.service.get_stats()
+        self.assertEqual(stats['total_reports'], 3)
+        self.assertFalse(stats['approximate'])
+        
+        self.service.on_report_created(db.session, 'draft', 'Ana Ruiz', 'Dr. Garcia')
+        self.service.on_report_created(db.session, 'draft', 'Juan Perez', None)
+        self.service.on_report_updated(db.session, 'draft', 'final', 'Juan Perez', 'Dr. Garcia')
+        self.service.on_report_deleted(db.session, 'draft')
+        db.session.commit()
+        
+        # Una transacción revertida no cambia los contadores
+        self.service.on_report_created(db.session, 'printed', 'Luis Gomez')
+        db.session.rollback()
+        
+        # Otra instancia (otro worker del servidor) ve los mismos valores sin recalcular
+        stats = FakeStatsService(Config()).get_stats()
+        self.assertEqual(FakeStatsService.loads, 1)
+        self.assertEqual(stats['total_reports'], 4)
+        self.assertEqual(stats['draft_reports'], 2)
+        self.assertEqual(stats['final_reports'], 2)
+        self.assertEqual(stats['printed_reports'], 0)
+        self.assertEqual(stats['unique_patients'], 3)
+        self.assertEqual(stats['unique_doctors'], 1)
+        self.assertTrue(stats['approximate'])
+    
+    def test_recompute_keeps_changes_committed_during_scan(self):
+        """Probar que un reporte creado durante el recorrido no se pierde al aplicar el recálculo"""
+        self.service.get_stats()
+        self.service.on_report_created(db.session, 'draft', 'Ana Ruiz')
+        db.session.commit()
+        
+        def create_report():
+            # Confirmado después de la instantánea: el recorrido no lo incluye
+            FakeStatsService.during_scan = None
+            self.service.on_report_created(db.session, 'final', 'Luis Gomez')
+            db.session.commit()
+        
+        FakeStatsService.during_scan = create_report
+        stats = self.service.get_stats(exact=True)
+        self.assertEqual(FakeStatsService.loads, 2)
+        self.assertEqual(stats['total_reports'], 4)
+        self.assertEqual(stats['draft_reports'], 2)
+        self.assertEqual(stats['final_reports'], 2)
+    
+    def test_concurrent_recompute_is_discarded(self):
+        """Probar que un recálculo cuya instantánea quedó vieja no aplica su corrección dos veces"""
+        self.service.get_stats()
+        self.service.on_report_created(db.session, 'draft', 'Ana Ruiz')
+        db.session.commit()
+        
+        other = FakeStatsService(Config())
+        applied = []
+        FakeStatsService.during_scan = lambda: (setattr(FakeStatsService, 'during_scan', None),
+                                                applied.append(other.recompute()))
+        self.assertFalse(self.service.recompute())
+        self.assertEqual(applied, [True])
+        self.assertEqual(self.service.get_stats()['total_reports'], 3)
+    
+    def test_stale_stats_refresh_in_background(self):
+        """Probar que vencido el intervalo se responde con los contadores y se recalcula en segundo plano"""
+        self.service.get_stats()
+        self.service.on_report_created(db.session, 'draft', 'Ana Ruiz')
+        db.session.commit()
+        
+        self.service.recompute_interval = 0
+        self.assertEqual(self.service.get_stats()['total_reports'], 4)
+        self.service._refresher.join(timeout=5)
+        self.assertEqual(FakeStatsService.loads, 2)
+        self.assertEqual(self.service.get_stats()['total_reports'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Pruebas unitarias para almacenamiento comprimido de HTML
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from app.config import Config
+from app.controllers.file_response import send_html_file
+from app.services.frontend_html_service import FrontendHTMLService
+from app.services.report_storage import write_html, read_html, resolve_stored_path, remove_stored, stored_size
+
+HTML = '<!DOCTYPE html>\n<html><head><style>' + '.tabla td { padding: 4px; }\n' * 200 + '</style></head><body>Resultado</body></html>'
+
+
+class TestReportStorage(unittest.TestCase):
+    """Pruebas para las funciones de report_storage"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_write_and_read_compressed(self):
+        """Probar escritura comprimida y lectura transparente"""
+        path = os.path.join(self.base_path, 'reporte.html.gz')
+        written = write_html(path, HTML)
+        
+        self.assertLess(written, len(HTML.encode('utf-8')) // 5)
+        self.assertEqual(read_html(path), HTML)
+        self.assertEqual(resolve_stored_path(os.path.join(self.base_path, 'reporte.html')), path)
+        
+        # Mismo contenido, mismos bytes (gzip sin timestamp)
+        with open(path, 'rb') as f:
+            first = f.read()
+        write_html(path, HTML)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), first)
+        
+        self.assertTrue(remove_stored(os.path.join(self.base_path, 'reporte.html')))
+        self.assertIsNone(resolve_stored_path(path))
+    
+    def test_atomic_write_keeps_previous_content(self):
+        """Probar que una escritura interrumpida no deja el archivo truncado"""
+        path = os.path.join(self.base_path, 'reporte.html')
+        write_html(path, HTML)
+        
+        with patch('app.services.report_storage.os.replace', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                write_html(path, '<html>incompleto')
+        
+        self.assertEqual(read_html(path), HTML)
+        self.assertEqual(os.listdir(self.base_path), ['reporte.html'])
+    
+    def test_rewrite_keeps_file_mode(self):
+        """Probar que la escritura atómica conserva los permisos del archivo reemplazado"""
+        path = os.path.join(self.base_path, 'reporte.html')
+        write_html(path, HTML)
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o666 & ~umask)
+        
+        os.chmod(path, 0o644)
+        write_html(path, '<html>nuevo</html>')
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+    
+    def test_stored_size(self):
+        """Probar tamaño sin comprimir de archivos planos y .gz"""
+        plain = os.path.join(self.base_path, 'a.html')
+        compressed = os.path.join(self.base_path, 'b.html.gz')
+        write_html(plain, HTML)
+        write_html(compressed, HTML)
+        
+        self.assertEqual(stored_size(plain), len(HTML.encode('utf-8')))
+        self.assertEqual(stored_size(compressed), len(HTML.encode('utf-8')))
+        self.assertIsNone(stored_size(os.path.join(self.base_path, 'c.html')))
+
+
+class TestCompressedFrontendHTML(unittest.TestCase):
+    """Pruebas para FrontendHTMLService con compresión en disco"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class CompressedConfig(Config):
+            FRONTEND_HTML_BASE_PATH = self.base_path
+            FRONTEND_HTML_BACKUP_ENABLED = False
+            FRONTEND_HTML_COMPRESS_AT_REST = True
+        
+        self.service = FrontendHTMLService(CompressedConfig())
+        self.file_path = os.path.join(self.base_path, '2024', '01', 'frontend_ORD-1.html')
+        self.service.save_html_file(HTML, self.file_path, {'patient_name': 'Juan'})
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_saved_as_gzip_with_logical_name(self):
+        """Probar que se guarda .html.gz pero se expone con el nombre .html"""
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertTrue(os.path.exists(self.file_path + '.gz'))
+        self.assertTrue(self.service.file_exists(self.file_path))
+        self.assertIn('Resultado', self.service.get_html_content(self.file_path))
+        
+        files = self.service.list_html_files()
+        self.assertEqual(len(files), 1)
+        self.assertEqual(files[0]['filename'], 'frontend_ORD-1.html')
+        self.assertEqual(files[0]['metadata']['patient_name'], 'Juan')
+        
+        self.service.delete_html_file(self.file_path)
+        self.assertFalse(self.service.file_exists(self.file_path))
+    
+    def test_serving_passes_gzip_through(self):
+        """Probar que se envían los bytes gzip sin recomprimir"""
+        app = Flask(__name__)
+        stored_path = self.service.resolve_file_path(self.file_path)
+        with open(stored_path, 'rb') as f:
+            stored_bytes = f.read()
+        
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate'}):
+            response = send_html_file(stored_path)
+            response.direct_passthrough = False
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response.headers['Vary'])
+            self.assertEqual(response.get_data(), stored_bytes)
+        
+        with app.test_request_context(headers={'Accept-Encoding': 'identity'}):
+            response = send_html_file(stored_path)
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertEqual(response.get_data(), gzip.decompress(stored_bytes))
+
+
+if __name__ == '__main__':
+    unittest.main()
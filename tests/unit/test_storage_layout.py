@@ -0,0 +1,275 @@
+"""
+Pruebas unitarias para la distribución de archivos en directorios y su migración
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.config import Config
+from app.models.lab_report import LabReport
+from app.services.lab_report_service import LabReportService
+from app.services.report_storage import physical_path, read_html, write_html
+from app.services.storage_layout import (
+    LAYOUT_MONTHLY, LAYOUT_SHARDED, StorageLayout, shard_prefix, stage_move, finish_move
+)
+from tests.unit.helpers import FrontendHTMLTestCase
+
+MOMENT = datetime(2024, 1, 15, 14, 30, 22)
+
+
+class TestStorageLayout(unittest.TestCase):
+    """Pruebas para StorageLayout, stage_move y finish_move"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def test_paths_by_layout(self):
+        """Probar rutas mensuales y por día y prefijo de hash"""
+        name = 'ORD-1_Juan_20240115_143022.html'
+        layout = StorageLayout(self.base_path, LAYOUT_SHARDED, shard_width=3)
+        prefix = shard_prefix(name, 3)
+        
+        self.assertEqual(len(prefix), 3)
+        self.assertEqual(prefix, shard_prefix(name + '.gz', 3))
+        self.assertEqual(layout.path_for(name, MOMENT),
+                         os.path.join(self.base_path, '2024', '01', '15', prefix, name))
+        self.assertEqual(layout.path_for(name, MOMENT, LAYOUT_MONTHLY),
+                         os.path.join(self.base_path, '2024', '01', name))
+        self.assertEqual(layout.candidate_paths(name, MOMENT),
+                         [layout.path_for(name, MOMENT), layout.path_for(name, MOMENT, LAYOUT_MONTHLY)])
+        
+        path = layout.prepare_path(name, MOMENT)
+        self.assertTrue(os.path.isdir(os.path.dirname(path)))
+        
+        with self.assertRaises(ValueError):
+            StorageLayout(self.base_path, 'daily')
+    
+    def test_move_keeps_latest_content(self):
+        """Probar que una reescritura entre stage_move y finish_move no se pierde"""
+        source = os.path.join(self.base_path, 'a.html')
+        destination = os.path.join(self.base_path, 'nuevo', 'a.html')
+        write_html(source, '<p>v1</p>')
+        
+        signature = stage_move(source, destination)
+        self.assertTrue(os.path.exists(source))
+        self.assertEqual(read_html(destination), '<p>v1</p>')
+        self.assertFalse(finish_move(source, destination, signature))
+        self.assertFalse(os.path.exists(source))
+        
+        write_html(source, '<p>v1</p>')
+        signature = stage_move(source, destination)
+        write_html(source, '<p>v2</p>')  # Escritura concurrente en la ruta anterior
+        self.assertTrue(finish_move(source, destination, signature))
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(read_html(destination), '<p>v2</p>')
+
+
+class TestFrontendHTMLLayoutMigration(FrontendHTMLTestCase):
+    """Pruebas para la distribución por día y hash de FrontendHTMLService"""
+    
+    config_overrides = {
+        'FRONTEND_HTML_BACKUP_ENABLED': True,
+        'FRONTEND_HTML_BACKUP_COMPACT_INTERVAL': 0,
+        'FRONTEND_HTML_COMPRESS_AT_REST': False,
+        'FRONTEND_HTML_STORAGE_LAYOUT': 'sharded'
+    }
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        super().setUp()
+        self.metadata = {'patient_name': 'José Pérez', 'order_number': 'ORD-1', 'created_at': '2024-01-15T08:00:00'}
+    
+    def _monthly_file(self, number):
+        """Guardar un archivo en la distribución mensual (anterior a la migración)"""
+        filename = f'frontend_reporte{number}_20240115_1430{number:02d}_0000abc{number}.html'
+        file_path = self.service.layout.path_for(filename, MOMENT, LAYOUT_MONTHLY)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self.service.save_html_file(f'<p>Hemoglobina {number}</p>', file_path, dict(self.metadata))
+        self.service.update_html_file(file_path, f'<p>Hemoglobina {number} corregida</p>',
+                                      {'edited_by': 'ana', 'edit_reason': 'Corrección'})
+        return filename, file_path
+    
+    def test_new_files_use_sharded_layout(self):
+        """Probar que los archivos nuevos se ubican por día y prefijo de hash"""
+        filename = self.service.generate_file_name('reporte.html')
+        file_path = self.service.new_file_path(filename)
+        
+        moment = self.service._file_moment(filename)
+        self.assertEqual(file_path, self.service.layout.path_for(filename, moment))
+        self.assertTrue(os.path.isdir(os.path.dirname(file_path)))
+        
+        self.service.save_html_file('<p>Glucosa</p>', file_path, dict(self.metadata))
+        self.assertEqual(self.service.find_file(filename), file_path)
+        self.assertEqual(self.service.rebuild_index()['indexed'], 1)
+    
+    def test_migration_keeps_metadata_history_and_search(self):
+        """Probar la migración por lotes: dry run, reanudación, búsqueda, historial y backups"""
+        files = [self._monthly_file(number) for number in range(3)]
+        
+        # Antes de migrar los archivos se encuentran en la distribución anterior
+        self.assertEqual(self.service.find_file(files[0][0]), files[0][1])
+        
+        preview = self.service.migrate_storage_layout(dry_run=True)
+        self.assertEqual(preview['pending'], 3)
+        self.assertTrue(os.path.exists(files[0][1]))
+        
+        first = self.service.migrate_storage_layout(batch_size=2, max_batches=1)
+        self.assertEqual(first['moved'], 2)
+        self.assertFalse(first['done'])
+        rest = self.service.migrate_storage_layout(after=first['next_after'], batch_size=2)
+        self.assertTrue(rest['done'])
+        self.assertEqual(first['moved'] + rest['moved'], 3)
+        self.assertEqual(rest['errors'], [])
+        
+        for filename, old_path in files:
+            new_path = self.service.layout.path_for(filename, MOMENT)
+            self.assertEqual(self.service.find_file(filename), new_path)
+            self.assertFalse(os.path.exists(old_path))
+            self.assertFalse(os.path.exists(f'{old_path}.meta'))
+            self.assertIn('corregida', self.service.get_html_content(new_path))
+            self.assertEqual(self.service.get_file_metadata(new_path)['edit_count'], 1)
+            self.assertEqual(len(self.service.get_edit_history(new_path)), 1)
+            self.assertEqual(len(self.service.backup_store.list_snapshots(new_path)), 2)
+        
+        results = self.service.search_html_files(query='corregida')
+        self.assertEqual({f['file_path'] for f in results},
+                         {self.service.layout.path_for(filename, MOMENT) for filename, _ in files})
+        
+        # Repetir la migración no mueve nada y el índice se reconstruye desde la nueva distribución
+        self.assertEqual(self.service.migrate_storage_layout()['moved'], 0)
+        self.assertEqual(self.service.rebuild_index()['indexed'], 3)
+    
+    def test_write_with_stale_path_follows_moved_file(self):
+        """Probar que una edición con la ruta anterior a la migración se guarda en la ruta nueva"""
+        filename, old_path = self._monthly_file(1)
+        self.service.migrate_storage_layout()
+        new_path = self.service.layout.path_for(filename, MOMENT)
+        
+        result = self.service.update_html_file(old_path, '<p>Hemoglobina 1 revisada</p>', {'edited_by': 'ana'})
+        self.assertEqual(result['file_path'], new_path)
+        self.assertIsNone(self.service.resolve_file_path(old_path))
+        self.assertIn('revisada', self.service.get_html_content(new_path))
+        self.assertEqual(self.service.get_file_metadata(new_path)['edit_count'], 2)
+        
+        self.service.update_file_status(old_path, 'completed')
+        self.assertEqual(self.service.get_file_metadata(new_path)['status'], 'completed')
+        self.assertFalse(os.path.exists(f'{old_path}.meta'))
+
+
+class TestLabReportLayoutMigration(unittest.TestCase):
+    """Pruebas para la distribución y la migración de archivos de LabReportService"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+        
+        class ShardedConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_COMPRESS_AT_REST = False
+            REPORTS_STORAGE_LAYOUT = 'sharded'
+        
+        self.service = LabReportService(ShardedConfig())
+        self.rows = []
+        self.updates = {}
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def _report(self, report_id, compressed=False, exists=True):
+        file_name = f'ORD-{report_id}_Juan_20240115_1430{report_id:02d}.html'
+        file_path = self.service.layout.path_for(file_name, MOMENT, LAYOUT_MONTHLY) + ('.gz' if compressed else '')
+        if exists:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            write_html(file_path, f'<p>Reporte {report_id}</p>')
+        self.rows.append(SimpleNamespace(id=report_id, file_path=file_path, file_name=file_name,
+                                         created_at=datetime(2024, 1, 20)))
+        return file_name, file_path
+    
+    def _file_rows_after(self, after_id, limit):
+        rows = [row for row in self.rows if row.id > after_id][:limit]
+        return [(row.id, self.updates.get(row.id, row.file_path), row.file_name, row.created_at) for row in rows]
+    
+    def _migrate(self, **kwargs):
+        with patch.object(LabReport, 'file_rows_after', side_effect=self._file_rows_after), \
+                patch.object(LabReport, 'update_file_paths', side_effect=self.updates.update), \
+                patch('app.services.lab_report_service.db') as db:
+            return self.service.migrate_storage_layout(**kwargs), db
+    
+    def test_report_file_path_uses_name_date(self):
+        """Probar que la ruta de un reporte nuevo sale de la fecha de su nombre"""
+        file_name = 'ORD-7_Maria_20240115_143022.html'
+        path = self.service.report_file_path(file_name)
+        
+        self.assertEqual(path, os.path.join(self.base_path, '2024', '01', '15', shard_prefix(file_name), file_name))
+        self.assertTrue(os.path.isdir(os.path.dirname(path)))
+    
+    def test_migration_moves_files_and_updates_file_path(self):
+        """Probar la migración por lotes de archivos planos y comprimidos"""
+        moved = [self._report(1), self._report(2, compressed=True), self._report(3)]
+        self._report(4, exists=False)
+        
+        preview, _ = self._migrate(dry_run=True)
+        self.assertEqual(preview['pending'], 3)
+        self.assertEqual(self.updates, {})
+        
+        summary, db = self._migrate(batch_size=2)
+        self.assertTrue(summary['done'])
+        self.assertEqual(summary['moved'], 3)
+        self.assertEqual(summary['missing'], [4])
+        self.assertEqual(summary['next_after_id'], 4)
+        self.assertEqual(db.session.commit.call_count, 2)
+        
+        for report_id, (file_name, old_path) in enumerate(moved, start=1):
+            new_path = self.updates[report_id]
+            self.assertEqual(new_path, physical_path(self.service.layout.path_for(file_name, MOMENT),
+                                                     old_path.endswith('.gz')))
+            self.assertEqual(read_html(new_path), f'<p>Reporte {report_id}</p>')
+            self.assertFalse(os.path.exists(old_path))
+        
+        again, _ = self._migrate()
+        self.assertEqual(again['moved'], 0)
+    
+    def test_write_to_moved_report_follows_new_path(self):
+        """Probar que una escritura en la ruta anterior a la migración termina en la ruta nueva"""
+        file_name, old_path = self._report(1)
+        self._migrate()
+        new_path = self.updates[1]
+        
+        # update_report leyó file_path antes de la migración y escribió después de finish_move
+        write_html(old_path, '<p>Reporte 1 corregido</p>')
+        with patch('app.services.lab_report_service.db') as db:
+            db.session.query.return_value.filter_by.return_value.scalar.return_value = new_path
+            self.service._follow_moved_file(1, old_path, '<p>Reporte 1 corregido</p>')
+        
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(read_html(new_path), '<p>Reporte 1 corregido</p>')
+    
+    def test_failed_commit_keeps_original_files(self):
+        """Probar que si falla la actualización de la base de datos los archivos quedan donde estaban"""
+        file_name, old_path = self._report(1)
+        
+        with patch.object(LabReport, 'file_rows_after', side_effect=self._file_rows_after), \
+                patch.object(LabReport, 'update_file_paths'), \
+                patch('app.services.lab_report_service.db') as db:
+            db.session.commit.side_effect = RuntimeError('conexión perdida')
+            with self.assertRaises(RuntimeError):
+                self.service.migrate_storage_layout()
+            db.session.rollback.assert_called_once()
+        
+        self.assertTrue(os.path.exists(old_path))
+        self.assertFalse(os.path.exists(self.service.layout.path_for(file_name, MOMENT)))
+
+
+if __name__ == '__main__':
+    unittest.main()
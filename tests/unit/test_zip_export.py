@@ -0,0 +1,138 @@
+"""
+Pruebas unitarias para la exportación de archivos en ZIP generado en streaming
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.config import Config
+from app.models.lab_report import LabReport
+from app.services.frontend_html_service import FrontendHTMLService
+from app.services.lab_report_service import LabReportService
+from app.services.report_storage import write_html
+from app.services.zip_export import stream_zip
+from tests.unit.helpers import frontend_html_config
+
+HTML = '<!DOCTYPE html>\n<html><body>' + 'Resultado de laboratorio ñ ' * 500 + '</body></html>'
+
+
+class FakeExportQuery:
+    """Consulta en memoria con la misma interfaz que usa el servicio"""
+    
+    def __init__(self, reports):
+        self.reports = reports
+        self.batch_sizes = []
+    
+    def options(self, *args):
+        return self
+    
+    def yield_per(self, batch_size):
+        self.batch_sizes.append(batch_size)
+        return iter(self.reports)
+
+
+class TestZipExport(unittest.TestCase):
+    """Pruebas para stream_zip y las exportaciones de frontend HTML y reportes"""
+    
+    def setUp(self):
+        """Configuración inicial para cada prueba"""
+        self.base_path = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Limpieza después de cada prueba"""
+        shutil.rmtree(self.base_path, ignore_errors=True)
+    
+    def _zip(self, chunks):
+        return zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    
+    def test_entries_by_format(self):
+        """Probar .gz copiado como deflate, formatos comprimidos sin recomprimir y omisión de faltantes"""
+        plain = os.path.join(self.base_path, 'a.html')
+        gzipped = os.path.join(self.base_path, 'b.html.gz')
+        pdf = os.path.join(self.base_path, 'c.pdf')
+        write_html(plain, HTML)
+        write_html(gzipped, HTML)
+        with open(pdf, 'wb') as f:
+            f.write(b'%PDF-1.4 contenido')
+        
+        chunks = list(stream_zip([(plain, 'a.html'), (gzipped, 'b.html'),
+                                  (os.path.join(self.base_path, 'faltante.html'), 'faltante.html'),
+                                  (pdf, 'c.pdf')]))
+        archive = self._zip(chunks)
+        
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['a.html', 'b.html', 'c.pdf'])
+        self.assertEqual(archive.read('b.html').decode('utf-8'), HTML)
+        self.assertEqual(archive.read('a.html').decode('utf-8'), HTML)
+        info = archive.getinfo('b.html')
+        self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(info.compress_size, os.path.getsize(gzipped) - 18)
+        self.assertEqual(archive.getinfo('c.pdf').compress_type, zipfile.ZIP_STORED)
+        self.assertGreater(len(chunks), 3)
+    
+    def test_zip_is_produced_lazily(self):
+        """Probar que la primera parte del ZIP sale antes de leer el resto de archivos"""
+        path = os.path.join(self.base_path, 'a.html')
+        write_html(path, HTML)
+        consumed = []
+        
+        def files():
+            for number in range(3):
+                consumed.append(number)
+                yield path, f'{number}.html'
+        
+        chunks = stream_zip(files())
+        first = next(chunks)
+        self.assertEqual(consumed, [0])
+        self.assertEqual(self._zip([first] + list(chunks)).namelist(), ['0.html', '1.html', '2.html'])
+    
+    def test_frontend_export_by_filter_and_names(self):
+        """Probar exportación de archivos del frontend por filtro y por nombre"""
+        service = FrontendHTMLService(frontend_html_config(self.base_path, FRONTEND_HTML_COMPRESS_AT_REST=True))
+        try:
+            for name, order in (('frontend_a.html', 'ORD-1'), ('frontend_b.html', 'ORD-2')):
+                service.save_html_file(HTML, os.path.join(self.base_path, '2024', '01', name),
+                                       {'order_number': order})
+            
+            archive = self._zip(service.export_html_files(order_number='ORD-2', include_metadata=True))
+            self.assertEqual(archive.namelist(), ['2024/01/frontend_b.html', '2024/01/frontend_b.html.meta'])
+            self.assertIn('Resultado de laboratorio', archive.read('2024/01/frontend_b.html').decode('utf-8'))
+            
+            archive = self._zip(service.export_html_files(['frontend_a.html', 'no_existe.html', '../x']))
+            self.assertEqual(archive.namelist(), ['2024/01/frontend_a.html'])
+        finally:
+            service.index.close()
+    
+    def test_reports_export_reads_in_batches(self):
+        """Probar exportación de reportes por lotes omitiendo los que no tienen archivo"""
+        class ReportsConfig(Config):
+            REPORTS_BASE_PATH = self.base_path
+            REPORTS_EXPORT_BATCH_SIZE = 7
+        
+        service = LabReportService(ReportsConfig())
+        stored = os.path.join(self.base_path, 'ORD-1.html')
+        write_html(stored + '.gz', HTML)
+        reports = [
+            SimpleNamespace(file_path=stored, file_name='ORD-1.html'),
+            SimpleNamespace(file_path=os.path.join(self.base_path, 'ORD-2.html'), file_name='ORD-2.html')
+        ]
+        query = FakeExportQuery(reports)
+        
+        with patch.object(LabReport, 'query_for_export', return_value=query) as query_for_export:
+            archive = self._zip(service.export_reports_zip(order_number='ORD-1'))
+        
+        query_for_export.assert_called_once_with(None, 'ORD-1', None, None, None)
+        
+        self.assertEqual(archive.namelist(), ['ORD-1.html'])
+        self.assertEqual(archive.read('ORD-1.html').decode('utf-8'), HTML)
+        self.assertEqual(query.batch_sizes, [7])
+
+
+if __name__ == '__main__':
+    unittest.main()